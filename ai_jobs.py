@@ -0,0 +1,348 @@
+"""
+Background jobs for AI operations.
+
+An LLM call made in a request handler holds a gunicorn thread for 10-60
+seconds, and each worker has a fixed number of them, so a few concurrent
+AI users could take the instance offline. AI operations are submitted as
+jobs instead: the request stores an AIJob row and returns its id at once,
+the work runs on a bounded thread pool, and the client polls
+GET /api/ai/jobs/<id> or streams GET /api/ai/jobs/<id>/events.
+
+Operations register a handler under a kind, with the API key scope a
+Bearer caller needs to submit it:
+
+    @register_job('summarize_decision', action=AIAction.SUMMARIZE, scope='read')
+    def summarize_decision(job, decision_id):
+        for chunk in provider.stream(prompt):
+            job.emit(chunk)                      # streamed to SSE clients
+        job.usage('openai', 'gpt-4o-mini', tokens_input=812, tokens_output=240)
+        return {'summary': text}                 # stored in AIJob.result
+
+- At most AI_JOB_WORKERS jobs run per process, and at most
+  AI_JOB_TENANT_CONCURRENCY per tenant; a tenant's further jobs wait for one
+  of its own to finish, so one busy tenant cannot starve the others.
+  Submitting beyond AI_JOB_MAX_QUEUED outstanding jobs raises JobQueueFull.
+- Partial results go out on a per-job event stream (event_bus.py, shared
+  through Redis when EVENT_BUS_URL or REDIS_URL is set), with the same
+  Last-Event-ID replay as the MCP stream. The final state is always in the
+  row, so late subscribers and pollers need nothing else; streams re-read it
+  on every heartbeat and end once the job has stopped, even if its
+  job.finished event was lost.
+- On completion the job's token usage is written to AIJob and, if the
+  tenant logs AI interactions, to an AIInteractionLog row.
+
+Queued jobs do not survive a process restart; rows left queued or running
+longer than AI_JOB_STALE_SECONDS are reported as failed (expire_stale).
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+
+from env_config import env_number
+from event_bus import WORKER_TIMEOUT, create_bus, stream_seconds_limit
+from models import db, AIAction, AIInteractionLog, AIJob, Tenant
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_TENANT_CONCURRENCY = 2
+DEFAULT_MAX_QUEUED = 100
+DEFAULT_STALE_SECONDS = 900
+DEFAULT_STREAM_SECONDS = 300
+KEY_PREFIX = 'dr:aijob:'
+REPLAY_SIZE = 2000
+
+PROGRESS = 'job.progress'
+STATUS = 'job.status'
+FINISHED = 'job.finished'
+
+JobKind = namedtuple('JobKind', 'name handler action scope')
+
+_kinds = {}
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def finished_data(job):
+    """The job.finished payload for a job that has stopped, or None while it is queued or running."""
+    if job.status in AIJob.ACTIVE_STATUSES:
+        return None
+    return {
+        'status': job.status, 'result': job.result, 'error_message': job.error_message,
+        'tokens_input': job.tokens_input, 'tokens_output': job.tokens_output,
+    }
+
+
+class JobQueueFull(Exception):
+    """Too many AI jobs are outstanding in this process."""
+
+
+def register_job(name, action=AIAction.SUMMARIZE, scope='read'):
+    """Register handler(job, **params) as the job kind name; API keys need scope to submit it."""
+    def decorator(handler):
+        _kinds[name] = JobKind(name, handler, action, scope)
+        return handler
+    return decorator
+
+
+def job_kind(name):
+    return _kinds.get(name)
+
+
+class JobContext:
+    """What a handler gets: the job's identity and params, and ways to report progress and usage."""
+
+    def __init__(self, job, runner):
+        self.id = job.id
+        self.tenant_id = job.tenant_id
+        self.user_id = job.user_id
+        self.api_key_id = job.api_key_id
+        self.params = dict(job.params or {})
+        self._runner = runner
+        self.llm_provider = None
+        self.llm_model = None
+        self.tokens_input = 0
+        self.tokens_output = 0
+        self.cache_hit = False
+        self.tokens_saved = 0
+
+    def emit(self, text):
+        """Send a partial result to the job's subscribers."""
+        self._runner.events.publish(self.id, PROGRESS, {'text': text})
+
+    def usage(self, provider=None, model=None, tokens_input=0, tokens_output=0):
+        """Add one LLM call's token usage."""
+        self.llm_provider = provider or self.llm_provider
+        self.llm_model = model or self.llm_model
+        self.tokens_input += tokens_input or 0
+        self.tokens_output += tokens_output or 0
+
+    def record_cache(self, result):
+        """Account for an llm_cache CacheResult."""
+        self.usage(tokens_input=result.tokens_input, tokens_output=result.tokens_output)
+        self.cache_hit = self.cache_hit or result.hit
+        self.tokens_saved += result.tokens_saved
+
+
+class AIJobRunner:
+    """Runs AI jobs on a shared pool with a per-tenant concurrency limit."""
+
+    def __init__(self, workers=DEFAULT_WORKERS, tenant_concurrency=DEFAULT_TENANT_CONCURRENCY,
+                 max_queued=DEFAULT_MAX_QUEUED, stale_seconds=DEFAULT_STALE_SECONDS, events=None):
+        self.workers = workers
+        self.tenant_concurrency = tenant_concurrency
+        self.max_queued = max_queued
+        self.stale_seconds = stale_seconds
+        self.stream_seconds = stream_seconds_limit(env_number('AI_JOB_STREAM_SECONDS', DEFAULT_STREAM_SECONDS, float),
+                                                   WORKER_TIMEOUT)
+        self._events = events
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._executor = None
+        self._pid = None
+        self._running = {}  # tenant id -> jobs running or handed to the pool
+        self._waiting = {}  # tenant id -> deque of job ids over the tenant's limit
+        self._outstanding = 0
+        self._counts = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0}
+
+    @property
+    def executor(self):
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ai-job')
+                    self._pid = os.getpid()
+        return self._executor
+
+    @property
+    def events(self):
+        if self._events is None:
+            with self._lock:
+                if self._events is None:
+                    self._events = create_bus(prefix=KEY_PREFIX, replay_size=REPLAY_SIZE)
+        return self._events
+
+    @events.setter
+    def events(self, value):
+        self._events = value
+
+    def submit(self, kind, tenant_id, channel, params=None, user_id=None, api_key_id=None):
+        """Store a queued AIJob and schedule it; returns the job. Raises KeyError or JobQueueFull."""
+        if kind not in _kinds:
+            raise KeyError(kind)
+        with self._lock:
+            if self._outstanding >= self.max_queued:
+                self._counts['rejected'] += 1
+                raise JobQueueFull(f'{self._outstanding} AI jobs outstanding')
+            self._outstanding += 1
+            self._counts['submitted'] += 1
+        try:
+            job = AIJob(id=f'job_{uuid.uuid4().hex}', tenant_id=tenant_id, user_id=user_id, api_key_id=api_key_id,
+                        channel=channel, kind=kind, params=params or {}, status=AIJob.STATUS_QUEUED)
+            db.session.add(job)
+            db.session.commit()
+            db.session.refresh(job)  # The caller reads the queued state, not the worker's
+        except Exception:
+            self._finished(None)
+            raise
+        self._schedule(current_app._get_current_object(), job.id, tenant_id)
+        return job
+
+    def _schedule(self, app, job_id, tenant_id):
+        with self._lock:
+            if self._running.get(tenant_id, 0) >= self.tenant_concurrency:
+                self._waiting.setdefault(tenant_id, deque()).append(job_id)
+                return
+            self._running[tenant_id] = self._running.get(tenant_id, 0) + 1
+        self.executor.submit(self._run, app, job_id, tenant_id)
+
+    def _run(self, app, job_id, tenant_id):
+        try:
+            with app.app_context():
+                self._execute(job_id)
+        except Exception:
+            logger.exception(f"AI job {job_id} could not be recorded")
+        finally:
+            self._finished(tenant_id, app)
+
+    def _finished(self, tenant_id, app=None):
+        next_job = None
+        with self._lock:
+            if tenant_id is not None:
+                waiting = self._waiting.get(tenant_id)
+                if waiting:
+                    next_job = waiting.popleft()  # Keeps the tenant's slot
+                    if not waiting:
+                        del self._waiting[tenant_id]
+                else:
+                    self._running[tenant_id] -= 1
+                    if not self._running[tenant_id]:
+                        del self._running[tenant_id]
+            self._outstanding -= 1
+            self._idle.notify_all()
+        if next_job is not None:
+            self.executor.submit(self._run, app, next_job, tenant_id)
+
+    @staticmethod
+    def _leave_queue(job_id, status, **values):
+        """Move a queued job to status in one conditional UPDATE; False if it had already left the queue."""
+        moved = AIJob.query.filter_by(id=job_id, status=AIJob.STATUS_QUEUED).update(
+            {'status': status, **values}, synchronize_session=False
+        )
+        db.session.commit()
+        return bool(moved)
+
+    def _execute(self, job_id):
+        if not self._leave_queue(job_id, AIJob.STATUS_RUNNING, started_at=_utcnow()):
+            return  # Cancelled while waiting
+        job = db.session.get(AIJob, job_id)
+        kind = _kinds.get(job.kind)
+        self.events.publish(job_id, STATUS, {'status': AIJob.STATUS_RUNNING})
+
+        context = JobContext(job, self)
+        started = time.monotonic()
+        try:
+            if kind is None:
+                raise KeyError(f'Unknown AI job kind {job.kind!r}')
+            result = kind.handler(context, **context.params)
+        except Exception as e:
+            logger.exception(f"AI job {job_id} ({job.kind}) failed")
+            db.session.rollback()
+            job = db.session.get(AIJob, job_id)
+            job.status = AIJob.STATUS_FAILED
+            job.error_message = str(e)[:500] or type(e).__name__
+            self._count('failed')
+        else:
+            job.status = AIJob.STATUS_COMPLETED
+            job.result = result
+            self._count('completed')
+
+        job.finished_at = _utcnow()
+        job.duration_ms = int((time.monotonic() - started) * 1000)
+        job.llm_provider = context.llm_provider
+        job.llm_model = context.llm_model
+        job.tokens_input = context.tokens_input
+        job.tokens_output = context.tokens_output
+        log = self._interaction_log(job, kind, context)
+        if log is not None:
+            db.session.add(log)
+            db.session.flush()
+            job.interaction_log_id = log.id
+        db.session.commit()
+        self._publish_finished(job)
+
+    @staticmethod
+    def _interaction_log(job, kind, context):
+        tenant = db.session.get(Tenant, job.tenant_id)
+        if tenant is None or tenant.ai_log_interactions is False:
+            return None
+        return AIInteractionLog(
+            user_id=job.user_id, tenant_id=job.tenant_id, api_key_id=job.api_key_id, channel=job.channel,
+            action=kind.action if kind else AIAction.SUMMARIZE,
+            llm_provider=job.llm_provider, llm_model=job.llm_model,
+            tokens_input=job.tokens_input, tokens_output=job.tokens_output,
+            cache_hit=context.cache_hit, tokens_saved=context.tokens_saved,
+            duration_ms=job.duration_ms, success=job.status == AIJob.STATUS_COMPLETED,
+            error_message=job.error_message,
+        )
+
+    def _publish_finished(self, job):
+        self.events.publish(job.id, FINISHED, finished_data(job))
+        self.events.discard(job.id)
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def cancel(self, job):
+        """Cancel a queued job; returns False once it has started."""
+        if not self._leave_queue(job.id, AIJob.STATUS_CANCELLED, finished_at=_utcnow()):
+            return False
+        self._publish_finished(job)  # Expired by the commit, so this reads the cancelled row
+        return True
+
+    def expire_stale(self, job):
+        """Mark a job failed if it has been queued or running too long (its process went away)."""
+        created_at = job.created_at.replace(tzinfo=None)
+        if job.status in AIJob.ACTIVE_STATUSES and created_at < _utcnow() - timedelta(seconds=self.stale_seconds):
+            job.status = AIJob.STATUS_FAILED
+            job.error_message = 'Job was interrupted before it finished'
+            job.finished_at = _utcnow()
+            db.session.commit()
+        return job
+
+    def subscribe(self, job_id, last_event_id=None):
+        """A subscription to the job's events, replaying what was sent before."""
+        return self.events.subscribe(job_id, last_event_id or self.events.first_event_id)
+
+    def join(self, timeout=None):
+        """Wait until no jobs are outstanding; returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._outstanding == 0, timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counts,
+                'outstanding': self._outstanding,
+                'running': sum(self._running.values()),
+                'waiting': sum(len(waiting) for waiting in self._waiting.values()),
+                'workers': self.workers,
+            }
+
+
+ai_jobs = AIJobRunner(
+    workers=env_number('AI_JOB_WORKERS', DEFAULT_WORKERS),
+    tenant_concurrency=env_number('AI_JOB_TENANT_CONCURRENCY', DEFAULT_TENANT_CONCURRENCY),
+    max_queued=env_number('AI_JOB_MAX_QUEUED', DEFAULT_MAX_QUEUED),
+    stale_seconds=env_number('AI_JOB_STALE_SECONDS', DEFAULT_STALE_SECONDS),
+)
@@ -0,0 +1,252 @@
+"""
+Tenant AI interaction log listing and audit export.
+
+Every AI request adds an AIInteractionLog row, so the table is large and keeps
+growing. Paging it with LIMIT/OFFSET makes the database read and discard every
+earlier row, and loading full ORM rows decodes query text and JSON for rows
+nobody asked about. Instead:
+
+- Pages are keyset paginated, newest first, on (tenant_id, created_at, id) -
+  the columns of idx_ai_log_tenant_created - so page 1000 costs the same as
+  page 1. Each page carries an opaque next_cursor.
+- Channel, action, success and date-range filters are applied in SQL.
+- Only the serialized columns are selected, as plain rows; query_text is read
+  only when include_query is set.
+- Export streams every matching row as CSV or NDJSON in keyset batches, so
+  memory use does not grow with the tenant's history.
+
+    filters = parse_filters(request.args)
+    page = list_logs(tenant.id, filters, limit=100, cursor=request.args.get('cursor'))
+    # {'logs': [...], 'limit': 100, 'next_cursor': 'MjAyNi0xMC0xOFQw...'}
+"""
+import base64
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from sqlalchemy import tuple_
+
+from models import db, AIAction, AIChannel, AIInteractionLog
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Rows fetched per round trip while exporting
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    # format -> (mimetype, file extension)
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+
+# Serialized fields, in AIInteractionLog.to_dict() order; query_text is only
+# selected on request
+FIELDS = (
+    'id', 'user_id', 'tenant_id', 'channel', 'action', 'query_anonymized', 'decision_ids', 'decision_count',
+    'llm_provider', 'llm_model', 'tokens_input', 'tokens_output', 'cache_hit', 'tokens_saved', 'duration_ms',
+    'success', 'error_message', 'created_at',
+)
+QUERY_FIELD = 'query_text'
+
+_TRUE = {'1', 'true', 'yes'}
+_FALSE = {'0', 'false', 'no'}
+
+# Spreadsheet apps run cells starting with these as formulas
+_CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+LogFilters = namedtuple('LogFilters', 'channel action success start end include_query',
+                        defaults=(None, None, None, None, None, False))
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _enum_value(value):
+    return value.value if hasattr(value, 'value') else value
+
+
+def _naive_utc(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+_CONVERTERS = {
+    'channel': _enum_value,
+    'action': _enum_value,
+    'cache_hit': bool,
+    'created_at': _iso,
+}
+
+
+# ==================== Filters ====================
+
+def _parse_bool(name, value):
+    value = value.strip().lower()
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    raise ValueError(f'Invalid {name}: must be true or false')
+
+
+def _parse_date(name, value):
+    try:
+        return _naive_utc(datetime.fromisoformat(value.replace('Z', '+00:00')))
+    except ValueError:
+        raise ValueError(f'Invalid {name} format') from None
+
+
+def parse_filters(args):
+    """LogFilters from request query arguments; raises ValueError with a message for the client."""
+    channel = action = success = start = end = None
+    if args.get('channel'):
+        try:
+            channel = AIChannel(args['channel'])
+        except ValueError:
+            raise ValueError(f"Invalid channel: {args['channel']}") from None
+    if args.get('action'):
+        try:
+            action = AIAction(args['action'])
+        except ValueError:
+            raise ValueError(f"Invalid action: {args['action']}") from None
+    if args.get('success'):
+        success = _parse_bool('success', args['success'])
+    if args.get('start_date'):
+        start = _parse_date('start_date', args['start_date'])
+    if args.get('end_date'):
+        end = _parse_date('end_date', args['end_date'])
+    include_query = _parse_bool('include_query', args['include_query']) if args.get('include_query') else False
+    return LogFilters(channel, action, success, start, end, include_query)
+
+
+def encode_cursor(created_at, log_id):
+    raw = f'{_naive_utc(created_at).isoformat()}|{log_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor returned by list_logs; raises ValueError if it is not one."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, log_id = raw.rsplit('|', 1)
+        return _naive_utc(datetime.fromisoformat(created_at)), int(log_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor') from None
+
+
+# ==================== Queries ====================
+
+def fields_for(filters):
+    if not filters.include_query:
+        return FIELDS
+    return FIELDS[:5] + (QUERY_FIELD,) + FIELDS[5:]
+
+
+def _query(tenant_id, filters, fields, after=None):
+    """Column-only query for the tenant's matching logs, newest first, after the keyset position."""
+    query = db.session.query(*(getattr(AIInteractionLog, name) for name in fields)).filter(
+        AIInteractionLog.tenant_id == tenant_id
+    )
+    if filters.channel is not None:
+        query = query.filter(AIInteractionLog.channel == filters.channel)
+    if filters.action is not None:
+        query = query.filter(AIInteractionLog.action == filters.action)
+    if filters.success is not None:
+        query = query.filter(AIInteractionLog.success == filters.success)
+    if filters.start is not None:
+        query = query.filter(AIInteractionLog.created_at >= filters.start)
+    if filters.end is not None:
+        query = query.filter(AIInteractionLog.created_at <= filters.end)
+    if after is not None:
+        query = query.filter(tuple_(AIInteractionLog.created_at, AIInteractionLog.id) < tuple_(*after))
+    return query.order_by(AIInteractionLog.created_at.desc(), AIInteractionLog.id.desc())
+
+
+def _serializer(fields):
+    """Turn a projected row into the log's dict, converting only the columns that need it."""
+    converters = [(name, _CONVERTERS.get(name)) for name in fields]
+
+    def serialize(row):
+        return {name: convert(value) if convert else value for (name, convert), value in zip(converters, row)}
+    return serialize
+
+
+def _keyset(row, fields):
+    return row[fields.index('created_at')], row[fields.index('id')]
+
+
+def list_logs(tenant_id, filters, limit=DEFAULT_PAGE_SIZE, cursor=None, offset=None):
+    """
+    One page of the tenant's logs, newest first.
+
+    Pass the previous page's next_cursor to continue; it is None on the last
+    page. offset is kept for older clients and reads every skipped row.
+    """
+    fields = fields_for(filters)
+    after = decode_cursor(cursor) if cursor else None
+    query = _query(tenant_id, filters, fields, after)
+    if offset and after is None:
+        query = query.offset(offset)
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*_keyset(rows[-1], fields))
+    serialize = _serializer(fields)
+    return {'logs': [serialize(row) for row in rows], 'limit': limit, 'next_cursor': next_cursor}
+
+
+def iter_log_batches(tenant_id, filters, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of log dicts for every matching row, batch_size at a time."""
+    fields = fields_for(filters)
+    serialize = _serializer(fields)
+    after = None
+    while True:
+        rows = _query(tenant_id, filters, fields, after).limit(batch_size).all()
+        if not rows:
+            return
+        yield [serialize(row) for row in rows]
+        if len(rows) < batch_size:
+            return
+        after = _keyset(rows[-1], fields)
+
+
+# ==================== Export ====================
+
+def _csv_cell(value):
+    if isinstance(value, list):
+        return ' '.join(str(item) for item in value)
+    if isinstance(value, str) and value.startswith(_CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_export_ndjson(tenant_id, filters, batch_size=EXPORT_BATCH_SIZE):
+    for batch in iter_log_batches(tenant_id, filters, batch_size):
+        yield ''.join(json.dumps(log) + '\n' for log in batch)
+
+
+def iter_export_csv(tenant_id, filters, batch_size=EXPORT_BATCH_SIZE):
+    """CSV with a header row; decision ids are space separated and formula-like text is quoted."""
+    fields = fields_for(filters)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue()
+    for batch in iter_log_batches(tenant_id, filters, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_cell(log[name]) for name in fields] for log in batch)
+        yield buffer.getvalue()
+
+
+def iter_export(tenant_id, filters, export_format='ndjson', batch_size=EXPORT_BATCH_SIZE):
+    if export_format == 'csv':
+        return iter_export_csv(tenant_id, filters, batch_size)
+    return iter_export_ndjson(tenant_id, filters, batch_size)
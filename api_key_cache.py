@@ -0,0 +1,332 @@
+"""
+Cache of authenticated AI API keys for the MCP server and the AI API.
+
+Agent clients make dozens of calls per task, and each one used to hash the
+bearer key, look up AIApiKey by key_hash, load the user, the tenant and its
+AI flags, and write last_used_at. The cache keeps the outcome per key hash:
+
+    key_id, user_id, tenant_id, scopes, expires_at,
+    ai_enabled, external_access, tenant_active, member, opted_out
+
+so a key that is already known is authorized without SQL:
+
+    principal = api_key_cache.authenticate(api_key)
+    if principal is not None and principal.allows_mcp:
+        api_key_activity.touch(principal.key_id)
+
+Only valid keys are cached. A cached key stops authorizing the moment its
+expires_at passes, and entries are invalidated after any commit that revokes
+or changes a key, changes a tenant's AI settings or deletion state, or changes
+a membership's AI opt-out. Bulk query deletes bypass the ORM and must call
+invalidate_tenants()/invalidate_users() themselves.
+
+Entries live in Redis when API_KEY_CACHE_URL or REDIS_URL points at one, so
+a revocation reaches every worker at once; otherwise each process keeps its
+own entries with a short TTL.
+
+last_used_at is written through api_key_activity, which batches the
+timestamps of all keys into one UPDATE a minute (see workspace_cache.py).
+"""
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import timezone
+
+from sqlalchemy import and_, inspect
+
+from env_config import env_number
+from models import db, AIApiKey, Tenant, TenantMembership, User
+from rate_limits import hash_api_key
+from redis_support import RedisError, connect, redis_url
+from session_hooks import PendingChanges
+from workspace_cache import ActivityTracker
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'dr:apikey:'
+DEFAULT_REDIS_TTL = 300
+DEFAULT_LOCAL_TTL = 30
+LOCAL_MAX_ENTRIES = 10000
+
+# Columns whose changes affect authorization; last_used_at is not one of them
+KEY_ATTRS = ('key_hash', 'user_id', 'tenant_id', 'scopes', 'expires_at', 'revoked_at')
+TENANT_ATTRS = ('ai_features_enabled', 'ai_external_access_enabled', 'deleted_at')
+MEMBERSHIP_ATTRS = ('user_id', 'tenant_id', 'ai_opt_out')
+
+
+class ApiKeyPrincipal(namedtuple(
+    'ApiKeyPrincipal',
+    'key_id user_id tenant_id scopes expires_at ai_enabled external_access tenant_active member opted_out',
+)):
+    """What an API key may do; expires_at is a UTC epoch timestamp or None."""
+
+    __slots__ = ()
+
+    def expired(self, now=None):
+        return self.expires_at is not None and (now or time.time()) >= self.expires_at
+
+    def has_scope(self, scope):
+        return scope in self.scopes
+
+    @property
+    def allows_mcp(self):
+        """Whether the key may use the MCP server and AI API: its tenant has AI and external
+        access enabled and is active, and its user is a member who has not opted out."""
+        return bool(self.ai_enabled and self.external_access and self.tenant_active and self.member
+                    and not self.opted_out)
+
+
+def _epoch(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def principal_for_key(key_hash):
+    """Load the principal of a valid key in one query; None if it is unknown, revoked or expired."""
+    row = (
+        db.session.query(
+            AIApiKey.id, AIApiKey.user_id, AIApiKey.tenant_id, AIApiKey.scopes,
+            AIApiKey.expires_at, AIApiKey.revoked_at,
+            Tenant.ai_features_enabled, Tenant.ai_external_access_enabled, Tenant.deleted_at,
+            TenantMembership.id, TenantMembership.ai_opt_out,
+        )
+        .join(Tenant, Tenant.id == AIApiKey.tenant_id)
+        .outerjoin(TenantMembership, and_(
+            TenantMembership.user_id == AIApiKey.user_id,
+            TenantMembership.tenant_id == AIApiKey.tenant_id,
+        ))
+        .filter(AIApiKey.key_hash == key_hash)
+        .first()
+    )
+    if row is None or row.revoked_at is not None:
+        return None
+    principal = ApiKeyPrincipal(
+        key_id=row[0],
+        user_id=row.user_id,
+        tenant_id=row.tenant_id,
+        scopes=tuple(row.scopes or ()),
+        expires_at=_epoch(row.expires_at),
+        ai_enabled=bool(row.ai_features_enabled),
+        external_access=bool(row.ai_external_access_enabled),
+        tenant_active=row.deleted_at is None,
+        member=row[9] is not None,
+        opted_out=bool(row.ai_opt_out),
+    )
+    return None if principal.expired() else principal
+
+
+class LocalApiKeyStore:
+    """Per-process principals with a TTL."""
+
+    def __init__(self, ttl=DEFAULT_LOCAL_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}  # key hash -> (expires at, ApiKeyPrincipal)
+
+    def get(self, key_hash):
+        entry = self._entries.get(key_hash)
+        if entry is None:
+            return None
+        if entry[0] <= self._clock():
+            self._entries.pop(key_hash, None)
+            return None
+        return entry[1]
+
+    def set(self, key_hash, principal):
+        with self._lock:
+            if len(self._entries) >= LOCAL_MAX_ENTRIES:
+                self._entries.clear()
+            self._entries[key_hash] = (self._clock() + self.ttl, principal)
+
+    def delete(self, key_hashes=(), tenant_ids=(), user_ids=()):
+        tenant_ids, user_ids = set(tenant_ids), set(user_ids)
+        with self._lock:
+            for key_hash in key_hashes:
+                self._entries.pop(key_hash, None)
+            if tenant_ids or user_ids:
+                self._entries = {
+                    key_hash: entry for key_hash, entry in self._entries.items()
+                    if entry[1].tenant_id not in tenant_ids and entry[1].user_id not in user_ids
+                }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisApiKeyStore:
+    """Principals shared by all workers through Redis, indexed by tenant and user for invalidation."""
+
+    def __init__(self, client, ttl=DEFAULT_REDIS_TTL):
+        self.client = client
+        self.ttl = ttl
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        return cls(connect(url), **kwargs)
+
+    def get(self, key_hash):
+        try:
+            raw = self.client.get(f'{KEY_PREFIX}{key_hash}')
+        except RedisError as e:
+            logger.warning(f"API key cache unavailable: {e}")
+            return None
+        if raw is None:
+            return None
+        try:
+            data = json.loads(raw)
+            data['scopes'] = tuple(data['scopes'])
+            return ApiKeyPrincipal(**data)
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def set(self, key_hash, principal):
+        tenant_index = f'{KEY_PREFIX}tenant:{principal.tenant_id}'
+        user_index = f'{KEY_PREFIX}user:{principal.user_id}'
+        try:
+            pipe = self.client.pipeline()
+            pipe.set(f'{KEY_PREFIX}{key_hash}', json.dumps(principal._asdict()), ex=self.ttl)
+            pipe.sadd(tenant_index, key_hash)
+            pipe.expire(tenant_index, self.ttl)
+            pipe.sadd(user_index, key_hash)
+            pipe.expire(user_index, self.ttl)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"API key cache unavailable: {e}")
+
+    def delete(self, key_hashes=(), tenant_ids=(), user_ids=()):
+        indexes = [f'{KEY_PREFIX}tenant:{tenant_id}' for tenant_id in tenant_ids]
+        indexes += [f'{KEY_PREFIX}user:{user_id}' for user_id in user_ids]
+        try:
+            hashes = set(key_hashes)
+            for index in indexes:
+                hashes.update(member.decode() if isinstance(member, bytes) else member
+                              for member in self.client.smembers(index))
+            keys = [f'{KEY_PREFIX}{key_hash}' for key_hash in hashes] + indexes
+            if keys:
+                self.client.delete(*keys)
+        except RedisError as e:
+            # A stale entry lives at most ttl seconds
+            logger.error(f"Could not invalidate cached API keys: {e}")
+
+    def clear(self):
+        try:
+            for key in self.client.scan_iter(match=f'{KEY_PREFIX}*'):
+                self.client.delete(key)
+        except RedisError as e:
+            logger.error(f"Could not clear cached API keys: {e}")
+
+
+def create_store(url=None):
+    """RedisApiKeyStore for a redis:// URL (when the redis package is installed), otherwise local."""
+    url = redis_url(url, 'API_KEY_CACHE_URL', 'API key cache', 'keys are cached per process')
+    if url:
+        return RedisApiKeyStore.from_url(url, ttl=env_number('API_KEY_CACHE_TTL', DEFAULT_REDIS_TTL))
+    return LocalApiKeyStore(ttl=env_number('API_KEY_CACHE_TTL', DEFAULT_LOCAL_TTL))
+
+
+class ApiKeyCache:
+    """Authenticates bearer keys from cached principals."""
+
+    def __init__(self, store=None):
+        self._store = store
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = create_store()
+        return self._store
+
+    @store.setter
+    def store(self, value):
+        self._store = value
+
+    def authenticate(self, api_key):
+        """The principal of a valid bearer key, or None."""
+        if not api_key:
+            return None
+        return self.get(hash_api_key(api_key))
+
+    def get(self, key_hash):
+        principal = self.store.get(key_hash)
+        if principal is not None:
+            if not principal.expired():
+                self.hits += 1
+                return principal
+            self.store.delete(key_hashes=[key_hash])
+        self.misses += 1
+        principal = principal_for_key(key_hash)
+        if principal is not None:
+            self.store.set(key_hash, principal)
+        return principal
+
+    def invalidate(self, *key_hashes):
+        if key_hashes:
+            self.store.delete(key_hashes=key_hashes)
+
+    def invalidate_tenants(self, *tenant_ids):
+        if tenant_ids:
+            self.store.delete(tenant_ids=tenant_ids)
+
+    def invalidate_users(self, *user_ids):
+        if user_ids:
+            self.store.delete(user_ids=user_ids)
+
+    def clear(self):
+        self.store.clear()
+
+
+api_key_cache = ApiKeyCache()
+api_key_activity = ActivityTracker(AIApiKey, column='last_used_at')
+
+
+# ==================== Invalidation ====================
+
+_PENDING_KEY = 'api_key_cache_invalidations'
+
+
+def _changed(obj, attrs):
+    state = inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+
+def _collect_invalidations(session):
+    pending = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        # New and deleted rows always count; updates only when an authorization column changed
+        changed = obj in session.new or obj in session.deleted
+        if isinstance(obj, AIApiKey) and (changed or _changed(obj, KEY_ATTRS)):
+            hashes = inspect(obj).attrs.key_hash.history
+            keys = set(hashes.deleted or ()) | set(hashes.unchanged or ()) | set(hashes.added or ())
+        elif isinstance(obj, Tenant) and (changed or _changed(obj, TENANT_ATTRS)):
+            keys = {('tenant', obj.id)}
+        elif isinstance(obj, TenantMembership) and (changed or _changed(obj, MEMBERSHIP_ATTRS)):
+            keys = {('user', obj.user_id)}
+        elif isinstance(obj, User) and obj in session.deleted:
+            keys = {('user', obj.id)}
+        else:
+            continue
+        pending.update(keys)
+    return pending
+
+
+def _apply_invalidations(session, pending):
+    api_key_cache.store.delete(
+        key_hashes=[item for item in pending if not isinstance(item, tuple)],
+        tenant_ids=[item[1] for item in pending if isinstance(item, tuple) and item[0] == 'tenant'],
+        user_ids=[item[1] for item in pending if isinstance(item, tuple) and item[0] == 'user'],
+    )
+
+
+pending_invalidations = PendingChanges(_PENDING_KEY, _collect_invalidations, _apply_invalidations)
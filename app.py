@@ -5,6 +5,7 @@ import logging
 import sys
 import traceback
 import threading
+import io
 from sqlalchemy.pool import StaticPool
 
 # psycopg2 is only needed for PostgreSQL - make import optional for SQLite local dev
@@ -13,19 +14,44 @@ try:
 except ImportError:
     psycopg2 = None
 
-from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, g, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, g, send_from_directory, stream_with_context, has_request_context
 from authlib.integrations.requests_client import OAuth2Session
 # Core models (always available)
-from models import db, User, MasterAccount, SSOConfig, EmailConfig, Subscription, ArchitectureDecision, DecisionHistory, DecisionComment, AuthConfig, WebAuthnCredential, AccessRequest, EmailVerification, ITInfrastructure, SystemConfig, DomainApproval, save_history, Tenant, TenantMembership, TenantSettings, Space, DecisionSpace, GlobalRole, MaturityState, AuditLog, RoleRequest, RequestedRole, RequestStatus, SetupToken, LoginHistory, log_login_attempt, UserConsent
+from models import db, User, MasterAccount, SSOConfig, EmailConfig, Subscription, ArchitectureDecision, DecisionHistory, DecisionComment, AuthConfig, WebAuthnCredential, AccessRequest, EmailVerification, ITInfrastructure, SystemConfig, DomainApproval, save_history, Tenant, TenantMembership, Space, DecisionSpace, GlobalRole, MaturityState, AuditLog, RoleRequest, RequestedRole, RequestStatus, SetupToken, LoginHistory, log_login_attempt, UserConsent, GDPRJobRun
 
 # EE:START - EE Model Imports
 # Enterprise Edition models (Slack, Teams, AI integration)
-from models import SlackWorkspace, SlackUserMapping, TeamsWorkspace, TeamsUserMapping, TeamsConversationReference, AIApiKey, AIInteractionLog, LLMProvider, AIChannel, AIAction
+from models import SlackWorkspace, SlackUserMapping, TeamsWorkspace, TeamsUserMapping, TeamsConversationReference, AIApiKey, AIInteractionLog, AIJob, LLMProvider, AIChannel
 # EE:END - EE Model Imports
 from datetime import datetime, timedelta, timezone
+from functools import wraps
 from auth import login_required, admin_required, get_current_user, get_or_create_user, get_oidc_config, extract_domain_from_email, is_master_account, authenticate_master, master_required, steward_or_admin_required, get_current_tenant, get_current_membership
 from governance import log_admin_action
-from notifications import notify_subscribers_new_decision, notify_subscribers_decision_updated
+from notification_digest import send_due_digests
+from notifications import notify_subscribers_new_decision, notify_subscribers_decision_updated, notify_subscribers_bulk_import, notify_subscribers_bulk_update
+from change_version import bump_change_version, etag_cached
+from response_encoding import init_response_encoding
+from http_client import http_client, RequestException
+from rate_limits import rate_limiter, limiter_storage_uri, hash_api_key, check_ai_quota
+from principal_cache import init_principal_cache
+from webhook_queue import slack_queue, slack_deduplicator, deliver_response_url
+from workspace_cache import slack_workspaces, slack_activity, teams_workspaces, teams_activity
+from async_loop import teams_loop
+from mcp_batch import mcp_batch
+from api_key_cache import api_key_cache, api_key_activity
+from llm_cache import tenant_cache_stats
+from ai_logs import EXPORT_FORMATS as AI_LOG_EXPORT_FORMATS, DEFAULT_PAGE_SIZE as AI_LOG_PAGE_SIZE, MAX_PAGE_SIZE as AI_LOG_MAX_PAGE_SIZE, parse_filters as parse_ai_log_filters, list_logs as list_ai_logs, iter_export as iter_ai_log_export
+from ai_jobs import ai_jobs, finished_data, job_kind, JobQueueFull, FINISHED as AI_JOB_FINISHED
+from event_bus import event_bus, stream_limits, format_sse, RESET, STREAM_HEARTBEAT, STREAM_MAX_SECONDS, WORKER_THREADS
+from env_config import env_number
+from route_classes import (
+    ROUTE_PROBE, ROUTE_STATIC, FRONTEND_ASSET_EXTENSIONS,
+    route_class, get_route_class, is_lightweight_request, init_route_classes, register_route_classes
+)
+from decision_bulk import BulkPatchError, validate_bulk_request, apply_bulk_patch
+from decision_transfer import EXPORT_FORMATS as DECISION_EXPORT_FORMATS, iter_export as iter_decision_export, iter_ndjson_records, iter_madr_tar_records, import_decisions
+from gdpr_export import EXPORT_FORMATS, export_section_names, iter_export
+from gdpr_jobs import anonymize_user, enqueue_gdpr_tasks, summarize_run as summarize_gdpr_run, get_job_history as get_gdpr_job_history  # noqa: F401 (anonymize_user is re-exported)
 from webauthn_auth import (
     create_registration_options, verify_registration,
     create_authentication_options, verify_authentication,
@@ -36,7 +62,7 @@ from security import (
     generate_csrf_token, validate_csrf_token, get_request_csrf_token,
     should_enforce_csrf, apply_security_headers,
     sanitize_title, sanitize_text_field, sanitize_name, sanitize_email,
-    sanitize_request_data, sanitize_string
+    sanitize_request_data, sanitize_string, attack_path_matcher
 )
 from feature_flags import (
     require_slack, require_teams, require_enterprise, require_feature,
@@ -95,6 +121,9 @@ SERVE_ANGULAR = os.path.exists(FRONTEND_DIR)
 
 app = Flask(__name__, static_folder=FRONTEND_DIR if SERVE_ANGULAR else 'static')
 
+# Fast JSON encoding and negotiated gzip/brotli compression (see response_encoding.py)
+init_response_encoding(app)
+
 # ==================== CORS Configuration for Marketing Site ====================
 # The marketing website runs on a separate domain and needs to call authentication
 # endpoints on the app domain. Configure CORS for these specific endpoints.
@@ -147,6 +176,14 @@ if database_url == 'sqlite:///:memory:':
         'connect_args': {'check_same_thread': False},
         'poolclass': StaticPool,
     }
+else:
+    # Every gunicorn thread may hold a connection, and so may the threads of
+    # the Slack, MCP batch and AI job pools and the GDPR run; SQLAlchemy's
+    # default pool (5 + 10 overflow) would leave requests waiting for one.
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': env_number('DB_POOL_SIZE', WORKER_THREADS),
+        'max_overflow': env_number('DB_MAX_OVERFLOW', slack_queue.workers + mcp_batch.workers + ai_jobs.workers + 1),
+    }
 
 # SECRET_KEY for session signing (Key Vault or environment variable)
 # This MUST be persistent across restarts for sessions to remain valid
@@ -180,6 +217,9 @@ if _cookie_domain:
 # Default max is 24 hours, but actual expiry is stored in session['_expires_at']
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
 
+# MCP event streams close after this many seconds (clients reconnect with Last-Event-ID)
+app.config['MCP_SSE_MAX_SECONDS'] = STREAM_MAX_SECONDS
+
 # Rate limiting configuration - disabled in testing mode
 if os.environ.get('FLASK_ENV') == 'testing':
     app.config['RATELIMIT_ENABLED'] = False
@@ -188,7 +228,9 @@ if os.environ.get('FLASK_ENV') == 'testing':
     logger.info("TESTING MODE: Rate limiting disabled for E2E tests")
 else:
     app.config['RATELIMIT_ENABLED'] = True
-    app.config['RATELIMIT_STORAGE_URL'] = os.environ.get('REDIS_URL', 'memory://')
+    # Shared Redis counters (REDIS_URL) so limits hold across workers and restarts
+    app.config['RATELIMIT_STORAGE_URL'] = limiter_storage_uri()
+    app.config['RATELIMIT_STRATEGY'] = 'sliding-window-counter'
     app.config['RATELIMIT_DEFAULT'] = '200 per minute'  # Default rate limit
     app.config['RATELIMIT_HEADERS_ENABLED'] = True  # Include rate limit info in response headers
 
@@ -202,6 +244,9 @@ else:
             app=app,
             default_limits=["200 per minute"],
             storage_uri=app.config['RATELIMIT_STORAGE_URL'],
+            strategy=app.config['RATELIMIT_STRATEGY'],
+            # Keep limiting with per-process counters while Redis is unreachable
+            in_memory_fallback_enabled=True,
         )
         RATE_LIMITING_ENABLED = True
         logger.info("Rate limiting enabled")
@@ -210,6 +255,14 @@ else:
         RATE_LIMITING_ENABLED = False
         logger.warning("Flask-Limiter not installed, rate limiting disabled")
 
+# Health probes and static files skip session decoding, CSRF, rate limiting and
+# analytics (see route_classes.py; routes are classified at the end of this module)
+init_route_classes(app, limiter=limiter, asset_extensions=FRONTEND_ASSET_EXTENSIONS if SERVE_ANGULAR else ())
+
+# login_required authorizes from a cached principal instead of loading the User
+# (see principal_cache.py); shared through Redis when REDIS_URL is set
+init_principal_cache(app)
+
 # Initialize Flask-Talisman for CSP (Content Security Policy)
 try:
     from flask_talisman import Talisman
@@ -425,29 +478,8 @@ def handle_400(e):
     return "Bad request", 400
 
 
-# Common attack path patterns to silently block (WordPress, PHP, etc.)
-ATTACK_PATH_PATTERNS = (
-    '.php',           # PHP files (xmlrpc.php, wp-login.php, etc.)
-    '.env',           # Environment files
-    '.git',           # Git directory
-    '.config',        # Config files
-    'phpinfo',        # PHP info pages
-    'phpunit',        # PHPUnit exploits
-    'wp-',            # WordPress paths
-    'wordpress',      # WordPress paths
-    'admin/.env',     # Admin env files
-    'vendor/',        # PHP vendor directories
-    'eval-stdin',     # PHP eval exploits
-    '/cgi-bin/',      # CGI exploits
-    'shell',          # Shell access attempts
-    '.asp',           # ASP files
-    '.jsp',           # JSP files
-    'phpmyadmin',     # phpMyAdmin
-    'mysql',          # MySQL admin attempts
-    'adminer',        # Adminer DB tool
-    'debug',          # Debug endpoints
-    '/.well-known/security.txt',  # Not an attack but unnecessary
-)
+# Scanner paths to silently block; deployments can add their own
+attack_path_matcher.extend(app.config.get('ATTACK_PATH_EXTRA_PATTERNS') or os.environ.get('ATTACK_PATH_EXTRA_PATTERNS', ''))
 
 
 @app.before_request
@@ -457,13 +489,9 @@ def block_attack_paths():
     This prevents unnecessary error logging and PostHog exception tracking
     for automated vulnerability scanners probing for WordPress, PHP, etc.
     """
-    path_lower = request.path.lower()
-
-    # Check if path matches any attack pattern
-    for pattern in ATTACK_PATH_PATTERNS:
-        if pattern in path_lower:
-            # Return 404 silently - don't log, don't track
-            return '', 404
+    if attack_path_matcher.match(request.path):
+        # Return 404 silently - don't log, don't track
+        return '', 404
 
     return None  # Continue to normal request handling
 
@@ -637,8 +665,8 @@ def is_session_expired():
 @app.before_request
 def check_session_expiry():
     """Check if session has expired and clear it if so."""
-    if request.endpoint and request.endpoint.startswith('static'):
-        return  # Skip static files
+    if is_lightweight_request():
+        return  # Skip health probes and static files
 
     if ('user_id' in session or 'master_id' in session) and is_session_expired():
         # Session has expired - clear it
@@ -652,7 +680,7 @@ def check_session_expiry():
 @app.before_request
 def enforce_csrf_for_session_auth():
     """Require CSRF tokens for state-changing requests tied to a browser session."""
-    if not should_enforce_csrf():
+    if is_lightweight_request() or not should_enforce_csrf():
         return None
 
     token = get_request_csrf_token()
@@ -667,7 +695,7 @@ def enforce_csrf_for_session_auth():
 def initialize_db():
     """Initialize database before handling requests"""
     # Initialize database for any request except static files
-    if not _db_initialized and not (request.endpoint and request.endpoint.startswith('static')):
+    if not _db_initialized and get_route_class() != ROUTE_STATIC:
         try:
             with _db_init_lock:
                 if not _db_initialized:
@@ -696,6 +724,7 @@ def add_security_headers(response):
 
     # Teams tab runs in an iframe - disable caching so the latest Angular build is always loaded.
     # Without this, browsers return 304 and use stale index.html referencing old JS chunk hashes.
+    # Validators are only stripped here; API reads keep their ETags (see change_version.etag_cached).
     if request.path.startswith('/teams/'):
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
         response.headers['Pragma'] = 'no-cache'
@@ -711,6 +740,7 @@ def add_security_headers(response):
 # ==================== Health Check ====================
 
 @app.route('/health')
+@route_class(ROUTE_PROBE)
 def health_check():
     """Health check endpoint that reports application status"""
     if app_error_state['healthy']:
@@ -729,6 +759,7 @@ def health_check():
 
 @app.route('/ping')
 @app.route('/api/health')
+@route_class(ROUTE_PROBE)
 def ping():
     """Simple ping endpoint for load balancer health checks - always returns 200.
     Also available at /api/health for consistency with documentation.
@@ -753,9 +784,26 @@ def check_version():
     Check for available updates.
     Compares current version with latest GitHub release.
     Returns update status and release information.
+
+    Served from the cached result in update_check; GitHub is queried on a
+    background thread at most every UPDATE_CHECK_INTERVAL_HOURS.
     """
-    from version import check_for_updates
-    return jsonify(check_for_updates()), 200
+    from update_check import update_checker
+    return jsonify(update_checker.status(app)), 200
+
+
+@app.route('/api/admin/security/attack-paths', methods=['GET'])
+@master_required
+def api_attack_path_stats():
+    """Blocked scanner path patterns and how often each matched (super admin only)."""
+    return jsonify(attack_path_matcher.stats()), 200
+
+
+@app.route('/api/admin/http-client/metrics', methods=['GET'])
+@master_required
+def api_http_client_metrics():
+    """Per-host outbound request counts, errors and latency (super admin only)."""
+    return jsonify({'hosts': http_client.metrics()}), 200
 
 
 @app.route('/api/features')
@@ -1229,6 +1277,7 @@ def sso_callback():
         redirect_uri=url_for('sso_callback', _external=True),
         state=stored_state
     )
+    http_client.attach(client)
 
     try:
         token = client.fetch_token(
@@ -1450,7 +1499,6 @@ def slack_oidc_callback():
     The tenant is derived from the email domain (existing logic).
     First user of a domain becomes provisional admin (existing logic).
     """
-    import requests
     from ee.backend.slack.slack_security import (
         get_slack_client_id,
         get_slack_client_secret,
@@ -1500,7 +1548,7 @@ def slack_oidc_callback():
 
     try:
         # Exchange code for tokens
-        token_response = requests.post(
+        token_response = http_client.post(
             SLACK_OIDC_TOKEN_URL,
             data={
                 'client_id': client_id,
@@ -1527,7 +1575,7 @@ def slack_oidc_callback():
             return redirect('/?error=no_access_token')
 
         # Fetch user info
-        userinfo_response = requests.get(
+        userinfo_response = http_client.get(
             SLACK_OIDC_USERINFO_URL,
             headers={'Authorization': f'Bearer {access_token}'},
             timeout=30
@@ -1672,7 +1720,7 @@ def slack_oidc_callback():
         # Redirect to tenant dashboard with welcome modal trigger
         return redirect(f'{app_base}/{domain}?slack_welcome=1')
 
-    except requests.RequestException as e:
+    except RequestException as e:
         logger.error(f"Slack OIDC request error: {e}")
         log_login_attempt(
             email='unknown',
@@ -1792,7 +1840,6 @@ def google_oauth_callback():
     The tenant is derived from the email domain (existing logic).
     First user of a domain becomes provisional admin (existing logic).
     """
-    import requests as http_requests
     from ee.backend.oauth_providers.google_oauth import (
         get_google_client_id,
         get_google_client_secret,
@@ -1842,7 +1889,7 @@ def google_oauth_callback():
 
     try:
         # Exchange code for tokens
-        token_response = http_requests.post(
+        token_response = http_client.post(
             GOOGLE_OAUTH_TOKEN_URL,
             data={
                 'client_id': client_id,
@@ -1869,7 +1916,7 @@ def google_oauth_callback():
             return redirect('/?error=no_access_token')
 
         # Fetch user info
-        userinfo_response = http_requests.get(
+        userinfo_response = http_client.get(
             GOOGLE_OAUTH_USERINFO_URL,
             headers={'Authorization': f'Bearer {access_token}'},
             timeout=30
@@ -2010,7 +2057,7 @@ def google_oauth_callback():
         # Redirect to tenant dashboard
         return redirect(f'{app_base}/{domain}')
 
-    except http_requests.RequestException as e:
+    except RequestException as e:
         logger.error(f"Google OAuth request error: {e}")
         log_login_attempt(
             email='unknown',
@@ -2131,7 +2178,6 @@ def microsoft_oauth_callback():
     The tenant is derived from the email domain (existing logic).
     First user of a domain becomes provisional admin (existing logic).
     """
-    import requests as http_requests
     from ee.backend.oauth_providers.microsoft_oauth import (
         get_microsoft_client_id,
         get_microsoft_client_secret,
@@ -2181,7 +2227,7 @@ def microsoft_oauth_callback():
 
     try:
         # Exchange code for tokens
-        token_response = http_requests.post(
+        token_response = http_client.post(
             MICROSOFT_OAUTH_TOKEN_URL,
             data={
                 'client_id': client_id,
@@ -2209,7 +2255,7 @@ def microsoft_oauth_callback():
             return redirect('/?error=no_access_token')
 
         # Fetch user info from Microsoft Graph
-        userinfo_response = http_requests.get(
+        userinfo_response = http_client.get(
             MICROSOFT_GRAPH_USER_URL,
             headers={'Authorization': f'Bearer {access_token}'},
             timeout=30
@@ -2352,7 +2398,7 @@ def microsoft_oauth_callback():
         # Redirect to tenant dashboard
         return redirect(f'{app_base}/{domain}')
 
-    except http_requests.RequestException as e:
+    except RequestException as e:
         logger.error(f"Microsoft OAuth request error: {e}")
         log_login_attempt(
             email='unknown',
@@ -2585,6 +2631,7 @@ if not SERVE_ANGULAR:
 @app.route('/api/decisions', methods=['GET'])
 @login_required
 @track_endpoint('api_decisions_list')
+@etag_cached('decisions')
 def api_list_decisions():
     """List all architecture decisions for the user's domain."""
     # SECURITY: Master accounts should NOT access tenant data
@@ -2720,8 +2767,115 @@ def api_create_decision():
     return jsonify(decision.to_dict()), 201
 
 
+@app.route('/api/decisions/export', methods=['GET'])
+@login_required
+@track_endpoint('api_decisions_export')
+def api_export_decisions():
+    """
+    Stream every decision in the user's tenant, including history and comments.
+
+    ?format=ndjson (default) returns one JSON record per line; ?format=madr
+    returns a tar archive with one MADR Markdown file per decision.
+    """
+    if is_master_account():
+        return jsonify({'error': 'Super admin accounts cannot access tenant data'}), 403
+
+    export_format = (request.args.get('format') or 'ndjson').lower()
+    if export_format not in DECISION_EXPORT_FORMATS:
+        return jsonify({'error': f"Invalid format. Must be one of: {', '.join(DECISION_EXPORT_FORMATS)}"}), 400
+
+    domain = g.current_user.sso_domain
+    mimetype, extension = DECISION_EXPORT_FORMATS[export_format]
+    response = Response(stream_with_context(iter_decision_export(domain, export_format)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="decisions-{domain}-{datetime.now(timezone.utc).strftime("%Y%m%d")}.{extension}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def _finish_decision_import(summary, user, tenant):
+    """Audit and send the single summary notification for a completed import."""
+    sample_titles = summary.pop('sample_titles', [])
+    if not summary['imported']:
+        return
+
+    if tenant:
+        log_admin_action(
+            tenant_id=tenant.id,
+            actor_user_id=user.id,
+            action_type=AuditLog.ACTION_DECISIONS_IMPORTED,
+            target_entity='decision',
+            details={'imported': summary['imported'], 'failed': summary['failed']}
+        )
+        db.session.commit()
+
+    email_config = EmailConfig.query.filter_by(domain=user.sso_domain, enabled=True).first()
+    if not email_config:
+        email_config = EmailConfig.query.filter_by(domain='system', enabled=True).first()
+    try:
+        notify_subscribers_bulk_import(db, user.sso_domain, summary['imported'], user, email_config, sample_titles)
+    except Exception as e:
+        logger.warning(f"Failed to send bulk import notification: {e}")
+
+
+@app.route('/api/decisions/import', methods=['POST'])
+@steward_or_admin_required
+@track_endpoint('api_decisions_import')
+def api_import_decisions():
+    """
+    Bulk import decisions into the user's tenant.
+
+    Accepts NDJSON in the format produced by /api/decisions/export, or a tar
+    (optionally gzipped) of MADR Markdown files, either as the raw request body
+    or as a multipart 'file' upload. Records are inserted in batches without
+    per-record notifications; subscribers get one summary email.
+
+    With Accept: application/x-ndjson the response streams a progress event
+    after every batch; otherwise the summary is returned once the import ends.
+    """
+    if is_master_account():
+        return jsonify({'error': 'Master accounts cannot import decisions. Please log in with an SSO account.'}), 403
+
+    user = g.current_user
+    tenant = g.current_tenant
+    domain = user.sso_domain
+
+    tar_types = ('application/x-tar', 'application/gzip', 'application/x-gzip', 'application/x-gtar')
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if not upload:
+            return jsonify({'error': 'No file provided'}), 400
+        is_tar = upload.filename.endswith(('.tar', '.tar.gz', '.tgz')) or upload.mimetype in tar_types
+        source = upload.stream
+    else:
+        is_tar = request.mimetype in tar_types
+        source = request.stream
+
+    records = iter_madr_tar_records(source) if is_tar else iter_ndjson_records(source)
+    progress = import_decisions(records, domain, tenant, user)
+
+    if request.accept_mimetypes.best == 'application/x-ndjson':
+        def generate():
+            for event in progress:
+                if event['done']:
+                    _finish_decision_import(event, user, tenant)
+                yield json.dumps(event) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    summary = None
+    for summary in progress:
+        pass
+    _finish_decision_import(summary, user, tenant)
+    if summary.get('error'):
+        status_code = 500
+    else:
+        status_code = 201 if summary['imported'] else 400
+    return jsonify(summary), status_code
+
+
 @app.route('/api/decisions/<int:decision_id>', methods=['GET'])
 @login_required
+@etag_cached('decision')
 def api_get_decision(decision_id):
     """Get a single architecture decision with its history."""
     # SECURITY: Master accounts should NOT access tenant data
@@ -2891,6 +3045,59 @@ def api_update_decision(decision_id):
     return jsonify(decision.to_dict_with_history())
 
 
+@app.route('/api/decisions/bulk', methods=['POST'])
+@steward_or_admin_required
+@track_endpoint('api_decisions_bulk_update')
+def api_bulk_update_decisions():
+    """
+    Apply one patch to many decisions in a single transaction.
+
+    Body: {"ids": [...], "patch": {...}, "change_reason": "..."} where patch may
+    set status, owner_id, owner_email, and space membership via space_ids
+    (replace) or add_space_ids / remove_space_ids. Subscribers receive one
+    digest email; the response lists a compact result per id.
+    """
+    if is_master_account():
+        return jsonify({'error': 'Master accounts cannot modify decisions. Please log in with an SSO account.'}), 403
+
+    data = request.get_json(silent=True)
+    domain = g.current_user.sso_domain
+
+    try:
+        ids, patch = validate_bulk_request(data, domain, g.current_tenant)
+    except BulkPatchError as e:
+        return jsonify({'error': str(e)}), 400
+
+    sanitized, errors = sanitize_request_data(data, {
+        'change_reason': {'type': 'text', 'max_length': 500},
+    })
+    if errors:
+        return jsonify({'error': errors[0]}), 400
+    change_reason = sanitized.get('change_reason')
+
+    try:
+        results, changed, status_changed = apply_bulk_patch(ids, patch, domain, g.current_user, change_reason)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Bulk decision update failed: {e}")
+        return jsonify({'error': 'Bulk update failed, no decisions were changed'}), 500
+
+    if changed:
+        email_config = EmailConfig.query.filter_by(domain=domain, enabled=True).first()
+        if not email_config:
+            email_config = EmailConfig.query.filter_by(domain='system', enabled=True).first()
+        try:
+            notify_subscribers_bulk_update(db, domain, changed, email_config, g.current_user,
+                                           change_reason, status_changed)
+        except Exception as e:
+            logger.warning(f"Failed to send bulk update notifications: {e}")
+
+    counts = {key: sum(1 for r in results if r['result'] == key)
+              for key in ('updated', 'unchanged', 'not_found')}
+    return jsonify({'results': results, **counts})
+
+
 @app.route('/api/decisions/<int:decision_id>', methods=['DELETE'])
 @login_required
 def api_delete_decision(decision_id):
@@ -2941,22 +3148,34 @@ def api_delete_decision(decision_id):
                 'rate_limited_until': (membership.deletion_rate_limited_at + timedelta(hours=1)).isoformat()
             }), 429
 
-    # Rate limiting check: >3 deletions in 5 minutes triggers lockout
+    # Get the decision
+    decision = ArchitectureDecision.query.filter_by(
+        id=decision_id,
+        domain=user.sso_domain,
+        deleted_at=None
+    ).first_or_404()
+
+    # Rate limiting check: >3 deletions in 5 minutes triggers lockout. Deletions are
+    # counted in the shared rate limit store; without one (or while it is down) the
+    # count on the membership is used, so the limit still holds across workers.
     RATE_LIMIT_COUNT = 3
     RATE_LIMIT_WINDOW_MINUTES = 5
 
-    now = datetime.now(timezone.utc)
-    window_start = membership.deletion_count_window_start
-
-    # Reset window if expired or not set
-    if not window_start or (now - window_start) > timedelta(minutes=RATE_LIMIT_WINDOW_MINUTES):
-        membership.deletion_count_window_start = now
-        membership.deletion_count = 0
-        window_start = now
-
-    # Check if already at limit
-    if membership.deletion_count >= RATE_LIMIT_COUNT:
-        # Trigger rate limiting
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    throttle = rate_limiter.shared_hit(f'decision-delete:{membership.id}', RATE_LIMIT_COUNT, RATE_LIMIT_WINDOW_MINUTES * 60)
+    if throttle is not None:
+        allowed = throttle.allowed
+    else:
+        # Reset window if expired or not set
+        window_start = membership.deletion_count_window_start
+        if not window_start or (now - window_start) > timedelta(minutes=RATE_LIMIT_WINDOW_MINUTES):
+            membership.deletion_count_window_start = now
+            membership.deletion_count = 0
+        allowed = (membership.deletion_count or 0) < RATE_LIMIT_COUNT
+        if allowed:
+            membership.deletion_count = (membership.deletion_count or 0) + 1
+
+    if not allowed:
         membership.deletion_rate_limited_at = now
         db.session.commit()
 
@@ -2970,7 +3189,7 @@ def api_delete_decision(decision_id):
             target_id=user.id,
             details={
                 'reason': 'excessive_deletions',
-                'count': membership.deletion_count,
+                'count': RATE_LIMIT_COUNT,
                 'window_minutes': RATE_LIMIT_WINDOW_MINUTES
             }
         )
@@ -2981,13 +3200,6 @@ def api_delete_decision(decision_id):
             'rate_limited_until': (now + timedelta(hours=1)).isoformat()
         }), 429
 
-    # Get the decision
-    decision = ArchitectureDecision.query.filter_by(
-        id=decision_id,
-        domain=user.sso_domain,
-        deleted_at=None
-    ).first_or_404()
-
     # Soft delete with retention window
     deletion_time = datetime.now(timezone.utc)
     retention_days = 30
@@ -2995,9 +3207,6 @@ def api_delete_decision(decision_id):
     decision.deleted_by_id = user.id
     decision.deletion_expires_at = deletion_time + timedelta(days=retention_days)
 
-    # Update deletion count for rate limiting
-    membership.deletion_count = (membership.deletion_count or 0) + 1
-
     # Log the deletion
     log_admin_action(
         tenant_id=tenant.id,
@@ -3226,7 +3435,8 @@ def api_get_subscription():
         return jsonify({
             'notify_on_create': False,
             'notify_on_update': False,
-            'notify_on_status_change': False
+            'notify_on_status_change': False,
+            'delivery_mode': Subscription.DELIVERY_IMMEDIATE,
         })
     return jsonify(subscription.to_dict())
 
@@ -3241,6 +3451,9 @@ def api_update_subscription():
 
     data = request.get_json() or {}
 
+    if 'delivery_mode' in data and data['delivery_mode'] not in Subscription.DELIVERY_MODES:
+        return jsonify({'error': f'Invalid delivery_mode. Must be one of: {", ".join(Subscription.DELIVERY_MODES)}'}), 400
+
     subscription = Subscription.query.filter_by(user_id=g.current_user.id).first()
 
     if not subscription:
@@ -3253,6 +3466,8 @@ def api_update_subscription():
         subscription.notify_on_update = bool(data['notify_on_update'])
     if 'notify_on_status_change' in data:
         subscription.notify_on_status_change = bool(data['notify_on_status_change'])
+    if 'delivery_mode' in data:
+        subscription.delivery_mode = data['delivery_mode']
 
     db.session.commit()
 
@@ -3279,68 +3494,6 @@ def api_dismiss_admin_onboarding():
 
 # ==================== API Routes - GDPR (Art. 17, 20) ====================
 
-def anonymize_user(user_id):
-    """
-    Anonymize a user's personal data per GDPR Art. 17 and deletion-controls.md spec.
-
-    Preserves contributions (decisions remain, author set to None).
-    Redacts PII from audit logs and login history.
-    """
-    import uuid
-
-    user = db.session.get(User, user_id)
-    if not user or user.is_anonymized:
-        return False
-
-    anonymous_email = f"deleted-{uuid.uuid4()}@anonymized.local"
-
-    # Anonymize user PII
-    original_email = user.email
-    user.email = anonymous_email
-    user.name = 'Former Member'
-    user.first_name = None
-    user.last_name = None
-    user.password_hash = None
-    user.sso_subject = None
-    user.aad_object_id = None
-    user.is_anonymized = True
-    user.deleted_at = datetime.now(timezone.utc)
-
-    # Detach decisions (keep content, remove author link)
-    for decision in user.decisions_created:
-        decision.created_by_id = None
-
-    # Remove WebAuthn credentials
-    for cred in list(user.webauthn_credentials):
-        db.session.delete(cred)
-
-    # Remove tenant memberships
-    memberships = TenantMembership.query.filter_by(user_id=user.id).all()
-    for membership in memberships:
-        db.session.delete(membership)
-
-    # Redact LoginHistory entries
-    login_entries = LoginHistory.query.filter_by(user_id=user.id).all()
-    for entry in login_entries:
-        entry.email = anonymous_email
-        entry.ip_address = None
-        entry.user_agent = None
-
-    # Redact AuditLog details containing user email
-    audit_entries = AuditLog.query.filter(
-        AuditLog.details.isnot(None)
-    ).all()
-    for entry in audit_entries:
-        if entry.details and isinstance(entry.details, dict):
-            details_str = json.dumps(entry.details)
-            if original_email in details_str:
-                details_str = details_str.replace(original_email, 'deleted-user')
-                entry.details = json.loads(details_str)
-
-    db.session.commit()
-    return True
-
-
 @app.route('/api/user/delete-request', methods=['POST'])
 @login_required
 @track_endpoint('api_user_delete_request')
@@ -3435,75 +3588,20 @@ def api_get_deletion_status():
 @login_required
 @track_endpoint('api_user_export_data')
 def api_export_user_data():
-    """Export all personal data for the current user (GDPR Art. 20 — data portability)."""
+    """
+    Export all personal data for the current user (GDPR Art. 20 — data portability).
+
+    The export is streamed. Optional ?format=gzip or ?format=zip wraps the JSON
+    document in a compressed archive.
+    """
     if is_master_account():
         return jsonify({'error': 'Not applicable for master accounts'}), 400
 
-    user = g.current_user
+    export_format = (request.args.get('format') or 'json').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Invalid format. Must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
 
-    # Gather all personal data
-    export = {
-        'export_date': datetime.now(timezone.utc).isoformat(),
-        'data_subject': {
-            'id': user.id,
-            'email': user.email,
-            'name': user.get_full_name(),
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-        },
-        'profile': {
-            'auth_type': user.auth_type,
-            'email_verified': user.email_verified,
-            'created_at': user.created_at.isoformat(),
-            'last_login': user.last_login.isoformat() if user.last_login else None,
-            'sso_domain': user.sso_domain,
-        },
-        'decisions_authored': [],
-        'memberships': [],
-        'audit_trail': [],
-        'login_history': [],
-    }
-
-    # Decisions authored
-    decisions = ArchitectureDecision.query.filter_by(created_by_id=user.id).all()
-    for d in decisions:
-        export['decisions_authored'].append({
-            'id': d.id,
-            'title': d.title,
-            'status': d.status,
-            'created_at': d.created_at.isoformat() if d.created_at else None,
-            'updated_at': d.updated_at.isoformat() if d.updated_at else None,
-        })
-
-    # Tenant memberships
-    memberships = TenantMembership.query.filter_by(user_id=user.id).all()
-    for m in memberships:
-        tenant = db.session.get(Tenant, m.tenant_id)
-        export['memberships'].append({
-            'tenant_name': tenant.name if tenant else None,
-            'tenant_domain': tenant.domain if tenant else None,
-            'role': m.global_role.value,
-            'joined_at': m.joined_at.isoformat() if m.joined_at else None,
-        })
-
-    # Audit trail (actions performed by this user)
-    audit_entries = AuditLog.query.filter_by(actor_user_id=user.id).order_by(AuditLog.created_at.desc()).limit(500).all()
-    for entry in audit_entries:
-        export['audit_trail'].append({
-            'action': entry.action_type,
-            'target': entry.target_entity,
-            'created_at': entry.created_at.isoformat(),
-        })
-
-    # Login history
-    login_entries = LoginHistory.query.filter_by(user_id=user.id).order_by(LoginHistory.created_at.desc()).limit(500).all()
-    for entry in login_entries:
-        export['login_history'].append({
-            'method': entry.login_method,
-            'success': entry.success,
-            'ip_address': entry.ip_address,
-            'created_at': entry.created_at.isoformat() if entry.created_at else None,
-        })
+    user = g.current_user
 
     # Log the export action
     tenant = Tenant.query.filter_by(domain=user.sso_domain).first()
@@ -3514,11 +3612,14 @@ def api_export_user_data():
             action_type=AuditLog.ACTION_USER_DATA_EXPORTED,
             target_entity='user',
             target_id=user.id,
-            details={'export_sections': list(export.keys())}
+            details={'export_sections': export_section_names(), 'format': export_format}
         )
 
-    response = jsonify(export)
-    response.headers['Content-Disposition'] = f'attachment; filename="data-export-{user.id}-{datetime.now(timezone.utc).strftime("%Y%m%d")}.json"'
+    # Stream the export so complete histories never have to fit in memory
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    response = Response(stream_with_context(iter_export(user, export_format)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="data-export-{user.id}-{datetime.now(timezone.utc).strftime("%Y%m%d")}.{extension}"'
+    response.headers['Cache-Control'] = 'no-store'
     return response
 
 
@@ -3602,89 +3703,103 @@ def api_update_user_consent():
     return jsonify(consent.to_dict())
 
 
+def _gdpr_job_auth_error():
+    """Return an error response unless the caller is the master account or cron."""
+    return _cron_job_auth_error('GDPR_CRON_SECRET')
+
+
+def _cron_job_auth_error(secret_env_var):
+    """Return an error response unless the caller is the master account or sends the cron secret."""
+    cron_secret = request.headers.get('X-Cron-Secret')
+    expected_secret = os.environ.get(secret_env_var)
+
+    if cron_secret and expected_secret and secrets.compare_digest(cron_secret, expected_secret):
+        return None
+
+    # Require master account
+    if not (session.get('is_master') and session.get('master_id')):
+        return jsonify({'error': 'Master account or cron authentication required'}), 403
+    master = db.session.get(MasterAccount, session.get('master_id'))
+    if not master:
+        return jsonify({'error': 'Authentication required'}), 403
+    return None
+
+
 @app.route('/api/admin/execute-gdpr-tasks', methods=['POST'])
 @track_endpoint('api_admin_execute_gdpr_tasks')
 def api_execute_gdpr_tasks():
     """
-    Execute scheduled GDPR tasks: anonymize users past grace period,
+    Queue scheduled GDPR tasks: anonymize users past grace period,
     purge expired soft-deletes, clean old login history.
 
+    Tasks run in chunks on a background worker (see gdpr_jobs.py) and the
+    request returns immediately with the run_id. Safe to call from cron: if a
+    run is already in flight, its run_id is returned instead of queuing another.
+
     Requires master account session OR X-Cron-Secret header.
     """
-    # Auth: master account or cron secret
-    cron_secret = request.headers.get('X-Cron-Secret')
-    expected_secret = os.environ.get('GDPR_CRON_SECRET')
+    auth_error = _gdpr_job_auth_error()
+    if auth_error:
+        return auth_error
 
-    is_cron = cron_secret and expected_secret and cron_secret == expected_secret
+    trigger = GDPRJobRun.TRIGGER_MASTER if session.get('is_master') else GDPRJobRun.TRIGGER_CRON
+    run_id, created = enqueue_gdpr_tasks(app, trigger)
 
-    if not is_cron:
-        # Require master account
-        if not (session.get('is_master') and session.get('master_id')):
-            return jsonify({'error': 'Master account or cron authentication required'}), 403
-        from models import MasterAccount
-        master = db.session.get(MasterAccount, session.get('master_id'))
-        if not master:
-            return jsonify({'error': 'Authentication required'}), 403
+    if not created:
+        return jsonify({'message': 'GDPR tasks already running', 'run_id': run_id, 'queued': False}), 202
 
-    now = datetime.now(timezone.utc)
-    results = {'anonymized_users': 0, 'purged_decisions': 0, 'purged_tenants': 0, 'cleaned_login_history': 0}
+    logger.info(f"GDPR tasks queued: run {run_id} ({trigger})")
+    return jsonify({'message': 'GDPR tasks queued', 'run_id': run_id, 'queued': True}), 202
 
-    # 1. Anonymize users past their scheduled deletion date
-    users_to_delete = User.query.filter(
-        User.deletion_scheduled_at <= now,
-        User.deleted_at.is_(None),
-        User.is_anonymized == False
-    ).all()
 
-    for user in users_to_delete:
-        if anonymize_user(user.id):
-            results['anonymized_users'] += 1
+@app.route('/api/admin/send-notification-digests', methods=['POST'])
+@track_endpoint('api_admin_send_notification_digests')
+def api_send_notification_digests():
+    """
+    Send due hourly/daily notification digests (see notification_digest.py).
 
-    # 2. Hard-delete decisions past 30-day soft-delete retention
-    expired_decisions = ArchitectureDecision.query.filter(
-        ArchitectureDecision.deleted_at.isnot(None),
-        ArchitectureDecision.deletion_expires_at <= now
-    ).all()
+    Intended to be called hourly from cron. Requires master account session
+    OR X-Cron-Secret header matching NOTIFICATION_CRON_SECRET.
+    """
+    auth_error = _cron_job_auth_error('NOTIFICATION_CRON_SECRET')
+    if auth_error:
+        return auth_error
 
-    for decision in expired_decisions:
-        # Delete associated history entries first
-        DecisionHistory.query.filter_by(decision_id=decision.id).delete()
-        # Delete decision-space associations
-        DecisionSpace.query.filter_by(decision_id=decision.id).delete()
-        db.session.delete(decision)
-        results['purged_decisions'] += 1
+    try:
+        stats = send_due_digests()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Notification digest run failed: {e}")
+        return jsonify({'error': 'Digest run failed'}), 500
+    return jsonify(stats)
 
-    if results['purged_decisions'] > 0:
-        db.session.commit()
 
-    # 3. Hard-delete tenants past 30-day soft-delete retention
-    expired_tenants = Tenant.query.filter(
-        Tenant.deleted_at.isnot(None),
-        Tenant.deletion_expires_at <= now
-    ).all()
+@app.route('/api/admin/gdpr-jobs', methods=['GET'])
+@track_endpoint('api_admin_list_gdpr_jobs')
+def api_list_gdpr_jobs():
+    """
+    List GDPR job history (one entry per task per run), newest first.
 
-    for tenant in expired_tenants:
-        # Delete tenant memberships
-        TenantMembership.query.filter_by(tenant_id=tenant.id).delete()
-        # Delete tenant settings
-        TenantSettings.query.filter_by(tenant_id=tenant.id).delete()
-        # Delete spaces
-        Space.query.filter_by(tenant_id=tenant.id).delete()
-        db.session.delete(tenant)
-        results['purged_tenants'] += 1
-
-    if results['purged_tenants'] > 0:
-        db.session.commit()
+    Optional ?run_id= narrows to a single run and adds its results summary.
+    Requires master account session OR X-Cron-Secret header.
+    """
+    auth_error = _gdpr_job_auth_error()
+    if auth_error:
+        return auth_error
 
-    # 4. Clean LoginHistory entries older than 90 days
-    cutoff = now.replace(tzinfo=None) - timedelta(days=90)
-    cleaned = LoginHistory.query.filter(LoginHistory.created_at < cutoff).delete()
-    if cleaned > 0:
-        db.session.commit()
-    results['cleaned_login_history'] = cleaned
+    run_id = request.args.get('run_id')
+    if run_id:
+        jobs = GDPRJobRun.query.filter_by(run_id=run_id).order_by(GDPRJobRun.id).all()
+        if not jobs:
+            return jsonify({'error': 'Run not found'}), 404
+        return jsonify({
+            'run_id': run_id,
+            'results': summarize_gdpr_run(run_id),
+            'jobs': [job.to_dict() for job in jobs],
+        })
 
-    logger.info(f"GDPR tasks executed: {results}")
-    return jsonify({'message': 'GDPR tasks executed', 'results': results})
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    return jsonify({'jobs': [job.to_dict() for job in get_gdpr_job_history(limit)]})
 
 
 # ==================== API Routes - Admin (SSO Config) ====================
@@ -8596,6 +8711,7 @@ def api_update_tenant_auth_config():
 
 @app.route('/api/infrastructure', methods=['GET'])
 @login_required
+@etag_cached('infrastructure')
 def api_list_infrastructure():
     """List all IT infrastructure items for the user's domain."""
     if is_master_account():
@@ -8741,6 +8857,7 @@ def api_get_infrastructure_types():
 
 @app.route('/api/spaces', methods=['GET'])
 @login_required
+@etag_cached('spaces')
 def api_list_spaces():
     """List all spaces for the user's tenant."""
     if is_master_account():
@@ -8990,8 +9107,9 @@ def api_update_decision_spaces(decision_id):
     if invalid_ids:
         return jsonify({'error': f'Invalid space IDs: {list(invalid_ids)}'}), 400
 
-    # Remove existing links
+    # Remove existing links (set-based delete, so bump the change version explicitly)
     DecisionSpace.query.filter_by(decision_id=decision_id).delete()
+    bump_change_version(decision.domain)
 
     # Add new links
     for space_id in space_ids:
@@ -9697,13 +9815,91 @@ def slack_oauth_callback():
         return redirect('/settings?slack_error=callback_failed')
 
 
+# Slack webhooks are acknowledged at once and processed on the slack work queue
+# (see webhook_queue.py): Slack retries anything not answered within 3 seconds,
+# so deliveries are deduplicated and results go back through response_url.
+
+def _is_slack_retry():
+    return request.headers.get('X-Slack-Retry-Num') is not None
+
+
+def _load_active_slack_workspace(workspace_pk):
+    """Reload a workspace inside a queued job and record the activity."""
+    workspace = db.session.get(SlackWorkspace, workspace_pk)
+    if not workspace or not workspace.is_active:
+        return None
+    slack_activity.touch(workspace.id)
+    return workspace
+
+
+def _process_slack_command(workspace_pk, text, user_id, trigger_id, response_url, channel_id):
+    """Run a slash command and post its reply to the command's response_url."""
+    from ee.backend.slack.slack_service import SlackService
+
+    workspace = _load_active_slack_workspace(workspace_pk)
+    if not workspace:
+        return
+
+    service = SlackService(workspace)
+    response, _ = service.handle_command(text, user_id, trigger_id, response_url, channel_id)
+    if response is not None:
+        deliver_response_url(response_url, response)
+
+
+def _process_slack_interaction(workspace_pk, payload):
+    """Handle a button, message action or shortcut; replies go to the payload's response_url."""
+    from ee.backend.slack.slack_service import SlackService
+
+    workspace = _load_active_slack_workspace(workspace_pk)
+    if not workspace:
+        return
+
+    service = SlackService(workspace)
+    payload_type = payload.get('type')
+    result = None
+    if payload_type == 'block_actions':
+        result = service.handle_block_action(payload)
+    elif payload_type == 'message_action':
+        result = service.handle_message_action(payload)
+    elif payload_type == 'shortcut':
+        # Global shortcuts (type: global in manifest)
+        result = service.handle_message_action(payload)
+
+    if isinstance(result, dict) and payload.get('response_url'):
+        deliver_response_url(payload['response_url'], result)
+
+
+def _process_slack_event(team_id, event):
+    """Handle one Events API callback."""
+    from ee.backend.slack.slack_service import SlackService
+
+    workspace_ref = slack_workspaces.resolve(team_id)
+    workspace = _load_active_slack_workspace(workspace_ref.id) if workspace_ref else None
+    if not workspace:
+        logger.warning(f"Event from unknown workspace: {team_id}")
+        return
+
+    service = SlackService(workspace)
+    service.handle_event(event)
+
+
+def _slack_interaction_key(payload):
+    """Delivery key for an interaction payload (trigger_id, else the action timestamp)."""
+    if payload.get('trigger_id'):
+        return f"interaction:{payload['trigger_id']}"
+    actions = payload.get('actions') or [{}]
+    action_ts = actions[0].get('action_ts') if isinstance(actions[0], dict) else None
+    if action_ts:
+        return f"interaction:{payload.get('type')}:{action_ts}"
+    return None
+
+
 @app.route('/api/slack/webhook/commands', methods=['POST'])
 @require_slack
 @track_endpoint('api_slack_command')
 def slack_commands():
     """Handle Slack slash commands."""
     from ee.backend.slack.slack_security import verify_slack_signature
-    from ee.backend.slack.slack_service import SlackService
 
     # Verify request signature
     if not verify_slack_signature(request):
@@ -9717,8 +9913,11 @@ def slack_commands():
     trigger_id = request.form.get('trigger_id')
     response_url = request.form.get('response_url', '')
 
+    if not slack_deduplicator.first_seen(f'command:{trigger_id}' if trigger_id else None):
+        return '', 200
+
     # Find workspace
-    workspace = SlackWorkspace.query.filter_by(workspace_id=team_id, is_active=True).first()
+    workspace = slack_workspaces.resolve(team_id)
     if not workspace:
         return jsonify({
             'response_type': 'ephemeral',
@@ -9732,18 +9931,8 @@ def slack_commands():
             'text': f'This Slack workspace needs to be claimed by a Decision Records organization.\n\nYour Workspace ID is: `{team_id}`\n\nShare this with your Decision Records admin to connect the workspace.'
         })
 
-    # Update last activity
-    workspace.last_activity_at = datetime.now(timezone.utc)
-    db.session.commit()
-
-    # Create service and handle command
-    service = SlackService(workspace)
-    response, _ = service.handle_command(text, user_id, trigger_id, response_url, channel_id)
-
-    if response is None:
-        return '', 200
-
-    return jsonify(response)
+    slack_queue.submit(_process_slack_command, workspace.id, text, user_id, trigger_id, response_url, channel_id)
+    return '', 200
 
 
 @app.route('/api/slack/webhook/interactions', methods=['POST'])
@@ -9765,30 +9954,26 @@ def slack_interactions():
     team_id = payload.get('team', {}).get('id')
 
     # Find workspace
-    workspace = SlackWorkspace.query.filter_by(workspace_id=team_id, is_active=True).first()
+    workspace = slack_workspaces.resolve(team_id)
     if not workspace:
         return '', 200
 
-    # Update last activity
-    workspace.last_activity_at = datetime.now(timezone.utc)
-    db.session.commit()
-
-    service = SlackService(workspace)
-
-    result = None
+    # Modal submissions answer in the response body (validation errors, closing
+    # the view), so they are the one interaction still handled in the request
     if payload_type == 'view_submission':
-        result = service.handle_modal_submission(payload)
-    elif payload_type == 'block_actions':
-        result = service.handle_block_action(payload)
-    elif payload_type == 'message_action':
-        result = service.handle_message_action(payload)
-    elif payload_type == 'shortcut':
-        # Global shortcuts (type: global in manifest)
-        result = service.handle_message_action(payload)
+        workspace = _load_active_slack_workspace(workspace.id)
+        if not workspace:
+            return '', 200
+        result = SlackService(workspace).handle_modal_submission(payload)
+        if result is not None:
+            return jsonify(result), 200
+        return '', 200
+
+    if payload_type in ('block_actions', 'message_action', 'shortcut'):
+        if slack_deduplicator.first_seen(_slack_interaction_key(payload)):
+            slack_queue.submit(_process_slack_interaction, workspace.id, payload)
 
-    # Slack expects a 200 response - return result if it's a dict, otherwise empty 200
-    if result is not None:
-        return jsonify(result), 200
+    # Slack expects a 200 response
     return '', 200
 
 
@@ -9798,8 +9983,6 @@ def slack_interactions():
 def slack_events():
     """Handle Slack Events API (app_home_opened, etc.)."""
     from ee.backend.slack.slack_security import verify_slack_signature
-    from ee.backend.slack.slack_service import SlackService
-    import json
 
     # Verify request signature
     if not verify_slack_signature(request):
@@ -9813,21 +9996,13 @@ def slack_events():
 
     # Handle actual events
     if data.get('type') == 'event_callback':
-        event = data.get('event', {})
-        team_id = data.get('team_id')
-
-        # Find workspace
-        workspace = SlackWorkspace.query.filter_by(workspace_id=team_id, is_active=True).first()
-        if not workspace:
-            logger.warning(f"Event from unknown workspace: {team_id}")
+        event_id = data.get('event_id')
+        if not slack_deduplicator.first_seen(f'event:{event_id}' if event_id else None):
+            if _is_slack_retry():
+                logger.info(f"Ignoring Slack retry {request.headers.get('X-Slack-Retry-Num')} of {event_id}")
             return '', 200
 
-        # Update last activity
-        workspace.last_activity_at = datetime.now(timezone.utc)
-        db.session.commit()
-
-        service = SlackService(workspace)
-        service.handle_event(event)
+        slack_queue.submit(_process_slack_event, data.get('team_id'), data.get('event', {}))
 
     return '', 200
 
@@ -10407,6 +10582,45 @@ else:
         pass
 
 
+# --- AI and MCP Quotas ---
+
+@app.before_request
+def enforce_ai_quotas():
+    """Per-API-key and per-tenant request quotas for /api/mcp and /api/ai.
+
+    Counted in the shared rate limit store; a JSON-RPC batch counts once per message.
+    """
+    if not app.config.get('RATELIMIT_ENABLED'):
+        return
+    if request.path != '/api/mcp' and not request.path.startswith('/api/ai/'):
+        return
+    auth_header = request.headers.get('Authorization', '')
+    api_key = auth_header[7:].strip() if auth_header.startswith('Bearer ') else ''
+    if not api_key:
+        return
+
+    cost = 1
+    if request.method == 'POST' and request.is_json:
+        body = request.get_json(silent=True)
+        if isinstance(body, list) and body:
+            cost = len(body)
+
+    key_hash = hash_api_key(api_key)
+    principal = api_key_cache.get(key_hash)
+    exceeded = check_ai_quota(key_hash, principal.tenant_id if principal else None, cost=cost)
+    if exceeded is None:
+        return
+
+    message = f'Rate limit exceeded. Retry in {exceeded.retry_after} seconds.'
+    if request.path == '/api/mcp':
+        response = _mcp_error_response(None, -32000, message)
+    else:
+        response = jsonify({'error': 'Rate limit exceeded', 'message': message, 'retry_after': exceeded.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(exceeded.retry_after)
+    return response
+
+
 # --- Super Admin AI Configuration ---
 
 @app.route('/api/admin/ai/config', methods=['GET'])
@@ -10496,6 +10710,8 @@ def api_get_ai_system_stats():
     by_channel = {}
     by_action = {}
     total_tokens = 0
+    cache_hits = 0
+    tokens_saved = 0
 
     for log in logs:
         by_tenant[log.tenant_id] = by_tenant.get(log.tenant_id, 0) + 1
@@ -10505,6 +10721,10 @@ def api_get_ai_system_stats():
             total_tokens += log.tokens_input
         if log.tokens_output:
             total_tokens += log.tokens_output
+        if log.cache_hit:
+            cache_hits += 1
+        if log.tokens_saved:
+            tokens_saved += log.tokens_saved
 
     return jsonify({
         'period_start': start_date.isoformat(),
@@ -10514,6 +10734,9 @@ def api_get_ai_system_stats():
         'by_channel': by_channel,
         'by_action': by_action,
         'total_tokens': total_tokens,
+        'cache_hits': cache_hits,
+        'cache_hit_rate': round(cache_hits / len(logs), 4) if logs else 0.0,
+        'tokens_saved': tokens_saved,
     })
 
 
@@ -10652,7 +10875,9 @@ def api_get_tenant_ai_stats():
         except ValueError:
             return jsonify({'error': 'Invalid end_date format'}), 400
 
-    return jsonify(AIInteractionLogger.get_tenant_stats(tenant.id, start_date, end_date))
+    stats = AIInteractionLogger.get_tenant_stats(tenant.id, start_date, end_date)
+    stats['response_cache'] = tenant_cache_stats(tenant.id, start_date, end_date)
+    return jsonify(stats)
 
 
 # --- User AI Preferences ---
@@ -10812,57 +11037,90 @@ def api_revoke_ai_api_key(key_id):
 
 # --- AI Interaction Logs (Tenant Admin) ---
 
-@app.route('/api/tenant/ai/logs', methods=['GET'])
-@login_required
-def api_get_tenant_ai_logs():
-    """Get AI interaction logs for current tenant (admin only)."""
-    user = get_current_user()
+def _ai_log_admin_tenant():
+    """The tenant and membership of an AI log reader (admins and stewards), or an error response."""
     tenant = get_current_tenant()
-
     if not tenant:
-        return jsonify({'error': 'Tenant not found'}), 404
+        return None, None, (jsonify({'error': 'Tenant not found'}), 404)
 
     membership = get_current_membership()
     if not membership or membership.global_role not in [GlobalRole.ADMIN, GlobalRole.STEWARD, GlobalRole.PROVISIONAL_ADMIN]:
-        return jsonify({'error': 'Permission denied. Admin or Steward role required.'}), 403
+        return None, None, (jsonify({'error': 'Permission denied. Admin or Steward role required.'}), 403)
 
     # Check if logging is enabled
     if not tenant.ai_log_interactions:
-        return jsonify({'error': 'AI interaction logging is disabled for this organization'}), 400
+        return None, None, (jsonify({'error': 'AI interaction logging is disabled for this organization'}), 400)
+    return tenant, membership, None
 
-    limit = min(int(request.args.get('limit', 100)), 500)
-    offset = int(request.args.get('offset', 0))
-    channel = request.args.get('channel')
-    action = request.args.get('action')
 
-    channel_enum = None
-    action_enum = None
+@app.route('/api/tenant/ai/logs', methods=['GET'])
+@login_required
+def api_get_tenant_ai_logs():
+    """
+    Get AI interaction logs for current tenant (admin only), newest first.
 
-    if channel:
-        try:
-            channel_enum = AIChannel(channel)
-        except ValueError:
-            return jsonify({'error': f'Invalid channel: {channel}'}), 400
+    Filters: channel, action, success, start_date, end_date. query_text is
+    only returned with include_query=true. Pass the response's next_cursor as
+    ?cursor= for the next page (see ai_logs.py).
+    """
+    tenant, membership, error = _ai_log_admin_tenant()
+    if error:
+        return error
 
-    if action:
-        try:
-            action_enum = AIAction(action)
-        except ValueError:
-            return jsonify({'error': f'Invalid action: {action}'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', AI_LOG_PAGE_SIZE)), 1), AI_LOG_MAX_PAGE_SIZE)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
 
-    logs = AIInteractionLogger.get_tenant_logs(
+    try:
+        filters = parse_ai_log_filters(request.args)
+        page = list_ai_logs(tenant.id, filters, limit=limit, cursor=request.args.get('cursor'), offset=offset)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if offset and not request.args.get('cursor'):
+        page['offset'] = offset
+    return jsonify(page)
+
+
+@app.route('/api/tenant/ai/logs/export', methods=['GET'])
+@login_required
+@track_endpoint('api_tenant_ai_logs_export')
+def api_export_tenant_ai_logs():
+    """
+    Stream every matching AI interaction log for auditors.
+
+    ?format=ndjson (default) or ?format=csv; takes the same filters as
+    GET /api/tenant/ai/logs.
+    """
+    tenant, membership, error = _ai_log_admin_tenant()
+    if error:
+        return error
+
+    export_format = (request.args.get('format') or 'ndjson').lower()
+    if export_format not in AI_LOG_EXPORT_FORMATS:
+        return jsonify({'error': f"Invalid format. Must be one of: {', '.join(AI_LOG_EXPORT_FORMATS)}"}), 400
+    try:
+        filters = parse_ai_log_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    log_admin_action(
         tenant_id=tenant.id,
-        limit=limit,
-        offset=offset,
-        channel=channel_enum,
-        action=action_enum
+        actor_user_id=membership.user_id,
+        action_type=AuditLog.ACTION_AI_LOGS_EXPORTED,
+        target_entity='ai_interaction_log',
+        details={key: request.args[key] for key in ('format', 'channel', 'action', 'success', 'start_date',
+                                                    'end_date', 'include_query') if request.args.get(key)},
     )
+    db.session.commit()
 
-    return jsonify({
-        'logs': [AIInteractionLogger.serialize_log(log) for log in logs],
-        'limit': limit,
-        'offset': offset,
-    })
+    mimetype, extension = AI_LOG_EXPORT_FORMATS[export_format]
+    response = Response(stream_with_context(iter_ai_log_export(tenant.id, filters, export_format)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="ai-logs-{tenant.domain}-{datetime.now(timezone.utc).strftime("%Y%m%d")}.{extension}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 
 # --- MCP Server Endpoint (Claude Code Compatible) ---
@@ -10890,8 +11148,10 @@ def api_mcp_handler():
     - initialize: Initialize the MCP session
     - tools/list: List available tools
     - tools/call: Execute a tool
+
+    A batch is authenticated once; its read-only messages run concurrently
+    (see mcp_batch.py) and responses keep the request order.
     """
-    from ee.backend.ai.mcp import authenticate_mcp_request, handle_mcp_request
     from ee.backend.ai.config import AIConfig
 
     # Check system-level MCP availability
@@ -10907,11 +11167,11 @@ def api_mcp_handler():
         if auth_error:
             return _mcp_error_response(None, -32600, auth_error), 401
 
-        success, _handler, error = authenticate_mcp_request(api_key)
+        success, _handler, error = _authenticate_mcp(api_key)
         if not success:
             return _mcp_error_response(None, -32600, error), 401
 
-        return _mcp_sse_response()
+        return _mcp_sse_response(api_key)
 
     # POST request handling
     # Get API key from Authorization header
@@ -10929,13 +11189,21 @@ def api_mcp_handler():
     if isinstance(request_data, list):
         if not request_data:
             return _mcp_error_response(None, -32600, 'Invalid Request: batch cannot be empty'), 400
+        if len(request_data) > mcp_batch.max_size:
+            return _mcp_error_response(
+                None, -32600, f'Invalid Request: batch cannot contain more than {mcp_batch.max_size} messages'
+            ), 400
+
+        # Authenticate once for the whole batch
+        success, _handler, error = _authenticate_mcp(api_key)
+        if not success:
+            return _mcp_error_response(None, -32600, error), 401
 
         batch_responses = []
         status_code = 200
         session_id = None
         protocol_version = None
-        for item in request_data:
-            response_data, item_status, item_session_id, item_protocol_version = _handle_mcp_post_message(item, api_key)
+        for response_data, item_status, item_session_id, item_protocol_version in _run_mcp_batch(request_data, api_key):
             if item_session_id:
                 session_id = item_session_id
             if item_protocol_version:
@@ -10974,9 +11242,81 @@ def _extract_mcp_api_key():
     return api_key, None
 
 
+def _authenticate_mcp(api_key):
+    """authenticate_mcp_request(), once per request.
+
+    Keys the API key cache already knows to be allowed are accepted without
+    SQL (the handler is then None; callers here only use success and error).
+    Valid keys of a tenant that turned external access off are rejected here;
+    anything else goes to authenticate_mcp_request for its exact error.
+    """
+    cached = g.get('mcp_auth')
+    if cached is None or cached[0] != api_key:
+        principal = api_key_cache.authenticate(api_key)
+        if principal is not None and principal.allows_mcp:
+            api_key_activity.touch(principal.key_id)
+            result = (True, None, None)
+        elif principal is not None and not principal.external_access:
+            result = (False, None, 'External AI access is not enabled for this organization')
+        else:
+            from ee.backend.ai.mcp import authenticate_mcp_request
+            result = authenticate_mcp_request(api_key)
+        cached = g.mcp_auth = (api_key, result)
+    return cached[1]
+
+
+# Methods and tools without side effects; consecutive ones in a batch run concurrently
+MCP_CONCURRENT_METHODS = {'tools/list', 'server/discover', 'ping'}
+MCP_CONCURRENT_TOOLS = {
+    'search_decisions', 'get_decision', 'list_decisions', 'get_decision_history', 'list_decision_comments',
+}
+
+
+def _mcp_read_only(message):
+    """Whether a batch message can run alongside its neighbours."""
+    if not isinstance(message, dict):
+        return True  # Answered with an error, no side effects
+    method = message.get('method') or request.headers.get('Mcp-Method')
+    if method in MCP_CONCURRENT_METHODS:
+        return True
+    if method != 'tools/call':
+        return False
+    params = message.get('params')
+    name = params.get('name') if isinstance(params, dict) else None
+    return (name or request.headers.get('Mcp-Name')) in MCP_CONCURRENT_TOOLS
+
+
+def _run_mcp_batch(batch, api_key):
+    """Handle a JSON-RPC batch (see mcp_batch.py); returns per-message results in order.
+
+    Messages sent to the pool run in their own request context, and so with
+    their own database session.
+    """
+    environ = dict(request.environ, **{'wsgi.input': io.BytesIO()})
+
+    def handle(message):
+        if has_request_context():
+            return _handle_mcp_post_message(message, api_key)
+        with app.request_context(environ):
+            return _handle_mcp_post_message(message, api_key)
+
+    def unanswered(message, code, text):
+        if not isinstance(message, dict) or 'id' not in message:
+            return None, 202, None, None
+        payload = _mcp_error_payload(message.get('id'), code, text)
+        return payload, _mcp_http_status(payload), None, None
+
+    return mcp_batch.run(
+        batch, handle,
+        can_run_concurrently=_mcp_read_only,
+        timed_out=lambda message: unanswered(message, -32000, 'Batch time budget exceeded'),
+        failed=lambda message, exc: unanswered(message, -32603, 'Internal error'),
+    )
+
+
 def _handle_mcp_post_message(message, api_key):
     """Handle one JSON-RPC message from an MCP POST body."""
-    from ee.backend.ai.mcp import authenticate_mcp_request, handle_mcp_request
+    from ee.backend.ai.mcp import handle_mcp_request
     import uuid
 
     if not isinstance(message, dict):
@@ -11003,7 +11343,7 @@ def _handle_mcp_post_message(message, api_key):
         return _mcp_error_payload(request_id, -32600, protocol_error), 400, None, None
 
     if method == 'initialize':
-        success, _handler, error = authenticate_mcp_request(api_key)
+        success, _handler, error = _authenticate_mcp(api_key)
         if not success:
             return _mcp_error_payload(request_id, -32600, error), 401, None, protocol_version
 
@@ -11076,11 +11416,47 @@ def _decorate_mcp_response(response, session_id=None, protocol_version=None):
     return response
 
 
-def _mcp_sse_response():
-    """Return a lightweight SSE stream for Streamable HTTP clients that probe GET."""
+def _mcp_sse_response(api_key):
+    """Stream the tenant's decision and comment changes as MCP notifications (see event_bus.py).
+
+    Reconnecting clients send Last-Event-ID to get the events they missed.
+    Streams send a comment every MCP_SSE_HEARTBEAT seconds and close after
+    MCP_SSE_MAX_SECONDS; each key may hold MCP_SSE_MAX_PER_KEY of them.
+    """
+    principal = api_key_cache.authenticate(api_key)
+    limit_key = principal.key_id if principal is not None else hash_api_key(api_key)
+    if not stream_limits.acquire(limit_key):
+        response = jsonify(_mcp_error_payload(None, -32000, 'Too many open event streams for this API key'))
+        response.headers['Retry-After'] = '30'
+        return response, 429
+
+    subscription = None
+    if principal is not None:
+        subscription = event_bus.subscribe(principal.tenant_id, request.headers.get('Last-Event-ID'))
+    max_seconds = app.config['MCP_SSE_MAX_SECONDS']
+
     def event_stream():
-        yield 'retry: 30000\n'
-        yield ': decision-records MCP stream ready\n\n'
+        try:
+            yield 'retry: 5000\n'
+            yield ': decision-records MCP stream ready\n\n'
+            if subscription is None:
+                return
+            for change in subscription.stream(STREAM_HEARTBEAT, max_seconds):
+                if change is None:
+                    yield ': heartbeat\n\n'
+                    continue
+                params = {'type': change.type, **change.data}
+                if change.type == RESET:
+                    params['reason'] = 'Missed events are no longer available; re-read decisions'
+                yield format_sse(change.id, {
+                    'jsonrpc': '2.0',
+                    'method': 'notifications/decisions/changed',
+                    'params': params,
+                })
+        finally:
+            if subscription is not None:
+                subscription.close()
+            stream_limits.release(limit_key)
 
     response = Response(event_stream(), mimetype='text/event-stream')
     response.headers['Cache-Control'] = 'no-cache'
@@ -11119,6 +11495,183 @@ def _mcp_error_response(request_id, code, message):
     response = jsonify(_mcp_error_payload(request_id, code, message))
     _decorate_mcp_response(response)
     return response
+
+
+# --- AI Jobs ---
+
+def ai_job_auth(f):
+    """Authenticate an AI job request by API key (Bearer) or session; sets g.ai_job_caller.
+
+    The caller is (tenant_id, user_id, api_key_id, channel). g.ai_job_principal
+    is the key's principal for Bearer callers and None for session users.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not AIConfig.get_system_ai_enabled():
+            return jsonify({'error': 'AI features are not enabled'}), 400
+
+        auth_header = request.headers.get('Authorization', '')
+        if auth_header.startswith('Bearer '):
+            principal = api_key_cache.authenticate(auth_header[7:].strip())
+            if principal is None:
+                return jsonify({'error': 'Invalid or expired API key'}), 401
+            if not principal.allows_mcp:
+                return jsonify({'error': 'AI API access is not enabled for this key'}), 403
+            api_key_activity.touch(principal.key_id)
+            g.ai_job_caller = (principal.tenant_id, principal.user_id, principal.key_id, AIChannel.API)
+            g.ai_job_principal = principal
+            return f(*args, **kwargs)
+
+        @login_required
+        def session_caller():
+            tenant = get_current_tenant()
+            membership = get_current_membership()
+            if not tenant or not membership:
+                return jsonify({'error': 'You are not a member of this tenant'}), 403
+            if not tenant.ai_features_enabled or membership.ai_opt_out:
+                return jsonify({'error': 'AI features are not available for your account'}), 403
+            g.ai_job_caller = (tenant.id, membership.user_id, None, AIChannel.WEB)
+            g.ai_job_principal = None
+            return f(*args, **kwargs)
+
+        return session_caller()
+    return decorated_function
+
+
+def _load_ai_job(job_id):
+    """The caller's job, or None; jobs are visible to the user or API key that submitted them."""
+    tenant_id, user_id, api_key_id, _channel = g.ai_job_caller
+    job = db.session.get(AIJob, job_id)
+    if job is None or job.tenant_id != tenant_id:
+        return None
+    if api_key_id is not None and job.api_key_id != api_key_id:
+        return None
+    if api_key_id is None and job.user_id != user_id:
+        return None
+    return ai_jobs.expire_stale(job)
+
+
+def _ai_job_links(job):
+    return {'self': f'/api/ai/jobs/{job.id}', 'events': f'/api/ai/jobs/{job.id}/events'}
+
+
+@app.route('/api/ai/jobs', methods=['POST'])
+@ai_job_auth
+def api_submit_ai_job():
+    """Queue an AI operation; returns 202 with the job id to poll or stream."""
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind')
+    params = data.get('params') or {}
+    registered = job_kind(kind) if isinstance(kind, str) else None
+    if registered is None:
+        return jsonify({'error': f'Unknown AI job kind: {kind}'}), 400
+    if not isinstance(params, dict):
+        return jsonify({'error': 'params must be an object'}), 400
+    if g.ai_job_principal is not None and not g.ai_job_principal.has_scope(registered.scope):
+        return jsonify({'error': f'This API key does not have the {registered.scope} scope'}), 403
+
+    tenant_id, user_id, api_key_id, channel = g.ai_job_caller
+    try:
+        job = ai_jobs.submit(kind, tenant_id, channel, params, user_id=user_id, api_key_id=api_key_id)
+    except JobQueueFull:
+        response = jsonify({'error': 'Too many AI jobs are queued. Try again shortly.', 'retry_after': 10})
+        response.headers['Retry-After'] = '10'
+        return response, 503
+
+    response = jsonify({**job.to_dict(), 'links': _ai_job_links(job)})
+    response.headers['Location'] = _ai_job_links(job)['self']
+    return response, 202
+
+
+@app.route('/api/ai/jobs/<job_id>', methods=['GET'])
+@ai_job_auth
+def api_get_ai_job(job_id):
+    """Poll an AI job's status; includes the result and token usage once finished."""
+    job = _load_ai_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    response = jsonify({**job.to_dict(), 'links': _ai_job_links(job)})
+    if job.status in AIJob.ACTIVE_STATUSES:
+        response.headers['Retry-After'] = '2'
+    return response
+
+
+@app.route('/api/ai/jobs/<job_id>', methods=['DELETE'])
+@ai_job_auth
+def api_cancel_ai_job(job_id):
+    """Cancel an AI job that has not started yet."""
+    job = _load_ai_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if not ai_jobs.cancel(job):
+        return jsonify({'error': f'Job is {job.status} and can no longer be cancelled'}), 409
+    return jsonify(job.to_dict())
+
+
+@app.route('/api/ai/jobs/<job_id>/events', methods=['GET'])
+@ai_job_auth
+def api_ai_job_events(job_id):
+    """Stream an AI job's partial results over SSE, ending with a job.finished event.
+
+    Reconnecting clients send Last-Event-ID to skip what they already have.
+    """
+    job = _load_ai_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    tenant_id, user_id, api_key_id, _channel = g.ai_job_caller
+    limit_key = f'ai-job-key:{api_key_id}' if api_key_id is not None else f'ai-job-user:{user_id}'
+    if not stream_limits.acquire(limit_key):
+        response = jsonify({'error': 'Too many open event streams'})
+        response.headers['Retry-After'] = '30'
+        return response, 429
+
+    subscription = ai_jobs.subscribe(job.id, request.headers.get('Last-Event-ID'))
+    job_ref = job.id
+
+    def final_event():
+        """job.finished read from the row once the job has stopped; None while it runs.
+
+        The row is the source of truth: the job may have finished in another
+        process, or its worker may have died without publishing job.finished.
+        """
+        db.session.refresh(job)
+        finished = finished_data(ai_jobs.expire_stale(job))
+        # End the read so an open stream does not hold a pooled connection
+        db.session.rollback()
+        if finished is None:
+            return None
+        return format_sse(f'{job_ref}-final', {'type': AI_JOB_FINISHED, **finished})
+
+    def event_stream():
+        try:
+            yield 'retry: 2000\n\n'
+            # Read the status after subscribing so a job finishing in between is not missed
+            final = final_event()
+            if final is not None:
+                yield final
+                return
+            for event in subscription.stream(STREAM_HEARTBEAT, ai_jobs.stream_seconds):
+                if event is None:
+                    final = final_event()
+                    if final is not None:
+                        yield final
+                        return
+                    yield ': heartbeat\n\n'
+                    continue
+                yield format_sse(event.id, {'type': event.type, **event.data})
+                if event.type == AI_JOB_FINISHED:
+                    return
+        finally:
+            subscription.close()
+            stream_limits.release(limit_key)
+
+    response = Response(stream_with_context(event_stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # EE:END - AI/LLM Integration
 
 
@@ -11136,7 +11689,6 @@ def teams_webhook():
     This is the main webhook endpoint for the Teams bot.
     All messages, invokes, and events come through here.
     """
-    import asyncio
     from ee.backend.teams.teams_security import validate_teams_jwt
     from ee.backend.teams.teams_service import TeamsService
 
@@ -11158,11 +11710,13 @@ def teams_webhook():
 
     # Find the Teams workspace for this tenant
     workspace = None
-    if ms_tenant_id:
-        workspace = TeamsWorkspace.query.filter_by(
-            ms_tenant_id=ms_tenant_id,
-            is_active=True
-        ).first()
+    workspace_ref = teams_workspaces.resolve(ms_tenant_id)
+    if workspace_ref:
+        workspace = db.session.get(TeamsWorkspace, workspace_ref.id)
+        if workspace and workspace.is_active:
+            teams_activity.touch(workspace.id)
+        else:
+            workspace = None
 
     if not workspace:
         # For installation events, we may not have a workspace yet
@@ -11179,7 +11733,7 @@ def teams_webhook():
                 text = activity.get('text', '')[:50]
                 logger.info(f"Teams webhook: Message text: {text}")
                 # handle_message sends reply via REST API and returns success bool
-                success = asyncio.run(service.handle_message(activity))
+                success = teams_loop.run(service.handle_message(activity))
                 logger.info(f"Teams webhook: Message handled, reply sent: {success}")
                 # Return 200 to acknowledge receipt (reply already sent via REST API)
                 return '', 200
@@ -11187,13 +11741,13 @@ def teams_webhook():
 
         elif activity_type == 'invoke':
             if service:
-                response = asyncio.run(service.handle_invoke(activity))
+                response = teams_loop.run(service.handle_invoke(activity))
                 return jsonify(response), 200
             return jsonify({'status': 200}), 200
 
         elif activity_type == 'conversationUpdate':
             if service:
-                response = asyncio.run(service.handle_conversation_update(activity))
+                response = teams_loop.run(service.handle_conversation_update(activity))
                 if isinstance(response, dict) and response.get('type') == 'AdaptiveCard':
                     return _teams_card_response(response)
             return '', 200
@@ -11753,7 +12307,6 @@ def teams_tab_create_decision():
 @track_endpoint('api_teams_test')
 def teams_test():
     """Send a test notification to the configured Teams channel."""
-    import asyncio
     from ee.backend.teams.teams_service import TeamsService
     from ee.backend.teams.teams_cards import build_success_card
 
@@ -11787,7 +12340,7 @@ def teams_test():
             f"This is a test notification from Decision Records. Sent by {user.email}."
         )
 
-        success = asyncio.run(service._send_proactive_message(reference, card))
+        success = teams_loop.run(service._send_proactive_message(reference, card))
 
         if success:
             return jsonify({'message': 'Test notification sent successfully'})
@@ -12137,5 +12690,11 @@ def teams_oidc_callback():
 # EE:END - Microsoft Teams Integration
 
 
+# ==================== Route Classification ====================
+# Must run after every route and blueprint is registered
+
+register_route_classes(app)
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,177 @@
+"""
+Long-lived asyncio event loops for sync Flask workers.
+
+The Teams bot service is async, and the webhook used to drive it with
+asyncio.run() per activity. That builds and tears down an event loop every
+time, and any HTTP session or connection pool the service opens dies with it,
+so every reply to the Bot Framework paid for a new TCP and TLS handshake.
+
+BackgroundLoop keeps one event loop per calling thread and reuses it for
+every activity that thread handles. Sync code hands it a coroutine and blocks
+for the result:
+
+    result = teams_loop.run(service.handle_invoke(activity))
+
+The coroutine runs on the caller's own thread, as it did under asyncio.run():
+current_app, request, g and the request's database session are the caller's,
+and a handler doing blocking work (sync SQLAlchemy queries) only holds up its
+own request. A handler that times out is cancelled and run() returns only
+once it has stopped, so nothing uses the request's context after teardown.
+
+Objects that should outlive one activity (HTTP client sessions) are created
+once per loop with shared() and closed when the process exits:
+
+    session = await bot_framework_session()
+
+Loops are created on first use in each thread and again after a fork, so
+they are safe with preloading servers.
+"""
+import asyncio
+import atexit
+import logging
+import os
+import threading
+
+from env_config import env_number
+
+logger = logging.getLogger(__name__)
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+DEFAULT_TIMEOUT = 15  # The Bot Framework gives up on a webhook after 15 seconds
+HTTP_POOL_SIZE = 20
+HTTP_TIMEOUT = 10
+SHUTDOWN_TIMEOUT = 5
+
+
+class BackgroundLoop:
+    """Event loops kept per calling thread, with a blocking run() bridge for sync callers."""
+
+    def __init__(self, name, timeout=DEFAULT_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._loops = []  # (loop, shared resources) of every thread in this process
+        self._counts = {'completed': 0, 'failed': 0, 'timed_out': 0}
+
+    def _state(self):
+        """The calling thread's (pid, loop, resources), created (or recreated after a fork) on demand."""
+        state = getattr(self._local, 'state', None)
+        if state is None or state[0] != os.getpid() or state[1].is_closed():
+            state = self._local.state = (os.getpid(), asyncio.new_event_loop(), {})
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pid, self._loops = os.getpid(), []
+                self._loops.append(state[1:])
+        return state
+
+    @property
+    def loop(self):
+        """The calling thread's loop."""
+        return self._state()[1]
+
+    def in_loop_thread(self):
+        """Whether the caller is a coroutine running on this thread's loop."""
+        state = getattr(self._local, 'state', None)
+        return state is not None and state[1].is_running()
+
+    def run(self, coro, timeout=None):
+        """Run coro on the calling thread's loop and block until it finishes.
+
+        After timeout seconds the coroutine is cancelled and TimeoutError is
+        raised once it has stopped. Blocking calls inside it cannot be
+        interrupted, so the wait then lasts until they return.
+        """
+        if self.in_loop_thread():
+            raise RuntimeError(f"{self.name}.run() called from its own event loop; await the coroutine instead")
+        timeout = timeout if timeout is not None else self.timeout
+        try:
+            result = self.loop.run_until_complete(asyncio.wait_for(coro, timeout))
+        except TimeoutError:
+            self._count('timed_out')
+            raise TimeoutError(f"{self.name} coroutine did not finish in {timeout}s")
+        except BaseException:
+            self._count('failed')
+            raise
+        self._count('completed')
+        return result
+
+    def shared(self, name, factory):
+        """The loop's single instance of a resource, created by factory() on first use.
+
+        Call from a coroutine running under run() (factories such as
+        aiohttp.ClientSession need the running loop). Resources with a close()
+        method, sync or async, are closed at shutdown.
+        """
+        if not self.in_loop_thread():
+            raise RuntimeError(f"{self.name}.shared() must be called from a coroutine on its loop")
+        resources = self._local.state[2]
+        resource = resources.get(name)
+        if resource is None:
+            resource = resources[name] = factory()
+        return resource
+
+    def stats(self):
+        with self._lock:
+            loops = self._loops if self._pid == os.getpid() else []
+            return {**self._counts, 'loops': len(loops),
+                    'shared': sorted({name for _loop, resources in loops for name in resources})}
+
+    def shutdown(self):
+        """Close shared resources and the loops of every thread."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            loops, self._loops = self._loops, []
+
+        async def close_all(resources):
+            for resource in resources:
+                close = getattr(resource, 'close', None)
+                if close is None:
+                    continue
+                try:
+                    result = close()
+                    if asyncio.iscoroutine(result):
+                        await result
+                except Exception as e:
+                    logger.warning(f"Error closing {self.name} resource {resource!r}: {e}")
+
+        for loop, resources in loops:
+            if loop.is_running():
+                logger.warning(f"{self.name} loop is still running an activity; not closed")
+                continue
+            try:
+                loop.run_until_complete(asyncio.wait_for(close_all(list(resources.values())), SHUTDOWN_TIMEOUT))
+            except Exception as e:
+                logger.warning(f"{self.name} loop shutdown: {e}")
+            resources.clear()
+            loop.close()
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+
+def _new_bot_framework_session():
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=HTTP_POOL_SIZE),
+        timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+    )
+
+
+async def bot_framework_session():
+    """The shared aiohttp session for Bot Framework calls, or None without aiohttp."""
+    if not AIOHTTP_AVAILABLE:
+        return None
+    return teams_loop.shared('bot_framework', _new_bot_framework_session)
+
+
+teams_loop = BackgroundLoop('teams', timeout=env_number('TEAMS_ACTIVITY_TIMEOUT', DEFAULT_TIMEOUT, float))
+atexit.register(teams_loop.shutdown)
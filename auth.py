@@ -1,9 +1,11 @@
 from functools import wraps
-from flask import session, redirect, url_for, request, jsonify, g
+from flask import session, redirect, url_for, request, jsonify, g, current_app, abort, make_response
 from authlib.integrations.requests_client import OAuth2Session
 from datetime import datetime, timezone
 import logging
 
+from principal_cache import principal_for, needs_credential_setup
+
 logger = logging.getLogger(__name__)
 
 
@@ -146,6 +148,13 @@ def complete_setup_and_login(user):
     logger.info(f"Setup completed for user {user.email} - full session created")
 
 
+def _authentication_required():
+    """Response for a request without a signed-in user: 401 for API calls, otherwise back to the home page."""
+    if request.is_json or request.path.startswith('/api/'):
+        return jsonify({'error': 'Authentication required'}), 401
+    return redirect('/')
+
+
 def login_required(f):
     """Decorator to require authentication for a route."""
     @wraps(f)
@@ -159,29 +168,37 @@ def login_required(f):
 
         # Check for regular user session
         if 'user_id' not in session:
-            if request.is_json or request.path.startswith('/api/'):
-                return jsonify({'error': 'Authentication required'}), 401
-            return redirect('/')
-
-        g.current_user = get_current_user()
-        if not g.current_user:
-            session.clear()
-            if request.is_json or request.path.startswith('/api/'):
-                return jsonify({'error': 'Authentication required'}), 401
-            return redirect('/')
+            return _authentication_required()
+
+        # Authorize from the cached principal; the User is only loaded if the view uses it
+        user_id = session['user_id']
+        cache = current_app.extensions.get('principal_cache')
+        principal = cache.get(user_id) if cache else None
+        if principal is None:
+            g.current_user = get_current_user()
+            if not g.current_user:
+                session.clear()
+                return _authentication_required()
+            principal = cache.remember(g.current_user) if cache else principal_for(g.current_user)
+        else:
+            def load_user():
+                user = get_current_user()
+                if user is None:
+                    # The principal outlived its user (e.g. a row deleted in bulk): treat it as a miss
+                    cache.invalidate(user_id)
+                    session.clear()
+                    abort(make_response(_authentication_required()))
+                return user
+
+            g.defer_current_user(load_user)
+        g.principal = principal
 
         # Check if user has completed credential setup
         # Users must have at least one auth method (passkey, password, or SSO)
         # SSO users (auth_type 'sso' or 'teams') don't need local credentials -
         # their identity is verified by the SSO provider (Slack, Google, Microsoft, etc.)
         if not is_master_account():
-            # SSO users are fully authenticated via their identity provider
-            is_sso_user = g.current_user.auth_type in ('sso', 'teams')
-
-            has_passkey = len(g.current_user.webauthn_credentials) > 0 if g.current_user.webauthn_credentials else False
-            has_password = g.current_user.has_password()
-
-            if not is_sso_user and not has_passkey and not has_password:
+            if needs_credential_setup(principal):
                 # Non-SSO user without local credentials - incomplete signup, redirect to setup
                 # Allow access to setup-related endpoints
                 allowed_paths = [
@@ -193,7 +210,7 @@ def login_required(f):
                     '/api/webauthn/credentials',  # Profile page loads credentials
                 ]
                 if not any(request.path.startswith(p) for p in allowed_paths):
-                    domain = g.current_user.sso_domain
+                    domain = principal.domain
                     if request.is_json or request.path.startswith('/api/'):
                         return jsonify({
                             'error': 'Credential setup required',
@@ -280,16 +297,31 @@ def get_current_tenant():
     if is_master_account():
         return None
 
-    if not g.current_user or not g.current_user.sso_domain:
+    # The cached principal saves loading the User just for its domain
+    principal = g.get('principal')
+    if principal is not None:
+        domain = principal.domain
+    elif g.current_user:
+        domain = g.current_user.sso_domain
+    else:
+        return None
+    if not domain:
         return None
 
-    return Tenant.query.filter_by(domain=g.current_user.sso_domain).first()
+    return Tenant.query.filter_by(domain=domain).first()
 
 
 def get_current_membership():
     """Get the current user's membership in their tenant."""
+    from models import TenantMembership
+
     tenant = get_current_tenant()
-    if not tenant or not g.current_user:
+    if not tenant:
+        return None
+    principal = g.get('principal')
+    if principal is not None:
+        return TenantMembership.query.filter_by(user_id=principal.user_id, tenant_id=tenant.id).first()
+    if not g.current_user:
         return None
     return g.current_user.get_membership(tenant_id=tenant.id)
 
@@ -367,16 +399,10 @@ def create_oauth_client(sso_config):
 
 
 def get_oidc_config(discovery_url):
-    """Fetch OpenID Connect configuration from discovery URL."""
-    import requests
+    """Get OpenID Connect configuration for a discovery URL (cached, see oidc_metadata.py)."""
+    from oidc_metadata import get_discovery_document
 
-    try:
-        response = requests.get(discovery_url, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        logger.error(f"Failed to fetch OIDC config from {discovery_url}: {e}")
-        return None
+    return get_discovery_document(discovery_url)
 
 
 def extract_domain_from_email(email):
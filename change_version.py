@@ -0,0 +1,180 @@
+"""
+Per-tenant change versions and conditional GET support.
+
+Every flush that writes a decision, comment, space, space link, history row,
+infrastructure item, user or auth config bumps a counter for the affected
+tenant domain (in the same transaction). Read endpoints derive their ETag
+from that counter, so a client sending If-None-Match gets 304 Not Modified
+without the query and serialization work.
+
+Set-based writes (Query.update/delete, multi-row INSERT) bypass the flush
+events; code paths using them call bump_change_version() explicitly.
+"""
+import hashlib
+import logging
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+
+from auth import is_master_account
+from models import (
+    db, ArchitectureDecision, AuthConfig, DecisionComment, DecisionHistory, DecisionSpace,
+    ITInfrastructure, Space, Tenant, TenantChangeVersion, User,
+)
+from session_hooks import PendingChanges
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = 'change_version_domains'
+
+
+# ==================== Version Storage ====================
+
+def _bump_statement(dialect_name, domain, now):
+    """Build an upsert incrementing the version for one domain, if the dialect supports it."""
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+
+    table = TenantChangeVersion.__table__
+    stmt = insert(table).values(domain=domain, version=1, updated_at=now)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.domain],
+        set_={'version': table.c.version + 1, 'updated_at': now},
+    )
+
+
+def _bump(connection, domains):
+    table = TenantChangeVersion.__table__
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    # Sorted so concurrent transactions lock rows in the same order
+    for domain in sorted(domains):
+        stmt = _bump_statement(connection.dialect.name, domain, now)
+        if stmt is not None:
+            connection.execute(stmt)
+            continue
+        result = connection.execute(
+            table.update().where(table.c.domain == domain).values(version=table.c.version + 1, updated_at=now)
+        )
+        if not result.rowcount:
+            connection.execute(table.insert().values(domain=domain, version=1, updated_at=now))
+
+
+def bump_change_version(*domains):
+    """
+    Bump the change version of the given tenant domains.
+
+    Runs in the current db.session transaction, so the bump commits or rolls
+    back together with the write it describes.
+    """
+    domains = {domain for domain in domains if domain}
+    if domains:
+        _bump(db.session.connection(), domains)
+
+
+def get_change_version(domain):
+    """Return the current change version for a tenant domain (0 if never written)."""
+    version = db.session.query(TenantChangeVersion.version).filter_by(domain=domain).scalar()
+    return version or 0
+
+
+# ==================== Automatic Bumps ====================
+
+def _tenant_domain(session, tenant_id):
+    if tenant_id is None:
+        return None
+    tenant = session.get(Tenant, tenant_id)
+    return tenant.domain if tenant else None
+
+
+def _decision_domain(session, decision_id):
+    if decision_id is None:
+        return None
+    decision = session.get(ArchitectureDecision, decision_id)
+    return decision.domain if decision else None
+
+
+def _domain_for(session, obj):
+    """Resolve the tenant domain whose read payloads depend on obj, or None."""
+    if isinstance(obj, (ArchitectureDecision, ITInfrastructure, AuthConfig)):
+        return obj.domain
+    if isinstance(obj, User):
+        return obj.sso_domain
+    if isinstance(obj, (Space, DecisionComment)):
+        return _tenant_domain(session, obj.tenant_id)
+    if isinstance(obj, DecisionSpace):
+        if obj.space is not None:
+            return _tenant_domain(session, obj.space.tenant_id)
+        return _decision_domain(session, obj.decision_id)
+    if isinstance(obj, DecisionHistory):
+        return _decision_domain(session, obj.decision_id)
+    return None
+
+
+def _changed_domains(session):
+    domains = []
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            domain = _domain_for(session, obj)
+            if domain:
+                domains.append(domain)
+    return domains
+
+
+# Domains are collected before the flush and bumped right after it, in the same transaction
+changed_domains = PendingChanges(
+    _PENDING_KEY, _changed_domains, lambda session, domains: _bump(session.connection(), domains),
+    collect_on='before_flush', apply_on='after_flush',
+)
+
+
+# ==================== Conditional GET ====================
+
+def compute_etag(scope, domain, version, user_id):
+    """Derive an opaque ETag for one read endpoint and request."""
+    from version import get_version
+
+    parts = [
+        scope, domain, str(version), str(user_id), get_version(),
+        repr(sorted(request.view_args.items())) if request.view_args else '',
+        request.query_string.decode('latin-1'),
+    ]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def etag_cached(scope):
+    """
+    Decorator adding ETag / If-None-Match support to a tenant read endpoint.
+
+    Must be applied below @login_required. The ETag is computed from the
+    tenant change version before the view runs; a matching If-None-Match
+    returns 304 without calling the view. Master accounts are passed through
+    unchanged.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user = getattr(g, 'current_user', None)
+            domain = getattr(user, 'sso_domain', None)
+            if is_master_account() or not domain:
+                return f(*args, **kwargs)
+
+            etag = compute_etag(scope, domain, get_change_version(domain), user.id)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Always revalidate; the payload is tenant data so shared caches must not store it
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
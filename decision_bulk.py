@@ -0,0 +1,210 @@
+"""
+Bulk mutation of architecture decisions.
+
+Applies one patch (status, owner, space membership) to many decisions in a
+single transaction: decisions are loaded with one query, history snapshots are
+written with one multi-row INSERT, field changes with one UPDATE, and space
+links with set-based deletes and a multi-row INSERT.
+"""
+import logging
+from datetime import datetime, timezone
+
+from change_version import bump_change_version
+from event_bus import queue_decision_updates
+from models import db, ArchitectureDecision, DecisionHistory, DecisionSpace, Space, User
+from security import sanitize_request_data
+
+logger = logging.getLogger(__name__)
+
+MAX_BULK_IDS = 500
+
+PATCH_SCHEMA = {
+    'status': {'type': 'string', 'max_length': 50},
+    'owner_email': {'type': 'email', 'required': False},
+}
+
+# Per-id outcomes
+RESULT_UPDATED = 'updated'
+RESULT_UNCHANGED = 'unchanged'
+RESULT_NOT_FOUND = 'not_found'
+
+
+class BulkPatchError(ValueError):
+    """Raised when a bulk request or patch is invalid."""
+
+
+def _int_list(value, field):
+    if not isinstance(value, list) or not all(isinstance(v, int) and not isinstance(v, bool) for v in value):
+        raise BulkPatchError(f'{field} must be a list of integers')
+    return list(dict.fromkeys(value))  # De-duplicate, keep order
+
+
+def validate_bulk_request(data, domain, tenant):
+    """
+    Validate a bulk request body.
+
+    Returns (ids, patch) where patch only holds the recognised, sanitized keys:
+    status, owner_id, owner_email, space_ids, add_space_ids, remove_space_ids.
+    Raises BulkPatchError on invalid input.
+    """
+    if not isinstance(data, dict):
+        raise BulkPatchError('No data provided')
+
+    ids = _int_list(data.get('ids'), 'ids')
+    if not ids:
+        raise BulkPatchError('ids is required')
+    if len(ids) > MAX_BULK_IDS:
+        raise BulkPatchError(f'At most {MAX_BULK_IDS} ids per request')
+
+    raw_patch = data.get('patch')
+    if not isinstance(raw_patch, dict) or not raw_patch:
+        raise BulkPatchError('patch is required')
+
+    sanitized, errors = sanitize_request_data(raw_patch, PATCH_SCHEMA)
+    if errors:
+        raise BulkPatchError(errors[0])
+
+    patch = {}
+    if 'status' in raw_patch:
+        if sanitized.get('status') not in ArchitectureDecision.VALID_STATUSES:
+            raise BulkPatchError(f'Invalid status. Must be one of: {", ".join(ArchitectureDecision.VALID_STATUSES)}')
+        patch['status'] = sanitized['status']
+
+    if 'owner_id' in raw_patch:
+        owner_id = raw_patch['owner_id']
+        if owner_id is not None:
+            if not isinstance(owner_id, int) or not User.query.filter_by(id=owner_id, sso_domain=domain).first():
+                raise BulkPatchError('owner_id must be a user in this tenant')
+        patch['owner_id'] = owner_id
+    if 'owner_email' in raw_patch:
+        patch['owner_email'] = sanitized.get('owner_email')
+
+    space_keys = [key for key in ('space_ids', 'add_space_ids', 'remove_space_ids') if key in raw_patch]
+    if 'space_ids' in space_keys and len(space_keys) > 1:
+        raise BulkPatchError('space_ids cannot be combined with add_space_ids or remove_space_ids')
+    if space_keys and not tenant:
+        raise BulkPatchError('Tenant not found')
+    for key in space_keys:
+        space_ids = _int_list(raw_patch[key], key)
+        if space_ids:
+            valid_ids = {row[0] for row in db.session.query(Space.id).filter(
+                Space.id.in_(space_ids), Space.tenant_id == tenant.id
+            )}
+            invalid_ids = [space_id for space_id in space_ids if space_id not in valid_ids]
+            if invalid_ids:
+                raise BulkPatchError(f'Invalid space IDs: {invalid_ids}')
+        patch[key] = space_ids
+
+    if not patch:
+        raise BulkPatchError('patch has no supported fields (status, owner_id, owner_email, space_ids, add_space_ids, remove_space_ids)')
+
+    return ids, patch
+
+
+def _apply_space_patch(decision_ids, patch, user_id, now):
+    """Apply space membership changes. Returns the set of decision ids whose links changed."""
+    if not decision_ids:
+        return set()
+
+    existing = set(db.session.query(DecisionSpace.decision_id, DecisionSpace.space_id).filter(
+        DecisionSpace.decision_id.in_(decision_ids)
+    ))
+
+    if 'space_ids' in patch:
+        wanted = {(decision_id, space_id) for decision_id in decision_ids for space_id in patch['space_ids']}
+        to_remove = existing - wanted
+        to_add = wanted - existing
+    else:
+        to_add = {(decision_id, space_id) for decision_id in decision_ids
+                  for space_id in patch.get('add_space_ids', [])} - existing
+        to_remove = {(decision_id, space_id) for decision_id, space_id in existing
+                     if space_id in patch.get('remove_space_ids', [])}
+
+    if to_remove:
+        DecisionSpace.query.filter(
+            db.tuple_(DecisionSpace.decision_id, DecisionSpace.space_id).in_(sorted(to_remove))
+        ).delete(synchronize_session=False)
+
+    if to_add:
+        db.session.execute(db.insert(DecisionSpace).values([
+            {'decision_id': decision_id, 'space_id': space_id, 'added_by_id': user_id, 'added_at': now}
+            for decision_id, space_id in sorted(to_add)
+        ]))
+
+    return {decision_id for decision_id, _ in to_remove | to_add}
+
+
+def apply_bulk_patch(ids, patch, domain, user, change_reason=None):
+    """
+    Apply a validated patch to decisions in one transaction.
+
+    Returns (results, changed_decisions, status_changed) where results is a list
+    of {'id', 'result'} in request order and changed_decisions are the decisions
+    whose fields or spaces changed. The caller commits.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    decisions = {
+        d.id: d for d in ArchitectureDecision.query.filter(
+            ArchitectureDecision.id.in_(ids),
+            ArchitectureDecision.domain == domain,
+            ArchitectureDecision.deleted_at.is_(None),
+        )
+    }
+
+    field_updates = {key: patch[key] for key in ('status', 'owner_id', 'owner_email') if key in patch}
+    field_changed_ids = []
+    history_rows = []
+    for decision_id in ids:
+        decision = decisions.get(decision_id)
+        if decision is None:
+            continue
+        if any(getattr(decision, key) != value for key, value in field_updates.items()):
+            field_changed_ids.append(decision_id)
+            # Snapshot the current state, as save_history() does for single updates
+            history_rows.append({
+                'decision_id': decision.id,
+                'title': decision.title,
+                'context': decision.context,
+                'decision_text': decision.decision,
+                'status': decision.status,
+                'consequences': decision.consequences,
+                'changed_at': now,
+                'change_reason': change_reason,
+                'changed_by_id': user.id,
+            })
+
+    status_changed = 'status' in patch and any(
+        decisions[decision_id].status != patch['status'] for decision_id in field_changed_ids
+    )
+
+    if history_rows:
+        db.session.execute(db.insert(DecisionHistory).values(history_rows))
+        ArchitectureDecision.query.filter(ArchitectureDecision.id.in_(field_changed_ids)).update(
+            dict(field_updates, updated_by_id=user.id, updated_at=now), synchronize_session=False
+        )
+
+    space_changed_ids = set()
+    if any(key in patch for key in ('space_ids', 'add_space_ids', 'remove_space_ids')):
+        space_changed_ids = _apply_space_patch(list(decisions.keys()), patch, user.id, now)
+
+    changed_ids = set(field_changed_ids) | space_changed_ids
+    if changed_ids:
+        # The set-based writes above bypass flush events
+        bump_change_version(domain)
+        queue_decision_updates(
+            db.session, [decisions[decision_id] for decision_id in ids if decision_id in changed_ids],
+            **({'status': patch['status']} if 'status' in patch else {}),
+        )
+
+    results = []
+    for decision_id in ids:
+        if decision_id not in decisions:
+            result = RESULT_NOT_FOUND
+        elif decision_id in changed_ids:
+            result = RESULT_UPDATED
+        else:
+            result = RESULT_UNCHANGED
+        results.append({'id': decision_id, 'result': result})
+
+    changed = [decisions[decision_id] for decision_id in ids if decision_id in changed_ids]
+    return results, changed, status_changed
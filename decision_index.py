@@ -0,0 +1,661 @@
+"""
+Semantic vector index of decisions for AI search.
+
+AI search and the MCP search_decisions tool only had keyword matching, so a
+decision worded differently from the query was missed and an LLM could not
+be handed a good shortlist cheaply. The index keeps one embedding per live
+decision and ranks by a mix of cosine similarity and keyword matches:
+
+    hits = decision_index.search(domain, 'how do we handle retries', k=10)
+    # [SearchHit(decision_id, score, vector_score, keyword_score), ...]
+
+Pieces:
+
+- Embedders turn text into L2-normalized vectors. HashingEmbedder (the
+  default) is a deterministic signed hashing vectorizer over words and word
+  pairs; it needs nothing installed and is what the tests use. Set
+  EMBEDDING_MODEL to a sentence-transformers model name to embed with a
+  local CPU model instead.
+- Stores keep the vectors per tenant domain. PgVectorStore keeps them in
+  PostgreSQL when the pgvector extension is installed, shared by every
+  worker; its tables are created by migration 2.1.3 at startup. MemoryVectorStore keeps them in the process; with NumPy installed
+  top-k is one matrix product plus argpartition (a few milliseconds for
+  100k decisions), and with EMBEDDING_INDEX_DIR set each tenant's matrix is
+  saved there and memory-mapped on load, so restarts do not re-embed.
+  Without NumPy it falls back to pure Python, fine for small tenants.
+- sync() brings a domain's index up to date before each search. It is a
+  no-op while the tenant's change version (change_version.py) is unchanged;
+  otherwise only decisions updated since the last sync are re-embedded,
+  deleted ones are dropped, and purged ones are found by comparing counts.
+
+Scores: vector_score is the cosine similarity, keyword_score the weighted
+share of query terms found in the title (double weight) or body, and
+score = EMBEDDING_HYBRID_ALPHA * vector_score + (1 - alpha) * keyword_score.
+"""
+import hashlib
+import heapq
+import json
+import logging
+import math
+import operator
+import os
+import re
+import threading
+import uuid
+from array import array
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import case, func, or_, select, text
+
+from change_version import get_change_version
+from env_config import env_number
+from models import db, ArchitectureDecision
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SentenceTransformer = None
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+DEFAULT_DIMENSIONS = 256
+DEFAULT_ALPHA = 0.7
+CANDIDATE_FACTOR = 4
+MAX_QUERY_TERMS = 8
+EMBED_BATCH_SIZE = 256
+
+SearchHit = namedtuple('SearchHit', 'decision_id score vector_score keyword_score')
+
+
+# ==================== Embedders ====================
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset(
+    'a an and are as at be by do does for from has have how in is it of on or our should that the this to '
+    'was we what when which who why will with'.split()
+)
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords."""
+    return [token for token in _TOKEN_RE.findall((text or '').lower()) if token not in STOPWORDS]
+
+
+def decision_text(title, context, decision, consequences):
+    """The text embedded for a decision; the title counts twice."""
+    return '\n'.join(part for part in (title, title, context, decision, consequences) if part)
+
+
+class HashingEmbedder:
+    """Signed feature hashing of words and word pairs, log-scaled and L2-normalized."""
+
+    def __init__(self, dimensions=DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions
+        self.name = f'hashing-{dimensions}'
+
+    def _feature(self, feature):
+        digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'little')
+        return digest % self.dimensions, 1.0 if digest >> 63 else -1.0
+
+    def embed_one(self, text):
+        tokens = tokenize(text)
+        counts = {}
+        for feature in tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]:
+            counts[feature] = counts.get(feature, 0) + 1
+        vector = [0.0] * self.dimensions
+        for feature, count in counts.items():
+            index, sign = self._feature(feature)
+            vector[index] += sign * (1.0 + math.log(count))
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else vector
+
+    def embed(self, texts):
+        return [self.embed_one(text) for text in texts]
+
+
+class SentenceTransformerEmbedder:
+    """A local sentence-transformers model, loaded on first use."""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.name = f'st-{model_name}'
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = SentenceTransformer(self.model_name, device='cpu')
+        return self._model
+
+    @property
+    def dimensions(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts):
+        vectors = self.model.encode(list(texts), batch_size=64, normalize_embeddings=True)
+        return [list(map(float, vector)) for vector in vectors]
+
+
+def create_embedder(model=None):
+    """HashingEmbedder unless EMBEDDING_MODEL names a sentence-transformers model."""
+    if model is None:
+        model = os.environ.get('EMBEDDING_MODEL', '')
+    if model and model != 'hashing':
+        if SENTENCE_TRANSFORMERS_AVAILABLE:
+            return SentenceTransformerEmbedder(model)
+        logger.warning(f"EMBEDDING_MODEL={model!r} needs the sentence-transformers package; "
+                       "using the hashing embedder")
+    return HashingEmbedder(env_number('EMBEDDING_DIMENSIONS', DEFAULT_DIMENSIONS))
+
+
+# ==================== Vector Stores ====================
+
+class TenantVectors:
+    """One tenant's vectors: a float32 matrix (or arrays without NumPy) plus ids and versions."""
+
+    def __init__(self, dimensions, meta=None):
+        self.dimensions = dimensions
+        self.meta = dict(meta or {})
+        self.ids = []
+        self.versions = {}  # decision id -> version
+        self._rows = {}  # decision id -> row
+        self._count = 0
+        if NUMPY_AVAILABLE:
+            self._matrix = np.zeros((0, dimensions), dtype=np.float32)
+        else:
+            self._matrix = []
+
+    def __len__(self):
+        return self._count
+
+    def _writable(self):
+        if NUMPY_AVAILABLE and not self._matrix.flags.writeable:
+            self._matrix = np.array(self._matrix)  # Copy a memory-mapped matrix before the first write
+
+    def upsert(self, rows):
+        """rows: (decision_id, version, vector) tuples."""
+        self._writable()
+        for decision_id, version, vector in rows:
+            row = self._rows.get(decision_id)
+            if row is None:
+                row = self._append(decision_id)
+            if NUMPY_AVAILABLE:
+                self._matrix[row] = vector
+            else:
+                self._matrix[row] = array('f', vector)
+            self.versions[decision_id] = version
+
+    def _append(self, decision_id):
+        row = self._count
+        if NUMPY_AVAILABLE:
+            if row == len(self._matrix):
+                grown = np.zeros((max(16, 2 * row), self.dimensions), dtype=np.float32)
+                grown[:row] = self._matrix[:row]
+                self._matrix = grown
+        else:
+            self._matrix.append(None)
+        self.ids.append(decision_id)
+        self._rows[decision_id] = row
+        self._count += 1
+        return row
+
+    def delete(self, decision_ids):
+        self._writable()
+        for decision_id in decision_ids:
+            row = self._rows.pop(decision_id, None)
+            if row is None:
+                continue
+            self.versions.pop(decision_id, None)
+            last = self._count - 1
+            if row != last:
+                # Move the last row into the gap
+                moved = self.ids[last]
+                self._matrix[row] = self._matrix[last]
+                self.ids[row] = moved
+                self._rows[moved] = row
+            self.ids.pop()
+            if not NUMPY_AVAILABLE:
+                self._matrix.pop()
+            self._count -= 1
+
+    def top_k(self, vector, k):
+        """The k most similar (decision_id, cosine) pairs, best first."""
+        if not self._count or k <= 0:
+            return []
+        if NUMPY_AVAILABLE:
+            scores = self._matrix[:self._count] @ np.asarray(vector, dtype=np.float32)
+            if k < self._count:
+                best = np.argpartition(-scores, k)[:k]
+            else:
+                best = np.arange(self._count)
+            best = best[np.argsort(-scores[best], kind='stable')]
+            return [(self.ids[row], float(scores[row])) for row in best]
+        scored = ((sum(map(operator.mul, row, vector)), index) for index, row in enumerate(self._matrix))
+        return [(self.ids[index], score) for score, index in heapq.nlargest(k, scored)]
+
+    def similarities(self, vector, decision_ids):
+        scores = {}
+        for decision_id in decision_ids:
+            row = self._rows.get(decision_id)
+            if row is not None:
+                scores[decision_id] = float(sum(map(operator.mul, self._matrix[row], vector)))
+        return scores
+
+    # Persistence (NumPy only): <dir>/<name>.json holds ids, versions and meta and names the
+    # <name>.<stamp>.npy matrix written with them. Replacing the JSON publishes both at once, so
+    # a reader never pairs ids from one save with the matrix of another, even when several
+    # processes save the same tenant.
+
+    def save(self, path):
+        directory, name = os.path.split(path)
+        matrix_name = f'{name}.{uuid.uuid4().hex[:16]}.npy'
+        previous = self._saved_matrix(path)
+        np.save(os.path.join(directory, matrix_name), self._matrix[:self._count])
+        payload = {'ids': self.ids, 'versions': [self.versions[i] for i in self.ids], 'meta': self.meta,
+                   'matrix': matrix_name}
+        temp_path = f'{path}.{os.getpid()}.tmp.json'
+        with open(temp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(temp_path, f'{path}.json')
+        if previous and previous != matrix_name:
+            try:
+                os.remove(os.path.join(directory, previous))
+            except OSError:
+                pass  # Already replaced by another process
+
+    @staticmethod
+    def _saved_matrix(path):
+        try:
+            with open(f'{path}.json') as f:
+                return json.load(f).get('matrix')
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def load(cls, path, dimensions):
+        with open(f'{path}.json') as f:
+            payload = json.load(f)
+        if not payload.get('matrix'):
+            return None
+        matrix = np.load(os.path.join(os.path.dirname(path), payload['matrix']), mmap_mode='r')
+        count = len(payload['ids'])
+        if matrix.shape[1:] != (dimensions,) or len(matrix) != count or len(payload['versions']) != count:
+            return None
+        vectors = cls(dimensions, payload['meta'])
+        vectors._matrix = matrix
+        vectors.ids = list(payload['ids'])
+        vectors._rows = {decision_id: row for row, decision_id in enumerate(vectors.ids)}
+        vectors.versions = dict(zip(vectors.ids, payload['versions']))
+        vectors._count = len(vectors.ids)
+        return vectors
+
+
+class MemoryVectorStore:
+    """Per-tenant vectors in this process, optionally saved to (and memory-mapped from) a directory."""
+
+    def __init__(self, dimensions, directory=None):
+        self.dimensions = dimensions
+        self.directory = directory if NUMPY_AVAILABLE else None
+        if directory and not NUMPY_AVAILABLE:
+            logger.warning("EMBEDDING_INDEX_DIR needs NumPy; the decision index is kept in memory only")
+        self._tenants = {}
+        self._lock = threading.Lock()
+
+    def _path(self, domain):
+        return os.path.join(self.directory, hashlib.sha256(domain.encode()).hexdigest()[:24])
+
+    def _tenant(self, domain):
+        vectors = self._tenants.get(domain)
+        if vectors is None:
+            with self._lock:
+                vectors = self._tenants.get(domain)
+                if vectors is None:
+                    vectors = self._load(domain) or TenantVectors(self.dimensions)
+                    self._tenants[domain] = vectors
+        return vectors
+
+    def _load(self, domain):
+        if not self.directory or not os.path.exists(f'{self._path(domain)}.json'):
+            return None
+        try:
+            return TenantVectors.load(self._path(domain), self.dimensions)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable decision index for {domain}: {e}")
+            return None
+
+    def meta(self, domain):
+        return dict(self._tenant(domain).meta)
+
+    def versions(self, domain):
+        return dict(self._tenant(domain).versions)
+
+    def size(self, domain):
+        return len(self._tenant(domain))
+
+    def upsert(self, domain, rows):
+        self._tenant(domain).upsert(rows)
+
+    def delete(self, domain, decision_ids):
+        self._tenant(domain).delete(decision_ids)
+
+    def clear(self, domain):
+        with self._lock:
+            self._tenants[domain] = TenantVectors(self.dimensions)
+
+    def commit(self, domain, meta):
+        vectors = self._tenant(domain)
+        vectors.meta = dict(meta)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            vectors.save(self._path(domain))
+
+    def top_k(self, domain, vector, k):
+        return self._tenant(domain).top_k(vector, k)
+
+    def similarities(self, domain, vector, decision_ids):
+        return self._tenant(domain).similarities(vector, decision_ids)
+
+
+def _vector_literal(vector):
+    return '[' + ','.join(f'{value:.6g}' for value in vector) + ']'
+
+
+class PgVectorStore:
+    """Vectors in PostgreSQL with the pgvector extension, shared by all workers."""
+
+    def __init__(self, dimensions):
+        self.dimensions = dimensions
+
+    @staticmethod
+    def schema_statements(dimensions):
+        """DDL for the embedding tables. Run by migration 2.1.3, never while serving requests."""
+        return [
+            f"CREATE TABLE IF NOT EXISTS decision_embeddings ("
+            f" domain VARCHAR(255) NOT NULL, decision_id INTEGER NOT NULL, version VARCHAR(64) NOT NULL,"
+            f" embedding vector({int(dimensions)}) NOT NULL, PRIMARY KEY (domain, decision_id))",
+            "CREATE TABLE IF NOT EXISTS decision_embedding_state ("
+            " domain VARCHAR(255) PRIMARY KEY, meta TEXT NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS ix_decision_embeddings_hnsw"
+            " ON decision_embeddings USING hnsw (embedding vector_cosine_ops)",
+        ]
+
+    @staticmethod
+    def extension_installed(connection):
+        return bool(connection.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'vector'")).scalar())
+
+    @classmethod
+    def available(cls, engine, dimensions):
+        """True on PostgreSQL with pgvector once the embedding tables exist for this vector size."""
+        if engine.dialect.name != 'postgresql':
+            return False
+        with engine.connect() as connection:
+            if not cls.extension_installed(connection):
+                return False
+            column_type = connection.execute(text(
+                "SELECT format_type(atttypid, atttypmod) FROM pg_attribute"
+                " WHERE attrelid = to_regclass('decision_embeddings') AND attname = 'embedding'"
+            )).scalar()
+        if column_type != f'vector({int(dimensions)})':
+            logger.warning(f"pgvector is installed but decision_embeddings is {column_type or 'missing'}, "
+                           f"not vector({int(dimensions)}); using the in-process decision index")
+            return False
+        return True
+
+    def meta(self, domain):
+        raw = db.session.execute(
+            text("SELECT meta FROM decision_embedding_state WHERE domain = :domain"), {'domain': domain}
+        ).scalar()
+        return json.loads(raw) if raw else {}
+
+    def versions(self, domain):
+        rows = db.session.execute(
+            text("SELECT decision_id, version FROM decision_embeddings WHERE domain = :domain"), {'domain': domain}
+        )
+        return dict(rows.all())
+
+    def size(self, domain):
+        return db.session.execute(
+            text("SELECT count(*) FROM decision_embeddings WHERE domain = :domain"), {'domain': domain}
+        ).scalar()
+
+    def upsert(self, domain, rows):
+        if not rows:
+            return
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO decision_embeddings (domain, decision_id, version, embedding)"
+                " VALUES (:domain, :decision_id, :version, CAST(:embedding AS vector))"
+                " ON CONFLICT (domain, decision_id) DO UPDATE"
+                " SET version = EXCLUDED.version, embedding = EXCLUDED.embedding"
+            ), [
+                {'domain': domain, 'decision_id': decision_id, 'version': version,
+                 'embedding': _vector_literal(vector)}
+                for decision_id, version, vector in rows
+            ])
+
+    def delete(self, domain, decision_ids):
+        if not decision_ids:
+            return
+        with db.engine.begin() as connection:
+            connection.execute(
+                text("DELETE FROM decision_embeddings WHERE domain = :domain AND decision_id = ANY(:ids)"),
+                {'domain': domain, 'ids': list(decision_ids)},
+            )
+
+    def clear(self, domain):
+        with db.engine.begin() as connection:
+            connection.execute(text("DELETE FROM decision_embeddings WHERE domain = :domain"), {'domain': domain})
+            connection.execute(text("DELETE FROM decision_embedding_state WHERE domain = :domain"), {'domain': domain})
+
+    def commit(self, domain, meta):
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO decision_embedding_state (domain, meta) VALUES (:domain, :meta)"
+                " ON CONFLICT (domain) DO UPDATE SET meta = EXCLUDED.meta"
+            ), {'domain': domain, 'meta': json.dumps(meta)})
+
+    def top_k(self, domain, vector, k):
+        rows = db.session.execute(text(
+            "SELECT decision_id, 1 - (embedding <=> CAST(:embedding AS vector)) AS score"
+            " FROM decision_embeddings WHERE domain = :domain"
+            " ORDER BY embedding <=> CAST(:embedding AS vector) LIMIT :k"
+        ), {'domain': domain, 'embedding': _vector_literal(vector), 'k': k})
+        return [(decision_id, float(score)) for decision_id, score in rows]
+
+    def similarities(self, domain, vector, decision_ids):
+        if not decision_ids:
+            return {}
+        rows = db.session.execute(text(
+            "SELECT decision_id, 1 - (embedding <=> CAST(:embedding AS vector)) FROM decision_embeddings"
+            " WHERE domain = :domain AND decision_id = ANY(:ids)"
+        ), {'domain': domain, 'embedding': _vector_literal(vector), 'ids': list(decision_ids)})
+        return {decision_id: float(score) for decision_id, score in rows}
+
+
+def create_store(dimensions):
+    """PgVectorStore on PostgreSQL with pgvector (unless EMBEDDING_STORE=memory), otherwise MemoryVectorStore."""
+    kind = os.environ.get('EMBEDDING_STORE', '')
+    if kind != 'memory':
+        try:
+            if PgVectorStore.available(db.engine, dimensions):
+                return PgVectorStore(dimensions)
+        except Exception as e:
+            logger.warning(f"Could not check for pgvector, using the in-process decision index: {e}")
+        if kind == 'pgvector':
+            logger.warning("EMBEDDING_STORE=pgvector but the vector extension is not installed")
+    return MemoryVectorStore(dimensions, os.environ.get('EMBEDDING_INDEX_DIR') or None)
+
+
+# ==================== Index ====================
+
+def _version(updated_at):
+    return updated_at.isoformat() if updated_at else ''
+
+
+class DecisionIndex:
+    """Keeps each domain's embeddings in step with its decisions and answers hybrid searches."""
+
+    def __init__(self, embedder=None, store=None, alpha=None):
+        self._embedder = embedder
+        self._store = store
+        self.alpha = env_number('EMBEDDING_HYBRID_ALPHA', DEFAULT_ALPHA, float) if alpha is None else alpha
+        self._lock = threading.Lock()
+        self._domain_locks = {}
+        self.embedded = 0
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            with self._lock:
+                if self._embedder is None:
+                    self._embedder = create_embedder()
+        return self._embedder
+
+    @embedder.setter
+    def embedder(self, value):
+        self._embedder = value
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = create_store(self.embedder.dimensions)
+        return self._store
+
+    @store.setter
+    def store(self, value):
+        self._store = value
+
+    def _domain_lock(self, domain):
+        with self._lock:
+            return self._domain_locks.setdefault(domain, threading.Lock())
+
+    def sync(self, domain):
+        """Re-embed decisions changed since the last sync; returns how many were embedded."""
+        with self._domain_lock(domain):
+            change_version = get_change_version(domain)
+            meta = self.store.meta(domain)
+            if meta.get('model') != self.embedder.name:
+                self.store.clear(domain)
+                meta = {}
+            elif meta.get('change_version') == change_version:
+                return 0
+
+            watermark = meta.get('watermark')
+            base = select(
+                ArchitectureDecision.id, ArchitectureDecision.updated_at, ArchitectureDecision.deleted_at,
+                ArchitectureDecision.title, ArchitectureDecision.context, ArchitectureDecision.decision,
+                ArchitectureDecision.consequences,
+            ).where(ArchitectureDecision.domain == domain)
+            query = base
+            if watermark:
+                query = query.where(ArchitectureDecision.updated_at >= datetime.fromisoformat(watermark))
+            rows = db.session.execute(query).all()
+
+            known = self.store.versions(domain)
+            removed = [row.id for row in rows if row.deleted_at is not None and row.id in known]
+            changed = [row for row in rows if row.deleted_at is None and known.get(row.id) != _version(row.updated_at)]
+            embedded = self._embed(domain, changed)
+            self.store.delete(domain, removed)
+
+            # Purged decisions never show up as updated; catch them by count
+            live = select(ArchitectureDecision.id).where(
+                ArchitectureDecision.domain == domain, ArchitectureDecision.deleted_at.is_(None)
+            )
+            live_count = db.session.execute(select(func.count()).select_from(live.subquery())).scalar()
+            if live_count != self.store.size(domain):
+                live_ids = set(db.session.execute(live).scalars())
+                indexed = set(self.store.versions(domain))
+                self.store.delete(domain, indexed - live_ids)
+                missing = live_ids - indexed
+                if missing:
+                    embedded += self._embed(domain, db.session.execute(
+                        base.where(ArchitectureDecision.id.in_(missing))
+                    ).all())
+
+            updated = [row.updated_at for row in rows if row.updated_at is not None]
+            if updated:
+                watermark = max(updated).isoformat()
+            self.store.commit(domain, {'model': self.embedder.name, 'change_version': change_version,
+                                       'watermark': watermark})
+            return embedded
+
+    def _embed(self, domain, rows):
+        for start in range(0, len(rows), EMBED_BATCH_SIZE):
+            batch = rows[start:start + EMBED_BATCH_SIZE]
+            vectors = self.embedder.embed([
+                decision_text(row.title, row.context, row.decision, row.consequences) for row in batch
+            ])
+            self.store.upsert(domain, [
+                (row.id, _version(row.updated_at), vector) for row, vector in zip(batch, vectors)
+            ])
+        self.embedded += len(rows)
+        return len(rows)
+
+    def keyword_scores(self, domain, query, limit):
+        """Weighted share of query terms in each matching decision: title matches count double.
+
+        The limit best matches are scored, ranked in SQL by the same weights
+        (on substrings), then by id.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms:
+            return {}
+        title = ArchitectureDecision.title
+        body = (ArchitectureDecision.context, ArchitectureDecision.decision, ArchitectureDecision.consequences)
+        term_ranks = [
+            case((title.ilike(f'%{term}%'), 2), (or_(*[column.ilike(f'%{term}%') for column in body]), 1), else_=0)
+            for term in terms
+        ]
+        rank = sum(term_ranks[1:], term_ranks[0])
+        rows = db.session.execute(
+            select(ArchitectureDecision.id, title, *body)
+            .where(ArchitectureDecision.domain == domain, ArchitectureDecision.deleted_at.is_(None), rank > 0)
+            .order_by(rank.desc(), ArchitectureDecision.id)
+            .limit(limit)
+        ).all()
+        scores = {}
+        for row in rows:
+            title_terms = set(tokenize(row.title))
+            body_terms = set(tokenize(' '.join(part or '' for part in (row.context, row.decision, row.consequences))))
+            score = sum(2 if term in title_terms else 1 if term in body_terms else 0 for term in terms)
+            if score:
+                scores[row.id] = score / (2 * len(terms))
+        return scores
+
+    def search(self, domain, query, k=10):
+        """The k best SearchHits for query among the domain's live decisions."""
+        self.sync(domain)
+        vector = self.embedder.embed([query])[0]
+        pool = k * CANDIDATE_FACTOR
+        keyword_scores = self.keyword_scores(domain, query, pool)
+        with self._domain_lock(domain):  # Not while sync() moves rows
+            vector_scores = dict(self.store.top_k(domain, vector, pool))
+            missing = [decision_id for decision_id in keyword_scores if decision_id not in vector_scores]
+            vector_scores.update(self.store.similarities(domain, vector, missing))
+
+        hits = []
+        for decision_id in set(vector_scores) | set(keyword_scores):
+            vector_score = max(vector_scores.get(decision_id, 0.0), 0.0)
+            keyword_score = keyword_scores.get(decision_id, 0.0)
+            score = self.alpha * vector_score + (1 - self.alpha) * keyword_score
+            hits.append(SearchHit(decision_id, score, vector_score, keyword_score))
+        hits.sort(key=lambda hit: (-hit.score, hit.decision_id))
+        return hits[:k]
+
+
+decision_index = DecisionIndex()
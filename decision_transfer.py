@@ -0,0 +1,560 @@
+"""
+Tenant-wide bulk export and import of architecture decisions.
+
+Export streams every decision in a tenant either as NDJSON (one decision per
+line, with its history and comments) or as a tar archive of MADR Markdown files.
+Decisions are read in primary-key ordered batches with their history, comments
+and user emails fetched per batch, so memory use does not grow with the tenant.
+
+Import accepts the same NDJSON (or a tar of MADR Markdown files), validates each
+record, allocates decision numbers from a single max() lookup, inserts in batches
+and reports progress after every batch. Per-record notifications are not sent;
+the caller sends one summary notification at the end. Each batch commits on its
+own: if one fails, it is rolled back, the import stops and the final progress
+event reports the error alongside the batches already imported.
+"""
+import io
+import json
+import logging
+import re
+import tarfile
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import (
+    db, ArchitectureDecision, DecisionHistory, DecisionComment, DecisionSpace, Space,
+    User, AuthConfig,
+)
+from security import sanitize_request_data
+
+logger = logging.getLogger(__name__)
+
+TRANSFER_BATCH_SIZE = 500
+
+# Most per-record validation errors reported back to the caller
+MAX_REPORTED_ERRORS = 100
+
+# Largest MADR file read from an import archive
+MAX_MADR_FILE_BYTES = 5 * 1024 * 1024
+
+EXPORT_FORMATS = {
+    # format -> (mimetype, file extension)
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'madr': ('application/x-tar', 'tar'),
+}
+
+DECISION_SCHEMA = {
+    'title': {'type': 'title', 'max_length': 255, 'required': True},
+    'context': {'type': 'text', 'max_length': 50000, 'required': False},
+    'decision': {'type': 'text', 'max_length': 50000, 'required': False},
+    'consequences': {'type': 'text', 'max_length': 50000, 'required': False},
+    'status': {'type': 'string', 'max_length': 50},
+    'owner_email': {'type': 'email', 'required': False},
+}
+
+HISTORY_SCHEMA = {
+    'title': {'type': 'title', 'max_length': 255},
+    'context': {'type': 'text', 'max_length': 50000},
+    'decision': {'type': 'text', 'max_length': 50000},
+    'consequences': {'type': 'text', 'max_length': 50000},
+    'status': {'type': 'string', 'max_length': 50},
+    'change_reason': {'type': 'text', 'max_length': 500},
+}
+
+COMMENT_SCHEMA = {
+    'body': {'type': 'text', 'max_length': 10000, 'required': True},
+    'author': {'type': 'name', 'max_length': 255},
+}
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _parse_datetime(value):
+    """Parse an ISO timestamp from an import record into naive UTC, or None."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+# ==================== Export ====================
+
+def _display_prefix(domain):
+    auth_config = AuthConfig.query.filter_by(domain=domain).first()
+    if auth_config and auth_config.tenant_prefix:
+        return auth_config.tenant_prefix
+    return 'ADR'
+
+
+def _iter_decision_batches(domain, batch_size):
+    """Yield lists of live decisions for a domain, batch_size at a time, by id."""
+    last_id = 0
+    while True:
+        batch = ArchitectureDecision.query.filter(
+            ArchitectureDecision.domain == domain,
+            ArchitectureDecision.deleted_at.is_(None),
+            ArchitectureDecision.id > last_id,
+        ).order_by(ArchitectureDecision.id).limit(batch_size).all()
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+
+def iter_export_records(domain, batch_size=TRANSFER_BATCH_SIZE):
+    """Yield one export record (a dict) per live decision in the domain."""
+    prefix = _display_prefix(domain)
+
+    for batch in _iter_decision_batches(domain, batch_size):
+        ids = [d.id for d in batch]
+
+        history_by_decision = {}
+        for h in DecisionHistory.query.filter(
+            DecisionHistory.decision_id.in_(ids)
+        ).order_by(DecisionHistory.changed_at, DecisionHistory.id):
+            history_by_decision.setdefault(h.decision_id, []).append(h)
+
+        comments_by_decision = {}
+        for c in DecisionComment.query.filter(
+            DecisionComment.decision_id.in_(ids),
+            DecisionComment.deleted_at.is_(None),
+        ).order_by(DecisionComment.created_at, DecisionComment.id):
+            comments_by_decision.setdefault(c.decision_id, []).append(c)
+
+        user_ids = {d.created_by_id for d in batch} | {d.owner_id for d in batch}
+        user_ids |= {h.changed_by_id for hs in history_by_decision.values() for h in hs}
+        user_ids |= {c.user_id for cs in comments_by_decision.values() for c in cs}
+        user_ids.discard(None)
+        users = {}
+        if user_ids:
+            users = {
+                row.id: (row.email, ' '.join(filter(None, [row.first_name, row.last_name])) or row.name)
+                for row in db.session.query(
+                    User.id, User.email, User.first_name, User.last_name, User.name
+                ).filter(User.id.in_(user_ids))
+            }
+
+        for d in batch:
+            owner_email = d.owner_email or (users.get(d.owner_id) or (None,))[0]
+            yield {
+                'display_id': f"{prefix}-{d.decision_number:03d}" if d.decision_number is not None else None,
+                'decision_number': d.decision_number,
+                'title': d.title,
+                'status': d.status,
+                'context': d.context,
+                'decision': d.decision,
+                'consequences': d.consequences,
+                'owner_email': owner_email,
+                'created_by': (users.get(d.created_by_id) or (None,))[0],
+                'created_at': _iso(d.created_at),
+                'updated_at': _iso(d.updated_at),
+                'history': [{
+                    'title': h.title,
+                    'status': h.status,
+                    'context': h.context,
+                    'decision': h.decision_text,
+                    'consequences': h.consequences,
+                    'changed_at': _iso(h.changed_at),
+                    'change_reason': h.change_reason,
+                    'changed_by': (users.get(h.changed_by_id) or (None,))[0],
+                } for h in history_by_decision.get(d.id, [])],
+                'comments': [{
+                    'body': c.body,
+                    'author': (users.get(c.user_id) or (None, None))[1] or c.author_display,
+                    'author_email': (users.get(c.user_id) or (None,))[0],
+                    'created_at': _iso(c.created_at),
+                } for c in comments_by_decision.get(d.id, [])],
+            }
+
+
+def iter_export_ndjson(domain, batch_size=TRANSFER_BATCH_SIZE):
+    """Yield the tenant's decisions as NDJSON lines."""
+    for record in iter_export_records(domain, batch_size=batch_size):
+        yield json.dumps(record) + '\n'
+
+
+def _slugify(value, max_length=60):
+    slug = re.sub(r'[^a-z0-9]+', '-', (value or '').lower()).strip('-')
+    return slug[:max_length].rstrip('-') or 'decision'
+
+
+def render_madr(record):
+    """Render an export record as a MADR Markdown document."""
+    front_matter = [
+        ('status', record.get('status')),
+        ('date', (record.get('created_at') or '')[:10] or None),
+        ('display_id', record.get('display_id')),
+        ('decision_number', record.get('decision_number')),
+        ('owner', record.get('owner_email')),
+        ('created_by', record.get('created_by')),
+    ]
+    lines = ['---']
+    lines += [f"{key}: {value}" for key, value in front_matter if value is not None]
+    lines += ['---', '', f"# {record['title']}", '']
+    lines += ['## Context and Problem Statement', '', record.get('context') or '', '']
+    lines += ['## Decision Outcome', '', record.get('decision') or '', '']
+    lines += ['### Consequences', '', record.get('consequences') or '', '']
+
+    if record.get('history'):
+        lines += ['## History', '']
+        for h in record['history']:
+            by = f" by {h['changed_by']}" if h.get('changed_by') else ''
+            lines.append(f"- {h.get('changed_at')}{by}: {h.get('title')} ({h.get('status')})"
+                         + (f" — {h['change_reason']}" if h.get('change_reason') else ''))
+        lines.append('')
+
+    if record.get('comments'):
+        lines += ['## Comments', '']
+        for c in record['comments']:
+            lines += [f"**{c.get('author') or 'Unknown'}** ({c.get('created_at')}):", '', c.get('body') or '', '']
+
+    return '\n'.join(lines)
+
+
+class _StreamSink:
+    """Write-only sink that lets tarfile stream its output in pieces."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_export_madr_tar(domain, batch_size=TRANSFER_BATCH_SIZE):
+    """Yield a tar archive with one MADR Markdown file per decision."""
+    sink = _StreamSink()
+    archive = tarfile.open(fileobj=sink, mode='w|')
+    mtime = time.time()
+    seen = set()
+
+    for record in iter_export_records(domain, batch_size=batch_size):
+        number = record.get('decision_number') or 0
+        name = f"decisions/{number:04d}-{_slugify(record['title'])}.md"
+        while name in seen:
+            name = name[:-3] + '-1.md'
+        seen.add(name)
+
+        payload = render_madr(record).encode('utf-8')
+        info = tarfile.TarInfo(name)
+        info.size = len(payload)
+        info.mtime = mtime
+        archive.addfile(info, io.BytesIO(payload))
+        data = sink.drain()
+        if data:
+            yield data
+
+    archive.close()
+    yield sink.drain()
+
+
+def iter_export(domain, export_format='ndjson', batch_size=TRANSFER_BATCH_SIZE):
+    """Yield the tenant export in the requested format ('ndjson' or 'madr')."""
+    if export_format == 'madr':
+        return iter_export_madr_tar(domain, batch_size=batch_size)
+    return iter_export_ndjson(domain, batch_size=batch_size)
+
+
+# ==================== Import parsing ====================
+
+_MADR_SECTIONS = {
+    'context and problem statement': 'context',
+    'context': 'context',
+    'decision outcome': 'decision',
+    'decision': 'decision',
+    'consequences': 'consequences',
+}
+
+
+def parse_madr(text):
+    """Parse a MADR Markdown document into an import record."""
+    record = {}
+    body = text
+
+    if text.startswith('---'):
+        end = text.find('\n---', 3)
+        if end != -1:
+            for line in text[3:end].strip().splitlines():
+                key, sep, value = line.partition(':')
+                if sep:
+                    record[key.strip()] = value.strip()
+            body = text[end + 4:]
+
+    sections = {}
+    current = None
+    for line in body.splitlines():
+        heading = re.match(r'^(#{1,3})\s+(.*)$', line)
+        if heading:
+            level, heading_text = len(heading.group(1)), heading.group(2).strip()
+            if level == 1 and 'title' not in record:
+                record['title'] = heading_text
+                current = None
+            else:
+                # History and comments sections are informational only
+                current = _MADR_SECTIONS.get(heading_text.lower())
+            continue
+        if current:
+            sections.setdefault(current, []).append(line)
+
+    for key, lines in sections.items():
+        record[key] = '\n'.join(lines).strip()
+    if 'owner' in record and 'owner_email' not in record:
+        record['owner_email'] = record.pop('owner')
+    if 'date' in record and 'created_at' not in record:
+        record['created_at'] = record['date']
+    return record
+
+
+def iter_ndjson_records(stream):
+    """Yield (line_number, record_or_None, error) from an NDJSON byte stream."""
+    for line_number, raw in enumerate(stream, start=1):
+        line = raw.decode('utf-8', errors='replace').strip() if isinstance(raw, bytes) else raw.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, None, 'Invalid JSON'
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, 'Expected a JSON object'
+            continue
+        yield line_number, record, None
+
+
+def iter_madr_tar_records(fileobj):
+    """Yield (member_name, record_or_None, error) from a tar of MADR Markdown files."""
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode='r|*')
+    except tarfile.TarError:
+        yield None, None, 'Invalid tar archive'
+        return
+    with archive:
+        for member in archive:
+            if not member.isfile() or not member.name.endswith('.md'):
+                continue
+            if member.size > MAX_MADR_FILE_BYTES:
+                yield member.name, None, f'File is larger than {MAX_MADR_FILE_BYTES} bytes'
+                continue
+            content = archive.extractfile(member)
+            if content is None:
+                continue
+            try:
+                yield member.name, parse_madr(content.read().decode('utf-8')), None
+            except UnicodeDecodeError:
+                yield member.name, None, 'File is not valid UTF-8'
+
+
+# ==================== Import ====================
+
+def _validate_record(record):
+    """Sanitize one import record. Returns (decision_fields, history, comments, error)."""
+    sanitized, errors = sanitize_request_data(record, DECISION_SCHEMA)
+    if errors:
+        return None, None, None, errors[0]
+
+    status = sanitized.get('status') or 'proposed'
+    if status not in ArchitectureDecision.VALID_STATUSES:
+        return None, None, None, f"Invalid status '{status}'"
+    sanitized['status'] = status
+    sanitized['created_at'] = _parse_datetime(record.get('created_at'))
+
+    history = []
+    for entry in record.get('history') or []:
+        if not isinstance(entry, dict):
+            continue
+        clean, _ = sanitize_request_data(entry, HISTORY_SCHEMA)
+        clean['changed_at'] = _parse_datetime(entry.get('changed_at'))
+        history.append(clean)
+
+    comments = []
+    for entry in record.get('comments') or []:
+        if not isinstance(entry, dict):
+            continue
+        clean, entry_errors = sanitize_request_data(entry, COMMENT_SCHEMA)
+        if entry_errors:
+            continue
+        clean['created_at'] = _parse_datetime(entry.get('created_at'))
+        comments.append(clean)
+
+    return sanitized, history, comments, None
+
+
+def _next_decision_number(domain):
+    max_number = db.session.query(db.func.max(ArchitectureDecision.decision_number)).filter(
+        ArchitectureDecision.domain == domain
+    ).scalar() or 0
+    return max_number + 1
+
+
+def _insert_batch(batch, domain, tenant, user, next_number, default_space_id):
+    """Insert one batch of validated records. Returns the number inserted."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    owner_emails = {fields.get('owner_email') for fields, _, _ in batch} - {None}
+    owners = {}
+    if owner_emails:
+        owners = {
+            row.email: row.id
+            for row in db.session.query(User.id, User.email).filter(
+                User.email.in_(owner_emails), User.sso_domain == domain
+            )
+        }
+
+    decisions = []
+    for offset, (fields, _, _) in enumerate(batch):
+        decisions.append(ArchitectureDecision(
+            title=fields['title'],
+            context=fields.get('context', ''),
+            decision=fields.get('decision', ''),
+            status=fields['status'],
+            consequences=fields.get('consequences', ''),
+            decision_number=next_number + offset,
+            domain=domain,
+            tenant_id=tenant.id if tenant else None,
+            created_by_id=user.id,
+            updated_by_id=user.id,
+            owner_id=owners.get(fields.get('owner_email')),
+            owner_email=fields.get('owner_email'),
+            created_at=fields.get('created_at') or now,
+            updated_at=now,
+        ))
+    db.session.add_all(decisions)
+    db.session.flush()  # Assigns ids with one batched INSERT
+
+    history_rows = []
+    comment_rows = []
+    space_rows = []
+    for decision, (fields, history, comments) in zip(decisions, batch):
+        for h in history:
+            history_rows.append({
+                'decision_id': decision.id,
+                'title': h.get('title') or decision.title,
+                'context': h.get('context', ''),
+                'decision_text': h.get('decision', ''),
+                'status': h.get('status') or decision.status,
+                'consequences': h.get('consequences', ''),
+                'changed_at': h.get('changed_at') or now,
+                'change_reason': h.get('change_reason'),
+                'changed_by_id': None,
+            })
+        if tenant:
+            for c in comments:
+                comment_rows.append({
+                    'decision_id': decision.id,
+                    'tenant_id': tenant.id,
+                    'user_id': None,
+                    'body': c['body'],
+                    'author_display': c.get('author') or 'Imported',
+                    'created_at': c.get('created_at') or now,
+                    'updated_at': c.get('created_at') or now,
+                })
+        if default_space_id:
+            space_rows.append({'decision_id': decision.id, 'space_id': default_space_id,
+                               'added_by_id': user.id, 'added_at': now})
+
+    if history_rows:
+        db.session.execute(db.insert(DecisionHistory), history_rows)
+    if comment_rows:
+        db.session.execute(db.insert(DecisionComment), comment_rows)
+    if space_rows:
+        db.session.execute(db.insert(DecisionSpace), space_rows)
+
+    db.session.commit()
+    return len(decisions)
+
+
+def import_decisions(records, domain, tenant, user, batch_size=TRANSFER_BATCH_SIZE):
+    """
+    Import records into a tenant, yielding a progress dict after every batch.
+
+    records yields (position, record_or_None, error) tuples as produced by
+    iter_ndjson_records / iter_madr_tar_records. The final dict yielded has
+    'done': True and the complete summary, plus 'error' if a batch could not
+    be written (earlier batches stay imported).
+    """
+    tenant_id = tenant.id if tenant else None
+    started = time.monotonic()
+
+    default_space_id = None
+    if tenant_id:
+        default_space = Space.query.filter_by(tenant_id=tenant_id, is_default=True).first()
+        default_space_id = default_space.id if default_space else None
+
+    # Numbers for the whole import come from one lookup; batches take consecutive ranges
+    next_number = _next_decision_number(domain)
+    first_number = next_number
+
+    imported = 0
+    failed = 0
+    errors = []
+    sample_titles = []
+    batch = []
+
+    def progress(done=False, error=None):
+        result = {
+            'imported': imported,
+            'failed': failed,
+            'elapsed_ms': int((time.monotonic() - started) * 1000),
+            'done': done,
+        }
+        if done:
+            result['errors'] = errors
+            result['sample_titles'] = sample_titles
+            result['first_decision_number'] = first_number if imported else None
+            result['last_decision_number'] = next_number - 1 if imported else None
+        if error:
+            result['error'] = error
+        return result
+
+    def insert(batch):
+        """Insert a batch; returns an error message (after rolling back) if the database refused it."""
+        nonlocal imported, next_number
+        try:
+            inserted = _insert_batch(batch, domain, tenant, user, next_number, default_space_id)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Decision import for {domain} stopped after {imported} decisions: {e}")
+            return 'Import stopped: a batch could not be saved. Decisions imported before it were kept.'
+        imported += inserted
+        next_number += inserted
+        return None
+
+    for position, record, error in records:
+        if error is None:
+            fields, history, comments, error = _validate_record(record)
+        if error:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'record': position, 'error': error})
+            continue
+
+        batch.append((fields, history, comments))
+        if len(sample_titles) < 10:
+            sample_titles.append(fields['title'])
+        if len(batch) >= batch_size:
+            error = insert(batch)
+            if error:
+                yield progress(done=True, error=error)
+                return
+            batch = []
+            logger.info(f"Decision import for {domain}: {imported} imported, {failed} failed")
+            yield progress()
+
+    error = insert(batch) if batch else None
+    yield progress(done=True, error=error)
@@ -0,0 +1,25 @@
+"""
+Numeric settings read from the environment.
+
+Tuning knobs (pool sizes, timeouts, TTLs) fall back to their default when the
+variable is unset, empty or not a number, so a typo in a deployment logs a
+warning instead of stopping the app from starting.
+
+    timeout = env_number('MCP_BATCH_TIMEOUT', 10.0, float)
+"""
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def env_number(name, default, cast=int):
+    """cast(os.environ[name]), or default when it is unset, empty or invalid."""
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid {name}={value!r}")
+        return default
@@ -0,0 +1,412 @@
+"""
+Per-tenant change events for server-push clients (the MCP event stream).
+
+MCP clients used to learn about new or changed decisions only by polling
+tools/call. Committed decision and comment changes are now published as
+events on a per-tenant bus, and GET /api/mcp streams them over SSE:
+
+    subscription = event_bus.subscribe(tenant_id, last_event_id=request.headers.get('Last-Event-ID'))
+    for event in subscription.stream(heartbeat=15, max_seconds=300):
+        ...  # None means "send a heartbeat"
+
+Events carry ids only (decision id, number, title, status, comment id); clients
+fetch the content with the usual tools, so nothing is exposed that the key
+could not read anyway.
+
+Each tenant keeps the last REPLAY_SIZE events. A client reconnecting with
+Last-Event-ID gets the events it missed; if they are no longer buffered (or
+the id is from another bus generation) it gets a single 'reset' event and
+should re-read what it cares about. A subscriber that falls too far behind is
+disconnected and catches up the same way.
+
+Without Redis the bus lives in the process, so a stream only sees changes
+committed by the same worker. With EVENT_BUS_URL or REDIS_URL set, events are
+numbered and buffered in Redis and fanned out to every worker through
+pub/sub, one listener thread per process.
+
+Events are collected from ORM flushes and published after commit. Code that
+changes decisions with set-based Query.update queues its events itself with
+queue_decision_updates(), as the bulk update does.
+
+Each open stream holds a gunicorn thread (the image runs the gthread worker
+with GUNICORN_THREADS per process), so the per-process stream total defaults
+to the thread count minus the threads kept for ordinary requests, and streams
+close before GUNICORN_TIMEOUT.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+
+from env_config import env_number
+from models import ArchitectureDecision, DecisionComment
+from redis_support import RedisError, connect, redis_url
+from session_hooks import PendingChanges
+
+logger = logging.getLogger(__name__)
+
+REPLAY_SIZE = 500
+SUBSCRIBER_QUEUE_SIZE = 1000
+KEY_PREFIX = 'dr:events:'
+LISTENER_RETRY_SECONDS = 5
+LISTENER_HEALTH_CHECK_SECONDS = 30
+DISCARD_TTL = 300
+DEFAULT_MAX_PER_KEY = 3
+DEFAULT_HEARTBEAT = 15
+DEFAULT_MAX_SECONDS = 300
+DEFAULT_WORKER_THREADS = 32
+DEFAULT_WORKER_TIMEOUT = 360
+REQUEST_THREADS = 8  # threads per process that streams may not take
+WORKER_TIMEOUT_MARGIN = 30
+
+RESET = 'reset'
+
+Event = namedtuple('Event', 'id type data')
+
+
+def _parse_event_id(event_id):
+    """'<generation>-<sequence>' -> (generation, sequence), or (None, None)."""
+    generation, _, sequence = (event_id or '').rpartition('-')
+    try:
+        return generation, int(sequence)
+    except ValueError:
+        return None, None
+
+
+class Subscription:
+    """One stream's queue of events for a tenant."""
+
+    def __init__(self, bus, tenant_id, replay=()):
+        self.bus = bus
+        self.tenant_id = tenant_id
+        self._queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._replay = list(replay)
+        self.overflowed = False
+        self.closed = False
+
+    def deliver(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # The stream ends; the client reconnects with Last-Event-ID
+            self.overflowed = True
+
+    def stream(self, heartbeat, max_seconds, clock=time.monotonic):
+        """Replayed, then live events; None every heartbeat seconds without one. Ends after max_seconds."""
+        deadline = clock() + max_seconds
+        try:
+            yield from self._replay
+            self._replay = []
+            while not self.closed and not self.overflowed:
+                remaining = deadline - clock()
+                if remaining <= 0:
+                    return
+                try:
+                    yield self._queue.get(timeout=min(heartbeat, remaining))
+                except queue.Empty:
+                    if clock() < deadline:
+                        yield None
+        finally:
+            self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.bus._unsubscribe(self)
+
+
+class LocalEventBus:
+    """Events numbered, buffered and delivered within this process."""
+
+    def __init__(self, replay_size=REPLAY_SIZE):
+        self.replay_size = replay_size
+        self.generation = format(int(time.time() * 1000), 'x')
+        self._lock = threading.Lock()
+        self._subscribers = {}  # tenant id -> set of Subscription
+        self._sequences = {}  # tenant id -> last sequence
+        self._buffers = {}  # tenant id -> deque of Event
+
+    def publish(self, tenant_id, event_type, data):
+        with self._lock:
+            sequence = self._sequences.get(tenant_id, 0) + 1
+            self._sequences[tenant_id] = sequence
+            published = Event(f'{self.generation}-{sequence}', event_type, data)
+            self._buffers.setdefault(tenant_id, deque(maxlen=self.replay_size)).append(published)
+        self._deliver(tenant_id, published)
+        return published
+
+    def subscribe(self, tenant_id, last_event_id=None):
+        with self._lock:
+            replay = self._replay(tenant_id, last_event_id)
+            subscription = Subscription(self, tenant_id, replay)
+            self._subscribers.setdefault(tenant_id, set()).add(subscription)
+        return subscription
+
+    @property
+    def first_event_id(self):
+        """A Last-Event-ID that replays everything still buffered."""
+        return f'{self.generation}-0'
+
+    def discard(self, tenant_id):
+        """Forget a finished stream's buffer; current subscribers keep their events."""
+        with self._lock:
+            self._buffers.pop(tenant_id, None)
+            self._sequences.pop(tenant_id, None)
+
+    def subscriber_count(self, tenant_id=None):
+        with self._lock:
+            if tenant_id is not None:
+                return len(self._subscribers.get(tenant_id, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def _replay(self, tenant_id, last_event_id):
+        if not last_event_id:
+            return []
+        buffered = list(self._buffers.get(tenant_id, ()))
+        return _events_after(last_event_id, self.generation, buffered, self._sequences.get(tenant_id, 0))
+
+    def _deliver(self, tenant_id, published):
+        with self._lock:
+            subscribers = list(self._subscribers.get(tenant_id, ()))
+        for subscription in subscribers:
+            subscription.deliver(published)
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.tenant_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.tenant_id]
+
+
+def _events_after(last_event_id, generation, buffered, latest):
+    """Buffered events after last_event_id, or a single reset event when the gap cannot be filled."""
+    last_generation, last_sequence = _parse_event_id(last_event_id)
+    reset = [Event(f'{generation}-{latest}', RESET, {})]
+    if last_generation != generation or last_sequence > latest:
+        return reset
+    if last_sequence == latest:
+        return []
+    oldest = _parse_event_id(buffered[0].id)[1] if buffered else latest + 1
+    if last_sequence < oldest - 1:
+        return reset
+    return [e for e in buffered if _parse_event_id(e.id)[1] > last_sequence]
+
+
+class RedisEventBus(LocalEventBus):
+    """Events numbered and buffered in Redis and fanned out to every worker through pub/sub."""
+
+    def __init__(self, client, replay_size=REPLAY_SIZE, prefix=KEY_PREFIX, subscriber=None):
+        super().__init__(replay_size)
+        self.generation = 'r'
+        self.client = client
+        # Pub/sub reads block until the next event, so they need a client without a read timeout
+        self.subscriber = subscriber or client
+        self.prefix = prefix
+        self._listener = None
+        self._listener_pid = None
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        subscriber = connect(url, socket_timeout=None, health_check_interval=LISTENER_HEALTH_CHECK_SECONDS)
+        return cls(connect(url), subscriber=subscriber, **kwargs)
+
+    def publish(self, tenant_id, event_type, data):
+        try:
+            sequence = self.client.incr(f'{self.prefix}{tenant_id}:seq')
+            published = Event(f'{self.generation}-{sequence}', event_type, data)
+            raw = json.dumps(published._asdict())
+            pipe = self.client.pipeline()
+            pipe.lpush(f'{self.prefix}{tenant_id}:log', raw)
+            pipe.ltrim(f'{self.prefix}{tenant_id}:log', 0, self.replay_size - 1)
+            pipe.publish(f'{self.prefix}{tenant_id}', raw)
+            pipe.execute()
+            return published
+        except RedisError as e:
+            logger.warning(f"Event bus unavailable, delivering {event_type} in this process only: {e}")
+            published = Event(f'local-{time.time_ns()}', event_type, data)
+            self._deliver(tenant_id, published)
+            return published
+
+    def subscribe(self, tenant_id, last_event_id=None):
+        self._ensure_listener()
+        replay = []
+        if last_event_id:
+            try:
+                pipe = self.client.pipeline()
+                pipe.get(f'{self.prefix}{tenant_id}:seq')
+                pipe.lrange(f'{self.prefix}{tenant_id}:log', 0, -1)
+                latest, raw_events = pipe.execute()
+                buffered = [Event(**json.loads(raw)) for raw in reversed(raw_events)]
+                replay = _events_after(last_event_id, self.generation, buffered, int(latest or 0))
+            except RedisError as e:
+                logger.warning(f"Event bus unavailable, cannot replay after {last_event_id}: {e}")
+                replay = [Event(last_event_id, RESET, {})]
+        subscription = Subscription(self, tenant_id, replay)
+        with self._lock:
+            self._subscribers.setdefault(tenant_id, set()).add(subscription)
+        return subscription
+
+    def discard(self, tenant_id):
+        try:
+            pipe = self.client.pipeline()
+            pipe.expire(f'{self.prefix}{tenant_id}:seq', DISCARD_TTL)
+            pipe.expire(f'{self.prefix}{tenant_id}:log', DISCARD_TTL)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Could not expire event stream {tenant_id}: {e}")
+
+    def _ensure_listener(self):
+        if self._listener is not None and self._listener_pid == os.getpid() and self._listener.is_alive():
+            return
+        with self._lock:
+            if self._listener is None or self._listener_pid != os.getpid() or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='event-bus-listener', daemon=True)
+                self._listener_pid = os.getpid()
+                self._listener.start()
+
+    def _listen(self):
+        prefix = len(self.prefix)
+        while True:
+            try:
+                pubsub = self.subscriber.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f'{self.prefix}*')
+                for message in pubsub.listen():
+                    channel = message['channel']
+                    channel = channel.decode() if isinstance(channel, bytes) else channel
+                    key = channel[prefix:]
+                    # Tenant streams are keyed by id; other streams (AI jobs) by string
+                    self._deliver(int(key) if key.isdigit() else key, Event(**json.loads(message['data'])))
+            except RedisError as e:
+                logger.warning(f"Event bus listener disconnected, retrying in {LISTENER_RETRY_SECONDS}s: {e}")
+                time.sleep(LISTENER_RETRY_SECONDS)
+
+
+def create_bus(url=None, prefix=KEY_PREFIX, replay_size=REPLAY_SIZE):
+    """RedisEventBus for a redis:// URL (when the redis package is installed), otherwise local."""
+    url = redis_url(url, 'EVENT_BUS_URL', 'Event bus', 'events are only delivered within each process')
+    if url:
+        return RedisEventBus.from_url(url, replay_size=replay_size, prefix=prefix)
+    return LocalEventBus(replay_size)
+
+
+class ConnectionLimiter:
+    """Caps open streams per API key and per process."""
+
+    def __init__(self, per_key=DEFAULT_MAX_PER_KEY, total=DEFAULT_WORKER_THREADS - REQUEST_THREADS):
+        self.per_key = per_key
+        self.total = total
+        self._lock = threading.Lock()
+        self._open = {}
+
+    def acquire(self, key):
+        with self._lock:
+            if self._open.get(key, 0) >= self.per_key or sum(self._open.values()) >= self.total:
+                return False
+            self._open[key] = self._open.get(key, 0) + 1
+            return True
+
+    def release(self, key):
+        with self._lock:
+            count = self._open.get(key, 0) - 1
+            if count > 0:
+                self._open[key] = count
+            else:
+                self._open.pop(key, None)
+
+    def open_count(self, key=None):
+        with self._lock:
+            return self._open.get(key, 0) if key is not None else sum(self._open.values())
+
+
+def stream_capacity(threads):
+    """Streams a process may hold open with this many request threads."""
+    return max(1, threads - REQUEST_THREADS)
+
+
+def stream_seconds_limit(seconds, worker_timeout):
+    """seconds, capped so a stream ends before the worker timeout."""
+    return min(seconds, max(worker_timeout - WORKER_TIMEOUT_MARGIN, 1))
+
+
+WORKER_THREADS = env_number('GUNICORN_THREADS', DEFAULT_WORKER_THREADS)
+WORKER_TIMEOUT = env_number('GUNICORN_TIMEOUT', DEFAULT_WORKER_TIMEOUT, float)
+
+event_bus = create_bus()
+stream_limits = ConnectionLimiter(
+    per_key=env_number('MCP_SSE_MAX_PER_KEY', DEFAULT_MAX_PER_KEY),
+    total=env_number('MCP_SSE_MAX_CONNECTIONS', stream_capacity(WORKER_THREADS)),
+)
+STREAM_HEARTBEAT = env_number('MCP_SSE_HEARTBEAT', DEFAULT_HEARTBEAT, float)
+STREAM_MAX_SECONDS = stream_seconds_limit(env_number('MCP_SSE_MAX_SECONDS', DEFAULT_MAX_SECONDS, float),
+                                          WORKER_TIMEOUT)
+
+
+def format_sse(event_id, payload):
+    """One SSE message with an id line and a JSON data line."""
+    return f'id: {event_id}\ndata: {json.dumps(payload, separators=(",", ":"))}\n\n'
+
+
+# ==================== ORM Feed ====================
+
+_PENDING_KEY = 'event_bus_events'
+
+
+def _decision_data(decision):
+    return {
+        'decision_id': decision.id,
+        'decision_number': decision.decision_number,
+        'title': decision.title,
+        'status': decision.status,
+    }
+
+
+def _collect_events(session):
+    collected = []
+    for obj in session.new:
+        if isinstance(obj, ArchitectureDecision):
+            collected.append((obj.tenant_id, 'decision.created', _decision_data(obj)))
+        elif isinstance(obj, DecisionComment):
+            collected.append((obj.tenant_id, 'comment.created', {'decision_id': obj.decision_id, 'comment_id': obj.id}))
+    for obj in session.dirty:
+        if isinstance(obj, ArchitectureDecision) and session.is_modified(obj, include_collections=False):
+            deleted = obj.deleted_at is not None
+            collected.append((obj.tenant_id, 'decision.deleted' if deleted else 'decision.updated', _decision_data(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, ArchitectureDecision):
+            collected.append((obj.tenant_id, 'decision.deleted', _decision_data(obj)))
+    return [item for item in collected if item[0] is not None]
+
+
+def _publish_events(session, pending):
+    seen = set()
+    for tenant_id, event_type, data in pending:
+        # One event per decision and type per transaction
+        marker = (tenant_id, event_type, data.get('comment_id') or data['decision_id'])
+        if marker in seen:
+            continue
+        seen.add(marker)
+        try:
+            event_bus.publish(tenant_id, event_type, data)
+        except Exception as e:
+            logger.warning(f"Could not publish {event_type}: {e}")
+
+
+# Event data are dicts, so pending events are a list; _publish_events drops repeats
+pending_events = PendingChanges(_PENDING_KEY, _collect_events, _publish_events, unique=False)
+
+
+def queue_decision_updates(session, decisions, **changes):
+    """Publish decision.updated for decisions changed without the ORM once the session commits.
+
+    changes are the new values of fields in the event data (status) that the
+    loaded decisions do not show yet.
+    """
+    pending_events.add(session, [
+        (decision.tenant_id, 'decision.updated', {**_decision_data(decision), **changes})
+        for decision in decisions if decision.tenant_id is not None
+    ])
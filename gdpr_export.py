@@ -0,0 +1,278 @@
+"""
+Streaming personal data export (GDPR Art. 20 — data portability).
+
+The export is written as one JSON document, produced incrementally: each list
+section is read with column-only queries using yield_per (a server-side cursor
+on PostgreSQL) and serialized row by row, so memory use stays flat no matter how
+much history a user has. The same byte stream can be wrapped in gzip or a zip
+archive without buffering the whole document.
+"""
+import json
+import time
+import zipfile
+import zlib
+from datetime import datetime, timezone
+
+from models import (
+    db, ArchitectureDecision, TenantMembership, Tenant, AuditLog, LoginHistory,
+    DecisionComment, AIInteractionLog,
+)
+
+# Rows fetched per round trip while streaming a section
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_FORMATS = {
+    # format -> (mimetype, file extension)
+    'json': ('application/json', 'json'),
+    'gzip': ('application/gzip', 'json.gz'),
+    'zip': ('application/zip', 'zip'),
+}
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _enum_value(value):
+    return value.value if hasattr(value, 'value') else value
+
+
+# ==================== Sections ====================
+#
+# Each section is (key, query factory, row serializer). The query factory takes
+# the user id and returns a column-only query; rows are plain tuples, so nothing
+# accumulates in the session identity map while streaming.
+
+def _decisions_query(user_id):
+    return db.session.query(
+        ArchitectureDecision.id, ArchitectureDecision.title, ArchitectureDecision.status,
+        ArchitectureDecision.created_at, ArchitectureDecision.updated_at,
+    ).filter(ArchitectureDecision.created_by_id == user_id).order_by(ArchitectureDecision.id)
+
+
+def _decision_row(row):
+    return {
+        'id': row.id,
+        'title': row.title,
+        'status': row.status,
+        'created_at': _iso(row.created_at),
+        'updated_at': _iso(row.updated_at),
+    }
+
+
+def _memberships_query(user_id):
+    return db.session.query(
+        Tenant.name, Tenant.domain, TenantMembership.global_role, TenantMembership.joined_at,
+    ).outerjoin(Tenant, Tenant.id == TenantMembership.tenant_id).filter(
+        TenantMembership.user_id == user_id
+    ).order_by(TenantMembership.id)
+
+
+def _membership_row(row):
+    return {
+        'tenant_name': row.name,
+        'tenant_domain': row.domain,
+        'role': _enum_value(row.global_role),
+        'joined_at': _iso(row.joined_at),
+    }
+
+
+def _audit_query(user_id):
+    return db.session.query(
+        AuditLog.action_type, AuditLog.target_entity, AuditLog.created_at,
+    ).filter(AuditLog.actor_user_id == user_id).order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
+
+
+def _audit_row(row):
+    return {
+        'action': row.action_type,
+        'target': row.target_entity,
+        'created_at': _iso(row.created_at),
+    }
+
+
+def _login_history_query(user_id):
+    return db.session.query(
+        LoginHistory.login_method, LoginHistory.success, LoginHistory.ip_address, LoginHistory.created_at,
+    ).filter(LoginHistory.user_id == user_id).order_by(LoginHistory.created_at.desc(), LoginHistory.id.desc())
+
+
+def _login_history_row(row):
+    return {
+        'method': row.login_method,
+        'success': row.success,
+        'ip_address': row.ip_address,
+        'created_at': _iso(row.created_at),
+    }
+
+
+def _comments_query(user_id):
+    return db.session.query(
+        DecisionComment.id, DecisionComment.decision_id, DecisionComment.body,
+        DecisionComment.created_at, DecisionComment.updated_at, DecisionComment.deleted_at,
+    ).filter(DecisionComment.user_id == user_id).order_by(DecisionComment.id)
+
+
+def _comment_row(row):
+    return {
+        'id': row.id,
+        'decision_id': row.decision_id,
+        'body': row.body,
+        'created_at': _iso(row.created_at),
+        'updated_at': _iso(row.updated_at),
+        'deleted_at': _iso(row.deleted_at),
+    }
+
+
+def _ai_interactions_query(user_id):
+    return db.session.query(
+        AIInteractionLog.channel, AIInteractionLog.action, AIInteractionLog.query_text,
+        AIInteractionLog.query_anonymized, AIInteractionLog.decision_count,
+        AIInteractionLog.llm_provider, AIInteractionLog.llm_model,
+        AIInteractionLog.success, AIInteractionLog.created_at,
+    ).filter(AIInteractionLog.user_id == user_id).order_by(
+        AIInteractionLog.created_at.desc(), AIInteractionLog.id.desc()
+    )
+
+
+def _ai_interaction_row(row):
+    return {
+        'channel': _enum_value(row.channel),
+        'action': _enum_value(row.action),
+        'query': row.query_text,
+        'query_anonymized': row.query_anonymized,
+        'decision_count': row.decision_count,
+        'llm_provider': row.llm_provider,
+        'llm_model': row.llm_model,
+        'success': row.success,
+        'created_at': _iso(row.created_at),
+    }
+
+
+EXPORT_SECTIONS = [
+    ('decisions_authored', _decisions_query, _decision_row),
+    ('memberships', _memberships_query, _membership_row),
+    ('audit_trail', _audit_query, _audit_row),
+    ('login_history', _login_history_query, _login_history_row),
+    ('comments', _comments_query, _comment_row),
+    ('ai_interactions', _ai_interactions_query, _ai_interaction_row),
+]
+
+
+def export_section_names():
+    """Top-level keys of the export document, in output order."""
+    return ['export_date', 'data_subject', 'profile'] + [name for name, _, _ in EXPORT_SECTIONS]
+
+
+# ==================== Streaming ====================
+
+def iter_export_json(user, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield the user's export as JSON text fragments.
+
+    Concatenated, the fragments form a single JSON object with the same shape
+    as export_section_names().
+    """
+    header = {
+        'export_date': datetime.now(timezone.utc).isoformat(),
+        'data_subject': {
+            'id': user.id,
+            'email': user.email,
+            'name': user.get_full_name(),
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+        },
+        'profile': {
+            'auth_type': user.auth_type,
+            'email_verified': user.email_verified,
+            'created_at': _iso(user.created_at),
+            'last_login': _iso(user.last_login),
+            'sso_domain': user.sso_domain,
+        },
+    }
+    user_id = user.id
+
+    # Emit the header object without its closing brace, then append each section
+    yield json.dumps(header)[:-1]
+
+    for name, query_factory, serialize in EXPORT_SECTIONS:
+        yield f', {json.dumps(name)}: ['
+        parts = []
+        first = True
+        for row in query_factory(user_id).yield_per(batch_size):
+            parts.append(('' if first else ', ') + json.dumps(serialize(row)))
+            first = False
+            if len(parts) >= batch_size:
+                yield ''.join(parts)
+                parts = []
+        if parts:
+            yield ''.join(parts)
+        yield ']'
+
+    yield '}'
+
+
+def _iter_bytes(user, batch_size):
+    for fragment in iter_export_json(user, batch_size=batch_size):
+        yield fragment.encode('utf-8')
+
+
+def iter_export_gzip(user, batch_size=EXPORT_BATCH_SIZE):
+    """Yield the export JSON as a gzip stream."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in _iter_bytes(user, batch_size):
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _ZipStreamBuffer:
+    """Write-only, non-seekable sink that lets ZipFile stream its output."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_export_zip(user, batch_size=EXPORT_BATCH_SIZE, member_name='data-export.json'):
+    """Yield a zip archive containing the export JSON as a single member."""
+    sink = _ZipStreamBuffer()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        info = zipfile.ZipInfo(member_name, date_time=time.gmtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with archive.open(info, mode='w', force_zip64=True) as member:
+            for chunk in _iter_bytes(user, batch_size):
+                member.write(chunk)
+                data = sink.drain()
+                if data:
+                    yield data
+        data = sink.drain()
+        if data:
+            yield data
+    yield sink.drain()
+
+
+def iter_export(user, export_format='json', batch_size=EXPORT_BATCH_SIZE):
+    """Yield the export in the requested format ('json', 'gzip' or 'zip')."""
+    if export_format == 'gzip':
+        return iter_export_gzip(user, batch_size=batch_size)
+    if export_format == 'zip':
+        return iter_export_zip(user, batch_size=batch_size)
+    return iter_export_json(user, batch_size=batch_size)
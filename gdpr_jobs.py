@@ -0,0 +1,421 @@
+"""
+GDPR maintenance job runner.
+
+Runs the scheduled GDPR tasks (anonymize users past their grace period, purge
+expired soft-deletes, clean old login history) in primary-key ordered chunks.
+Each chunk is committed on its own and recorded on a GDPRJobRun row, so a run
+that hits its time budget stops with status 'partial' and the next run picks up
+from the saved checkpoint instead of starting over.
+
+Runs can be queued from the cron endpoint (executed on a background thread) or
+executed directly from the command line:
+
+    python gdpr_jobs.py                      # run all tasks
+    python gdpr_jobs.py --task purge_decisions --chunk-size 1000
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from models import (
+    db, User, ArchitectureDecision, DecisionHistory, DecisionSpace, DecisionComment,
+    decision_infrastructure, Tenant, TenantMembership, TenantSettings, Space,
+    LoginHistory, AuditLog, WebAuthnCredential, GDPRJobRun, NotificationEvent,
+)
+from principal_cache import principal_cache
+from api_key_cache import api_key_cache
+from llm_cache import llm_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_MAX_SECONDS = 240
+LOGIN_HISTORY_RETENTION_DAYS = 90
+
+# A queued/running run older than this is assumed to have died with its worker
+STALE_RUN_AFTER = timedelta(hours=1)
+
+# Worker threads started by enqueue_gdpr_tasks, keyed by run_id
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def get_chunk_size():
+    """Rows per chunk, from GDPR_JOB_CHUNK_SIZE."""
+    try:
+        return max(1, int(os.environ.get('GDPR_JOB_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)))
+    except ValueError:
+        return DEFAULT_CHUNK_SIZE
+
+
+def get_max_seconds():
+    """Time budget per run in seconds, from GDPR_JOB_MAX_SECONDS."""
+    try:
+        return max(1, int(os.environ.get('GDPR_JOB_MAX_SECONDS', DEFAULT_MAX_SECONDS)))
+    except ValueError:
+        return DEFAULT_MAX_SECONDS
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# ==================== Anonymization ====================
+
+def anonymize_user(user_id):
+    """
+    Anonymize a user's personal data per GDPR Art. 17 and deletion-controls.md spec.
+
+    Preserves contributions (decisions remain, author set to None).
+    Redacts PII from audit logs and login history.
+    """
+    user = db.session.get(User, user_id)
+    if not user or user.is_anonymized:
+        return False
+
+    anonymous_email = f"deleted-{uuid.uuid4()}@anonymized.local"
+
+    # Anonymize user PII
+    original_email = user.email
+    user.email = anonymous_email
+    user.name = 'Former Member'
+    user.first_name = None
+    user.last_name = None
+    user.password_hash = None
+    user.sso_subject = None
+    user.aad_object_id = None
+    user.is_anonymized = True
+    user.deleted_at = datetime.now(timezone.utc)
+
+    # Detach decisions (keep content, remove author link)
+    ArchitectureDecision.query.filter_by(created_by_id=user.id).update(
+        {'created_by_id': None}, synchronize_session=False
+    )
+
+    # Remove WebAuthn credentials and queued digest notifications
+    WebAuthnCredential.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+    NotificationEvent.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+
+    # Remove tenant memberships
+    TenantMembership.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+
+    # Redact LoginHistory entries
+    LoginHistory.query.filter_by(user_id=user.id).update(
+        {'email': anonymous_email, 'ip_address': None, 'user_agent': None},
+        synchronize_session=False
+    )
+
+    # Redact AuditLog details containing user email. The text match narrows the
+    # scan in SQL; the JSON round-trip below does the actual replacement.
+    audit_entries = AuditLog.query.filter(
+        AuditLog.details.isnot(None),
+        db.cast(AuditLog.details, db.Text).contains(original_email, autoescape=True)
+    ).all()
+    for entry in audit_entries:
+        if entry.details and isinstance(entry.details, dict):
+            details_str = json.dumps(entry.details)
+            if original_email in details_str:
+                details_str = details_str.replace(original_email, 'deleted-user')
+                entry.details = json.loads(details_str)
+
+    db.session.commit()
+    # The membership delete bypasses the ORM events that invalidate cached API keys
+    api_key_cache.invalidate_users(user.id)
+    return True
+
+
+# ==================== Tasks ====================
+#
+# Each task processes one chunk per call: it takes the last primary key handled
+# so far and returns (rows_processed, last_id). last_id is None once there is
+# nothing left to do.
+
+def _next_ids(column, filters, after_id, limit):
+    query = db.session.query(column).filter(*filters)
+    if after_id:
+        query = query.filter(column > after_id)
+    return [row[0] for row in query.order_by(column).limit(limit).all()]
+
+
+def _anonymize_users_chunk(now, after_id, limit):
+    ids = _next_ids(User.id, [
+        User.deletion_scheduled_at <= now,
+        User.deleted_at.is_(None),
+        User.is_anonymized == False,  # noqa: E712
+    ], after_id, limit)
+    if not ids:
+        return 0, None
+    processed = sum(1 for user_id in ids if anonymize_user(user_id))
+    return processed, ids[-1]
+
+
+def _purge_decisions_chunk(now, after_id, limit):
+    ids = _next_ids(ArchitectureDecision.id, [
+        ArchitectureDecision.deleted_at.isnot(None),
+        ArchitectureDecision.deletion_expires_at <= now,
+    ], after_id, limit)
+    if not ids:
+        return 0, None
+
+    # Children first, one statement per table for the whole chunk
+    DecisionHistory.query.filter(DecisionHistory.decision_id.in_(ids)).delete(synchronize_session=False)
+    DecisionSpace.query.filter(DecisionSpace.decision_id.in_(ids)).delete(synchronize_session=False)
+    DecisionComment.query.filter(DecisionComment.decision_id.in_(ids)).delete(synchronize_session=False)
+    db.session.execute(
+        decision_infrastructure.delete().where(decision_infrastructure.c.decision_id.in_(ids))
+    )
+    purged = ArchitectureDecision.query.filter(
+        ArchitectureDecision.id.in_(ids)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return purged, ids[-1]
+
+
+def _purge_tenants_chunk(now, after_id, limit):
+    ids = _next_ids(Tenant.id, [
+        Tenant.deleted_at.isnot(None),
+        Tenant.deletion_expires_at <= now,
+    ], after_id, limit)
+    if not ids:
+        return 0, None
+
+    member_ids = [row[0] for row in db.session.query(TenantMembership.user_id).filter(TenantMembership.tenant_id.in_(ids))]
+    space_ids = db.session.query(Space.id).filter(Space.tenant_id.in_(ids))
+    DecisionSpace.query.filter(DecisionSpace.space_id.in_(space_ids)).delete(synchronize_session=False)
+    TenantMembership.query.filter(TenantMembership.tenant_id.in_(ids)).delete(synchronize_session=False)
+    TenantSettings.query.filter(TenantSettings.tenant_id.in_(ids)).delete(synchronize_session=False)
+    Space.query.filter(Space.tenant_id.in_(ids)).delete(synchronize_session=False)
+    purged = Tenant.query.filter(Tenant.id.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+    # Bulk deletes bypass the ORM events that invalidate cached principals
+    principal_cache.invalidate(*member_ids)
+    api_key_cache.invalidate_tenants(*ids)
+    llm_cache.invalidate_tenants(*ids)
+    return purged, ids[-1]
+
+
+def _clean_login_history_chunk(now, after_id, limit):
+    cutoff = now - timedelta(days=LOGIN_HISTORY_RETENTION_DAYS)
+    ids = _next_ids(LoginHistory.id, [LoginHistory.created_at < cutoff], after_id, limit)
+    if not ids:
+        return 0, None
+    cleaned = LoginHistory.query.filter(LoginHistory.id.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+    return cleaned, ids[-1]
+
+
+# Task name -> (chunk function, key in the legacy results summary). Order matters:
+# tasks run in this order within a run.
+TASKS = OrderedDict([
+    ('anonymize_users', (_anonymize_users_chunk, 'anonymized_users')),
+    ('purge_decisions', (_purge_decisions_chunk, 'purged_decisions')),
+    ('purge_tenants', (_purge_tenants_chunk, 'purged_tenants')),
+    ('clean_login_history', (_clean_login_history_chunk, 'cleaned_login_history')),
+])
+
+
+# ==================== Runner ====================
+
+def _resume_checkpoint(task):
+    """Checkpoint to resume from if the previous run of this task stopped early."""
+    last = GDPRJobRun.query.filter(
+        GDPRJobRun.task == task,
+        GDPRJobRun.status.notin_(GDPRJobRun.ACTIVE_STATUSES),
+    ).order_by(GDPRJobRun.id.desc()).first()
+    if last and last.status == GDPRJobRun.STATUS_PARTIAL:
+        return last.checkpoint
+    return None
+
+
+def _execute_job(job, chunk_size, deadline):
+    """Run one task to completion or until the deadline, updating its job row."""
+    task = job.task
+    chunk_fn = TASKS[task][0]
+    now = _utcnow()
+    checkpoint = _resume_checkpoint(task)
+
+    job.status = GDPRJobRun.STATUS_RUNNING
+    job.started_at = now
+    job.checkpoint = checkpoint
+    db.session.commit()
+    job_id = job.id
+    started = time.monotonic()
+
+    try:
+        while True:
+            processed, last_id = chunk_fn(now, checkpoint, chunk_size)
+            if last_id is None:
+                status = GDPRJobRun.STATUS_COMPLETED
+                break
+            checkpoint = last_id
+            job = db.session.get(GDPRJobRun, job_id)
+            job.rows_processed += processed
+            job.chunks_processed += 1
+            job.checkpoint = checkpoint
+            db.session.commit()
+            if time.monotonic() >= deadline:
+                status = GDPRJobRun.STATUS_PARTIAL
+                break
+        error = None
+    except Exception as e:
+        db.session.rollback()
+        logger.exception(f"GDPR task {task} failed")
+        status = GDPRJobRun.STATUS_FAILED
+        error = str(e)[:500]
+
+    job = db.session.get(GDPRJobRun, job_id)
+    job.status = status
+    job.error_message = error
+    job.finished_at = _utcnow()
+    job.duration_ms = int((time.monotonic() - started) * 1000)
+    db.session.commit()
+    return job
+
+
+def _create_jobs(run_id, tasks, trigger):
+    jobs = []
+    for task in tasks:
+        if task not in TASKS:
+            raise ValueError(f"Unknown GDPR task: {task}")
+        job = GDPRJobRun(run_id=run_id, task=task, trigger=trigger, status=GDPRJobRun.STATUS_QUEUED)
+        db.session.add(job)
+        jobs.append(job)
+    db.session.commit()
+    return jobs
+
+
+def _execute_run(run_id, chunk_size=None, max_seconds=None):
+    chunk_size = chunk_size or get_chunk_size()
+    deadline = time.monotonic() + (max_seconds or get_max_seconds())
+
+    job_ids = [job.id for job in GDPRJobRun.query.filter_by(
+        run_id=run_id, status=GDPRJobRun.STATUS_QUEUED
+    ).order_by(GDPRJobRun.id).all()]
+    for index, job_id in enumerate(job_ids):
+        job = db.session.get(GDPRJobRun, job_id)
+        # The first task always gets at least one chunk so a tiny budget still progresses
+        if index and time.monotonic() >= deadline:
+            # Budget exhausted before this task started; leave it for next run
+            job.status = GDPRJobRun.STATUS_PARTIAL
+            job.checkpoint = _resume_checkpoint(job.task)
+            job.finished_at = _utcnow()
+            job.duration_ms = 0
+            db.session.commit()
+            continue
+        _execute_job(job, chunk_size, deadline)
+
+    results = summarize_run(run_id)
+    logger.info(f"GDPR tasks executed (run {run_id}): {results}")
+    return results
+
+
+def run_gdpr_tasks(tasks=None, trigger=GDPRJobRun.TRIGGER_CLI, chunk_size=None, max_seconds=None):
+    """
+    Run GDPR tasks synchronously in the current app context.
+
+    Returns (run_id, results) where results maps the summary keys
+    (anonymized_users, purged_decisions, ...) to rows processed.
+    """
+    run_id = str(uuid.uuid4())
+    _create_jobs(run_id, list(tasks or TASKS.keys()), trigger)
+    return run_id, _execute_run(run_id, chunk_size=chunk_size, max_seconds=max_seconds)
+
+
+def get_active_run():
+    """Return the run_id of an in-flight (non-stale) run, or None."""
+    cutoff = _utcnow() - STALE_RUN_AFTER
+    active = GDPRJobRun.query.filter(
+        GDPRJobRun.status.in_(GDPRJobRun.ACTIVE_STATUSES),
+        GDPRJobRun.created_at >= cutoff,
+    ).order_by(GDPRJobRun.id.desc()).first()
+    return active.run_id if active else None
+
+
+def enqueue_gdpr_tasks(app, trigger, tasks=None):
+    """
+    Queue a GDPR run and execute it on a background thread.
+
+    Cron-safe: if a run is already queued or running, no new run is created.
+    Returns (run_id, created).
+    """
+    active_run_id = get_active_run()
+    if active_run_id:
+        return active_run_id, False
+
+    run_id = str(uuid.uuid4())
+    _create_jobs(run_id, list(tasks or TASKS.keys()), trigger)
+
+    def worker():
+        with app.app_context():
+            try:
+                _execute_run(run_id)
+            except Exception:
+                logger.exception(f"GDPR run {run_id} failed")
+            finally:
+                db.session.remove()
+                with _workers_lock:
+                    _workers.pop(run_id, None)
+
+    thread = threading.Thread(target=worker, name=f'gdpr-run-{run_id[:8]}', daemon=True)
+    with _workers_lock:
+        _workers[run_id] = thread
+    thread.start()
+    return run_id, True
+
+
+def wait_for_run(run_id, timeout=None):
+    """Block until a run queued by this process finishes. Returns False on timeout."""
+    with _workers_lock:
+        thread = _workers.get(run_id)
+    if thread is None:
+        return True
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def summarize_run(run_id):
+    """Rows processed per task for a run, keyed like the legacy results payload."""
+    results = {key: 0 for _, key in TASKS.values()}
+    for job in GDPRJobRun.query.filter_by(run_id=run_id).all():
+        if job.task in TASKS:
+            results[TASKS[job.task][1]] = job.rows_processed
+    return results
+
+
+def get_job_history(limit=50):
+    """Most recent job rows, newest first."""
+    return GDPRJobRun.query.order_by(GDPRJobRun.id.desc()).limit(limit).all()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run scheduled GDPR maintenance tasks.')
+    parser.add_argument('--task', action='append', choices=list(TASKS.keys()),
+                        help='Task to run (repeatable). Defaults to all tasks.')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help=f'Rows per chunk (default: GDPR_JOB_CHUNK_SIZE or {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--max-seconds', type=int, default=None,
+                        help=f'Time budget for the run (default: GDPR_JOB_MAX_SECONDS or {DEFAULT_MAX_SECONDS})')
+    args = parser.parse_args(argv)
+
+    from app import app
+
+    with app.app_context():
+        run_id, results = run_gdpr_tasks(
+            tasks=args.task, trigger=GDPRJobRun.TRIGGER_CLI,
+            chunk_size=args.chunk_size, max_seconds=args.max_seconds,
+        )
+        jobs = GDPRJobRun.query.filter_by(run_id=run_id).order_by(GDPRJobRun.id).all()
+        print(json.dumps({'run_id': run_id, 'results': results,
+                          'jobs': [job.to_dict() for job in jobs]}, indent=2))
+        return 1 if any(job.status == GDPRJobRun.STATUS_FAILED for job in jobs) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,197 @@
+"""
+Shared outbound HTTP client.
+
+All calls to identity providers, GitHub and other integrations go through one
+process-wide requests.Session so connections (DNS, TCP and TLS) are reused:
+
+- Each scheme://host gets its own pooled HTTPAdapter, sized by
+  HTTP_CLIENT_POOL_MAXSIZE (or HTTP_CLIENT_POOL_MAXSIZE_<HOST> for one host).
+- Requests default to (HTTP_CLIENT_CONNECT_TIMEOUT, HTTP_CLIENT_READ_TIMEOUT).
+- Idempotent requests are retried HTTP_CLIENT_RETRIES times on connection
+  errors and 502/503/504, honouring Retry-After. POSTs are never retried, so an
+  OAuth authorization code is only ever redeemed once.
+- Latency and errors are recorded per host (see http_client.metrics()).
+
+Cookies are never stored: the session is shared by every tenant.
+"""
+import logging
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3.util.retry import Retry
+
+from env_config import env_number
+
+logger = logging.getLogger(__name__)
+
+# Re-exported so call sites do not need to import requests themselves
+RequestException = requests.RequestException
+
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_RETRIES = 2
+RETRY_BACKOFF = 0.3
+RETRY_STATUSES = (502, 503, 504)
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}'.lower()
+
+
+class _HostMetrics:
+    __slots__ = ('requests', 'errors', 'total_ms', 'max_ms', 'last_error')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_error = None
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'avg_ms': round(self.total_ms / self.requests, 1) if self.requests else 0.0,
+            'max_ms': round(self.max_ms, 1),
+            'last_error': self.last_error,
+        }
+
+
+class _PerHostAdapter(BaseAdapter):
+    """Mounted for http:// and https://; hands each request to its host's pool."""
+
+    def __init__(self, client):
+        super().__init__()
+        self._client = client
+
+    def send(self, request, **kwargs):
+        return self._client.adapter_for(request.url).send(request, **kwargs)
+
+    def close(self):
+        pass
+
+
+class OutboundHTTPClient:
+    """Pooled, instrumented HTTP client shared by all outbound integrations."""
+
+    def __init__(self, pool_maxsize=None, connect_timeout=None, read_timeout=None, retries=None):
+        self.pool_maxsize = pool_maxsize or env_number('HTTP_CLIENT_POOL_MAXSIZE', DEFAULT_POOL_MAXSIZE)
+        self.timeout = (
+            connect_timeout or env_number('HTTP_CLIENT_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT, float),
+            read_timeout or env_number('HTTP_CLIENT_READ_TIMEOUT', DEFAULT_READ_TIMEOUT, float),
+        )
+        self.retries = retries if retries is not None else env_number('HTTP_CLIENT_RETRIES', DEFAULT_RETRIES)
+        self._lock = threading.Lock()
+        self._adapters = {}
+        self._metrics = {}
+        self.session = self._new_session()
+
+    def _new_session(self):
+        session = requests.Session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self._mount(session)
+        return session
+
+    def _mount(self, session):
+        dispatcher = _PerHostAdapter(self)
+        session.mount('https://', dispatcher)
+        session.mount('http://', dispatcher)
+
+    def _pool_size_for(self, host_key):
+        netloc = urlsplit(host_key).netloc.split(':')[0]
+        suffix = ''.join(c if c.isalnum() else '_' for c in netloc).upper()
+        return env_number(f'HTTP_CLIENT_POOL_MAXSIZE_{suffix}', self.pool_maxsize)
+
+    def _retry(self):
+        return Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+
+    def adapter_for(self, url):
+        """The pooled adapter for url's scheme://host, created on first use."""
+        key = _host_key(url)
+        adapter = self._adapters.get(key)
+        if adapter is None:
+            with self._lock:
+                adapter = self._adapters.get(key)
+                if adapter is None:
+                    size = self._pool_size_for(key)
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size, max_retries=self._retry())
+                    self._adapters[key] = adapter
+        return adapter
+
+    def _record(self, host, elapsed_ms, error=None):
+        with self._lock:
+            metrics = self._metrics.get(host)
+            if metrics is None:
+                metrics = self._metrics[host] = _HostMetrics()
+            metrics.requests += 1
+            metrics.total_ms += elapsed_ms
+            metrics.max_ms = max(metrics.max_ms, elapsed_ms)
+            if error:
+                metrics.errors += 1
+                metrics.last_error = error
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """Send a request through the pooled session. Raises RequestException on failure."""
+        host = urlsplit(url).netloc.lower()
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+        except RequestException as e:
+            self._record(host, (time.perf_counter() - started) * 1000, type(e).__name__)
+            raise
+        error = f'HTTP {response.status_code}' if response.status_code >= 500 else None
+        self._record(host, (time.perf_counter() - started) * 1000, error)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def attach(self, session):
+        """
+        Route another requests.Session (e.g. an Authlib OAuth2Session) through the
+        shared pools and record its responses in the metrics.
+        """
+        self._mount(session)
+
+        def record(response, *args, **kwargs):
+            error = f'HTTP {response.status_code}' if response.status_code >= 500 else None
+            self._record(urlsplit(response.url).netloc.lower(),
+                         response.elapsed.total_seconds() * 1000, error)
+
+        session.hooks['response'].append(record)
+        return session
+
+    def metrics(self):
+        """Per-host request counts, error counts and latency (ms)."""
+        with self._lock:
+            return {host: m.to_dict() for host, m in sorted(self._metrics.items())}
+
+    def close(self):
+        """Close pooled connections and reset metrics."""
+        with self._lock:
+            adapters, self._adapters, self._metrics = self._adapters, {}, {}
+        for adapter in adapters.values():
+            adapter.close()
+
+
+http_client = OutboundHTTPClient()
@@ -0,0 +1,358 @@
+"""
+Cache of LLM responses for AI-assisted features.
+
+AI-assisted creation, Slack AI queries and the external AI API call the LLM
+provider for every request, even when the same question is asked again over
+the same decisions; tokens and latency are the main AI costs. Responses are
+cached under
+
+    (tenant, prompt template, normalized query, decision-set version)
+
+so a repeat is answered without the provider:
+
+    result = llm_cache.cached(tenant.id, PROMPT_TEMPLATE, query, decisions,
+                              lambda: complete(prompt))  # -> (value, tokens_input, tokens_output)
+    record_cache_result(log, result)  # AIInteractionLog.cache_hit / tokens_saved
+
+- The template is hashed into the key, so editing a prompt template starts a
+  fresh set of entries.
+- The query is hashed as it goes into the prompt, with only case and
+  whitespace folded: anything else (a different person, link or
+  punctuation) can change the answer, so it gets its own entry. No raw
+  query text is kept in the key.
+- The decision-set version is a digest of the ids and updated_at of the
+  decisions given to the LLM: a changed decision means a different key.
+  Entries are also dropped after any commit that changes, deletes or comments
+  on a referenced decision, so they do not outlive it in memory.
+
+Entries expire after LLM_CACHE_TTL seconds; the local store evicts the least
+recently used beyond LLM_CACHE_MAX_ENTRIES. With LLM_CACHE_URL or REDIS_URL
+set, entries are shared by all workers (eviction is then Redis's maxmemory
+policy). Hits, misses and tokens saved are counted per tenant in the process
+(stats()) and persisted with each AIInteractionLog row (tenant_cache_stats()).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import case, func
+
+from env_config import env_number
+from models import db, AIInteractionLog, ArchitectureDecision, DecisionComment
+from redis_support import RedisError, connect, redis_url
+from session_hooks import PendingChanges
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'dr:llm:'
+DEFAULT_TTL = 3600
+DEFAULT_MAX_ENTRIES = 2000
+
+CacheResult = namedtuple('CacheResult', 'value hit tokens_input tokens_output tokens_saved')
+
+
+# ==================== Keys ====================
+
+def normalize_query(query):
+    """The query lowercased with runs of whitespace folded to one space."""
+    return ' '.join((query or '').lower().split())
+
+
+def decision_set_version(decisions):
+    """(digest, ids) of the decisions given to the LLM; the digest changes with any of them."""
+    parts = sorted(
+        (decision.id, decision.updated_at.isoformat() if decision.updated_at else '') for decision in decisions
+    )
+    digest = hashlib.sha256(json.dumps(parts).encode()).hexdigest()[:32]
+    return digest, [decision_id for decision_id, _updated in parts]
+
+
+def cache_key(tenant_id, template, query, version):
+    raw = '\0'.join((str(tenant_id), template, normalize_query(query), version))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# ==================== Stores ====================
+
+class LocalResponseStore:
+    """LRU of responses in this process, indexed by referenced decision."""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires, tenant_id, decision_ids, payload)
+        self._by_decision = {}  # (tenant_id, decision_id) -> keys
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self._clock():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[3]
+
+    def set(self, key, tenant_id, decision_ids, payload):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._clock() + self.ttl, tenant_id, tuple(decision_ids), payload)
+            for decision_id in decision_ids:
+                self._by_decision.setdefault((tenant_id, decision_id), set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _expires, tenant_id, decision_ids, _payload = self._entries.pop(key)
+        for decision_id in decision_ids:
+            keys = self._by_decision.get((tenant_id, decision_id))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_decision[(tenant_id, decision_id)]
+
+    def delete_decisions(self, tenant_id, decision_ids):
+        with self._lock:
+            keys = set()
+            for decision_id in decision_ids:
+                keys |= self._by_decision.get((tenant_id, decision_id), set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def delete_tenants(self, tenant_ids):
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry[1] in tenant_ids]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_decision.clear()
+
+
+class RedisResponseStore:
+    """Responses in Redis, shared by all workers, with per-decision and per-tenant key sets."""
+
+    def __init__(self, client, ttl=DEFAULT_TTL):
+        self.client = client
+        self.ttl = ttl
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        return cls(connect(url), **kwargs)
+
+    def get(self, key):
+        try:
+            raw = self.client.get(f'{KEY_PREFIX}{key}')
+        except RedisError as e:
+            logger.warning(f"LLM cache unavailable: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    def set(self, key, tenant_id, decision_ids, payload):
+        try:
+            pipe = self.client.pipeline()
+            pipe.set(f'{KEY_PREFIX}{key}', json.dumps(payload), ex=self.ttl)
+            for index in [f'{KEY_PREFIX}t:{tenant_id}'] + [f'{KEY_PREFIX}d:{tenant_id}:{i}' for i in decision_ids]:
+                pipe.sadd(index, key)
+                pipe.expire(index, self.ttl)
+            pipe.execute()
+        except (RedisError, TypeError, ValueError) as e:
+            logger.warning(f"Could not cache LLM response: {e}")
+
+    def _delete_indexed(self, indexes):
+        keys = set()
+        for index in indexes:
+            keys |= {member.decode() if isinstance(member, bytes) else member for member in self.client.smembers(index)}
+        if keys or indexes:
+            self.client.delete(*[f'{KEY_PREFIX}{key}' for key in keys], *indexes)
+        return len(keys)
+
+    def delete_decisions(self, tenant_id, decision_ids):
+        try:
+            return self._delete_indexed([f'{KEY_PREFIX}d:{tenant_id}:{i}' for i in decision_ids])
+        except RedisError as e:
+            logger.warning(f"Could not invalidate cached LLM responses: {e}")
+            return 0
+
+    def delete_tenants(self, tenant_ids):
+        try:
+            return self._delete_indexed([f'{KEY_PREFIX}t:{tenant_id}' for tenant_id in tenant_ids])
+        except RedisError as e:
+            logger.warning(f"Could not invalidate cached LLM responses: {e}")
+            return 0
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(f'{KEY_PREFIX}*', count=500))
+            if keys:
+                self.client.delete(*keys)
+        except RedisError as e:
+            logger.warning(f"Could not clear the LLM cache: {e}")
+
+
+def create_store(url=None):
+    """RedisResponseStore for a redis:// URL (when the redis package is installed), otherwise local."""
+    ttl = env_number('LLM_CACHE_TTL', DEFAULT_TTL)
+    url = redis_url(url, 'LLM_CACHE_URL', 'LLM cache', 'using a per-process cache')
+    if url:
+        return RedisResponseStore.from_url(url, ttl=ttl)
+    return LocalResponseStore(ttl=ttl, max_entries=env_number('LLM_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+
+
+# ==================== Cache ====================
+
+class LLMResponseCache:
+    """Answers repeated prompts from the store and counts hits per tenant."""
+
+    def __init__(self, store=None, enabled=None):
+        self._store = store
+        self.enabled = (
+            os.environ.get('LLM_CACHE_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+            if enabled is None else enabled
+        )
+        self._lock = threading.Lock()
+        self._stats = {}  # tenant id -> [hits, misses, tokens saved]
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = create_store()
+        return self._store
+
+    @store.setter
+    def store(self, value):
+        self._store = value
+
+    def cached(self, tenant_id, template, query, decisions, call):
+        """call() -> (value, tokens_input, tokens_output), unless a cached response answers it.
+
+        Returns a CacheResult. Only successful calls are cached; exceptions propagate.
+        """
+        if not self.enabled:
+            return self._call(call)
+        version, decision_ids = decision_set_version(decisions)
+        key = cache_key(tenant_id, template, query, version)
+        payload = self.store.get(key)
+        if payload is not None:
+            saved = (payload.get('tokens_input') or 0) + (payload.get('tokens_output') or 0)
+            self._count(tenant_id, hit=True, saved=saved)
+            return CacheResult(payload['value'], True, 0, 0, saved)
+
+        result = self._call(call)
+        self._count(tenant_id, hit=False, saved=0)
+        self.store.set(key, tenant_id, decision_ids, {
+            'value': result.value, 'tokens_input': result.tokens_input, 'tokens_output': result.tokens_output,
+        })
+        return result
+
+    @staticmethod
+    def _call(call):
+        value, tokens_input, tokens_output = call()
+        return CacheResult(value, False, tokens_input or 0, tokens_output or 0, 0)
+
+    def _count(self, tenant_id, hit, saved):
+        with self._lock:
+            counters = self._stats.setdefault(tenant_id, [0, 0, 0])
+            counters[0 if hit else 1] += 1
+            counters[2] += saved
+
+    def stats(self, tenant_id):
+        """This process's hits, misses, hit rate and tokens saved for a tenant."""
+        with self._lock:
+            hits, misses, saved = self._stats.get(tenant_id, (0, 0, 0))
+        total = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0.0, 'tokens_saved': saved}
+
+    def invalidate_decisions(self, tenant_id, *decision_ids):
+        if decision_ids:
+            self.store.delete_decisions(tenant_id, decision_ids)
+
+    def invalidate_tenants(self, *tenant_ids):
+        if tenant_ids:
+            self.store.delete_tenants(set(tenant_ids))
+
+    def clear(self):
+        self.store.clear()
+        with self._lock:
+            self._stats.clear()
+
+
+llm_cache = LLMResponseCache()
+
+
+# ==================== Metrics ====================
+
+def record_cache_result(log, result):
+    """Copy a CacheResult's hit and tokens saved onto an AIInteractionLog row."""
+    log.cache_hit = result.hit
+    log.tokens_saved = result.tokens_saved
+    if result.hit:
+        log.tokens_input = 0
+        log.tokens_output = 0
+
+
+def tenant_cache_stats(tenant_id, start_date=None, end_date=None):
+    """Logged AI interactions, cache hits, hit rate and tokens saved for a tenant (default: last 30 days)."""
+    end_date = end_date or datetime.now(timezone.utc).replace(tzinfo=None)
+    start_date = start_date or end_date - timedelta(days=30)
+    requests, hits, saved = db.session.query(
+        func.count(AIInteractionLog.id),
+        func.sum(case((AIInteractionLog.cache_hit.is_(True), 1), else_=0)),
+        func.sum(AIInteractionLog.tokens_saved),
+    ).filter(
+        AIInteractionLog.tenant_id == tenant_id,
+        AIInteractionLog.created_at >= start_date,
+        AIInteractionLog.created_at <= end_date,
+    ).one()
+    hits = hits or 0
+    return {
+        'requests': requests,
+        'cache_hits': hits,
+        'hit_rate': round(hits / requests, 4) if requests else 0.0,
+        'tokens_saved': saved or 0,
+    }
+
+
+# ==================== Invalidation ====================
+
+_PENDING_KEY = 'llm_cache_decisions'
+
+
+def _changed_decisions(session):
+    changed = set()
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, ArchitectureDecision) and (obj in session.deleted or session.is_modified(obj)):
+            changed.add((obj.tenant_id, obj.id))
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, DecisionComment):
+            changed.add((obj.tenant_id, obj.decision_id))
+    return [item for item in changed if item[0] is not None]
+
+
+def _invalidate_changed_decisions(session, changed):
+    by_tenant = {}
+    for tenant_id, decision_id in changed:
+        by_tenant.setdefault(tenant_id, []).append(decision_id)
+    for tenant_id, decision_ids in by_tenant.items():
+        llm_cache.invalidate_decisions(tenant_id, *decision_ids)
+
+
+pending_invalidations = PendingChanges(_PENDING_KEY, _changed_decisions, _invalidate_changed_decisions)
@@ -0,0 +1,118 @@
+"""
+Concurrent execution of MCP JSON-RPC batches.
+
+Agent clients batch several tool calls into one POST (a search plus a handful
+of get_decision calls), and the endpoint used to run them one after another,
+so the client waited for the sum of their latencies. BatchRunner runs the
+independent messages of a batch on a bounded, process-wide thread pool:
+
+- Consecutive read-only messages (can_run_concurrently) run together; a
+  write (create_decision, add_decision_comment, initialize) waits for the
+  reads before it and runs alone, so later messages see its effect as they
+  did when the batch ran in order.
+- Results come back in request order, whatever order the calls finish in.
+- A batch has a size limit (checked by the caller) and a time budget;
+  messages that have not finished when it runs out get timed_out(item).
+  Calls already running finish in the background and their results are
+  dropped.
+
+    results = mcp_batch.run(batch, handle, can_run_concurrently=_mcp_read_only,
+                            timed_out=..., failed=...)
+
+handle is called on pool threads, so it must set up its own app/request
+context and database session. Nothing here depends on Flask.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from env_config import env_number
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_SIZE = 20
+DEFAULT_TIMEOUT = 30
+
+
+class BatchRunner:
+    """Runs a batch's independent messages on a shared, bounded thread pool."""
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_size=DEFAULT_MAX_SIZE, timeout=DEFAULT_TIMEOUT, clock=time.monotonic):
+        self.workers = workers
+        self.max_size = max_size
+        self.timeout = timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    @property
+    def executor(self):
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='mcp-batch')
+                    self._pid = os.getpid()
+        return self._executor
+
+    def run(self, items, handle, can_run_concurrently, timed_out, failed, timeout=None):
+        """handle(item) for every item; returns the results in item order.
+
+        Items that raise get failed(item, exc); items not finished within the
+        time budget get timed_out(item).
+        """
+        deadline = self._clock() + (self.timeout if timeout is None else timeout)
+        results = [None] * len(items)
+        for group in self._groups(items, can_run_concurrently):
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                for index in group:
+                    results[index] = timed_out(items[index])
+                continue
+            if len(group) == 1:
+                index = group[0]
+                results[index] = self._call(handle, failed, items[index])
+                continue
+
+            futures = {self.executor.submit(self._call, handle, failed, items[index]): index for index in group}
+            done, pending = wait(futures, timeout=remaining)
+            for future in done:
+                results[futures[future]] = future.result()
+            for future in pending:
+                future.cancel()
+                results[futures[future]] = timed_out(items[futures[future]])
+        return results
+
+    @staticmethod
+    def _groups(items, can_run_concurrently):
+        """Split item indexes into runs of concurrent reads and single writes."""
+        groups, current = [], []
+        for index, item in enumerate(items):
+            if can_run_concurrently(item):
+                current.append(index)
+                continue
+            if current:
+                groups.append(current)
+                current = []
+            groups.append([index])
+        if current:
+            groups.append(current)
+        return groups
+
+    @staticmethod
+    def _call(handle, failed, item):
+        try:
+            return handle(item)
+        except Exception as e:
+            logger.exception("MCP batch message failed")
+            return failed(item, e)
+
+
+mcp_batch = BatchRunner(
+    workers=env_number('MCP_BATCH_WORKERS', DEFAULT_WORKERS),
+    max_size=env_number('MCP_BATCH_MAX_SIZE', DEFAULT_MAX_SIZE),
+    timeout=env_number('MCP_BATCH_TIMEOUT', DEFAULT_TIMEOUT, float),
+)
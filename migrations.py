@@ -171,6 +171,26 @@ MIGRATIONS = [
         "description": "Add decision comments table",
         "migrate": lambda db: migrate_1_15_0(db)
     },
+    {
+        "version": "2.1.0",
+        "description": "Add notification digest delivery columns",
+        "migrate": lambda db: migrate_2_1_0(db)
+    },
+    {
+        "version": "2.1.1",
+        "description": "Add AI response cache metrics columns",
+        "migrate": lambda db: migrate_2_1_1(db)
+    },
+    {
+        "version": "2.1.2",
+        "description": "Add id to the AI interaction log tenant index for keyset paging",
+        "migrate": lambda db: migrate_2_1_2(db)
+    },
+    {
+        "version": "2.1.3",
+        "description": "Add pgvector tables for the semantic decision index",
+        "migrate": lambda db: migrate_2_1_3(db)
+    },
 ]
 
 
@@ -334,6 +354,72 @@ def migrate_1_15_0(db):
     return changes
 
 
+def migrate_2_1_0(db):
+    """Migration for v2.1.0 - Notification digests (notification_events is created by create_all)."""
+    changes = 0
+
+    if table_exists(db, 'subscriptions'):
+        if add_column(db, 'subscriptions', 'delivery_mode', 'VARCHAR(20)', default='immediate'):
+            changes += 1
+        if add_column(db, 'subscriptions', 'last_digest_at', 'TIMESTAMP'):
+            changes += 1
+
+    return changes
+
+
+def migrate_2_1_1(db):
+    """Migration for v2.1.1 - LLM response cache hits and tokens saved per AI interaction."""
+    changes = 0
+
+    if table_exists(db, 'ai_interaction_logs'):
+        if add_column(db, 'ai_interaction_logs', 'cache_hit', 'BOOLEAN', default=False):
+            changes += 1
+        if add_column(db, 'ai_interaction_logs', 'tokens_saved', 'INTEGER'):
+            changes += 1
+
+    return changes
+
+
+def migrate_2_1_2(db):
+    """Migration for v2.1.2 - Index AI interaction logs on (tenant_id, created_at, id) for keyset paging."""
+    if not table_exists(db, 'ai_interaction_logs'):
+        return 0
+
+    with db.engine.connect() as conn:
+        conn.execute(db.text("DROP INDEX IF EXISTS idx_ai_log_tenant_created"))
+        conn.execute(db.text(
+            "CREATE INDEX idx_ai_log_tenant_created "
+            "ON ai_interaction_logs(tenant_id, created_at, id)"
+        ))
+        conn.commit()
+
+    logger.info("Rebuilt idx_ai_log_tenant_created with id")
+    return 1
+
+
+def migrate_2_1_3(db):
+    """Migration for v2.1.3 - Decision embedding tables, only on PostgreSQL with pgvector installed.
+
+    Without the vector extension the decision index stays in each worker's
+    memory. Installing it later needs this function run once by hand.
+    """
+    if get_db_type(db) != 'postgresql':
+        return 0
+
+    from decision_index import PgVectorStore, create_embedder
+
+    with db.engine.connect() as conn:
+        if not PgVectorStore.extension_installed(conn):
+            logger.info("pgvector is not installed; skipping decision embedding tables")
+            return 0
+        for statement in PgVectorStore.schema_statements(create_embedder().dimensions):
+            conn.execute(db.text(statement))
+        conn.commit()
+
+    logger.info("Created decision embedding tables")
+    return 1
+
+
 # =============================================================================
 # Migration Runner
 # =============================================================================
@@ -133,6 +133,9 @@ class SystemConfig(db.Model):
     KEY_ANALYTICS_EVENT_MAPPINGS = 'analytics_event_mappings'
     KEY_ANALYTICS_EXCEPTION_CAPTURE = 'analytics_exception_capture'
 
+    # Update check (cached latest GitHub release, JSON)
+    KEY_UPDATE_CHECK_RESULT = 'update_check_result'
+
     # Default values
     DEFAULT_ADMIN_SESSION_TIMEOUT = 1  # 1 hour for super admin
     DEFAULT_USER_SESSION_TIMEOUT = 8   # 8 hours for regular users
@@ -706,6 +709,8 @@ class AuditLog(db.Model):
     ACTION_USER_DELETION_CANCELLED = 'user_deletion_cancelled'
     ACTION_USER_DELETION_EXECUTED = 'user_deletion_executed'
     ACTION_USER_DATA_EXPORTED = 'user_data_exported'
+    ACTION_DECISIONS_IMPORTED = 'decisions_imported'
+    ACTION_AI_LOGS_EXPORTED = 'ai_logs_exported'
 
     def to_dict(self):
         return {
@@ -969,6 +974,66 @@ class UserConsent(db.Model):
         }
 
 
+class GDPRJobRun(db.Model):
+    """
+    Job history for scheduled GDPR maintenance tasks.
+
+    One row per task per run. Rows sharing a run_id were queued together.
+    The checkpoint holds the last primary key processed so a run that stopped
+    on its time budget can be resumed by the next run.
+    """
+    __tablename__ = 'gdpr_job_runs'
+
+    # Status constants
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_PARTIAL = 'partial'  # Stopped on time budget, resumes from checkpoint
+    STATUS_FAILED = 'failed'
+
+    ACTIVE_STATUSES = [STATUS_QUEUED, STATUS_RUNNING]
+
+    # Trigger constants
+    TRIGGER_CRON = 'cron'
+    TRIGGER_MASTER = 'master'
+    TRIGGER_CLI = 'cli'
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.String(36), nullable=False, index=True)
+    task = db.Column(db.String(50), nullable=False)
+    trigger = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_QUEUED)
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    chunks_processed = db.Column(db.Integer, nullable=False, default=0)
+    checkpoint = db.Column(db.Integer, nullable=True)
+    error_message = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_ms = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.Index('idx_gdpr_job_task_created', 'task', 'created_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'run_id': self.run_id,
+            'task': self.task,
+            'trigger': self.trigger,
+            'status': self.status,
+            'rows_processed': self.rows_processed,
+            'chunks_processed': self.chunks_processed,
+            'checkpoint': self.checkpoint,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_ms': self.duration_ms,
+        }
+
+
 class SSOConfig(db.Model):
     """SSO configuration for OpenID Connect providers."""
 
@@ -1198,11 +1263,21 @@ class Subscription(db.Model):
 
     __tablename__ = 'subscriptions'
 
+    # Delivery modes
+    DELIVERY_IMMEDIATE = 'immediate'
+    DELIVERY_HOURLY = 'hourly'
+    DELIVERY_DAILY = 'daily'
+
+    DELIVERY_MODES = [DELIVERY_IMMEDIATE, DELIVERY_HOURLY, DELIVERY_DAILY]
+    DIGEST_MODES = [DELIVERY_HOURLY, DELIVERY_DAILY]
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True)
     notify_on_create = db.Column(db.Boolean, default=True)
     notify_on_update = db.Column(db.Boolean, default=False)
     notify_on_status_change = db.Column(db.Boolean, default=True)
+    delivery_mode = db.Column(db.String(20), nullable=False, default=DELIVERY_IMMEDIATE)
+    last_digest_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
@@ -1213,11 +1288,45 @@ class Subscription(db.Model):
             'notify_on_create': self.notify_on_create,
             'notify_on_update': self.notify_on_update,
             'notify_on_status_change': self.notify_on_status_change,
+            'delivery_mode': self.delivery_mode or self.DELIVERY_IMMEDIATE,
+            'last_digest_at': self.last_digest_at.isoformat() if self.last_digest_at else None,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
         }
 
 
+class NotificationEvent(db.Model):
+    """
+    Buffered decision notification for a subscriber on digest delivery.
+
+    One row per recipient per event. Decision fields are snapshotted so the
+    digest renders without reloading decisions; rows are deleted once the
+    digest containing them has been sent.
+    """
+    __tablename__ = 'notification_events'
+
+    # Event types
+    EVENT_CREATED = 'created'
+    EVENT_UPDATED = 'updated'
+    EVENT_STATUS_CHANGED = 'status_changed'
+    EVENT_IMPORTED = 'imported'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    domain = db.Column(db.String(255), nullable=False)
+    decision_id = db.Column(db.Integer, nullable=True)  # No FK: purged decisions keep their snapshot
+    event_type = db.Column(db.String(20), nullable=False)
+    title = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(50), nullable=True)
+    actor_name = db.Column(db.String(255), nullable=True)
+    change_reason = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        db.Index('idx_notification_events_user', 'user_id', 'id'),
+    )
+
+
 # Association table for many-to-many relationship between Decisions and Infrastructure
 decision_infrastructure = db.Table('decision_infrastructure',
     db.Column('decision_id', db.Integer, db.ForeignKey('architecture_decisions.id'), primary_key=True),
@@ -1439,6 +1548,21 @@ class DecisionComment(db.Model):
         }
 
 
+class TenantChangeVersion(db.Model):
+    """
+    Monotonic per-tenant change counter for decision-related data.
+
+    Bumped on every write to decisions, comments, spaces, infrastructure and
+    the users/auth config they render, and used to derive ETags for the read
+    endpoints. Kept in its own table so bumps never touch the tenant row.
+    """
+    __tablename__ = 'tenant_change_versions'
+
+    domain = db.Column(db.String(255), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
 class AccessRequest(db.Model):
     """Access requests for users wanting to join an existing tenant."""
 
@@ -2158,8 +2282,16 @@ class AIApiKey(db.Model):
         return scope in (self.scopes or [])
 
     def update_last_used(self):
-        """Update the last_used_at timestamp."""
-        self.last_used_at = datetime.now(timezone.utc)
+        """Update the last_used_at timestamp.
+
+        The first use is recorded right away; after that uses are batched
+        into one write a minute (see api_key_cache.py).
+        """
+        if self.last_used_at is None:
+            self.last_used_at = datetime.now(timezone.utc)
+            return
+        from api_key_cache import api_key_activity
+        api_key_activity.touch(self.id)
 
     def revoke(self):
         """Revoke this API key."""
@@ -2226,6 +2358,10 @@ class AIInteractionLog(db.Model):
     tokens_input = db.Column(db.Integer, nullable=True)
     tokens_output = db.Column(db.Integer, nullable=True)
 
+    # LLM response cache (llm_cache.py): answered from cache, and the tokens that call would have cost
+    cache_hit = db.Column(db.Boolean, default=False)
+    tokens_saved = db.Column(db.Integer, nullable=True)
+
     # Performance
     duration_ms = db.Column(db.Integer, nullable=True)  # Request duration in milliseconds
 
@@ -2243,7 +2379,7 @@ class AIInteractionLog(db.Model):
 
     # Indexes for analytics queries
     __table_args__ = (
-        db.Index('idx_ai_log_tenant_created', 'tenant_id', 'created_at'),
+        db.Index('idx_ai_log_tenant_created', 'tenant_id', 'created_at', 'id'),  # Keyset paging (ai_logs.py)
         db.Index('idx_ai_log_user_created', 'user_id', 'created_at'),
         db.Index('idx_ai_log_channel', 'channel'),
         db.Index('idx_ai_log_action', 'action'),
@@ -2265,9 +2401,78 @@ class AIInteractionLog(db.Model):
             'llm_model': self.llm_model,
             'tokens_input': self.tokens_input,
             'tokens_output': self.tokens_output,
+            'cache_hit': bool(self.cache_hit),
+            'tokens_saved': self.tokens_saved,
             'duration_ms': self.duration_ms,
             'success': self.success,
             'error_message': self.error_message,
             'created_at': self.created_at.isoformat() if self.created_at else None,
         }
+
+
+class AIJob(db.Model):
+    """
+    A background AI operation (see ai_jobs.py).
+
+    Submitting returns the job id straight away; the LLM call runs on the AI
+    job pool and clients poll the row or stream its progress. Token usage is
+    kept here and copied to the AIInteractionLog row written on completion.
+    """
+    __tablename__ = 'ai_jobs'
+
+    # Status constants
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+
+    ACTIVE_STATUSES = [STATUS_QUEUED, STATUS_RUNNING]
+
+    id = db.Column(db.String(40), primary_key=True)  # 'job_' + uuid4 hex
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    api_key_id = db.Column(db.Integer, db.ForeignKey('ai_api_keys.id'), nullable=True)
+    channel = db.Column(db.Enum(AIChannel), nullable=False)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_QUEUED)
+    params = db.Column(db.JSON, nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    error_message = db.Column(db.String(500), nullable=True)
+
+    # LLM usage
+    llm_provider = db.Column(db.String(50), nullable=True)
+    llm_model = db.Column(db.String(100), nullable=True)
+    tokens_input = db.Column(db.Integer, nullable=True)
+    tokens_output = db.Column(db.Integer, nullable=True)
+    interaction_log_id = db.Column(db.Integer, db.ForeignKey('ai_interaction_logs.id'), nullable=True)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_ms = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.Index('idx_ai_job_tenant_created', 'tenant_id', 'created_at'),
+        db.Index('idx_ai_job_status', 'status'),
+    )
+
+    def to_dict(self):
+        """Serialize to dictionary."""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'channel': self.channel.value if self.channel else None,
+            'result': self.result,
+            'error_message': self.error_message,
+            'llm_provider': self.llm_provider,
+            'llm_model': self.llm_model,
+            'tokens_input': self.tokens_input,
+            'tokens_output': self.tokens_output,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_ms': self.duration_ms,
+        }
 # EE:END - AI/LLM Integration Models
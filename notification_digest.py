@@ -0,0 +1,211 @@
+"""
+Scheduled delivery of notification digests.
+
+Subscribers on hourly or daily delivery get their decision notifications
+buffered as NotificationEvent rows (see notifications.buffer_notification_events).
+This job groups the pending events per recipient and tenant, renders one digest
+per recipient and sends each tenant's digests over a single SMTP connection, so
+SMTP volume scales with recipients rather than edits.
+
+Run it hourly from cron, via POST /api/admin/send-notification-digests or:
+
+    python notification_digest.py
+"""
+import json
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from models import db, User, Subscription, NotificationEvent, EmailConfig
+from notification_templates import render_notification
+from notifications import send_emails
+
+logger = logging.getLogger(__name__)
+
+DIGEST_INTERVALS = {
+    Subscription.DELIVERY_HOURLY: timedelta(hours=1),
+    Subscription.DELIVERY_DAILY: timedelta(days=1),
+}
+
+# The job is expected to run hourly. The grace period keeps a digest sent at
+# 09:00:40 from making the recipient wait until 11:00 because the 10:00:05 run
+# was a few seconds short of a full interval.
+DIGEST_GRACE = timedelta(minutes=5)
+
+DEFAULT_BATCH_SIZE = 200
+
+_SUMMARY_LABELS = OrderedDict([
+    (NotificationEvent.EVENT_CREATED, 'Created'),
+    (NotificationEvent.EVENT_IMPORTED, 'Imported'),
+    (NotificationEvent.EVENT_STATUS_CHANGED, 'Status changed'),
+    (NotificationEvent.EVENT_UPDATED, 'Updated'),
+])
+
+
+def _due_filter(now):
+    """Subscriptions whose digest is due: interval elapsed, or switched back to immediate."""
+    conditions = [Subscription.delivery_mode.notin_(Subscription.DIGEST_MODES)]
+    for mode, interval in DIGEST_INTERVALS.items():
+        conditions.append(db.and_(
+            Subscription.delivery_mode == mode,
+            db.or_(Subscription.last_digest_at.is_(None),
+                   Subscription.last_digest_at <= now - interval + DIGEST_GRACE),
+        ))
+    return db.or_(*conditions)
+
+
+def _due_recipients(now, after_user_id, limit):
+    """(user_id, email, delivery_mode) for due recipients with pending events, in id order."""
+    pending = db.exists().where(NotificationEvent.user_id == User.id)
+    return db.session.query(User.id, User.email, Subscription.delivery_mode).join(Subscription).filter(
+        pending,
+        User.id > after_user_id,
+        _due_filter(now),
+    ).order_by(User.id).limit(limit).all()
+
+
+def build_digest_entries(events):
+    """
+    Collapse events into one entry per decision, most recently changed first.
+
+    Bulk import events have no decision and stay as separate entries.
+    """
+    entries = OrderedDict()
+    for event in events:
+        key = ('decision', event.decision_id) if event.decision_id else ('event', event.id)
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = {
+                'decision_id': event.decision_id,
+                'counts': {},
+                'actors': [],
+                'change_reasons': [],
+            }
+        # Events arrive in id order, so the last one wins for title and status
+        entry['title'] = event.title
+        entry['status'] = event.status
+        entry['last_id'] = event.id
+        entry['counts'][event.event_type] = entry['counts'].get(event.event_type, 0) + 1
+        if event.actor_name and event.actor_name not in entry['actors']:
+            entry['actors'].append(event.actor_name)
+        if event.change_reason and event.change_reason not in entry['change_reasons']:
+            entry['change_reasons'].append(event.change_reason)
+
+    result = []
+    for entry in sorted(entries.values(), key=lambda e: e['last_id'], reverse=True):
+        parts = []
+        for event_type, label in _SUMMARY_LABELS.items():
+            count = entry['counts'].get(event_type)
+            if count:
+                parts.append(label if count == 1 else f'{label} {count} times')
+        entry['summary'] = ', '.join(parts)
+        result.append(entry)
+    return result
+
+
+def _email_config_for(domain, cache):
+    if domain not in cache:
+        config = EmailConfig.query.filter_by(domain=domain, enabled=True).first()
+        if not config:
+            config = EmailConfig.query.filter_by(domain='system', enabled=True).first()
+        cache[domain] = config
+    return cache[domain]
+
+
+def _send_batch(recipients, now, config_cache, stats):
+    """Render and send digests for one batch of recipients. Commits."""
+    by_user = {user_id: (email, mode) for user_id, email, mode in recipients}
+    events = NotificationEvent.query.filter(
+        NotificationEvent.user_id.in_(list(by_user))
+    ).order_by(NotificationEvent.user_id, NotificationEvent.id).all()
+
+    # (domain -> user_id -> events)
+    grouped = OrderedDict()
+    for event in events:
+        grouped.setdefault(event.domain, OrderedDict()).setdefault(event.user_id, []).append(event)
+
+    sent_event_ids = []
+    sent_user_ids = set()
+    for domain, user_events in grouped.items():
+        email_config = _email_config_for(domain, config_cache)
+        if not email_config:
+            logger.warning(f"No email configuration for {domain}; keeping {len(user_events)} digests queued")
+            stats['skipped'] += len(user_events)
+            continue
+
+        messages = []
+        for user_id, pending in user_events.items():
+            email, mode = by_user[user_id]
+            entries = build_digest_entries(pending)
+            period = mode if mode in Subscription.DIGEST_MODES else 'notification'
+            html_content, text_content = render_notification(
+                'digest', entries=entries, period=period,
+                subscription_reason='decision notification digests',
+            )
+            noun = 'decision' if len(entries) == 1 else 'decisions'
+            messages.append((email, f"[ADR] Digest: {len(entries)} {noun} changed", html_content, text_content))
+
+        delivered = set(send_emails(email_config, messages))
+        for user_id, pending in user_events.items():
+            if by_user[user_id][0] in delivered:
+                sent_user_ids.add(user_id)
+                sent_event_ids.extend(event.id for event in pending)
+            else:
+                stats['failed'] += 1
+
+    if sent_event_ids:
+        NotificationEvent.query.filter(NotificationEvent.id.in_(sent_event_ids)).delete(synchronize_session=False)
+        Subscription.query.filter(Subscription.user_id.in_(sent_user_ids)).update(
+            {'last_digest_at': now}, synchronize_session=False
+        )
+    db.session.commit()
+
+    stats['emails_sent'] += len(sent_user_ids)
+    stats['events_delivered'] += len(sent_event_ids)
+
+
+def send_due_digests(now=None, batch_size=None):
+    """
+    Send every due digest.
+
+    Recipients are processed in batches of batch_size (NOTIFICATION_DIGEST_BATCH_SIZE,
+    default 200) and each batch is committed on its own. Events whose email could
+    not be sent stay queued for the next run. Returns a stats dict.
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    batch_size = batch_size or int(os.environ.get('NOTIFICATION_DIGEST_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+
+    stats = {'recipients': 0, 'emails_sent': 0, 'events_delivered': 0, 'failed': 0, 'skipped': 0}
+    config_cache = {}
+    after_user_id = 0
+    while True:
+        recipients = _due_recipients(now, after_user_id, batch_size)
+        if not recipients:
+            break
+        stats['recipients'] += len(recipients)
+        _send_batch(recipients, now, config_cache, stats)
+        after_user_id = recipients[-1][0]
+
+    logger.info(f"Notification digests: {stats}")
+    return stats
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Send due notification digests.')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help=f'Recipients per batch (default: NOTIFICATION_DIGEST_BATCH_SIZE or {DEFAULT_BATCH_SIZE})')
+    args = parser.parse_args(argv)
+
+    from app import app
+
+    with app.app_context():
+        stats = send_due_digests(batch_size=args.batch_size)
+        print(json.dumps(stats, indent=2))
+        return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
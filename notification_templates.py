@@ -0,0 +1,40 @@
+"""
+Precompiled Jinja templates for subscriber notification emails.
+
+Templates live in templates/email/ as <name>.html and <name>.txt pairs and are
+compiled once at import. HTML bodies are autoescaped; text bodies are not.
+Bodies are rendered once per event and the same strings are sent to every
+recipient (see notifications.send_email_batch).
+"""
+import os
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'email')
+
+NOTIFICATION_TEMPLATES = ('new_decision', 'decision_updated', 'bulk_import', 'bulk_update', 'digest')
+
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(enabled_extensions=('html',), default_for_string=False),
+    undefined=StrictUndefined,
+    trim_blocks=True,
+    lstrip_blocks=True,
+    auto_reload=False,
+)
+
+_templates = {
+    (name, kind): _env.get_template(f'{name}.{kind}')
+    for name in NOTIFICATION_TEMPLATES
+    for kind in ('html', 'txt')
+}
+
+
+def render_notification(name, **context):
+    """Render a notification template pair. Returns (html_content, text_content)."""
+    try:
+        html_template = _templates[(name, 'html')]
+        text_template = _templates[(name, 'txt')]
+    except KeyError:
+        raise ValueError(f'Unknown notification template: {name}') from None
+    return html_template.render(**context), text_template.render(**context)
@@ -2,10 +2,64 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import logging
+from datetime import datetime, timezone
+
+from notification_templates import render_notification
 
 logger = logging.getLogger(__name__)
 
 
+def _smtp_credentials(email_config):
+    """Resolve SMTP credentials for a config. Returns (username, password) or (None, None)."""
+    from crypto import decrypt_password
+
+    smtp_username = email_config.smtp_username
+    smtp_password = email_config.smtp_password
+
+    # If config uses Key Vault placeholders, fetch from Key Vault
+    if smtp_username == 'from-keyvault' or smtp_password == 'from-keyvault':
+        from ee.backend.azure.keyvault_client import keyvault_client
+        kv_username, kv_password = keyvault_client.get_smtp_credentials()
+
+        if not kv_username or not kv_password:
+            logger.error("SMTP credentials not available in Key Vault")
+            return None, None
+
+        logger.info("Using SMTP credentials from Key Vault")
+        return kv_username, kv_password
+
+    # Decrypt the password if it's encrypted (tenant email configs)
+    decrypted_password = decrypt_password(smtp_password)
+    if decrypted_password is None:
+        logger.error("Failed to decrypt SMTP password")
+        return None, None
+    return smtp_username, decrypted_password
+
+
+def _build_message(email_config, subject, html_content, text_content=None):
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = f"{email_config.from_name} <{email_config.from_email}>"
+
+    # Add plain text version if provided
+    if text_content:
+        msg.attach(MIMEText(text_content, 'plain'))
+
+    # Add HTML version
+    msg.attach(MIMEText(html_content, 'html'))
+    return msg
+
+
+def _connect(email_config, smtp_username, smtp_password):
+    if email_config.use_tls:
+        server = smtplib.SMTP(email_config.smtp_server, email_config.smtp_port)
+        server.starttls()
+    else:
+        server = smtplib.SMTP_SSL(email_config.smtp_server, email_config.smtp_port)
+    server.login(smtp_username, smtp_password)
+    return server
+
+
 def send_email(email_config, to_email, subject, html_content, text_content=None):
     """Send an email using the provided SMTP configuration.
 
@@ -18,52 +72,14 @@ def send_email(email_config, to_email, subject, html_content, text_content=None)
         return False
 
     try:
-        from crypto import decrypt_password
-
-        # Determine actual credentials to use
-        smtp_username = email_config.smtp_username
-        smtp_password = email_config.smtp_password
-
-        # If config uses Key Vault placeholders, fetch from Key Vault
-        if smtp_username == 'from-keyvault' or smtp_password == 'from-keyvault':
-            from ee.backend.azure.keyvault_client import keyvault_client
-            kv_username, kv_password = keyvault_client.get_smtp_credentials()
+        smtp_username, smtp_password = _smtp_credentials(email_config)
+        if smtp_password is None:
+            return False
 
-            if not kv_username or not kv_password:
-                logger.error("SMTP credentials not available in Key Vault")
-                return False
-
-            smtp_username = kv_username
-            smtp_password = kv_password
-            logger.info("Using SMTP credentials from Key Vault")
-        else:
-            # Decrypt the password if it's encrypted (tenant email configs)
-            decrypted_password = decrypt_password(smtp_password)
-            if decrypted_password is None:
-                logger.error("Failed to decrypt SMTP password")
-                return False
-            smtp_password = decrypted_password
-
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = f"{email_config.from_name} <{email_config.from_email}>"
+        msg = _build_message(email_config, subject, html_content, text_content)
         msg['To'] = to_email
 
-        # Add plain text version if provided
-        if text_content:
-            msg.attach(MIMEText(text_content, 'plain'))
-
-        # Add HTML version
-        msg.attach(MIMEText(html_content, 'html'))
-
-        # Connect and send
-        if email_config.use_tls:
-            server = smtplib.SMTP(email_config.smtp_server, email_config.smtp_port)
-            server.starttls()
-        else:
-            server = smtplib.SMTP_SSL(email_config.smtp_server, email_config.smtp_port)
-
-        server.login(smtp_username, smtp_password)
+        server = _connect(email_config, smtp_username, smtp_password)
         server.sendmail(email_config.from_email, to_email, msg.as_string())
         server.quit()
 
@@ -75,146 +91,297 @@ def send_email(email_config, to_email, subject, html_content, text_content=None)
         return False
 
 
-def notify_subscribers_new_decision(db, decision, email_config):
-    """Notify subscribers about a new architecture decision."""
-    from models import User, Subscription
+def send_email_batch(email_config, recipients, subject, html_content, text_content=None):
+    """Send one pre-rendered message to many recipients over a single SMTP connection.
 
+    The MIME message is built once; only the To header changes per recipient.
+    A refused recipient is logged and skipped. Returns the number of emails sent.
+    """
+    recipients = list(dict.fromkeys(recipients))  # De-duplicate, keep order
+    if not recipients:
+        return 0
     if not email_config or not email_config.enabled:
-        return
+        logger.warning("Email not sent: Email configuration is missing or disabled")
+        return 0
+
+    sent = 0
+    try:
+        smtp_username, smtp_password = _smtp_credentials(email_config)
+        if smtp_password is None:
+            return 0
+
+        msg = _build_message(email_config, subject, html_content, text_content)
+        server = _connect(email_config, smtp_username, smtp_password)
+        try:
+            for to_email in recipients:
+                del msg['To']
+                msg['To'] = to_email
+                try:
+                    server.sendmail(email_config.from_email, to_email, msg.as_string())
+                    sent += 1
+                except smtplib.SMTPRecipientsRefused as e:
+                    logger.error(f"Failed to send email to {to_email}: {str(e)}")
+        finally:
+            server.quit()
+
+    except Exception as e:
+        logger.error(f"Batch email failed after {sent} of {len(recipients)} recipients: {str(e)}")
+
+    logger.info(f"Batch email sent to {sent} of {len(recipients)} recipients")
+    return sent
+
+
+def send_emails(email_config, messages):
+    """Send individually rendered messages over a single SMTP connection.
+
+    messages is an iterable of (to_email, subject, html_content, text_content).
+    A refused recipient is logged and skipped. Returns the list of recipients
+    that were sent to.
+    """
+    messages = list(messages)
+    if not messages:
+        return []
+    if not email_config or not email_config.enabled:
+        logger.warning("Email not sent: Email configuration is missing or disabled")
+        return []
+
+    sent = []
+    try:
+        smtp_username, smtp_password = _smtp_credentials(email_config)
+        if smtp_password is None:
+            return []
+
+        server = _connect(email_config, smtp_username, smtp_password)
+        try:
+            for to_email, subject, html_content, text_content in messages:
+                msg = _build_message(email_config, subject, html_content, text_content)
+                msg['To'] = to_email
+                try:
+                    server.sendmail(email_config.from_email, to_email, msg.as_string())
+                    sent.append(to_email)
+                except smtplib.SMTPRecipientsRefused as e:
+                    logger.error(f"Failed to send email to {to_email}: {str(e)}")
+        finally:
+            server.quit()
+
+    except Exception as e:
+        logger.error(f"Email batch failed after {len(sent)} of {len(messages)} messages: {str(e)}")
 
-    # Get all subscribers in the same domain who want to be notified on create
-    subscribers = db.session.query(User).join(Subscription).filter(
-        User.sso_domain == decision.domain,
-        Subscription.notify_on_create == True
+    return sent
+
+
+def _user_name(user):
+    return user.name if user and user.name else 'Unknown'
+
+
+# ==================== Subscriber Fan-out ====================
+
+def _subscribers(db, domain, wants):
+    """(id, email, delivery_mode) rows for subscribers in a domain matching a filter."""
+    from models import User, Subscription
+
+    return db.session.query(User.id, User.email, Subscription.delivery_mode).join(Subscription).filter(
+        User.sso_domain == domain, wants
     ).all()
 
-    subject = f"[ADR] New Architecture Decision: {decision.title}"
 
-    for subscriber in subscribers:
-        # Don't notify the creator
-        if decision.created_by_id and subscriber.id == decision.created_by_id:
+def _create_subscribers(db, domain):
+    from models import Subscription
+
+    return _subscribers(db, domain, Subscription.notify_on_create == True)
+
+
+def _update_subscribers(db, domain, status_changed):
+    """Subscribers who want update (or status change) notifications."""
+    from models import Subscription
+
+    if status_changed:
+        wants = (Subscription.notify_on_update == True) | (Subscription.notify_on_status_change == True)
+    else:
+        wants = Subscription.notify_on_update == True
+    return _subscribers(db, domain, wants)
+
+
+def _split_by_delivery(subscribers, exclude_user_id=None):
+    """Split subscriber rows into immediate recipient emails and digest user ids."""
+    from models import Subscription
+
+    immediate, digest = [], []
+    for user_id, email, delivery_mode in subscribers:
+        if exclude_user_id is not None and user_id == exclude_user_id:
             continue
+        if delivery_mode in Subscription.DIGEST_MODES:
+            digest.append(user_id)
+        else:
+            immediate.append(email)
+    return immediate, digest
 
-        html_content = f"""
-        <html>
-        <body>
-            <h2>New Architecture Decision Created</h2>
-            <p><strong>ADR-{decision.id}: {decision.title}</strong></p>
-            <p><strong>Status:</strong> {decision.status.capitalize()}</p>
-            <p><strong>Created by:</strong> {decision.creator.name if decision.creator else 'Unknown'}</p>
 
-            <h3>Context</h3>
-            <p>{decision.context}</p>
+def _decision_event(decision, event_type, actor_name, change_reason=None):
+    return {
+        'decision_id': decision.id,
+        'event_type': event_type,
+        'title': decision.title,
+        'status': decision.status,
+        'actor_name': actor_name,
+        'change_reason': change_reason,
+    }
 
-            <h3>Decision</h3>
-            <p>{decision.decision}</p>
 
-            <h3>Consequences</h3>
-            <p>{decision.consequences}</p>
+def buffer_notification_events(db, user_ids, domain, events):
+    """Queue events for digest subscribers, one row per recipient per event.
 
-            <hr>
-            <p><small>You are receiving this because you subscribed to new decision notifications.</small></p>
-        </body>
-        </html>
-        """
+    events are dicts of NotificationEvent fields (decision_id, event_type,
+    title, status, actor_name, change_reason). Commits. Returns rows written.
+    """
+    from models import NotificationEvent
 
-        text_content = f"""
-New Architecture Decision Created
+    if not user_ids or not events:
+        return 0
 
-ADR-{decision.id}: {decision.title}
-Status: {decision.status.capitalize()}
-Created by: {decision.creator.name if decision.creator else 'Unknown'}
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = [dict(event, user_id=user_id, domain=domain, created_at=now)
+            for user_id in user_ids for event in events]
+    db.session.execute(db.insert(NotificationEvent), rows)
+    db.session.commit()
+    return len(rows)
 
-Context:
-{decision.context}
 
-Decision:
-{decision.decision}
+def notify_subscribers_new_decision(db, decision, email_config):
+    """Notify subscribers about a new architecture decision."""
+    from models import NotificationEvent
+
+    if not email_config or not email_config.enabled:
+        return
 
-Consequences:
-{decision.consequences}
+    # Don't notify the creator
+    recipients, digest_user_ids = _split_by_delivery(
+        _create_subscribers(db, decision.domain), decision.created_by_id
+    )
+    if not recipients and not digest_user_ids:
+        return
 
----
-You are receiving this because you subscribed to new decision notifications.
-        """
+    actor_name = _user_name(decision.creator)
+    buffer_notification_events(db, digest_user_ids, decision.domain, [
+        _decision_event(decision, NotificationEvent.EVENT_CREATED, actor_name)
+    ])
+    if not recipients:
+        return
 
-        send_email(email_config, subscriber.email, subject, html_content, text_content)
+    subject = f"[ADR] New Architecture Decision: {decision.title}"
+    html_content, text_content = render_notification(
+        'new_decision',
+        decision=decision,
+        actor_name=actor_name,
+        subscription_reason='new decision notifications',
+    )
+    send_email_batch(email_config, recipients, subject, html_content, text_content)
 
 
 def notify_subscribers_decision_updated(db, decision, email_config, change_reason=None, status_changed=False):
     """Notify subscribers about an updated architecture decision."""
-    from models import User, Subscription
+    from models import NotificationEvent
 
     if not email_config or not email_config.enabled:
         return
 
-    # Build filter based on notification type
-    if status_changed:
-        subscribers = db.session.query(User).join(Subscription).filter(
-            User.sso_domain == decision.domain,
-            (Subscription.notify_on_update == True) | (Subscription.notify_on_status_change == True)
-        ).all()
-    else:
-        subscribers = db.session.query(User).join(Subscription).filter(
-            User.sso_domain == decision.domain,
-            Subscription.notify_on_update == True
-        ).all()
+    # Don't notify the person who made the update
+    recipients, digest_user_ids = _split_by_delivery(
+        _update_subscribers(db, decision.domain, status_changed), decision.updated_by_id
+    )
+    if not recipients and not digest_user_ids:
+        return
+
+    actor_name = _user_name(decision.updated_by)
+    event_type = NotificationEvent.EVENT_STATUS_CHANGED if status_changed else NotificationEvent.EVENT_UPDATED
+    buffer_notification_events(db, digest_user_ids, decision.domain, [
+        _decision_event(decision, event_type, actor_name, change_reason)
+    ])
+    if not recipients:
+        return
 
     subject = f"[ADR] Updated: {decision.title}"
     if status_changed:
         subject = f"[ADR] Status Changed: {decision.title} - Now {decision.status.capitalize()}"
 
-    for subscriber in subscribers:
-        # Don't notify the person who made the update
-        if decision.updated_by_id and subscriber.id == decision.updated_by_id:
-            continue
+    html_content, text_content = render_notification(
+        'decision_updated',
+        decision=decision,
+        actor_name=actor_name,
+        change_reason=change_reason,
+        subscription_reason='decision update notifications',
+    )
+    send_email_batch(email_config, recipients, subject, html_content, text_content)
 
-        html_content = f"""
-        <html>
-        <body>
-            <h2>Architecture Decision Updated</h2>
-            <p><strong>ADR-{decision.id}: {decision.title}</strong></p>
-            <p><strong>Status:</strong> {decision.status.capitalize()}</p>
-            <p><strong>Updated by:</strong> {decision.updated_by.name if decision.updated_by else 'Unknown'}</p>
-            {f'<p><strong>Change reason:</strong> {change_reason}</p>' if change_reason else ''}
 
-            <h3>Context</h3>
-            <p>{decision.context}</p>
+def notify_subscribers_bulk_import(db, domain, imported_count, imported_by, email_config, sample_titles=None):
+    """Send one summary email to create-subscribers after a bulk decision import."""
+    from models import NotificationEvent
 
-            <h3>Decision</h3>
-            <p>{decision.decision}</p>
+    if not email_config or not email_config.enabled or not imported_count:
+        return
 
-            <h3>Consequences</h3>
-            <p>{decision.consequences}</p>
+    # Don't notify the importer
+    recipients, digest_user_ids = _split_by_delivery(
+        _create_subscribers(db, domain), imported_by.id if imported_by else None
+    )
+    if not recipients and not digest_user_ids:
+        return
 
-            <hr>
-            <p><small>You are receiving this because you subscribed to decision update notifications.</small></p>
-        </body>
-        </html>
-        """
+    actor_name = _user_name(imported_by)
+    buffer_notification_events(db, digest_user_ids, domain, [{
+        'decision_id': None,
+        'event_type': NotificationEvent.EVENT_IMPORTED,
+        'title': f"{imported_count} decisions imported",
+        'status': None,
+        'actor_name': actor_name,
+        'change_reason': None,
+    }])
+    if not recipients:
+        return
 
-        text_content = f"""
-Architecture Decision Updated
+    sample_titles = sample_titles or []
+    subject = f"[ADR] {imported_count} architecture decisions imported"
+    html_content, text_content = render_notification(
+        'bulk_import',
+        imported_count=imported_count,
+        actor_name=actor_name,
+        sample_titles=sample_titles,
+        more=imported_count - len(sample_titles),
+        subscription_reason='new decision notifications',
+    )
+    send_email_batch(email_config, recipients, subject, html_content, text_content)
 
-ADR-{decision.id}: {decision.title}
-Status: {decision.status.capitalize()}
-Updated by: {decision.updated_by.name if decision.updated_by else 'Unknown'}
-{f'Change reason: {change_reason}' if change_reason else ''}
 
-Context:
-{decision.context}
+def notify_subscribers_bulk_update(db, domain, decisions, email_config, updated_by=None, change_reason=None, status_changed=False):
+    """Send one digest email per subscriber for decisions changed by a bulk update."""
+    from models import NotificationEvent
 
-Decision:
-{decision.decision}
+    if not email_config or not email_config.enabled or not decisions:
+        return
 
-Consequences:
-{decision.consequences}
+    # Same audience rules as notify_subscribers_decision_updated
+    recipients, digest_user_ids = _split_by_delivery(_update_subscribers(db, domain, status_changed))
+    if not recipients and not digest_user_ids:
+        return
 
----
-You are receiving this because you subscribed to decision update notifications.
-        """
+    actor_name = _user_name(updated_by)
+    event_type = NotificationEvent.EVENT_STATUS_CHANGED if status_changed else NotificationEvent.EVENT_UPDATED
+    buffer_notification_events(db, digest_user_ids, domain, [
+        _decision_event(decision, event_type, actor_name, change_reason) for decision in decisions
+    ])
+    if not recipients:
+        return
 
-        send_email(email_config, subscriber.email, subject, html_content, text_content)
+    subject = f"[ADR] {len(decisions)} architecture decisions updated"
+    html_content, text_content = render_notification(
+        'bulk_update',
+        decisions=decisions,
+        actor_name=actor_name,
+        change_reason=change_reason,
+        subscription_reason='decision update notifications',
+    )
+    send_email_batch(email_config, recipients, subject, html_content, text_content)
 
 
 def notify_decision_owner(email_config, decision, owner_email, owner_name=None, base_url=None):
@@ -0,0 +1,193 @@
+"""
+Process-wide cache for OpenID Connect provider metadata.
+
+Discovery documents and JWKS are cached per URL so SSO logins and callbacks do
+not block on the identity provider:
+
+- Freshness follows the response's Cache-Control max-age (or Expires), clamped
+  to [MIN_TTL, MAX_TTL]; responses without caching headers live DEFAULT_TTL.
+- Within the last REFRESH_AHEAD fraction of an entry's lifetime it is served
+  as-is while one background thread refreshes it.
+- Once expired, one caller refetches while concurrent callers for the same URL
+  wait for that result instead of issuing their own request.
+- If a refetch fails, the previous document is served (up to STALE_TTL past
+  expiry) and the next attempt is delayed by FAILURE_BACKOFF.
+"""
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 3600
+MIN_TTL = 60
+MAX_TTL = 86400
+REFRESH_AHEAD = 0.2
+STALE_TTL = 86400
+FAILURE_BACKOFF = 30
+FETCH_TIMEOUT = 5
+
+
+def parse_cache_ttl(headers, default=DEFAULT_TTL, min_ttl=MIN_TTL, max_ttl=MAX_TTL):
+    """Derive a TTL in seconds from Cache-Control / Age / Expires response headers."""
+    ttl = None
+    cache_control = headers.get('Cache-Control', '')
+    directives = {}
+    for part in cache_control.split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip().strip('"')
+
+    if 'no-store' in directives or 'no-cache' in directives:
+        ttl = 0
+    elif 'max-age' in directives:
+        try:
+            ttl = int(directives['max-age'])
+        except ValueError:
+            ttl = None
+        if ttl is not None:
+            try:
+                ttl -= int(headers.get('Age', 0))
+            except ValueError:
+                pass
+    elif headers.get('Expires'):
+        try:
+            expires = parsedate_to_datetime(headers['Expires'])
+            date = parsedate_to_datetime(headers['Date']) if headers.get('Date') else None
+            ttl = int(expires.timestamp() - (date.timestamp() if date else time.time()))
+        except (TypeError, ValueError):
+            ttl = 0  # An invalid Expires means already expired
+
+    if ttl is None:
+        ttl = default
+    return max(min_ttl, min(ttl, max_ttl))
+
+
+def _http_fetch(url, timeout):
+    """Fetch a JSON document. Returns (document, headers)."""
+    from http_client import http_client
+
+    response = http_client.get(url, timeout=timeout, headers={'Accept': 'application/json'})
+    response.raise_for_status()
+    document = response.json()
+    if not isinstance(document, dict):
+        raise ValueError('Metadata document is not a JSON object')
+    return document, response.headers
+
+
+class _Entry:
+    __slots__ = ('document', 'fetched_at', 'expires_at', 'retry_at', 'refreshing', 'lock')
+
+    def __init__(self):
+        self.document = None
+        self.fetched_at = 0.0
+        self.expires_at = 0.0
+        self.retry_at = 0.0
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+
+class MetadataCache:
+    """Thread-safe cache of JSON metadata documents keyed by URL."""
+
+    def __init__(self, fetch=None, timeout=FETCH_TIMEOUT, clock=time.monotonic):
+        self._fetch = fetch or _http_fetch
+        self._timeout = timeout
+        self._clock = clock
+        self._entries = {}
+        self._entries_lock = threading.Lock()
+
+    def _entry(self, url):
+        with self._entries_lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                entry = self._entries[url] = _Entry()
+            return entry
+
+    def _refresh(self, url, entry):
+        """Fetch url into entry. Caller holds entry.lock. Returns True on success."""
+        try:
+            document, headers = self._fetch(url, self._timeout)
+        except Exception as e:
+            now = self._clock()
+            entry.retry_at = now + FAILURE_BACKOFF
+            if entry.document is not None:
+                logger.warning(f"Failed to refresh OIDC metadata from {url}, serving cached copy: {e}")
+            else:
+                logger.error(f"Failed to fetch OIDC metadata from {url}: {e}")
+            return False
+
+        now = self._clock()
+        entry.document = document
+        entry.fetched_at = now
+        entry.expires_at = now + parse_cache_ttl(headers)
+        entry.retry_at = 0.0
+        return True
+
+    def _refresh_in_background(self, url, entry):
+        with entry.lock:
+            if entry.refreshing:
+                return
+            entry.refreshing = True
+
+        def run():
+            try:
+                with entry.lock:
+                    self._refresh(url, entry)
+            finally:
+                entry.refreshing = False
+
+        threading.Thread(target=run, name='oidc-metadata-refresh', daemon=True).start()
+
+    def _stale_usable(self, entry, now):
+        return entry.document is not None and now < entry.expires_at + STALE_TTL
+
+    def get(self, url):
+        """Return the cached document for url, fetching it if needed. None if unavailable."""
+        entry = self._entry(url)
+        now = self._clock()
+
+        if now < entry.expires_at:
+            lifetime = entry.expires_at - entry.fetched_at
+            if now >= entry.expires_at - lifetime * REFRESH_AHEAD and now >= entry.retry_at:
+                self._refresh_in_background(url, entry)
+            return entry.document
+
+        if now < entry.retry_at:
+            # Recent failure: do not hammer the provider
+            return entry.document if self._stale_usable(entry, now) else None
+
+        with entry.lock:
+            # Another caller may have refreshed while we waited for the lock
+            now = self._clock()
+            if now < entry.expires_at:
+                return entry.document
+            if now >= entry.retry_at and self._refresh(url, entry):
+                return entry.document
+            return entry.document if self._stale_usable(entry, self._clock()) else None
+
+    def invalidate(self, url=None):
+        """Drop one cached URL, or everything."""
+        with self._entries_lock:
+            if url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(url, None)
+
+
+metadata_cache = MetadataCache()
+
+
+def get_discovery_document(discovery_url):
+    """Return the provider's OpenID configuration, or None if it cannot be fetched."""
+    return metadata_cache.get(discovery_url)
+
+
+def get_jwks(discovery_url):
+    """Return the provider's JSON Web Key Set (via jwks_uri), or None."""
+    discovery = get_discovery_document(discovery_url)
+    jwks_uri = discovery.get('jwks_uri') if discovery else None
+    if not jwks_uri:
+        return None
+    return metadata_cache.get(jwks_uri)
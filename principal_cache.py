@@ -0,0 +1,260 @@
+"""
+Server-side cache of signed-in users' principals.
+
+The cookie session only carries user_id, so login_required used to load the
+User and its webauthn_credentials on every request just to decide whether the
+user may proceed. The principal cache keeps the answer, a compact record per
+user:
+
+    user_id, domain, auth_type, has_credentials, tenant_id, role
+
+login_required authorizes from the cached principal without any SQL and only
+loads the User (g.current_user) if the view actually uses it. Views that only
+need the user id, domain, tenant or role can read g.principal instead.
+
+Principals live in Redis when PRINCIPAL_CACHE_URL or REDIS_URL points at one,
+so every worker shares them and an invalidation reaches all of them. Otherwise
+each process keeps its own dict with a short TTL, since another worker's
+invalidation cannot reach it.
+
+Entries are invalidated after any commit that adds, changes or deletes a User,
+WebAuthnCredential or TenantMembership (credentials, roles, domain changes and
+anonymization all go through those). Bulk query deletes bypass the ORM and must
+call principal_cache.invalidate() themselves.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+from flask.ctx import _AppCtxGlobals
+
+from env_config import env_number
+from redis_support import RedisError, connect, redis_url
+from session_hooks import PendingChanges
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'dr:principal:'
+DEFAULT_REDIS_TTL = 300
+DEFAULT_LOCAL_TTL = 15
+LOCAL_MAX_ENTRIES = 10000
+
+SSO_AUTH_TYPES = ('sso', 'teams')
+
+Principal = namedtuple('Principal', 'user_id domain auth_type has_credentials tenant_id role')
+
+
+def principal_for(user):
+    """Build the principal of a User (reads its credentials and membership)."""
+    from models import Tenant, TenantMembership
+
+    has_passkey = len(user.webauthn_credentials) > 0 if user.webauthn_credentials else False
+    tenant_id, role = None, None
+    if user.sso_domain:
+        row = (
+            TenantMembership.query
+            .join(Tenant, Tenant.id == TenantMembership.tenant_id)
+            .with_entities(TenantMembership.tenant_id, TenantMembership.global_role)
+            .filter(TenantMembership.user_id == user.id, Tenant.domain == user.sso_domain)
+            .first()
+        )
+        if row:
+            tenant_id, role = row[0], row[1].value if row[1] else None
+    return Principal(
+        user_id=user.id,
+        domain=user.sso_domain,
+        auth_type=user.auth_type,
+        has_credentials=has_passkey or user.has_password(),
+        tenant_id=tenant_id,
+        role=role,
+    )
+
+
+def needs_credential_setup(principal):
+    """True for non-SSO users that have neither a passkey nor a password yet."""
+    return principal.auth_type not in SSO_AUTH_TYPES and not principal.has_credentials
+
+
+class LocalPrincipalStore:
+    """Per-process principals with a TTL."""
+
+    def __init__(self, ttl=DEFAULT_LOCAL_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}  # user_id -> (expires_at, Principal)
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] <= self._clock():
+            self._entries.pop(user_id, None)
+            return None
+        return entry[1]
+
+    def set(self, principal):
+        with self._lock:
+            if len(self._entries) >= LOCAL_MAX_ENTRIES:
+                self._entries.clear()
+            self._entries[principal.user_id] = (self._clock() + self.ttl, principal)
+
+    def delete(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisPrincipalStore:
+    """Principals shared by all workers through Redis."""
+
+    def __init__(self, client, ttl=DEFAULT_REDIS_TTL):
+        self.client = client
+        self.ttl = ttl
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        return cls(connect(url), **kwargs)
+
+    def get(self, user_id):
+        try:
+            raw = self.client.get(f'{KEY_PREFIX}{user_id}')
+        except RedisError as e:
+            logger.warning(f"Principal cache unavailable: {e}")
+            return None
+        if raw is None:
+            return None
+        try:
+            return Principal(**json.loads(raw))
+        except (TypeError, ValueError):
+            return None
+
+    def set(self, principal):
+        try:
+            self.client.set(f'{KEY_PREFIX}{principal.user_id}', json.dumps(principal._asdict()), ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f"Principal cache unavailable: {e}")
+
+    def delete(self, user_ids):
+        try:
+            self.client.delete(*[f'{KEY_PREFIX}{user_id}' for user_id in user_ids])
+        except RedisError as e:
+            # A stale principal lives at most ttl seconds
+            logger.error(f"Could not invalidate cached principals {sorted(user_ids)}: {e}")
+
+    def clear(self):
+        try:
+            for key in self.client.scan_iter(match=f'{KEY_PREFIX}*'):
+                self.client.delete(key)
+        except RedisError as e:
+            logger.error(f"Could not clear cached principals: {e}")
+
+
+def create_store(url=None):
+    """RedisPrincipalStore for a redis:// URL (when the redis package is installed), otherwise local."""
+    url = redis_url(url, 'PRINCIPAL_CACHE_URL', 'Principal cache', 'principals are cached per process')
+    if url:
+        return RedisPrincipalStore.from_url(url, ttl=env_number('PRINCIPAL_CACHE_TTL', DEFAULT_REDIS_TTL))
+    return LocalPrincipalStore(ttl=env_number('PRINCIPAL_CACHE_TTL', DEFAULT_LOCAL_TTL))
+
+
+class PrincipalCache:
+    """Looks up, stores and invalidates principals."""
+
+    def __init__(self, store=None):
+        self._store = store
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = create_store()
+        return self._store
+
+    @store.setter
+    def store(self, store):
+        self._store = store
+
+    def get(self, user_id):
+        return self.store.get(user_id)
+
+    def remember(self, user):
+        """Build, store and return the principal of user."""
+        principal = principal_for(user)
+        self.store.set(principal)
+        return principal
+
+    def invalidate(self, *user_ids):
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        if user_ids:
+            self.store.delete(user_ids)
+
+    def clear(self):
+        self.store.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+# ==================== Lazy g.current_user ====================
+
+class PrincipalGlobals(_AppCtxGlobals):
+    """Flask ``g`` whose current_user can be loaded on first access."""
+
+    @property
+    def current_user(self):
+        try:
+            return self.__dict__['current_user']
+        except KeyError:
+            pass
+        loader = self.__dict__.pop('_current_user_loader', None)
+        if loader is None:
+            raise AttributeError('current_user')
+        user = self.__dict__['current_user'] = loader()
+        return user
+
+    def defer_current_user(self, loader):
+        """Load current_user with loader() only if a view reads it."""
+        self.__dict__.pop('current_user', None)
+        self.__dict__['_current_user_loader'] = loader
+
+
+def init_principal_cache(app):
+    """Enable principal caching for app's login_required (PRINCIPAL_CACHE_ENABLED, default on)."""
+    if os.environ.get('PRINCIPAL_CACHE_ENABLED', 'true').lower() in ('false', '0', 'no'):
+        logger.info("Principal cache disabled")
+        return None
+    app.app_ctx_globals_class = PrincipalGlobals
+    app.extensions['principal_cache'] = principal_cache
+    return principal_cache
+
+
+# ==================== Invalidation ====================
+
+_PENDING_KEY = 'principal_cache_invalidations'
+
+
+def _affected_user_ids(session):
+    from models import User, WebAuthnCredential, TenantMembership
+
+    user_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            user_ids.add(obj.id)
+        elif isinstance(obj, (WebAuthnCredential, TenantMembership)):
+            user_ids.add(obj.user_id)
+    return user_ids
+
+
+pending_invalidations = PendingChanges(
+    _PENDING_KEY, _affected_user_ids, lambda session, user_ids: principal_cache.invalidate(*user_ids),
+)
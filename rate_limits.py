@@ -0,0 +1,260 @@
+"""
+Shared sliding-window rate limiting.
+
+Counters live in Redis when REDIS_URL (or RATE_LIMIT_STORAGE_URL) points at one,
+so every gunicorn worker and instance sees the same counts and they survive
+restarts. Without Redis, or while it is unreachable, counters are kept
+in-process; MemoryStore is also the stand-in used by the tests. Limits that
+must hold across workers call shared_hit(), which returns None instead of
+falling back, and keep their own durable count for that case.
+
+Each limit is a sliding-window counter: the count of the current fixed window
+plus the previous window's count weighted by how much of it still overlaps the
+sliding window. That costs two integers per key and window, and one round trip
+(a Lua script, so check-and-increment is atomic across workers).
+
+    result = rate_limiter.hit(f'decision-delete:{membership.id}', limit=3, window=300)
+    if not result.allowed:
+        ...  # 429 with Retry-After: result.retry_after
+
+The same storage URL is used for the Flask-Limiter HTTP limits (see
+limiter_storage_uri()).
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+
+import redis_support
+from env_config import env_number
+from redis_support import RedisError, connect, configured_url, is_redis_url, redis_url
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'dr:rl:'
+REDIS_RETRY_SECONDS = 5
+MEMORY_SWEEP_THRESHOLD = 10000
+
+# Per-API-key and per-tenant quotas for the MCP server and the AI API
+DEFAULT_AI_QUOTA_PER_KEY = 120
+DEFAULT_AI_QUOTA_PER_TENANT = 600
+AI_QUOTA_WINDOW_SECONDS = 60
+
+RateLimitResult = namedtuple('RateLimitResult', 'allowed limit remaining retry_after')
+
+
+def storage_url():
+    """The configured shared store, or None for in-process counters."""
+    return configured_url('RATE_LIMIT_STORAGE_URL')
+
+
+def limiter_storage_uri(url=None):
+    """Flask-Limiter storage URI: the shared Redis when usable, otherwise memory://."""
+    url = url if url is not None else storage_url()
+    if is_redis_url(url) and redis_support.REDIS_AVAILABLE:
+        return url
+    return 'memory://'
+
+
+def hash_api_key(api_key):
+    """SHA-256 hex digest, the form API keys are stored and rate limited under."""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+def _result(allowed, previous, current, limit, window, elapsed, cost):
+    weight = 1 - elapsed / window
+    used = previous * weight + current
+    remaining = max(0, int(limit - used))
+    if allowed:
+        return RateLimitResult(True, limit, remaining, 0)
+
+    # When the previous window's share has decayed enough for this hit to fit
+    if current + cost <= limit and previous:
+        needed_weight = (limit - current - cost) / previous
+        retry_after = window * (1 - needed_weight) - elapsed
+    else:
+        retry_after = window - elapsed
+    return RateLimitResult(False, limit, remaining, max(1, math.ceil(retry_after)))
+
+
+class MemoryStore:
+    """In-process sliding-window counters, per worker."""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counters = {}  # key -> [window index, current count, previous count, window]
+
+    def hit(self, key, limit, window, cost=1):
+        now = self._clock()
+        index, elapsed = divmod(now, window)
+        index = int(index)
+        with self._lock:
+            state = self._counters.get(key)
+            if state is None or state[0] < index - 1:
+                state = [index, 0, 0, window]
+            elif state[0] == index - 1:
+                state = [index, 0, state[1], window]
+            previous, current = state[2], state[1]
+            allowed = previous * (1 - elapsed / window) + current + cost <= limit
+            if allowed:
+                state[1] = current = current + cost
+            self._counters[key] = state
+            if len(self._counters) > MEMORY_SWEEP_THRESHOLD:
+                self._sweep(now)
+        return _result(allowed, previous, current, limit, window, elapsed, cost)
+
+    def shared_hit(self, key, limit, window, cost=1):
+        """Always None: these counters are not shared between workers."""
+        return None
+
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._counters.clear()
+            else:
+                self._counters.pop(key, None)
+
+    def _sweep(self, now):
+        # Drop keys whose windows have both expired
+        stale = [key for key, (index, _, _, window) in self._counters.items() if index < int(now // window) - 1]
+        for key in stale:
+            del self._counters[key]
+
+
+class RedisStore:
+    """Sliding-window counters shared through Redis, falling back to MemoryStore when it is down."""
+
+    SCRIPT = """
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local cost = tonumber(ARGV[3])
+if previous * tonumber(ARGV[2]) + current + cost > tonumber(ARGV[1]) then
+  return {0, previous, current}
+end
+current = redis.call('INCRBY', KEYS[1], cost)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {1, previous, current}
+"""
+
+    def __init__(self, client, clock=time.time, fallback=None):
+        self.client = client
+        self._clock = clock
+        self._script = client.register_script(self.SCRIPT)
+        self.fallback = fallback or MemoryStore(clock)
+        self._down_until = 0.0
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        return cls(connect(url), **kwargs)
+
+    def hit(self, key, limit, window, cost=1):
+        result = self.shared_hit(key, limit, window, cost)
+        if result is None:
+            return self.fallback.hit(key, limit, window, cost)
+        return result
+
+    def shared_hit(self, key, limit, window, cost=1):
+        """Count in Redis; None while Redis is unreachable."""
+        now = self._clock()
+        if now < self._down_until:
+            return None
+
+        index, elapsed = divmod(now, window)
+        index = int(index)
+        # Hash tag keeps both windows of a key on one cluster slot
+        base = f'{KEY_PREFIX}{{{key}}}:{window}:'
+        try:
+            allowed, previous, current = self._script(
+                keys=[f'{base}{index}', f'{base}{index - 1}'],
+                args=[limit, repr(1 - elapsed / window), cost, int(window * 2) + 1],
+            )
+        except RedisError as e:
+            self._down_until = now + REDIS_RETRY_SECONDS
+            logger.warning(f"Rate limit store unavailable, using in-process counters: {e}")
+            return None
+        return _result(bool(allowed), int(previous), int(current), limit, window, elapsed, cost)
+
+    def reset(self, key=None):
+        self.fallback.reset(key)
+        pattern = f'{KEY_PREFIX}*' if key is None else f'{KEY_PREFIX}{{{key}}}:*'
+        try:
+            for redis_key in self.client.scan_iter(match=pattern):
+                self.client.delete(redis_key)
+        except RedisError as e:
+            logger.warning(f"Could not reset rate limit counters: {e}")
+
+
+def create_store(url=None):
+    """RedisStore for a redis:// URL (when the redis package is installed), otherwise MemoryStore."""
+    url = redis_url(url if url is not None else storage_url(), description='Rate limit storage',
+                    fallback='counters are per process')
+    if url:
+        return RedisStore.from_url(url)
+    return MemoryStore()
+
+
+class SlidingWindowLimiter:
+    """Named sliding-window limits over a MemoryStore or RedisStore."""
+
+    def __init__(self, store=None):
+        self._store = store
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = create_store()
+        return self._store
+
+    @store.setter
+    def store(self, store):
+        self._store = store
+
+    def hit(self, key, limit, window, cost=1):
+        """Count cost against key; returns a RateLimitResult (nothing is counted when denied)."""
+        return self.store.hit(key, limit, window, cost)
+
+    def shared_hit(self, key, limit, window, cost=1):
+        """Like hit(), but None when no shared store is configured or reachable."""
+        return self.store.shared_hit(key, limit, window, cost)
+
+    def reset(self, key=None):
+        self.store.reset(key)
+
+
+rate_limiter = SlidingWindowLimiter()
+
+
+# ==================== AI and MCP Quotas ====================
+
+def ai_quota_limits():
+    """(per API key, per tenant) requests per minute; 0 disables a quota."""
+    return (
+        env_number('AI_RATE_LIMIT_PER_KEY', DEFAULT_AI_QUOTA_PER_KEY),
+        env_number('AI_RATE_LIMIT_PER_TENANT', DEFAULT_AI_QUOTA_PER_TENANT),
+    )
+
+
+def check_ai_quota(key_hash, tenant_id=None, cost=1, limiter=None):
+    """Count cost against the API key's and its tenant's quota.
+
+    Returns None when allowed, otherwise the RateLimitResult of the exhausted
+    quota. The key is checked first so one noisy key cannot use up its
+    tenant's quota.
+    """
+    limiter = limiter or rate_limiter
+    per_key, per_tenant = ai_quota_limits()
+    if per_key > 0:
+        result = limiter.hit(f'ai:key:{key_hash}', per_key, AI_QUOTA_WINDOW_SECONDS, cost)
+        if not result.allowed:
+            return result
+    if per_tenant > 0 and tenant_id is not None:
+        result = limiter.hit(f'ai:tenant:{tenant_id}', per_tenant, AI_QUOTA_WINDOW_SECONDS, cost)
+        if not result.allowed:
+            return result
+    return None
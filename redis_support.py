@@ -0,0 +1,66 @@
+"""
+Optional Redis connections shared by the caches, rate limits and event bus.
+
+Each feature that can share state across workers reads its own URL variable
+(PRINCIPAL_CACHE_URL, EVENT_BUS_URL, ...) and falls back to REDIS_URL. Redis is
+optional: without the URL, or without the redis package, callers keep their
+state in-process. Connections use short socket timeouts so an unreachable
+Redis degrades a request instead of hanging it.
+
+    url = redis_url(url, 'LLM_CACHE_URL', 'LLM cache', 'using a per-process cache')
+    store = RedisResponseStore(connect(url)) if url else LocalResponseStore()
+"""
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+    RedisError = redis.RedisError
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+    class RedisError(Exception):
+        """Stand-in so except clauses work without the redis package."""
+
+REDIS_SCHEMES = ('redis://', 'rediss://', 'unix://')
+REDIS_SOCKET_TIMEOUT = 0.5
+
+
+def configured_url(env_name=None):
+    """The URL in env_name, falling back to REDIS_URL; None when neither is set."""
+    return (env_name and os.environ.get(env_name)) or os.environ.get('REDIS_URL') or None
+
+
+def is_redis_url(url):
+    return bool(url) and url.startswith(REDIS_SCHEMES)
+
+
+def redis_url(url=None, env_name=None, description='Redis', fallback='state is kept per process'):
+    """
+    The Redis URL a feature should connect to, or None to stay in-process.
+
+    url defaults to configured_url(env_name). Non-Redis URLs are ignored, and
+    a Redis URL without the redis package installed logs a warning.
+    """
+    if url is None:
+        url = configured_url(env_name)
+    if not is_redis_url(url):
+        return None
+    if not REDIS_AVAILABLE:
+        logger.warning(f"{description} URL is Redis but the redis package is not installed; {fallback}")
+        return None
+    return url
+
+
+def connect(url, socket_timeout=REDIS_SOCKET_TIMEOUT, **kwargs):
+    """A client for url. Pass socket_timeout=None for connections that block on reads (pub/sub)."""
+    return redis.Redis.from_url(
+        url,
+        socket_timeout=socket_timeout,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        **kwargs,
+    )
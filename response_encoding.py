@@ -0,0 +1,200 @@
+"""
+Response encoding: fast JSON serialization and negotiated compression.
+
+- FastJSONProvider uses orjson when it is installed and falls back to the
+  standard library otherwise. Both paths encode datetimes and dates as ISO 8601.
+- compress_response() gzip- or brotli-encodes buffered responses above a size
+  threshold when the client accepts it. Streamed responses (SSE, exports) and
+  static files are left untouched.
+
+Optional dependencies: orjson (faster JSON) and Brotli (br encoding).
+"""
+import gzip
+import logging
+import os
+from datetime import date, datetime
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+DEFAULT_MIN_SIZE = 1024
+# Levels chosen with scripts/bench_response_encoding.py: on decision lists gzip -3
+# saves ~85% at well under half the CPU of the default -6 (~88%).
+GZIP_LEVEL = 3
+BROTLI_QUALITY = 4
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'application/xml',
+    'application/manifest+json',
+    'image/svg+xml',
+}
+UNCOMPRESSIBLE_MIMETYPES = {'text/event-stream'}
+
+
+# ==================== JSON ====================
+
+def _default(o):
+    """Serialize types the encoders do not handle natively."""
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson when available.
+
+    Output matches the default provider (sorted keys, compact outside debug)
+    except that datetimes are ISO 8601 instead of HTTP dates. Anything orjson
+    rejects (e.g. integers wider than 64 bits) is retried with the standard
+    library encoder.
+    """
+
+    default = staticmethod(_default)
+
+    def _orjson_options(self):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def _dumps_bytes(self, obj):
+        """Encode with orjson, or return None to fall back to the standard library."""
+        if not ORJSON_AVAILABLE:
+            return None
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options())
+        except TypeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            encoded = self._dumps_bytes(obj)
+            if encoded is not None:
+                return encoded.decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if ORJSON_AVAILABLE and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass  # Let the standard library raise its usual error
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        compact = self.compact if self.compact is not None else not self._app.debug
+        encoded = self._dumps_bytes(obj) if compact else None
+        if encoded is None:
+            return super().response(obj)
+        return self._app.response_class(encoded + b'\n', mimetype=self.mimetype)
+
+
+# ==================== Compression ====================
+
+def _is_compressible(mimetype):
+    if not mimetype or mimetype in UNCOMPRESSIBLE_MIMETYPES:
+        return False
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def choose_encoding(accept_encodings):
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, or None."""
+    gzip_quality = accept_encodings.quality('gzip')
+    if BROTLI_AVAILABLE:
+        br_quality = accept_encodings.quality('br')
+        if br_quality and br_quality >= gzip_quality:
+            return 'br'
+    return 'gzip' if gzip_quality else None
+
+
+def compress_body(data, encoding):
+    """Compress a response body with the given content coding."""
+    if encoding == 'br':
+        return brotli.compress(data, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response, min_size=DEFAULT_MIN_SIZE):
+    """
+    Compress a buffered response in place if the client accepts it.
+
+    Skips streamed and passthrough responses (SSE streams, exports, static
+    files), bodiless statuses, already-encoded bodies, non-text mimetypes and
+    bodies below min_size.
+    """
+    if response.is_streamed or response.direct_passthrough:
+        return response
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if request.method == 'HEAD' or 'Content-Encoding' in response.headers:
+        return response
+    if not _is_compressible(response.mimetype):
+        return response
+
+    encoding = choose_encoding(request.accept_encodings)
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    compressed = compress_body(data, encoding)
+    if len(compressed) >= len(data):
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    # The representation changed, so a strong validator no longer applies byte-for-byte
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_response_encoding(app):
+    """Install the JSON provider and the compression hook on a Flask app."""
+    app.json = FastJSONProvider(app)
+
+    app.config.setdefault(
+        'RESPONSE_COMPRESSION_ENABLED',
+        os.environ.get('RESPONSE_COMPRESSION_ENABLED', 'true').lower() == 'true',
+    )
+    app.config.setdefault(
+        'RESPONSE_COMPRESSION_MIN_SIZE',
+        int(os.environ.get('RESPONSE_COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE)),
+    )
+
+    @app.after_request
+    def _compress_response(response):
+        if not app.config['RESPONSE_COMPRESSION_ENABLED']:
+            return response
+        return compress_response(response, app.config['RESPONSE_COMPRESSION_MIN_SIZE'])
+
+    logger.info(
+        "Response encoding: json=%s, compression=%s",
+        'orjson' if ORJSON_AVAILABLE else 'stdlib',
+        ('br+gzip' if BROTLI_AVAILABLE else 'gzip') if app.config['RESPONSE_COMPRESSION_ENABLED'] else 'off',
+    )
@@ -0,0 +1,148 @@
+"""
+Declarative route classes for the request pipeline.
+
+Every request is one of:
+
+- ``probe``: load balancer health checks (/health, /ping, /api/health)
+- ``static``: static files and built frontend assets
+- ``app``: everything else
+
+Probe and static requests bypass the per-request work that only matters for
+application traffic: the session cookie is not decoded (they get a null
+session), session expiry and CSRF checks are skipped, the rate limiter exempts
+them and analytics middleware can skip them via is_lightweight_request().
+
+Views declare their class with the ``route_class`` decorator; Flask static
+endpoints are ``static`` automatically. Because the session is opened before
+URL matching, classification is by path: register_route_classes() sweeps the
+URL map once all routes exist and builds the path table.
+
+    @app.route('/ping')
+    @route_class(ROUTE_PROBE)
+    def ping(): ...
+"""
+import logging
+import posixpath
+
+from flask import request
+from flask.sessions import SecureCookieSessionInterface
+
+logger = logging.getLogger(__name__)
+
+ROUTE_PROBE = 'probe'
+ROUTE_STATIC = 'static'
+ROUTE_APP = 'app'
+ROUTE_CLASSES = (ROUTE_PROBE, ROUTE_STATIC, ROUTE_APP)
+LIGHTWEIGHT_CLASSES = frozenset({ROUTE_PROBE, ROUTE_STATIC})
+
+# Built frontend assets served from the site root by the SPA catch-all route
+FRONTEND_ASSET_EXTENSIONS = frozenset({
+    '.js', '.mjs', '.css', '.map', '.ico', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.avif',
+    '.woff', '.woff2', '.ttf', '.otf', '.eot', '.webmanifest',
+})
+
+ENVIRON_KEY = 'decisionrecords.route_class'
+
+
+def route_class(name):
+    """Declare the route class of a view. Place it below @app.route."""
+    if name not in ROUTE_CLASSES:
+        raise ValueError(f'Unknown route class: {name}')
+
+    def decorator(f):
+        f._route_class = name
+        return f
+    return decorator
+
+
+class RouteClassifier:
+    """Maps request paths to route classes."""
+
+    def __init__(self, asset_extensions=()):
+        self.enabled = True
+        self.exact = {}
+        self.prefixes = []
+        self.asset_extensions = frozenset(asset_extensions)
+
+    def add(self, rule, name):
+        if '<' in rule:
+            prefix = rule.split('<', 1)[0]
+            if prefix not in ('', '/'):
+                self.prefixes.append((prefix, name))
+        else:
+            self.exact[rule] = name
+
+    def classify(self, path):
+        if not self.enabled:
+            return ROUTE_APP
+        name = self.exact.get(path)
+        if name:
+            return name
+        if path.startswith('/api/'):
+            return ROUTE_APP
+        for prefix, name in self.prefixes:
+            if path.startswith(prefix):
+                return name
+        if self.asset_extensions and posixpath.splitext(path)[1].lower() in self.asset_extensions:
+            return ROUTE_STATIC
+        return ROUTE_APP
+
+
+def _classifier(app):
+    return app.extensions.get('route_classes')
+
+
+def classify_request(app, req):
+    """Route class of req, cached in its WSGI environ."""
+    name = req.environ.get(ENVIRON_KEY)
+    if name is None:
+        classifier = _classifier(app)
+        name = classifier.classify(req.path) if classifier else ROUTE_APP
+        req.environ[ENVIRON_KEY] = name
+    return name
+
+
+def get_route_class():
+    """Route class of the current request."""
+    from flask import current_app
+    return classify_request(current_app, request)
+
+
+def is_lightweight_request():
+    """True for probe and static requests, which skip session, CSRF, limits and analytics."""
+    return get_route_class() in LIGHTWEIGHT_CLASSES
+
+
+class RouteAwareSessionInterface(SecureCookieSessionInterface):
+    """Cookie sessions that are never decoded (or written) for probe and static requests."""
+
+    def open_session(self, app, request):
+        if classify_request(app, request) in LIGHTWEIGHT_CLASSES:
+            return self.make_null_session(app)
+        return super().open_session(app, request)
+
+
+def init_route_classes(app, limiter=None, asset_extensions=()):
+    """Install the classifier, the session interface and the limiter exemption."""
+    app.extensions['route_classes'] = RouteClassifier(asset_extensions)
+    app.session_interface = RouteAwareSessionInterface()
+    if limiter is not None:
+        limiter.request_filter(is_lightweight_request)
+
+
+def register_route_classes(app):
+    """Build the path table from @route_class declarations. Call after all routes are registered."""
+    classifier = _classifier(app)
+    classifier.exact.clear()
+    classifier.prefixes.clear()
+    for rule in app.url_map.iter_rules():
+        view = app.view_functions.get(rule.endpoint)
+        name = getattr(view, '_route_class', None)
+        if name is None and (rule.endpoint == 'static' or rule.endpoint.endswith('.static')):
+            name = ROUTE_STATIC
+        if name:
+            classifier.add(rule.rule, name)
+    # Longest prefix first, so /static/vendor/ can differ from /static/
+    classifier.prefixes.sort(key=lambda item: len(item[0]), reverse=True)
+    logger.info(f"Route classes: {len(classifier.exact)} exact paths, {len(classifier.prefixes)} prefixes")
+    return classifier
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Benchmark the per-request cost of scanner path blocking.
+
+Replays a synthetic request mix (mostly API and static paths, some scanner
+probes) through the previous substring loop and through ``AttackPathMatcher``,
+and reports the time per request and the share of one CPU core it would take
+at the target request rate.
+
+    python scripts/bench_attack_paths.py --requests 100000 --rps 10000
+    python scripts/bench_attack_paths.py --extra-patterns 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from security import ATTACK_PATH_PATTERNS, AttackPathMatcher  # noqa: E402
+
+API_PATHS = (
+    "/api/decisions", "/api/decisions/{id}", "/api/decisions/{id}/history", "/api/decisions/{id}/comments",
+    "/api/spaces", "/api/infrastructure", "/api/user/me", "/api/user/subscription", "/api/features",
+    "/api/version", "/api/health", "/api/tenants/{id}/members", "/api/mcp", "/ping",
+)
+STATIC_PATHS = ("/static/js/main.{id}.js", "/static/css/styles.{id}.css", "/favicon.ico", "/")
+PROBE_PATHS = (
+    "/wp-login.php", "/xmlrpc.php", "/.env", "/.git/config", "/vendor/phpunit/phpunit/src/Util/PHP/eval-stdin.php",
+    "/cgi-bin/luci", "/phpmyadmin/index.php", "/admin/.env", "/{id}/shell",
+)
+
+
+def build_paths(count, probe_share, seed=7):
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < probe_share:
+            template = rng.choice(PROBE_PATHS)
+        elif roll < probe_share + 0.2:
+            template = rng.choice(STATIC_PATHS)
+        else:
+            template = rng.choice(API_PATHS)
+        paths.append(template.format(id=rng.randint(1, 500)))
+    return paths
+
+
+def extra_patterns(count, seed=3):
+    """Random literal patterns standing in for ATTACK_PATH_EXTRA_PATTERNS."""
+    rng = random.Random(seed)
+    alphabet = string.ascii_lowercase + "-_."
+    return tuple("".join(rng.choice(alphabet) for _ in range(rng.randint(5, 12))) for _ in range(count))
+
+
+def legacy_matcher(patterns):
+    def legacy_match(path):
+        path_lower = path.lower()
+        for pattern in patterns:
+            if pattern in path_lower:
+                return pattern
+        return None
+    return legacy_match
+
+
+def _time(fn, paths, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            fn(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None or elapsed < best else best
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--rps", type=int, default=10_000, help="Request rate to express the cost against")
+    parser.add_argument("--probe-share", type=float, default=0.05, help="Fraction of requests that are scanner probes")
+    parser.add_argument("--extra-patterns", type=int, default=0, help="Random patterns added to the built-in list")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    patterns = ATTACK_PATH_PATTERNS + extra_patterns(args.extra_patterns)
+    legacy_match = legacy_matcher(patterns)
+
+    paths = build_paths(args.requests, args.probe_share)
+    unique = build_paths(args.requests, args.probe_share, seed=11)
+    unique = [f"{path}/{i}" for i, path in enumerate(unique)]  # Defeats the result cache
+
+    check = AttackPathMatcher(patterns)
+    for path in paths + unique:
+        assert bool(legacy_match(path)) == bool(check.match(path)), path
+
+    matcher = AttackPathMatcher(patterns)
+    uncached = AttackPathMatcher(patterns, cache_size=0)
+    runs = [
+        ("substring loop", legacy_match, paths),
+        ("matcher, no cache", uncached.match, paths),
+        ("matcher", matcher.match, paths),
+        ("matcher, unique paths", matcher.match, unique),
+    ]
+
+    print(f"{args.requests:,} requests, {args.probe_share:.0%} scanner probes, {len(patterns)} patterns")
+    print()
+    print(f"{'variant':<26}{'ns/request':>12}{f'core % at {args.rps:,} rps':>24}")
+    for label, fn, sample in runs:
+        elapsed = _time(fn, sample, args.repeat)
+        per_request = elapsed / len(sample)
+        print(f"{label:<26}{per_request * 1e9:>12.0f}{per_request * args.rps * 100:>23.2f}%")
+    print()
+    print(f"Top patterns: {list(matcher.stats()['hits'].items())[:5]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
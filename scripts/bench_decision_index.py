@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Benchmark top-k search over one tenant's decision vectors (decision_index.TenantVectors).
+
+Fills a tenant index with random unit vectors (embedding is not timed; see
+--embed for the hashing embedder's throughput) and times top-k queries. With
+NumPy installed top-k is a matrix product plus argpartition; without it the
+pure-Python fallback is shown, which is only meant for small tenants.
+
+    python scripts/bench_decision_index.py --decisions 100000 --dimensions 256 --k 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def _unit(rng, dimensions):
+    vector = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector]
+
+
+def _fill(vectors, decisions, dimensions, rng):
+    batch = 1000
+    for start in range(0, decisions, batch):
+        vectors.upsert([
+            (decision_id, "v1", _unit(rng, dimensions))
+            for decision_id in range(start, min(start + batch, decisions))
+        ])
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--decisions", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--k", type=int, default=40, help="Candidates fetched (search uses 4x the hits asked for)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--embed", type=int, default=1000, help="Decisions to embed with the hashing embedder")
+    args = parser.parse_args(argv)
+
+    from decision_index import NUMPY_AVAILABLE, HashingEmbedder, TenantVectors
+
+    rng = random.Random(7)
+    vectors = TenantVectors(args.dimensions)
+    started = time.perf_counter()
+    _fill(vectors, args.decisions, args.dimensions, rng)
+    print(f"{args.decisions:,} decisions x {args.dimensions} dimensions "
+          f"({'NumPy' if NUMPY_AVAILABLE else 'pure Python'}), filled in {time.perf_counter() - started:.1f}s")
+
+    queries = [_unit(rng, args.dimensions) for _ in range(min(args.queries, 20 if not NUMPY_AVAILABLE else args.queries))]
+    vectors.top_k(queries[0], args.k)  # Warm up
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        vectors.top_k(query, args.k)
+        samples.append((time.perf_counter() - started) * 1000)
+
+    print()
+    print(f"{'top-k':<8}{'queries':>9}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    print(f"{args.k:<8}{len(samples):>9}{statistics.median(samples):>10.2f}"
+          f"{_percentile(samples, 0.95):>10.2f}{max(samples):>10.2f}")
+
+    if args.embed:
+        embedder = HashingEmbedder(args.dimensions)
+        text = "Retry failed webhook deliveries with exponential backoff and a dead letter queue. " * 20
+        started = time.perf_counter()
+        embedder.embed([text] * args.embed)
+        seconds = time.perf_counter() - started
+        print()
+        print(f"Hashing embedder: {args.embed / seconds:,.0f} decisions/s (~{len(text.split())} words each)")
+
+
+if __name__ == "__main__":
+    main()
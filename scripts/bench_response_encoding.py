@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Benchmark JSON encoding and response compression on decision-shaped payloads.
+
+Builds a synthetic decision list shaped like ``ArchitectureDecision.to_dict()``
+(with history, as returned by the list and detail endpoints) and reports, per
+encoder and compression setting, the CPU time per request and the bytes saved.
+
+    python scripts/bench_response_encoding.py --decisions 2000 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from flask import Flask  # noqa: E402
+
+import response_encoding  # noqa: E402
+from response_encoding import FastJSONProvider  # noqa: E402
+
+WORDS = (
+    "service latency cache database postgres queue kafka event tenant api gateway "
+    "consistency availability partition replica migration schema index rollout "
+    "feature flag monitoring alerting cost security compliance retention backup"
+).split()
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _user(rng, user_id):
+    return {
+        "id": user_id,
+        "email": f"user{user_id}@example.com",
+        "name": f"User {user_id}",
+        "first_name": "User",
+        "last_name": str(user_id),
+        "sso_domain": "example.com",
+        "auth_type": "local",
+        "is_admin": rng.random() < 0.1,
+        "email_verified": True,
+        "has_seen_admin_onboarding": True,
+        "created_at": datetime(2025, 1, 1) + timedelta(days=user_id),
+        "last_login": datetime(2026, 3, 1) + timedelta(minutes=user_id),
+        "has_passkey": False,
+        "has_password": True,
+        "deletion_requested_at": None,
+        "deletion_scheduled_at": None,
+    }
+
+
+def build_payload(count, seed=7):
+    """Decision list with history, datetimes left as datetime objects."""
+    rng = random.Random(seed)
+    users = [_user(rng, i) for i in range(1, 21)]
+    decisions = []
+    for number in range(1, count + 1):
+        created = datetime(2025, 6, 1) + timedelta(hours=number)
+        decisions.append({
+            "id": number,
+            "display_id": f"ADR-{number:03d}",
+            "decision_number": number,
+            "title": _text(rng, 6),
+            "context": _text(rng, 120),
+            "decision": _text(rng, 80),
+            "status": rng.choice(["proposed", "accepted", "archived", "superseded"]),
+            "consequences": _text(rng, 60),
+            "created_at": created,
+            "updated_at": created + timedelta(days=3),
+            "domain": "example.com",
+            "tenant_id": 1,
+            "created_by": rng.choice(users),
+            "updated_by": rng.choice(users),
+            "owner": None,
+            "owner_id": None,
+            "owner_email": None,
+            "comment_count": rng.randint(0, 8),
+            "infrastructure": [],
+            "history": [
+                {"id": number * 10 + h, "title": _text(rng, 6), "status": "proposed",
+                 "changed_at": created + timedelta(days=h), "change_reason": _text(rng, 8)}
+                for h in range(rng.randint(0, 3))
+            ],
+        })
+    return decisions
+
+
+def _time(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None or elapsed < best else best
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--decisions", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    payload = build_payload(args.decisions)
+    app = Flask(__name__)
+    provider = FastJSONProvider(app)
+
+    print(f"Payload: {args.decisions} decisions")
+    print(f"orjson available: {response_encoding.ORJSON_AVAILABLE}, "
+          f"brotli available: {response_encoding.BROTLI_AVAILABLE}")
+    print()
+
+    with app.app_context():
+        stdlib_time, body = _time(
+            lambda: json.dumps(payload, default=response_encoding._default, sort_keys=True,
+                               separators=(",", ":")).encode("utf-8"),
+            args.repeat,
+        )
+        print(f"{'encoder':<24}{'ms':>10}")
+        print(f"{'json (stdlib)':<24}{stdlib_time * 1000:>10.1f}")
+        if response_encoding.ORJSON_AVAILABLE:
+            fast_time, body = _time(lambda: provider._dumps_bytes(payload), args.repeat)
+            print(f"{'orjson':<24}{fast_time * 1000:>10.1f}  ({stdlib_time / fast_time:.1f}x)")
+
+    raw = len(body)
+    print()
+    print(f"{'compression':<24}{'bytes':>12}{'saved':>9}{'ms':>10}{'MB/s':>9}")
+    print(f"{'identity':<24}{raw:>12,}{'0%':>9}{0.0:>10.1f}{'-':>9}")
+
+    settings = [(f"gzip -{level}", lambda level=level: gzip.compress(body, compresslevel=level, mtime=0))
+                for level in (1, response_encoding.GZIP_LEVEL, 9)]
+    if response_encoding.BROTLI_AVAILABLE:
+        brotli = response_encoding.brotli
+        settings += [(f"br q{quality}", lambda quality=quality: brotli.compress(
+            body, mode=brotli.MODE_TEXT, quality=quality)) for quality in (1, response_encoding.BROTLI_QUALITY, 9)]
+
+    for label, fn in settings:
+        elapsed, compressed = _time(fn, args.repeat)
+        saved = 1 - len(compressed) / raw
+        throughput = raw / elapsed / 1_000_000
+        print(f"{label:<24}{len(compressed):>12,}{saved:>8.0%}{elapsed * 1000:>10.1f}{throughput:>9.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
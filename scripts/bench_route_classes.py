@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Benchmark per-request pipeline overhead for each route class.
+
+Loads the real app in test mode (in-memory SQLite), logs a client in with a
+session cookie, and times requests to a probe, a static file and a cheap API
+route with route classification enabled and disabled. The difference is the
+work probes and static files no longer do (session decoding, expiry and CSRF
+checks, database initialisation checks).
+
+    python scripts/bench_route_classes.py --requests 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+PATHS = (
+    ("probe", "/ping"),
+    ("probe", "/health"),
+    ("static", "/static/CUBE_2D_LIGHT.svg"),
+    ("app", "/api/features"),
+)
+
+
+def _time(client, path, requests):
+    for _ in range(min(200, requests)):
+        client.get(path)
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(path)
+    return (time.perf_counter() - start) / requests
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rps", type=int, default=100, help="Probe rate per instance to express the saving against")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    from tests.app_test_utils import load_test_app
+    from models import db, User
+
+    app_module, app = load_test_app(secret_key="bench-secret-key-route-classes-0123456789")
+    classifier = app.extensions["route_classes"]
+
+    with app.app_context():
+        db.create_all()
+        app_module.init_database()
+        user = User(email="bench@example.com", sso_domain="example.com", auth_type="local")
+        db.session.add(user)
+        db.session.commit()
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = user.id
+            sess["_csrf_token"] = "bench-csrf-token"
+            sess["_expires_at"] = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+
+        print(f"{args.requests:,} requests per path, logged-in session cookie")
+        print()
+        print(f"{'class':<8}{'path':<30}{'unclassified us':>17}{'classified us':>15}{'saved':>8}")
+        savings = {}
+        for name, path in PATHS:
+            classifier.enabled = False
+            before = _time(client, path, args.requests)
+            classifier.enabled = True
+            after = _time(client, path, args.requests)
+            savings.setdefault(name, []).append(before - after)
+            print(f"{name:<8}{path:<30}{before * 1e6:>17.1f}{after * 1e6:>15.1f}{1 - after / before:>8.0%}")
+
+        probe_saving = sum(savings["probe"]) / len(savings["probe"])
+        print()
+        print(f"At {args.rps} probe requests/s: {probe_saving * args.rps * 1000:.1f} ms of CPU saved per second")
+        db.session.remove()
+        db.drop_all()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
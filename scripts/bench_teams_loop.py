@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Benchmark Teams activity throughput: asyncio.run() per activity vs persistent loops.
+
+Each simulated activity does what the bot does for a message: some blocking
+work (the handlers query the database with sync SQLAlchemy, simulated by
+--blocking-ms of sleep) and one reply POSTed to the Bot Framework connector,
+here a local HTTP server. With asyncio.run() per activity the reply client
+dies with the loop, so every activity opens a new connection. The per-thread
+loops of async_loop.BackgroundLoop keep the client and its connection. A
+single loop thread for the whole process also keeps them, but runs the
+blocking work of all request threads one activity at a time.
+Real Bot Framework replies also pay for TLS, which this leaves out, so the
+difference in production is larger.
+
+    python scripts/bench_teams_loop.py --activities 2000 --workers 4 --blocking-ms 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+class ConnectorClient:
+    """A minimal keep-alive HTTP/1.1 client, standing in for the bot's aiohttp session."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port, self.path = parts.hostname, parts.port, parts.path or "/"
+        self._connections = []
+
+    async def post(self, body):
+        if self._connections:
+            reader, writer = self._connections.pop()
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write(
+            f"POST {self.path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        status = await reader.readline()
+        length = 0
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        await reader.readexactly(length)
+        self._connections.append((reader, writer))
+        return int(status.split()[1])
+
+    async def close(self):
+        for _reader, writer in self._connections:
+            writer.close()
+        self._connections = []
+
+
+async def _activity(client, body, blocking):
+    time.sleep(blocking)  # Workspace and user lookups with sync SQLAlchemy
+    await asyncio.sleep(0)  # Card building
+    return await client.post(body)
+
+
+def _per_request(url, activities, workers, blocking):
+    async def handle(body):
+        client = ConnectorClient(url)
+        try:
+            return await _activity(client, body, blocking)
+        finally:
+            await client.close()
+
+    return _drive(lambda body: asyncio.run(handle(body)), activities, workers)
+
+
+def _single_thread(url, activities, workers, blocking):
+    """One loop on a daemon thread for the whole process, fed with run_coroutine_threadsafe."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    client = ConnectorClient(url)
+
+    async def handle(body):
+        return await _activity(client, body, blocking)
+
+    try:
+        return _drive(lambda body: asyncio.run_coroutine_threadsafe(handle(body), loop).result(), activities, workers)
+    finally:
+        asyncio.run_coroutine_threadsafe(client.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def _persistent(url, activities, workers, blocking):
+    from async_loop import BackgroundLoop
+
+    background = BackgroundLoop("bench")
+
+    async def handle(body):
+        client = background.shared("connector", lambda: ConnectorClient(url))
+        return await _activity(client, body, blocking)
+
+    try:
+        return _drive(lambda body: background.run(handle(body)), activities, workers)
+    finally:
+        background.shutdown()
+
+
+def _drive(handle, activities, workers):
+    """Run activities across worker threads (like a threaded WSGI server); returns seconds."""
+    per_worker = activities // workers
+    body = b'{"type": "message", "text": "Reply"}'
+    barrier = threading.Barrier(workers + 1)
+
+    def work():
+        barrier.wait()
+        for _ in range(per_worker):
+            assert handle(body) == 200
+
+    threads = [threading.Thread(target=work) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, per_worker * workers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--activities", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent request threads")
+    parser.add_argument("--blocking-ms", type=float, default=0, help="Blocking work per activity")
+    args = parser.parse_args(argv)
+    blocking = args.blocking_ms / 1000
+
+    logging.disable(logging.WARNING)
+    from tests.stub_idp import StubIdP
+
+    print(f"{args.activities:,} activities on {args.workers} threads, {args.blocking_ms:g} ms blocking work each, "
+          f"reply POSTed to a local connector")
+    print()
+    print(f"{'mode':<14}{'activities/s':>14}{'us/activity':>13}{'connections':>13}")
+    results = {}
+    for name, bench in (("asyncio.run", _per_request), ("one loop", _single_thread), ("thread loops", _persistent)):
+        with StubIdP() as connector:
+            connector.documents = lambda: {"/v3/conversations/a/activities": {"id": "1"}}
+            url = f"{connector.issuer}/v3/conversations/a/activities"
+            bench(url, min(200, args.activities), args.workers, blocking)  # Warm up
+            connector.connections.clear()
+            seconds, done = bench(url, args.activities, args.workers, blocking)
+            results[name] = done / seconds
+            print(f"{name:<14}{done / seconds:>14,.0f}{seconds / done * 1e6:>13.1f}{len(connector.connections):>13}")
+
+    print()
+    print(f"Per-thread loops: {results['thread loops'] / results['asyncio.run']:.1f}x the activity throughput "
+          f"of asyncio.run, {results['thread loops'] / results['one loop']:.1f}x that of one loop thread")
+
+
+if __name__ == "__main__":
+    main()
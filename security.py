@@ -6,6 +6,7 @@ This module provides:
 2. Rate limiting configuration
 3. Security headers
 4. CSRF protection helpers
+5. Scanner/attack path blocking
 """
 
 from functools import wraps
@@ -13,7 +14,9 @@ from flask import g, jsonify, request, session
 import logging
 import hashlib
 import hmac
+import re
 import secrets
+import threading
 import time
 
 logger = logging.getLogger(__name__)
@@ -240,6 +243,131 @@ def apply_security_headers(response):
     return response
 
 
+# ==================== Attack Path Blocking ====================
+
+# Common attack path patterns to silently block (WordPress, PHP, etc.)
+ATTACK_PATH_PATTERNS = (
+    '.php',           # PHP files (xmlrpc.php, wp-login.php, etc.)
+    '.env',           # Environment files
+    '.git',           # Git directory
+    '.config',        # Config files
+    'phpinfo',        # PHP info pages
+    'phpunit',        # PHPUnit exploits
+    'wp-',            # WordPress paths
+    'wordpress',      # WordPress paths
+    'admin/.env',     # Admin env files
+    'vendor/',        # PHP vendor directories
+    'eval-stdin',     # PHP eval exploits
+    '/cgi-bin/',      # CGI exploits
+    'shell',          # Shell access attempts
+    '.asp',           # ASP files
+    '.jsp',           # JSP files
+    'phpmyadmin',     # phpMyAdmin
+    'mysql',          # MySQL admin attempts
+    'adminer',        # Adminer DB tool
+    'debug',          # Debug endpoints
+    '/.well-known/security.txt',  # Not an attack but unnecessary
+)
+
+ATTACK_PATH_CACHE_SIZE = 4096
+ATTACK_PATH_CACHE_MAX_LENGTH = 256
+
+
+def _trie_regex(patterns):
+    """
+    Build one regex matching any of the literal patterns.
+
+    Alternatives are nested by shared prefix (a trie), so at each position of
+    the path the engine only follows branches whose next character matches,
+    instead of trying every pattern in turn. Longer patterns win over their
+    prefixes, so the matched text is always one complete pattern.
+    """
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for char in pattern:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return re.compile(build(trie))
+
+
+class AttackPathMatcher:
+    """
+    Precompiled substring matcher for scanner paths, with per-pattern hit counts.
+
+    Patterns are matched case-insensitively anywhere in the path. Paths that
+    did not match are remembered (up to cache_size), so repeated API and
+    static paths cost one set lookup.
+    """
+
+    def __init__(self, patterns=(), cache_size=ATTACK_PATH_CACHE_SIZE):
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self.hits = {}
+        self._compile(patterns)
+
+    def _compile(self, patterns):
+        patterns = tuple(dict.fromkeys(p.strip().lower() for p in patterns if p and p.strip()))
+        search = _trie_regex(patterns).search if patterns else None
+        # Swapped in one assignment so concurrent requests see old or new, never a mix
+        self._state = (patterns, search, set())
+
+    @property
+    def patterns(self):
+        return self._state[0]
+
+    def extend(self, patterns):
+        """Add patterns (e.g. from ATTACK_PATH_EXTRA_PATTERNS) and recompile."""
+        if isinstance(patterns, str):
+            patterns = patterns.split(',')
+        new = [p.strip().lower() for p in patterns if p and p.strip()]
+        with self._lock:
+            if not set(new) - set(self.patterns):
+                return
+            self._compile(self.patterns + tuple(new))
+
+    def match(self, path):
+        """Return the pattern found in path, or None. Counts the hit."""
+        path_lower = path.lower()
+        _, search, clean = self._state
+        if path_lower in clean:
+            return None
+
+        found = search(path_lower) if search else None
+        if found is None:
+            # Long paths are almost always unique probes; don't let them fill the cache
+            if len(path_lower) <= ATTACK_PATH_CACHE_MAX_LENGTH and self._cache_size:
+                if len(clean) >= self._cache_size:
+                    clean.clear()
+                clean.add(path_lower)
+            return None
+
+        pattern = found.group(0)
+        with self._lock:
+            self.hits[pattern] = self.hits.get(pattern, 0) + 1
+        return pattern
+
+    def stats(self):
+        with self._lock:
+            hits = dict(self.hits)
+        return {
+            'patterns': list(self.patterns),
+            'hits': dict(sorted(hits.items(), key=lambda item: item[1], reverse=True)),
+            'total_hits': sum(hits.values()),
+        }
+
+
+attack_path_matcher = AttackPathMatcher(ATTACK_PATH_PATTERNS)
+
+
 # ==================== Input Validation & Sanitization ====================
 
 # Initialize Bleach for HTML sanitization
@@ -0,0 +1,62 @@
+"""
+Changes noted during a flush and handled once the transaction commits.
+
+Caches and feeds react to committed writes: a flush listener notes what
+changed in session.info, and after the commit the notes are applied (cache
+entries dropped, events published). Notes from a rolled back transaction are
+discarded; those flushed before a rolled back savepoint are kept, since the
+outer transaction may still commit them.
+
+    def _changed_users(session):
+        return [obj.id for obj in session.dirty if isinstance(obj, User)]
+
+    pending_users = PendingChanges('principal_cache_invalidations', _changed_users,
+                                   lambda session, user_ids: principal_cache.invalidate(*user_ids))
+
+Query.update/delete skip the flush events; code using them queues its notes
+itself with pending_users.add(db.session, user_ids).
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class PendingChanges:
+    """
+    Items collect(session) returns at each flush, handed to apply(session, items) after the commit.
+
+    collect runs in after_flush by default, where session.new/dirty/deleted
+    still hold the flushed objects and new rows have ids. Items are kept in
+    order and repeats dropped, unless unique=False (for unhashable items).
+    collect_on and apply_on name other Session events for the two steps.
+    """
+
+    def __init__(self, key, collect, apply, unique=True, collect_on='after_flush', apply_on='after_commit'):
+        self.key = key
+        self.collect = collect
+        self.apply = apply
+        self.unique = unique
+        event.listen(Session, collect_on, self._collect)
+        event.listen(Session, apply_on, self._apply)
+        event.listen(Session, 'after_soft_rollback', self._discard)
+
+    def add(self, session, items):
+        """Queue items for the session's current transaction."""
+        items = list(items)
+        if not items:
+            return
+        if self.unique:
+            session.info.setdefault(self.key, {}).update(dict.fromkeys(items))
+        else:
+            session.info.setdefault(self.key, []).extend(items)
+
+    def _collect(self, session, *args):
+        self.add(session, self.collect(session) or ())
+
+    def _apply(self, session, *args):
+        items = session.info.pop(self.key, None)
+        if items:
+            self.apply(session, list(items))
+
+    def _discard(self, session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(self.key, None)
@@ -67,6 +67,35 @@ def sample_tenant(session):
     return tenant
 
 
+@pytest.fixture
+def ai_tenant(request, session, sample_tenant):
+    """sample_tenant with AI features and external AI access (API keys) enabled, and interactions logged.
+
+    Override the AI flags by parametrizing indirectly:
+    @pytest.mark.parametrize('ai_tenant', [{'ai_log_interactions': False}], indirect=True)
+    """
+    flags = {'ai_features_enabled': True, 'ai_external_access_enabled': True, 'ai_log_interactions': True}
+    flags.update(getattr(request, 'param', None) or {})
+    for name, value in flags.items():
+        setattr(sample_tenant, name, value)
+    session.commit()
+    return sample_tenant
+
+
+@pytest.fixture
+def other_tenant(session):
+    """A second tenant, for tests that check isolation between tenants."""
+    tenant = Tenant(
+        domain='other.com',
+        name='Other Corp',
+        status='active',
+        maturity_state=MaturityState.BOOTSTRAP
+    )
+    session.add(tenant)
+    session.commit()
+    return tenant
+
+
 @pytest.fixture
 def sample_tenant_with_settings(session, sample_tenant):
     """Create a tenant with settings."""
@@ -228,3 +257,22 @@ def master_session(app, sample_master):
         sess['_csrf_token'] = 'test-csrf-token'
     client.environ_base['HTTP_X_CSRF_TOKEN'] = 'test-csrf-token'
     return client
+
+
+class FakeClock:
+    """A clock for code that takes clock=: returns now, which tests set or advance()."""
+
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    """A FakeClock starting at 100.0."""
+    return FakeClock()
@@ -0,0 +1,119 @@
+"""
+Local stub OpenID Connect provider for tests.
+
+Serves a discovery document and a JWKS over real HTTP on 127.0.0.1 so the
+metadata cache and SSO flows can be exercised without network access.
+Response headers, latency and failures are adjustable per test, and every
+request and client connection is counted. Request bodies are recorded, so the
+stub also stands in for webhook receivers such as Slack's response_url.
+
+    with StubIdP() as idp:
+        idp.cache_control = 'max-age=300'
+        url = idp.discovery_url
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubIdP:
+    """A minimal OIDC provider running on a background thread."""
+
+    def __init__(self):
+        self.cache_control = 'max-age=3600'
+        self.delay = 0.0
+        self.fail = False
+        self.hits = {}
+        self.bodies = []
+        self.connections = set()
+        self.extra_headers = {}
+        self.kid = 'stub-key-1'
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def issuer(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    @property
+    def discovery_url(self):
+        return f'{self.issuer}/.well-known/openid-configuration'
+
+    @property
+    def jwks_uri(self):
+        return f'{self.issuer}/jwks'
+
+    def documents(self):
+        return {
+            '/.well-known/openid-configuration': {
+                'issuer': self.issuer,
+                'authorization_endpoint': f'{self.issuer}/authorize',
+                'token_endpoint': f'{self.issuer}/token',
+                'userinfo_endpoint': f'{self.issuer}/userinfo',
+                'jwks_uri': self.jwks_uri,
+            },
+            '/jwks': {'keys': [{'kty': 'RSA', 'kid': self.kid, 'use': 'sig', 'n': 'AQAB', 'e': 'AQAB'}]},
+        }
+
+    def hit_count(self, path='/.well-known/openid-configuration'):
+        with self._lock:
+            return self.hits.get(path, 0)
+
+    def _handler_class(self):
+        idp = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with idp._lock:
+                    idp.hits[self.path] = idp.hits.get(self.path, 0) + 1
+                    idp.connections.add(self.client_address)
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    body = self.rfile.read(length)
+                    with idp._lock:
+                        idp.bodies.append((self.path, body))
+                if idp.delay:
+                    time.sleep(idp.delay)
+                document = idp.documents().get(self.path)
+                if idp.fail or document is None:
+                    self.send_response(503 if idp.fail else 404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = json.dumps(document).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                if idp.cache_control:
+                    self.send_header('Cache-Control', idp.cache_control)
+                for name, value in idp.extra_headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_POST = do_GET
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
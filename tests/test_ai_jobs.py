@@ -0,0 +1,310 @@
+"""
+Tests for background AI jobs (ai_jobs.py).
+
+Covers:
+- Jobs run off the request and record result, token usage and an AIInteractionLog
+- Failures are recorded on the job and the log
+- Per-tenant concurrency: a tenant's extra jobs wait without holding up other tenants
+- Progress replay for late subscribers, cancel (which never overrides a started job), stale jobs and the queue limit
+- The /api/ai/jobs endpoints (submit, poll, cancel, SSE events)
+- API keys need the job kind's scope to submit it
+- Event streams re-read the row on each heartbeat and end once the job has stopped
+"""
+import json
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, AIAction, AIApiKey, AIChannel, AIInteractionLog, AIJob
+from ai_jobs import AIJobRunner, JobQueueFull, FINISHED, PROGRESS, STATUS, register_job
+from event_bus import LocalEventBus
+from rate_limits import hash_api_key
+from tests.app_test_utils import load_test_app
+
+gates = {}
+
+
+@register_job('test_echo', action=AIAction.SEARCH)
+def _echo(job, text='', tokens=0):
+    job.emit(f'partial {text}')
+    job.usage('openai', 'gpt-test', tokens_input=tokens, tokens_output=tokens // 2)
+    return {'echo': text}
+
+
+@register_job('test_write', scope='write')
+def _write(job):
+    return {'written': True}
+
+
+@register_job('test_fail')
+def _fail(job):
+    job.usage('openai', 'gpt-test', tokens_input=7)
+    raise RuntimeError('provider down')
+
+
+@register_job('test_gated')
+def _gated(job, gate):
+    started, release = gates[gate]
+    started.set()
+    assert release.wait(5)
+    return {'gate': gate}
+
+
+def _gate(name):
+    gates[name] = (threading.Event(), threading.Event())
+    return gates[name]
+
+
+@pytest.fixture
+def runner(app):
+    runner = AIJobRunner(workers=4, tenant_concurrency=1, max_queued=10, events=LocalEventBus())
+    yield runner
+    for _started, release in gates.values():
+        release.set()
+    runner.join(5)
+    gates.clear()
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+class TestRunner:
+    """Submitted jobs run on the pool and record what they used."""
+
+    def test_completed_job_records_usage(self, session, runner, ai_tenant):
+        job = runner.submit('test_echo', ai_tenant.id, AIChannel.API, {'text': 'hi', 'tokens': 100})
+        assert job.status == AIJob.STATUS_QUEUED
+        assert runner.join(5)
+
+        session.expire_all()
+        job = session.get(AIJob, job.id)
+        assert (job.status, job.result) == (AIJob.STATUS_COMPLETED, {'echo': 'hi'})
+        assert (job.tokens_input, job.tokens_output, job.llm_model) == (100, 50, 'gpt-test')
+        log = session.get(AIInteractionLog, job.interaction_log_id)
+        assert (log.action, log.channel, log.tokens_input, log.success) == (AIAction.SEARCH, AIChannel.API, 100, True)
+        assert runner.stats()['completed'] == 1
+
+    def test_failed_job(self, session, runner, ai_tenant):
+        job = runner.submit('test_fail', ai_tenant.id, AIChannel.WEB)
+        assert runner.join(5)
+
+        session.expire_all()
+        job = session.get(AIJob, job.id)
+        assert (job.status, job.error_message, job.tokens_input) == (AIJob.STATUS_FAILED, 'provider down', 7)
+        log = session.get(AIInteractionLog, job.interaction_log_id)
+        assert (log.success, log.error_message) == (False, 'provider down')
+
+    @pytest.mark.parametrize('ai_tenant', [{'ai_log_interactions': False}], indirect=True)
+    def test_no_log_when_tenant_opted_out(self, session, runner, ai_tenant):
+        job = runner.submit('test_echo', ai_tenant.id, AIChannel.API)
+        assert runner.join(5)
+        session.expire_all()
+        assert session.get(AIJob, job.id).interaction_log_id is None
+        assert AIInteractionLog.query.count() == 0
+
+    def test_unknown_kind(self, session, runner):
+        with pytest.raises(KeyError):
+            runner.submit('no_such_kind', 1, AIChannel.API)
+
+
+class TestScheduling:
+    """One tenant's jobs cannot use every worker."""
+
+    def test_tenant_concurrency(self, session, runner, ai_tenant, other_tenant):
+        # The test database is one SQLite connection, so jobs are started and
+        # finished one at a time; the handlers themselves overlap.
+        busy, other = ai_tenant, other_tenant
+        first_started, first_release = _gate('first')
+        second_started, second_release = _gate('second')
+        third_started, third_release = _gate('third')
+
+        runner.submit('test_gated', busy.id, AIChannel.API, {'gate': 'first'})
+        assert first_started.wait(5)
+        runner.submit('test_gated', busy.id, AIChannel.API, {'gate': 'second'})
+        runner.submit('test_gated', other.id, AIChannel.API, {'gate': 'third'})
+
+        assert third_started.wait(5)
+        assert not second_started.is_set()
+        assert runner.stats()['waiting'] == 1
+
+        third_release.set()
+        _wait_for(lambda: runner.stats()['completed'] == 1)
+        first_release.set()
+        assert second_started.wait(5)
+        second_release.set()
+        assert runner.join(5)
+        assert runner.stats()['completed'] == 3
+
+    def test_queue_full(self, session, app, ai_tenant):
+        started, release = _gate('full')
+        runner = AIJobRunner(workers=1, tenant_concurrency=1, max_queued=1, events=LocalEventBus())
+        try:
+            runner.submit('test_gated', ai_tenant.id, AIChannel.API, {'gate': 'full'})
+            assert started.wait(5)
+            with pytest.raises(JobQueueFull):
+                runner.submit('test_echo', ai_tenant.id, AIChannel.API)
+            assert runner.stats()['rejected'] == 1
+        finally:
+            release.set()
+            runner.join(5)
+            gates.clear()
+
+    def test_cancel_waiting_job(self, session, runner, ai_tenant):
+        started, release = _gate('block')
+        runner.submit('test_gated', ai_tenant.id, AIChannel.API, {'gate': 'block'})
+        assert started.wait(5)
+        waiting = runner.submit('test_echo', ai_tenant.id, AIChannel.API, {'text': 'never'})
+
+        assert runner.cancel(waiting)
+        release.set()
+        assert runner.join(5)
+        session.expire_all()
+        waiting = session.get(AIJob, waiting.id)
+        assert waiting.status == AIJob.STATUS_CANCELLED and waiting.result is None
+        assert not runner.cancel(waiting)
+
+    def test_cancel_loses_to_started_job(self, session, runner, ai_tenant):
+        started, release = _gate('race')
+        job = runner.submit('test_gated', ai_tenant.id, AIChannel.API, {'gate': 'race'})
+        assert started.wait(5)
+        assert job.status == AIJob.STATUS_QUEUED  # This session has not seen the worker's update
+
+        assert not runner.cancel(job)
+        release.set()
+        assert runner.join(5)
+        session.expire_all()
+        job = session.get(AIJob, job.id)
+        assert (job.status, job.result) == (AIJob.STATUS_COMPLETED, {'gate': 'race'})
+
+
+class TestEvents:
+    """Partial results are streamed and replayed."""
+
+    def test_late_subscriber_replays_progress(self, session, runner, ai_tenant):
+        started, release = _gate('stream')
+        job = runner.submit('test_gated', ai_tenant.id, AIChannel.API, {'gate': 'stream'})
+        assert started.wait(5)
+        runner.events.publish(job.id, PROGRESS, {'text': 'one'})
+
+        subscription = runner.subscribe(job.id)
+        release.set()
+        assert runner.join(5)
+        events = [event for event in subscription.stream(0.01, 0.2) if event is not None]
+        subscription.close()
+        assert [event.type for event in events] == [STATUS, PROGRESS, FINISHED]
+        assert events[-1].data['result'] == {'gate': 'stream'}
+
+    def test_expire_stale(self, session, runner, ai_tenant):
+        job = AIJob(id='job_stale', tenant_id=ai_tenant.id, channel=AIChannel.API, kind='test_echo',
+                    status=AIJob.STATUS_RUNNING, created_at=datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=1))
+        session.add(job)
+        session.commit()
+        assert runner.expire_stale(job).status == AIJob.STATUS_FAILED
+
+
+class TestEndpoints:
+    """/api/ai/jobs for session users."""
+
+    @pytest.fixture
+    def app(self, monkeypatch):
+        app_module, test_app = load_test_app(secret_key='ai-jobs-secret')
+        monkeypatch.setattr(app_module.AIConfig, 'get_system_ai_enabled', staticmethod(lambda: True))
+        with test_app.app_context():
+            db.create_all()
+            yield test_app
+            db.session.remove()
+            db.drop_all()
+            app_module._db_initialized = False
+
+    @pytest.fixture
+    def client(self, app, session, monkeypatch, ai_tenant, sample_user, sample_membership):
+        import app as app_module
+
+        runner = AIJobRunner(workers=2, tenant_concurrency=1, max_queued=10, events=LocalEventBus())
+        monkeypatch.setattr(app_module, 'ai_jobs', runner)
+        sample_user.set_password('ai-jobs-password-123')
+        session.commit()
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = sample_user.id
+            sess['_csrf_token'] = 'test-csrf-token'
+            sess['_expires_at'] = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+        client.environ_base['HTTP_X_CSRF_TOKEN'] = 'test-csrf-token'
+        client.runner = runner
+        yield client
+        runner.join(5)
+
+    def test_submit_and_poll(self, client):
+        response = client.post('/api/ai/jobs', json={'kind': 'test_echo', 'params': {'text': 'hi'}})
+        assert response.status_code == 202
+        body = response.get_json()
+        assert body['status'] == AIJob.STATUS_QUEUED
+        assert response.headers['Location'] == body['links']['self']
+
+        assert client.runner.join(5)
+        polled = client.get(body['links']['self']).get_json()
+        assert (polled['status'], polled['result']) == (AIJob.STATUS_COMPLETED, {'echo': 'hi'})
+
+    def test_events_for_finished_job(self, client):
+        job_id = client.post('/api/ai/jobs', json={'kind': 'test_echo'}).get_json()['id']
+        assert client.runner.join(5)
+        response = client.get(f'/api/ai/jobs/{job_id}/events')
+        assert response.mimetype == 'text/event-stream'
+        data = [json.loads(line[6:]) for line in response.get_data(as_text=True).splitlines() if line.startswith('data: ')]
+        assert data[-1]['type'] == FINISHED and data[-1]['status'] == AIJob.STATUS_COMPLETED
+
+    def test_events_end_when_row_stops(self, client, session, monkeypatch, ai_tenant, sample_user):
+        # The job's worker went away without publishing job.finished: the
+        # heartbeat re-read notices once the row goes stale and ends the stream
+        import app as app_module
+        monkeypatch.setattr(app_module, 'STREAM_HEARTBEAT', 0.01)
+        client.runner.stale_seconds = 1
+        client.runner.stream_seconds = 5
+        session.add(AIJob(id='job_orphan', tenant_id=ai_tenant.id, user_id=sample_user.id, channel=AIChannel.WEB,
+                          kind='test_echo', status=AIJob.STATUS_RUNNING))
+        session.commit()
+
+        started = time.monotonic()
+        body = client.get('/api/ai/jobs/job_orphan/events').get_data(as_text=True)
+        assert time.monotonic() - started < 5
+        assert ': heartbeat' in body
+        data = [json.loads(line[6:]) for line in body.splitlines() if line.startswith('data: ')]
+        assert data == [{'type': FINISHED, 'status': AIJob.STATUS_FAILED, 'result': None,
+                         'error_message': 'Job was interrupted before it finished',
+                         'tokens_input': None, 'tokens_output': None}]
+
+    def test_rejections(self, client, monkeypatch):
+        assert client.post('/api/ai/jobs', json={'kind': 'nope'}).status_code == 400
+        assert client.get('/api/ai/jobs/job_missing').status_code == 404
+
+        job_id = client.post('/api/ai/jobs', json={'kind': 'test_echo'}).get_json()['id']
+        assert client.runner.join(5)
+        assert client.delete(f'/api/ai/jobs/{job_id}').status_code == 409
+
+        client.runner.max_queued = 0
+        response = client.post('/api/ai/jobs', json={'kind': 'test_echo'})
+        assert response.status_code == 503 and response.headers['Retry-After'] == '10'
+
+    def test_api_key_scope(self, client, session, ai_tenant, sample_user):
+        raw = f'adr_{secrets.token_urlsafe(24)}'
+        session.add(AIApiKey(user_id=sample_user.id, tenant_id=ai_tenant.id, key_hash=hash_api_key(raw),
+                             key_prefix=raw[:8], name='Agent', scopes=['read', 'search']))
+        session.commit()
+        headers = {'Authorization': f'Bearer {raw}'}
+
+        assert client.post('/api/ai/jobs', json={'kind': 'test_echo'}, headers=headers).status_code == 202
+        response = client.post('/api/ai/jobs', json={'kind': 'test_write'}, headers=headers)
+        assert response.status_code == 403 and 'write' in response.get_json()['error']
+        # Session users are not limited by scopes
+        assert client.post('/api/ai/jobs', json={'kind': 'test_write'}).status_code == 202
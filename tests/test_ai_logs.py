@@ -0,0 +1,176 @@
+"""
+Tests for tenant AI interaction log listing and export (ai_logs.py).
+
+Covers:
+- Keyset pages walk every row once, newest first, including rows sharing a timestamp
+- Channel, action, success and date filters; query_text only on request
+- Invalid filters and cursors
+- CSV and NDJSON export, with spreadsheet formulas neutralized
+- GET /api/tenant/ai/logs and /api/tenant/ai/logs/export
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, AIAction, AIChannel, AIInteractionLog, AuditLog, GlobalRole, TenantMembership
+from ai_logs import LogFilters, decode_cursor, iter_export, list_logs, parse_filters
+from tests.app_test_utils import load_test_app
+
+BASE = datetime(2026, 10, 1, 12, 0, 0)
+
+
+def _logs(session, tenant, count=7):
+    """count logs one minute apart; the last two share a timestamp. Every third one failed over Slack."""
+    logs = []
+    for n in range(count):
+        logs.append(AIInteractionLog(
+            tenant_id=tenant.id, channel=AIChannel.SLACK if n % 3 == 0 else AIChannel.MCP,
+            action=AIAction.SEARCH if n % 2 else AIAction.READ, query_text=f'question {n}',
+            decision_ids=[n, n + 1], decision_count=2, success=n % 3 != 0, cache_hit=None,
+            created_at=BASE + timedelta(minutes=min(n, max(count - 2, 0))),
+        ))
+    session.add_all(logs)
+    session.commit()
+    return logs
+
+
+class TestListLogs:
+    """Keyset pages and SQL filters."""
+
+    def test_pages_cover_every_row_once(self, session, sample_tenant, other_tenant):
+        logs = _logs(session, sample_tenant)
+        _logs(session, other_tenant)
+
+        seen, cursor = [], None
+        while True:
+            page = list_logs(sample_tenant.id, LogFilters(), limit=3, cursor=cursor)
+            seen.extend(log['id'] for log in page['logs'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        expected = sorted(logs, key=lambda log: (log.created_at, log.id), reverse=True)
+        assert seen == [log.id for log in expected]
+
+    def test_projection(self, session, sample_tenant):
+        _logs(session, sample_tenant, count=1)
+        log = list_logs(sample_tenant.id, LogFilters())['logs'][0]
+        assert 'query_text' not in log
+        assert (log['channel'], log['action'], log['cache_hit'], log['decision_ids']) == ('slack', 'read', False, [0, 1])
+        assert log['created_at'] == BASE.isoformat()
+
+        log = list_logs(sample_tenant.id, LogFilters(include_query=True))['logs'][0]
+        assert log['query_text'] == 'question 0'
+        assert set(log) == set(session.get(AIInteractionLog, log['id']).to_dict())
+
+    def test_filters(self, session, sample_tenant):
+        _logs(session, sample_tenant)
+
+        def ids(**args):
+            return [log['id'] for log in list_logs(sample_tenant.id, parse_filters(args))['logs']]
+
+        assert len(ids(channel='slack')) == 3
+        assert len(ids(action='search')) == 3
+        assert len(ids(success='false')) == 3
+        assert len(ids(start_date=(BASE + timedelta(minutes=2)).isoformat(),
+                       end_date=(BASE + timedelta(minutes=4)).isoformat())) == 3
+        assert len(ids(start_date='2026-10-01T12:03:00Z')) == 4
+
+    @pytest.mark.parametrize('args,message', [
+        ({'channel': 'fax'}, 'Invalid channel: fax'),
+        ({'success': 'maybe'}, 'Invalid success: must be true or false'),
+        ({'start_date': 'yesterday'}, 'Invalid start_date format'),
+    ])
+    def test_invalid_filters(self, args, message):
+        with pytest.raises(ValueError, match=message):
+            parse_filters(args)
+
+    def test_invalid_cursor(self):
+        with pytest.raises(ValueError, match='Invalid cursor'):
+            decode_cursor('not-a-cursor')
+
+
+class TestExport:
+    """Every matching row, in batches."""
+
+    def test_ndjson(self, session, sample_tenant):
+        _logs(session, sample_tenant)
+        lines = ''.join(iter_export(sample_tenant.id, LogFilters(success=True), 'ndjson', batch_size=2)).splitlines()
+        assert len(lines) == 4
+        assert all(json.loads(line)['success'] for line in lines)
+
+    def test_csv(self, session, sample_tenant):
+        _logs(session, sample_tenant, count=3)
+        session.add(AIInteractionLog(tenant_id=sample_tenant.id, channel=AIChannel.API, action=AIAction.SEARCH,
+                                     query_text='=HYPERLINK("http://evil")', created_at=BASE - timedelta(days=1)))
+        session.commit()
+
+        text = ''.join(iter_export(sample_tenant.id, LogFilters(include_query=True), 'csv', batch_size=2))
+        rows = list(csv.DictReader(io.StringIO(text)))
+        assert len(rows) == 4
+        assert rows[0]['decision_ids'] == '2 3'
+        assert rows[-1]['query_text'] == '\'=HYPERLINK("http://evil")'
+
+
+class TestEndpoints:
+    """Admins and stewards page and export their tenant's logs."""
+
+    @pytest.fixture
+    def app(self):
+        app_module, test_app = load_test_app(secret_key='ai-logs-secret')
+        with test_app.app_context():
+            db.create_all()
+            yield test_app
+            db.session.remove()
+            db.drop_all()
+            app_module._db_initialized = False
+
+    @pytest.fixture
+    def client(self, app, session, sample_tenant, sample_user):
+        sample_user.set_password('ai-logs-password-123')
+        membership = TenantMembership(user_id=sample_user.id, tenant_id=sample_tenant.id, global_role=GlobalRole.ADMIN)
+        session.add(membership)
+        session.commit()
+        _logs(session, sample_tenant)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = sample_user.id
+            sess['_csrf_token'] = 'test-csrf-token'
+            sess['_expires_at'] = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+        client.environ_base['HTTP_X_CSRF_TOKEN'] = 'test-csrf-token'
+        client.membership = membership
+        return client
+
+    def test_list_pages(self, client):
+        first = client.get('/api/tenant/ai/logs?limit=3&channel=mcp').get_json()
+        assert len(first['logs']) == 3 and first['next_cursor']
+        second = client.get(f"/api/tenant/ai/logs?limit=3&channel=mcp&cursor={first['next_cursor']}").get_json()
+        assert [len(second['logs']), second['next_cursor']] == [1, None]
+
+        legacy = client.get('/api/tenant/ai/logs?limit=2&offset=5').get_json()
+        assert (legacy['offset'], len(legacy['logs'])) == (5, 2)
+
+    def test_bad_requests(self, client):
+        assert client.get('/api/tenant/ai/logs?action=dance').status_code == 400
+        assert client.get('/api/tenant/ai/logs?cursor=zzz').status_code == 400
+        assert client.get('/api/tenant/ai/logs/export?format=xlsx').status_code == 400
+
+    def test_export_is_audited(self, client):
+        response = client.get('/api/tenant/ai/logs/export?format=csv&success=false')
+        assert response.mimetype == 'text/csv'
+        assert 'ai-logs-example.com-' in response.headers['Content-Disposition']
+        assert len(response.get_data(as_text=True).splitlines()) == 4
+        audit = AuditLog.query.filter_by(action_type=AuditLog.ACTION_AI_LOGS_EXPORTED).one()
+        assert audit.details == {'format': 'csv', 'success': 'false'}
+
+    def test_members_denied(self, client):
+        client.membership.global_role = GlobalRole.USER
+        db.session.commit()
+        assert client.get('/api/tenant/ai/logs').status_code == 403
+        assert client.get('/api/tenant/ai/logs/export').status_code == 403
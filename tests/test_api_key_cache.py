@@ -0,0 +1,226 @@
+"""
+Tests for the AI API key authentication cache (api_key_cache.py).
+
+Covers:
+- Principals of valid keys, and None for unknown, revoked and expired keys
+- Cached authentication without SQL, expiry while cached
+- Invalidation on revoke, tenant AI settings, opt-out changes and anonymization (not last_used_at)
+- MCP authentication rejects keys once the tenant turns external access off
+- Batched last_used_at writes
+"""
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, AIApiKey, Tenant, TenantMembership
+from api_key_cache import ApiKeyCache, LocalApiKeyStore, api_key_activity, api_key_cache, principal_for_key
+from rate_limits import hash_api_key
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture
+def cache():
+    previous = api_key_cache._store
+    api_key_cache.store = LocalApiKeyStore()
+    yield api_key_cache
+    api_key_cache.store = previous
+
+
+@pytest.fixture
+def statements(session):
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def _key(session, tenant, user, scopes=('read', 'search'), expires_at=None, member=True):
+    if member:
+        session.add(TenantMembership(user_id=user.id, tenant_id=tenant.id))
+    raw = f'adr_{secrets.token_urlsafe(24)}'
+    key = AIApiKey(user_id=user.id, tenant_id=tenant.id, key_hash=hash_api_key(raw), key_prefix=raw[:8],
+                   name='Agent', scopes=list(scopes), expires_at=expires_at)
+    session.add(key)
+    session.commit()
+    return raw, key
+
+
+class TestPrincipal:
+    """Principals are built from one query."""
+
+    def test_valid_key(self, session, ai_tenant, sample_user):
+        raw, key = _key(session, ai_tenant, sample_user, scopes=('read', 'write'))
+        principal = principal_for_key(hash_api_key(raw))
+        assert principal.key_id == key.id
+        assert principal.scopes == ('read', 'write')
+        assert principal.allows_mcp
+
+    @pytest.mark.parametrize('ai_tenant', [{'ai_features_enabled': False}], indirect=True)
+    def test_flags(self, session, ai_tenant, sample_user):
+        raw, _key_row = _key(session, ai_tenant, sample_user, member=False)
+        principal = principal_for_key(hash_api_key(raw))
+        assert not principal.ai_enabled and not principal.member
+        assert not principal.allows_mcp
+
+    @pytest.mark.parametrize('ai_tenant', [{'ai_external_access_enabled': False}], indirect=True)
+    def test_external_access_required(self, session, ai_tenant, sample_user):
+        raw, _key_row = _key(session, ai_tenant, sample_user)
+        principal = principal_for_key(hash_api_key(raw))
+        assert principal.ai_enabled and not principal.external_access
+        assert not principal.allows_mcp
+
+    def test_invalid_keys(self, session, ai_tenant, sample_user):
+        assert principal_for_key(hash_api_key('adr_unknown')) is None
+        raw, key = _key(session, ai_tenant, sample_user, expires_at=_utcnow() - timedelta(minutes=1))
+        assert principal_for_key(hash_api_key(raw)) is None
+        key.expires_at = None
+        key.revoke()
+        session.commit()
+        assert principal_for_key(hash_api_key(raw)) is None
+
+
+class TestCache:
+    """Known keys authenticate without SQL."""
+
+    def test_cached(self, session, cache, statements, ai_tenant, sample_user):
+        raw, _key_row = _key(session, ai_tenant, sample_user)
+        statements.clear()
+        first = cache.authenticate(raw)
+        assert len(statements) == 1
+        assert cache.authenticate(raw) == first
+        assert len(statements) == 1
+
+    def test_expires_while_cached(self, session, ai_tenant, sample_user):
+        raw, _key_row = _key(session, ai_tenant, sample_user, expires_at=_utcnow() + timedelta(seconds=0.3))
+        local = ApiKeyCache(store=LocalApiKeyStore(ttl=300))
+        assert local.authenticate(raw) is not None
+        time.sleep(0.4)
+        assert local.authenticate(raw) is None
+        assert local.store.get(hash_api_key(raw)) is None
+
+    def test_unknown_keys_not_cached(self, session, cache):
+        assert cache.authenticate('adr_unknown') is None
+        assert cache.store.get(hash_api_key('adr_unknown')) is None
+
+
+class TestInvalidation:
+    """Commits that change authorization drop cached keys."""
+
+    def test_revoke(self, session, cache, ai_tenant, sample_user):
+        raw, key = _key(session, ai_tenant, sample_user)
+        assert cache.authenticate(raw) is not None
+        key.revoke()
+        session.commit()
+        assert cache.store.get(key.key_hash) is None
+        assert cache.authenticate(raw) is None
+
+    def test_tenant_ai_disabled(self, session, cache, ai_tenant, sample_user):
+        raw, key = _key(session, ai_tenant, sample_user)
+        assert cache.authenticate(raw).allows_mcp
+        tenant = db.session.get(Tenant, key.tenant_id)
+        tenant.ai_features_enabled = False
+        session.commit()
+        assert not cache.authenticate(raw).allows_mcp
+
+    def test_external_access_disabled(self, session, cache, ai_tenant, sample_user):
+        raw, _key_row = _key(session, ai_tenant, sample_user)
+        assert cache.authenticate(raw).allows_mcp
+        ai_tenant.ai_external_access_enabled = False
+        session.commit()
+        assert not cache.authenticate(raw).allows_mcp
+
+    def test_opt_out(self, session, cache, ai_tenant, sample_user):
+        raw, key = _key(session, ai_tenant, sample_user)
+        assert cache.authenticate(raw).allows_mcp
+        TenantMembership.query.filter_by(user_id=key.user_id).one().ai_opt_out = True
+        session.commit()
+        assert cache.authenticate(raw).opted_out
+
+    def test_anonymized_user(self, session, cache, ai_tenant, sample_user):
+        from gdpr_jobs import anonymize_user
+
+        raw, _key_row = _key(session, ai_tenant, sample_user)
+        assert cache.authenticate(raw).allows_mcp
+        assert anonymize_user(sample_user.id)
+        assert cache.store.get(hash_api_key(raw)) is None
+        assert not cache.authenticate(raw).allows_mcp
+
+    def test_last_used_keeps_entry(self, session, cache, ai_tenant, sample_user):
+        raw, key = _key(session, ai_tenant, sample_user)
+        cache.authenticate(raw)
+        key.last_used_at = _utcnow()
+        session.commit()
+        assert cache.store.get(key.key_hash) is not None
+
+    def test_rollback_keeps_entry(self, session, cache, ai_tenant, sample_user):
+        raw, key = _key(session, ai_tenant, sample_user)
+        cache.authenticate(raw)
+        key.revoke()
+        session.flush()
+        session.rollback()
+        assert cache.store.get(hash_api_key(raw)) is not None
+
+
+class TestMcpAuthentication:
+    """The MCP endpoint accepts cached keys without asking the enterprise authenticator."""
+
+    @pytest.fixture
+    def app(self):
+        from tests.app_test_utils import load_test_app
+
+        app_module, test_app = load_test_app(secret_key='test-secret-key-api-key-cache-0123456789')
+        with test_app.app_context():
+            db.create_all()
+            yield test_app
+            db.session.remove()
+            db.drop_all()
+            app_module._db_initialized = False
+
+    def test_external_access_disabled(self, app, session, cache, ai_tenant, sample_user):
+        import app as app_module
+
+        raw, _key_row = _key(session, ai_tenant, sample_user)
+        with app.app_context(), app.test_request_context('/api/mcp'):
+            assert app_module._authenticate_mcp(raw) == (True, None, None)
+
+        ai_tenant.ai_external_access_enabled = False
+        session.commit()
+        with app.app_context(), app.test_request_context('/api/mcp'):
+            success, _handler, error = app_module._authenticate_mcp(raw)
+        assert not success
+        assert error == 'External AI access is not enabled for this organization'
+
+
+class TestLastUsed:
+    """last_used_at is recorded on first use, then batched."""
+
+    def test_first_use_immediate_then_batched(self, session, statements, ai_tenant, sample_user):
+        _raw, key = _key(session, ai_tenant, sample_user)
+        key.update_last_used()
+        session.commit()
+        first_use = key.last_used_at
+        assert first_use is not None
+
+        statements.clear()
+        for _ in range(10):
+            key.update_last_used()
+        assert statements == []
+        assert key.id in api_key_activity.pending()
+
+        assert api_key_activity.flush() == 1
+        session.expire_all()
+        assert db.session.get(AIApiKey, key.id).last_used_at > first_use.replace(tzinfo=None)
@@ -0,0 +1,198 @@
+"""
+Tests for the background event loop used by the Teams bot (async_loop.py).
+
+Covers:
+- Coroutines run on a long-lived loop per calling thread and return results or raise
+- The caller's context (app context, request) is visible to the coroutine
+- Blocking work in one thread's handler does not hold up other threads
+- Timeouts cancel the coroutine, and run() returns once it has stopped
+- Shared resources are created once per loop and closed at shutdown
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+from flask import Flask, current_app, g, request
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_loop import BackgroundLoop
+
+
+@pytest.fixture
+def background():
+    loop = BackgroundLoop('test', timeout=5)
+    yield loop
+    loop.shutdown()
+
+
+async def _loop_identity():
+    await asyncio.sleep(0)
+    return id(asyncio.get_running_loop()), threading.current_thread().name
+
+
+class TestRun:
+    """run() drives coroutines on the background loop."""
+
+    def test_same_loop_every_time(self, background):
+        results = {background.run(_loop_identity()) for _ in range(20)}
+        assert len(results) == 1
+        assert results.pop()[1] == threading.current_thread().name
+        assert background.stats()['completed'] == 20
+        assert background.stats()['loops'] == 1
+
+    def test_concurrent_callers(self, background):
+        async def echo(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = {}
+
+        def call(i):
+            results[i] = background.run(echo(i))
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == {i: i for i in range(16)}
+
+    def test_blocking_handler_holds_up_only_its_thread(self, background):
+        released = threading.Event()
+
+        async def blocking():
+            released.wait(5)  # A sync database query, say
+            return 'blocked'
+
+        async def quick():
+            return 'quick'
+
+        results = {}
+        thread = threading.Thread(target=lambda: results.update(blocking=background.run(blocking())))
+        thread.start()
+        started = time.monotonic()
+        assert background.run(quick()) == 'quick'
+        assert time.monotonic() - started < 1
+        released.set()
+        thread.join()
+        assert results == {'blocking': 'blocked'}
+
+    def test_exceptions_propagate(self, background):
+        async def broken():
+            raise ValueError('bad activity')
+
+        with pytest.raises(ValueError, match='bad activity'):
+            background.run(broken())
+        assert background.stats()['failed'] == 1
+
+    def test_timeout_cancels(self, background):
+        cancelled = threading.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with pytest.raises(TimeoutError):
+            background.run(slow(), timeout=0.05)
+        assert cancelled.is_set()
+        assert background.stats()['timed_out'] == 1
+
+    def test_timeout_waits_for_blocking_work(self, background):
+        # The coroutine is only cancelled at its next await; run() must not
+        # return while it still uses the request's context
+        finished = threading.Event()
+
+        async def stuck():
+            time.sleep(0.2)
+            finished.set()
+            await asyncio.sleep(10)
+
+        with pytest.raises(TimeoutError):
+            background.run(stuck(), timeout=0.05)
+        assert finished.is_set()
+
+    def test_run_from_loop_rejected(self, background):
+        async def nested():
+            coro = _loop_identity()
+            try:
+                background.run(coro)
+            finally:
+                coro.close()
+
+        with pytest.raises(RuntimeError):
+            background.run(nested())
+
+
+class TestContext:
+    """The coroutine sees the caller's Flask context."""
+
+    def test_request_context(self, background):
+        app = Flask(__name__)
+
+        async def handler():
+            return current_app.name, request.path, g.tenant
+
+        with app.test_request_context('/api/teams/webhook'):
+            g.tenant = 'example.com'
+            assert background.run(handler()) == (app.name, '/api/teams/webhook', 'example.com')
+
+
+class TestShared:
+    """Shared resources live as long as the loop."""
+
+    def test_created_once_and_closed(self):
+        background = BackgroundLoop('test')
+        created = []
+
+        class Session:
+            closed = False
+
+            async def close(self):
+                self.closed = True
+
+        def factory():
+            asyncio.get_running_loop()  # Factories may need the running loop
+            created.append(Session())
+            return created[-1]
+
+        async def use():
+            return background.shared('http', factory)
+
+        first = background.run(use())
+        assert background.run(use()) is first
+        assert len(created) == 1
+
+        background.shutdown()
+        assert first.closed
+        assert background.stats()['loops'] == 0
+
+    def test_outside_loop_rejected(self, background):
+        with pytest.raises(RuntimeError):
+            background.shared('http', object)
+
+    def test_one_per_thread(self, background):
+        async def use():
+            return background.shared('http', object)
+
+        first = background.run(use())
+        other = []
+        thread = threading.Thread(target=lambda: other.append(background.run(use())))
+        thread.start()
+        thread.join()
+        assert background.run(use()) is first
+        assert other[0] is not first
+        assert background.stats()['shared'] == ['http']
+
+    def test_restarts_after_shutdown(self, background):
+        first = background.run(_loop_identity())
+        background.shutdown()
+        assert background.stats()['loops'] == 0
+        assert background.run(_loop_identity()) != first
+        assert background.stats()['loops'] == 1
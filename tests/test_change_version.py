@@ -0,0 +1,173 @@
+"""
+Tests for per-tenant change versions and conditional GET (change_version.py).
+
+Covers:
+- Flushes touching decisions, comments, spaces and infrastructure bump the version
+- Unrelated writes and other tenants are not bumped
+- Explicit bumps for set-based writes
+- ETag / If-None-Match on the decision, space and infrastructure read endpoints
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import (
+    db, User, Tenant, TenantMembership, Space, DecisionSpace, ArchitectureDecision,
+    DecisionComment, ITInfrastructure, AuditLog, GlobalRole, MaturityState,
+)
+from change_version import bump_change_version, get_change_version
+from tests.app_test_utils import load_test_app
+
+
+def create_decision(session, tenant, user, number=1):
+    decision = ArchitectureDecision(
+        title=f'Decision {number}', context='c', decision='d', status='proposed', consequences='q',
+        domain=tenant.domain, tenant_id=tenant.id, decision_number=number, created_by_id=user.id,
+    )
+    session.add(decision)
+    session.commit()
+    return decision
+
+
+class TestAutomaticBumps:
+    """ORM flushes bump the affected tenant's version."""
+
+    def test_starts_at_zero(self, app, session):
+        assert get_change_version('nobody.com') == 0
+
+    def test_decision_create_update_delete(self, app, session, sample_tenant, sample_user):
+        start = get_change_version('example.com')
+        decision = create_decision(session, sample_tenant, sample_user)
+        after_create = get_change_version('example.com')
+        assert after_create > start
+
+        decision.title = 'Renamed'
+        session.commit()
+        assert get_change_version('example.com') == after_create + 1
+
+        session.delete(decision)
+        session.commit()
+        assert get_change_version('example.com') == after_create + 2
+
+    def test_comment_space_and_link(self, app, session, sample_tenant, sample_user):
+        decision = create_decision(session, sample_tenant, sample_user)
+        version = get_change_version('example.com')
+
+        session.add(DecisionComment(decision_id=decision.id, tenant_id=sample_tenant.id,
+                                    user_id=sample_user.id, body='Hi'))
+        session.commit()
+        assert get_change_version('example.com') == version + 1
+
+        space = Space(tenant_id=sample_tenant.id, name='Platform')
+        session.add(space)
+        session.commit()
+        assert get_change_version('example.com') == version + 2
+
+        session.add(DecisionSpace(decision_id=decision.id, space_id=space.id))
+        session.commit()
+        assert get_change_version('example.com') == version + 3
+
+    def test_infrastructure(self, app, session):
+        session.add(ITInfrastructure(name='DB', type='database', domain='infra.com'))
+        session.commit()
+        assert get_change_version('infra.com') == 1
+
+    def test_unrelated_write_and_other_tenant(self, app, session, sample_tenant, sample_user):
+        create_decision(session, sample_tenant, sample_user)
+        version = get_change_version('example.com')
+
+        session.add(AuditLog(tenant_id=sample_tenant.id, actor_user_id=sample_user.id,
+                             action_type=AuditLog.ACTION_USER_JOINED, target_entity='user'))
+        session.add(ITInfrastructure(name='Queue', type='service', domain='other.com'))
+        session.commit()
+        assert get_change_version('example.com') == version
+
+    def test_rollback_discards_bump(self, app, session, sample_tenant, sample_user):
+        decision = create_decision(session, sample_tenant, sample_user)
+        version = get_change_version('example.com')
+
+        decision.title = 'Not kept'
+        session.flush()
+        session.rollback()
+        assert get_change_version('example.com') == version
+
+    def test_explicit_bump(self, app, session):
+        bump_change_version('bulk.com', None)
+        bump_change_version('bulk.com')
+        session.commit()
+        assert get_change_version('bulk.com') == 2
+
+
+class TestConditionalGet:
+    """ETag / If-None-Match on tenant read endpoints."""
+
+    @pytest.fixture
+    def client_and_data(self):
+        app_module, test_app = load_test_app(secret_key='test-secret-key-etag')
+
+        with test_app.app_context():
+            db.create_all()
+            app_module.init_database()
+
+            tenant = Tenant(domain='etag.com', name='ETag Corp', status='active',
+                            maturity_state=MaturityState.BOOTSTRAP)
+            user = User(email='admin@etag.com', sso_domain='etag.com', auth_type='local', email_verified=True)
+            user.set_password('etagpassword')
+            db.session.add_all([tenant, user])
+            db.session.commit()
+            db.session.add(TenantMembership(user_id=user.id, tenant_id=tenant.id, global_role=GlobalRole.ADMIN))
+            db.session.add(Space(tenant_id=tenant.id, name='General', is_default=True))
+            db.session.commit()
+            decision = create_decision(db.session, tenant, user)
+
+            client = test_app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = user.id
+                sess['_csrf_token'] = 'test-csrf-token'
+                sess['_expires_at'] = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+            client.environ_base['HTTP_X_CSRF_TOKEN'] = 'test-csrf-token'
+
+            yield client, decision
+            db.session.remove()
+            db.drop_all()
+            app_module._db_initialized = False
+
+    @pytest.mark.parametrize('path', ['/api/decisions', '/api/spaces', '/api/infrastructure'])
+    def test_not_modified(self, client_and_data, path):
+        client, _ = client_and_data
+        first = client.get(path)
+        assert first.status_code == 200
+        etag = first.headers['ETag']
+        assert first.headers['Cache-Control'] == 'private, no-cache'
+
+        second = client.get(path, headers={'If-None-Match': etag})
+        assert second.status_code == 304
+        assert second.get_data() == b''
+        assert second.headers['ETag'] == etag
+
+    def test_write_changes_etag(self, client_and_data):
+        client, decision = client_and_data
+        etag = client.get(f'/api/decisions/{decision.id}').headers['ETag']
+
+        response = client.put(f'/api/decisions/{decision.id}', json={'title': 'Updated title'})
+        assert response.status_code == 200
+
+        refreshed = client.get(f'/api/decisions/{decision.id}', headers={'If-None-Match': etag})
+        assert refreshed.status_code == 200
+        assert refreshed.headers['ETag'] != etag
+        assert refreshed.get_json()['title'] == 'Updated title'
+
+    def test_etag_differs_per_resource(self, client_and_data):
+        client, decision = client_and_data
+        list_etag = client.get('/api/decisions').headers['ETag']
+        item_etag = client.get(f'/api/decisions/{decision.id}').headers['ETag']
+        assert list_etag != item_etag
+        assert client.get('/api/decisions/999999', headers={'If-None-Match': item_etag}).status_code == 404
+
+    def test_teams_paths_still_strip_validators(self, client_and_data):
+        client, _ = client_and_data
+        response = client.get('/teams/tab')
+        assert 'ETag' not in response.headers
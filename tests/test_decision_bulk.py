@@ -0,0 +1,265 @@
+"""
+Tests for bulk decision mutation (decision_bulk.py, POST /api/decisions/bulk).
+
+Covers:
+- Request validation (ids, status, owner, spaces)
+- Status/owner patch writes one history row per changed decision
+- Space membership replace/add/remove
+- Compact per-id results (updated / unchanged / not_found)
+- One digest email per subscriber
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import (
+    db, User, Tenant, TenantMembership, Space, DecisionSpace, ArchitectureDecision,
+    DecisionHistory, Subscription, GlobalRole, MaturityState,
+)
+from decision_bulk import BulkPatchError, validate_bulk_request, apply_bulk_patch
+from tests.app_test_utils import load_test_app
+
+
+def create_decision(session, tenant, user, number, status='proposed', domain=None):
+    decision = ArchitectureDecision(
+        title=f'Decision {number}', context='c', decision='d', status=status, consequences='q',
+        domain=domain or tenant.domain, tenant_id=tenant.id, decision_number=number,
+        created_by_id=user.id,
+    )
+    session.add(decision)
+    session.commit()
+    return decision
+
+
+@pytest.fixture
+def spaces(session, sample_tenant):
+    general = Space(tenant_id=sample_tenant.id, name='General', is_default=True)
+    platform = Space(tenant_id=sample_tenant.id, name='Platform')
+    session.add_all([general, platform])
+    session.commit()
+    return general, platform
+
+
+class TestValidation:
+    """validate_bulk_request rejects malformed input."""
+
+    @pytest.mark.parametrize('data, message', [
+        (None, 'No data provided'),
+        ({'ids': [], 'patch': {'status': 'archived'}}, 'ids is required'),
+        ({'ids': ['1'], 'patch': {'status': 'archived'}}, 'list of integers'),
+        ({'ids': [1]}, 'patch is required'),
+        ({'ids': [1], 'patch': {'status': 'done'}}, 'Invalid status'),
+        ({'ids': [1], 'patch': {'title': 'x'}}, 'no supported fields'),
+        ({'ids': [1], 'patch': {'space_ids': [1], 'add_space_ids': [2]}}, 'cannot be combined'),
+    ])
+    def test_invalid_requests(self, app, session, sample_tenant, data, message):
+        with pytest.raises(BulkPatchError, match=message):
+            validate_bulk_request(data, 'example.com', sample_tenant)
+
+    def test_too_many_ids(self, app, session, sample_tenant):
+        with pytest.raises(BulkPatchError, match='At most'):
+            validate_bulk_request({'ids': list(range(1, 502)), 'patch': {'status': 'archived'}},
+                                  'example.com', sample_tenant)
+
+    def test_owner_must_be_in_tenant(self, app, session, sample_tenant):
+        outsider = User(email='x@elsewhere.com', sso_domain='elsewhere.com', auth_type='local')
+        session.add(outsider)
+        session.commit()
+        with pytest.raises(BulkPatchError, match='owner_id'):
+            validate_bulk_request({'ids': [1], 'patch': {'owner_id': outsider.id}}, 'example.com', sample_tenant)
+
+    def test_spaces_must_belong_to_tenant(self, app, session, sample_tenant):
+        other = Tenant(domain='other.com', name='Other', status='active', maturity_state=MaturityState.BOOTSTRAP)
+        session.add(other)
+        session.commit()
+        foreign = Space(tenant_id=other.id, name='Foreign')
+        session.add(foreign)
+        session.commit()
+        with pytest.raises(BulkPatchError, match='Invalid space IDs'):
+            validate_bulk_request({'ids': [1], 'patch': {'add_space_ids': [foreign.id]}},
+                                  'example.com', sample_tenant)
+
+    def test_duplicate_ids_collapsed(self, app, session, sample_tenant):
+        ids, patch = validate_bulk_request({'ids': [3, 1, 3], 'patch': {'status': 'archived'}},
+                                           'example.com', sample_tenant)
+        assert ids == [3, 1]
+        assert patch == {'status': 'archived'}
+
+
+class TestApplyBulkPatch:
+    """apply_bulk_patch applies one patch to many decisions."""
+
+    def test_status_patch_with_history(self, app, session, sample_tenant, sample_user):
+        d1 = create_decision(session, sample_tenant, sample_user, 1)
+        d2 = create_decision(session, sample_tenant, sample_user, 2, status='archived')
+        other = create_decision(session, sample_tenant, sample_user, 3, domain='other.com')
+
+        results, changed, status_changed = apply_bulk_patch(
+            [d1.id, d2.id, other.id, 9999], {'status': 'archived'}, 'example.com', sample_user, 'Cleanup'
+        )
+        session.commit()
+
+        assert results == [
+            {'id': d1.id, 'result': 'updated'},
+            {'id': d2.id, 'result': 'unchanged'},
+            {'id': other.id, 'result': 'not_found'},
+            {'id': 9999, 'result': 'not_found'},
+        ]
+        assert status_changed is True
+        assert [d.id for d in changed] == [d1.id]
+        assert db.session.get(ArchitectureDecision, d1.id).status == 'archived'
+        assert db.session.get(ArchitectureDecision, d1.id).updated_by_id == sample_user.id
+
+        history = DecisionHistory.query.all()
+        assert len(history) == 1
+        assert history[0].decision_id == d1.id
+        assert history[0].status == 'proposed'
+        assert history[0].change_reason == 'Cleanup'
+
+    def test_owner_patch(self, app, session, sample_tenant, sample_user):
+        owner = User(email='owner@example.com', sso_domain='example.com', auth_type='local')
+        session.add(owner)
+        session.commit()
+        decisions = [create_decision(session, sample_tenant, sample_user, n) for n in range(1, 4)]
+
+        results, changed, status_changed = apply_bulk_patch(
+            [d.id for d in decisions], {'owner_id': owner.id}, 'example.com', sample_user
+        )
+        session.commit()
+
+        assert status_changed is False
+        assert all(r['result'] == 'updated' for r in results)
+        assert {d.owner_id for d in ArchitectureDecision.query.all()} == {owner.id}
+        assert DecisionHistory.query.count() == 3
+
+    def test_replace_spaces(self, app, session, sample_tenant, sample_user, spaces):
+        general, platform = spaces
+        d1 = create_decision(session, sample_tenant, sample_user, 1)
+        d2 = create_decision(session, sample_tenant, sample_user, 2)
+        session.add_all([DecisionSpace(decision_id=d1.id, space_id=general.id),
+                         DecisionSpace(decision_id=d2.id, space_id=platform.id)])
+        session.commit()
+
+        results, _, _ = apply_bulk_patch([d1.id, d2.id], {'space_ids': [platform.id]}, 'example.com', sample_user)
+        session.commit()
+
+        assert results == [{'id': d1.id, 'result': 'updated'}, {'id': d2.id, 'result': 'unchanged'}]
+        links = {(link.decision_id, link.space_id) for link in DecisionSpace.query.all()}
+        assert links == {(d1.id, platform.id), (d2.id, platform.id)}
+        # Space moves do not snapshot history
+        assert DecisionHistory.query.count() == 0
+
+    def test_add_and_remove_spaces(self, app, session, sample_tenant, sample_user, spaces):
+        general, platform = spaces
+        d1 = create_decision(session, sample_tenant, sample_user, 1)
+        d2 = create_decision(session, sample_tenant, sample_user, 2)
+        session.add(DecisionSpace(decision_id=d1.id, space_id=general.id))
+        session.commit()
+
+        apply_bulk_patch([d1.id, d2.id], {'add_space_ids': [platform.id], 'remove_space_ids': [general.id]},
+                         'example.com', sample_user)
+        session.commit()
+
+        links = {(link.decision_id, link.space_id) for link in DecisionSpace.query.all()}
+        assert links == {(d1.id, platform.id), (d2.id, platform.id)}
+
+
+class TestDigestNotification:
+    """One digest email per subscriber."""
+
+    def test_one_email_per_subscriber(self, app, session, sample_tenant, sample_user, monkeypatch):
+        import notifications
+
+        subscriber = User(email='watcher@example.com', sso_domain='example.com', auth_type='local')
+        session.add(subscriber)
+        session.commit()
+        session.add(Subscription(user_id=subscriber.id, notify_on_update=False, notify_on_status_change=True))
+        session.commit()
+        decisions = [create_decision(session, sample_tenant, sample_user, n) for n in range(1, 6)]
+
+        sent = []
+        monkeypatch.setattr(notifications, 'send_email_batch',
+                            lambda config, to, subject, html, text=None: sent.append((to, subject, text)))
+        config = SimpleNamespace(enabled=True)
+
+        notifications.notify_subscribers_bulk_update(db, 'example.com', decisions, config, sample_user,
+                                                     'Cleanup', status_changed=True)
+        assert len(sent) == 1
+        assert sent[0][0] == ['watcher@example.com']
+        assert '5 architecture decisions updated' in sent[0][1]
+        assert 'Decision 5' in sent[0][2]
+
+        sent.clear()
+        # Not a status change: status-only subscribers are skipped
+        notifications.notify_subscribers_bulk_update(db, 'example.com', decisions, config, sample_user)
+        assert sent == []
+
+
+class TestBulkEndpoint:
+    """POST /api/decisions/bulk over HTTP."""
+
+    @pytest.fixture
+    def client_and_data(self):
+        app_module, test_app = load_test_app(secret_key='test-secret-key-bulk')
+
+        with test_app.app_context():
+            db.create_all()
+            app_module.init_database()
+
+            tenant = Tenant(domain='bulk.com', name='Bulk Corp', status='active',
+                            maturity_state=MaturityState.BOOTSTRAP)
+            admin = User(email='admin@bulk.com', sso_domain='bulk.com', auth_type='local', email_verified=True)
+            member = User(email='member@bulk.com', sso_domain='bulk.com', auth_type='local', email_verified=True)
+            for user in (admin, member):
+                user.set_password('bulkpassword')
+            db.session.add_all([tenant, admin, member])
+            db.session.commit()
+            db.session.add_all([
+                TenantMembership(user_id=admin.id, tenant_id=tenant.id, global_role=GlobalRole.ADMIN),
+                TenantMembership(user_id=member.id, tenant_id=tenant.id, global_role=GlobalRole.USER),
+            ])
+            db.session.commit()
+            decision_ids = [create_decision(db.session, tenant, admin, n).id for n in range(1, 4)]
+
+            def client_for(user):
+                client = test_app.test_client()
+                with client.session_transaction() as sess:
+                    sess['user_id'] = user.id
+                    sess['_csrf_token'] = 'test-csrf-token'
+                    sess['_expires_at'] = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+                client.environ_base['HTTP_X_CSRF_TOKEN'] = 'test-csrf-token'
+                return client
+
+            yield client_for(admin), client_for(member), decision_ids
+            db.session.remove()
+            db.drop_all()
+            app_module._db_initialized = False
+
+    def test_bulk_archive(self, client_and_data):
+        admin_client, _, decision_ids = client_and_data
+        response = admin_client.post('/api/decisions/bulk', json={
+            'ids': decision_ids + [424242],
+            'patch': {'status': 'archived'},
+            'change_reason': 'Quarterly cleanup',
+        })
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['updated'] == 3
+        assert data['not_found'] == 1
+        assert data['results'][-1] == {'id': 424242, 'result': 'not_found'}
+        assert ArchitectureDecision.query.filter_by(status='archived').count() == 3
+        assert DecisionHistory.query.filter_by(change_reason='Quarterly cleanup').count() == 3
+
+    def test_invalid_patch(self, client_and_data):
+        admin_client, _, decision_ids = client_and_data
+        response = admin_client.post('/api/decisions/bulk', json={'ids': decision_ids, 'patch': {'status': 'nope'}})
+        assert response.status_code == 400
+
+    def test_requires_steward_or_admin(self, client_and_data):
+        _, member_client, decision_ids = client_and_data
+        response = member_client.post('/api/decisions/bulk', json={'ids': decision_ids, 'patch': {'status': 'archived'}})
+        assert response.status_code == 403
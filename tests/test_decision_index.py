@@ -0,0 +1,233 @@
+"""
+Tests for the semantic decision index (decision_index.py).
+
+Covers:
+- Hashing embedder: deterministic, normalized, similar texts closer
+- Tenant vectors: upsert, delete, top-k order, persistence (with NumPy)
+- pgvector tables come from a migration, not from requests
+- Incremental sync: only changed decisions re-embedded, deletes and purges dropped
+- Hybrid ranking of cosine and keyword scores; keyword candidates ranked in SQL
+"""
+import json
+import math
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import ArchitectureDecision
+from decision_index import (
+    DecisionIndex, HashingEmbedder, MemoryVectorStore, NUMPY_AVAILABLE, PgVectorStore, TenantVectors, tokenize,
+)
+from migrations import migrate_2_1_3
+
+DOMAIN = 'example.com'
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dimensions=64)
+        self.texts = []
+
+    def embed(self, texts):
+        self.texts.extend(texts)
+        return super().embed(texts)
+
+
+def _cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+@pytest.fixture
+def index():
+    embedder = CountingEmbedder()
+    return DecisionIndex(embedder=embedder, store=MemoryVectorStore(embedder.dimensions), alpha=0.7)
+
+
+def _decision(session, number, title, body):
+    decision = ArchitectureDecision(title=title, context=body, decision=body, consequences='None', status='accepted',
+                                    domain=DOMAIN, decision_number=number)
+    session.add(decision)
+    return decision
+
+
+class TestEmbedder:
+    """The hashing baseline."""
+
+    def test_tokenize_drops_stopwords(self):
+        assert tokenize('How do we handle the Retries?') == ['handle', 'retries']
+
+    def test_deterministic_and_normalized(self):
+        embedder = HashingEmbedder(dimensions=32)
+        first, second = embedder.embed(['retry failed webhooks', 'retry failed webhooks'])
+        assert first == second
+        assert math.isclose(_cosine(first, first), 1.0, rel_tol=1e-9)
+        assert embedder.embed(['the of and'])[0] == [0.0] * 32
+
+    def test_similar_texts_closer(self):
+        embedder = HashingEmbedder()
+        query, near, far = embedder.embed([
+            'retry failed webhook deliveries', 'webhook deliveries retry with backoff', 'choose postgres database',
+        ])
+        assert _cosine(query, near) > _cosine(query, far)
+
+
+class TestTenantVectors:
+    """The per-tenant matrix."""
+
+    def test_top_k_order_and_delete(self):
+        vectors = TenantVectors(2)
+        vectors.upsert([(1, 'a', [1.0, 0.0]), (2, 'a', [0.0, 1.0]), (3, 'a', [0.6, 0.8])])
+        assert [decision_id for decision_id, _score in vectors.top_k([1.0, 0.0], 2)] == [1, 3]
+        vectors.delete([1])
+        assert len(vectors) == 2
+        assert [decision_id for decision_id, _score in vectors.top_k([1.0, 0.0], 5)] == [3, 2]
+        assert vectors.similarities([0.0, 1.0], [2, 9]) == {2: pytest.approx(1.0)}
+
+    def test_upsert_replaces(self):
+        vectors = TenantVectors(2)
+        vectors.upsert([(1, 'a', [1.0, 0.0])])
+        vectors.upsert([(1, 'b', [0.0, 1.0])])
+        assert len(vectors) == 1
+        assert vectors.versions == {1: 'b'}
+        assert vectors.top_k([0.0, 1.0], 1)[0][1] == pytest.approx(1.0)
+
+    @pytest.mark.skipif(not NUMPY_AVAILABLE, reason='persistence needs NumPy')
+    def test_saved_and_memory_mapped(self, tmp_path):
+        store = MemoryVectorStore(2, directory=str(tmp_path))
+        store.upsert(DOMAIN, [(1, 'a', [1.0, 0.0]), (2, 'a', [0.0, 1.0])])
+        store.commit(DOMAIN, {'model': 'm'})
+
+        reloaded = MemoryVectorStore(2, directory=str(tmp_path))
+        assert reloaded.meta(DOMAIN) == {'model': 'm'}
+        assert reloaded.versions(DOMAIN) == {1: 'a', 2: 'a'}
+        assert reloaded.top_k(DOMAIN, [0.0, 1.0], 1)[0][0] == 2
+        reloaded.delete(DOMAIN, [2])
+        assert reloaded.size(DOMAIN) == 1
+
+    @pytest.mark.skipif(not NUMPY_AVAILABLE, reason='persistence needs NumPy')
+    def test_save_publishes_matrix_with_ids(self, tmp_path):
+        store = MemoryVectorStore(2, directory=str(tmp_path))
+        store.upsert(DOMAIN, [(1, 'a', [1.0, 0.0])])
+        store.commit(DOMAIN, {})
+        store.upsert(DOMAIN, [(1, 'b', [0.0, 1.0])])
+        store.commit(DOMAIN, {})
+
+        # One matrix file, named by the JSON written with it; no temp files left behind
+        assert sorted(path.suffix for path in tmp_path.iterdir()) == ['.json', '.npy']
+        reloaded = MemoryVectorStore(2, directory=str(tmp_path))
+        assert reloaded.versions(DOMAIN) == {1: 'b'}
+        assert reloaded.top_k(DOMAIN, [0.0, 1.0], 1)[0][1] == pytest.approx(1.0)
+
+    @pytest.mark.skipif(not NUMPY_AVAILABLE, reason='persistence needs NumPy')
+    def test_mismatched_files_ignored(self, tmp_path):
+        store = MemoryVectorStore(2, directory=str(tmp_path))
+        store.upsert(DOMAIN, [(1, 'a', [1.0, 0.0]), (2, 'a', [0.0, 1.0])])
+        store.commit(DOMAIN, {})
+        path = store._path(DOMAIN)
+        with open(f'{path}.json') as f:
+            payload = json.load(f)
+        payload['ids'].append(3)
+        with open(f'{path}.json', 'w') as f:
+            json.dump(payload, f)
+
+        assert TenantVectors.load(path, 2) is None
+        assert MemoryVectorStore(2, directory=str(tmp_path)).size(DOMAIN) == 0
+
+
+class TestSync:
+    """Only changed decisions are re-embedded."""
+
+    def test_incremental(self, session, index):
+        decisions = [_decision(session, n, f'Decision {n}', f'Body {n}') for n in range(1, 4)]
+        session.commit()
+        assert index.sync(DOMAIN) == 3
+        assert index.sync(DOMAIN) == 0
+
+        decisions[0].title = 'Renamed'
+        session.commit()
+        assert index.sync(DOMAIN) == 1
+        assert index.store.size(DOMAIN) == 3
+
+    def test_soft_delete_and_purge(self, session, index):
+        decisions = [_decision(session, n, f'Decision {n}', f'Body {n}') for n in range(1, 4)]
+        session.commit()
+        index.sync(DOMAIN)
+
+        decisions[0].deleted_at = decisions[0].updated_at
+        session.commit()
+        index.sync(DOMAIN)
+        assert set(index.store.versions(DOMAIN)) == {decisions[1].id, decisions[2].id}
+
+        purged = decisions[1].id
+        ArchitectureDecision.query.filter_by(id=purged).delete()
+        from change_version import bump_change_version
+        bump_change_version(DOMAIN)
+        session.commit()
+        assert index.sync(DOMAIN) == 0
+        assert set(index.store.versions(DOMAIN)) == {decisions[2].id}
+
+    def test_model_change_rebuilds(self, session, index):
+        _decision(session, 1, 'Decision', 'Body')
+        session.commit()
+        index.sync(DOMAIN)
+        index.embedder = HashingEmbedder(dimensions=64)
+        index.embedder.name = 'other'
+        assert index.sync(DOMAIN) == 1
+
+
+class TestSearch:
+    """Hybrid ranking."""
+
+    def test_semantic_and_keyword(self, session, index):
+        webhooks = _decision(session, 1, 'Retry webhook deliveries', 'Failed webhook deliveries retry with backoff')
+        _decision(session, 2, 'Use PostgreSQL', 'We store decisions in PostgreSQL')
+        _decision(session, 3, 'Frontend framework', 'Angular for the single page app')
+        session.commit()
+
+        hits = index.search(DOMAIN, 'webhook retry', k=2)
+        assert hits[0].decision_id == webhooks.id
+        assert hits[0].keyword_score == 1.0
+        assert hits[0].score == pytest.approx(0.7 * hits[0].vector_score + 0.3)
+
+    def test_best_keyword_matches_kept(self, session, index):
+        # More body matches than the candidate pool, inserted before the title match
+        for number in range(1, 10):
+            _decision(session, number, f'Decision {number}', 'Failed deliveries are logged')
+        title_match = _decision(session, 10, 'Webhook deliveries', 'Failed deliveries retry with backoff')
+        session.commit()
+
+        scores = index.keyword_scores(DOMAIN, 'webhook deliveries', limit=4)
+        assert len(scores) == 4
+        assert scores[title_match.id] == 1.0
+        assert index.keyword_scores(DOMAIN, 'webhook deliveries', limit=4) == scores
+        assert index.search(DOMAIN, 'webhook deliveries', k=1)[0].decision_id == title_match.id
+
+    def test_deleted_decisions_not_returned(self, session, index):
+        decision = _decision(session, 1, 'Retry webhook deliveries', 'Backoff')
+        session.commit()
+        assert [hit.decision_id for hit in index.search(DOMAIN, 'webhook')] == [decision.id]
+        decision.deleted_at = decision.updated_at
+        session.commit()
+        assert index.search(DOMAIN, 'webhook') == []
+
+    def test_other_domains_excluded(self, session, index):
+        other = ArchitectureDecision(title='Retry webhooks', context='c', decision='d', consequences='q',
+                                     status='accepted', domain='other.com', decision_number=1)
+        session.add(other)
+        session.commit()
+        assert index.search(DOMAIN, 'webhooks') == []
+
+
+class TestPgVectorSchema:
+    """pgvector tables are created by a migration, never on the request path."""
+
+    def test_not_used_without_postgres(self, app, session):
+        from models import db
+        assert not PgVectorStore.available(db.engine, 64)
+        assert migrate_2_1_3(db) == 0
+
+    def test_schema_sized_to_embedder(self):
+        assert 'vector(384)' in PgVectorStore.schema_statements(384)[0]
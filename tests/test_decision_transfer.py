@@ -0,0 +1,325 @@
+"""
+Tests for tenant-wide bulk export and import of decisions (decision_transfer.py).
+
+Covers:
+- NDJSON export includes history and comments, scoped to the tenant
+- MADR tar export and Markdown parsing round-trip
+- Batched import: numbering, progress events, validation errors, default space link
+- A batch the database rejects is rolled back and ends the import with an error; oversized tar members are skipped
+- Import/export endpoints over HTTP
+"""
+import io
+import json
+import tarfile
+import pytest
+from datetime import datetime, timedelta, timezone
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+
+from models import (
+    db, User, Tenant, TenantMembership, Space, DecisionSpace, ArchitectureDecision,
+    DecisionHistory, DecisionComment, AuditLog, GlobalRole, MaturityState,
+)
+import decision_transfer
+from decision_transfer import (
+    iter_export_records, iter_export_ndjson, iter_export_madr_tar, render_madr, parse_madr,
+    iter_ndjson_records, iter_madr_tar_records, import_decisions,
+)
+from tests.app_test_utils import load_test_app
+
+
+def create_decision(session, tenant, user, title, number, status='proposed'):
+    decision = ArchitectureDecision(
+        title=title, context=f'{title} context', decision=f'{title} decision', status=status,
+        consequences=f'{title} consequences', domain=tenant.domain, tenant_id=tenant.id,
+        decision_number=number, created_by_id=user.id,
+    )
+    session.add(decision)
+    session.commit()
+    return decision
+
+
+def ndjson_source(records):
+    return io.BytesIO(''.join(json.dumps(r) + '\n' for r in records).encode('utf-8'))
+
+
+def run_import(records, tenant, user, batch_size=500):
+    events = list(import_decisions(records, tenant.domain, tenant, user, batch_size=batch_size))
+    return events, events[-1]
+
+
+@pytest.fixture
+def populated_tenant(session, sample_user, sample_tenant):
+    first = create_decision(session, sample_tenant, sample_user, 'Use PostgreSQL', 1, 'accepted')
+    create_decision(session, sample_tenant, sample_user, 'Adopt Kafka', 2)
+    session.add(DecisionHistory(decision_id=first.id, title='Use MySQL', context='old', decision_text='old',
+                                status='proposed', consequences='old', change_reason='Switched engine',
+                                changed_by_id=sample_user.id))
+    session.add(DecisionComment(decision_id=first.id, tenant_id=sample_tenant.id,
+                                user_id=sample_user.id, body='Agreed'))
+    other = Tenant(domain='other.com', name='Other', status='active', maturity_state=MaturityState.BOOTSTRAP)
+    session.add(other)
+    session.commit()
+    create_decision(session, other, sample_user, 'Other tenant decision', 1)
+    return sample_tenant
+
+
+class TestExport:
+    """Streaming export in both formats."""
+
+    def test_ndjson_includes_history_and_comments(self, app, session, populated_tenant, sample_user):
+        lines = ''.join(iter_export_ndjson('example.com', batch_size=1)).splitlines()
+        records = [json.loads(line) for line in lines]
+
+        assert [r['title'] for r in records] == ['Use PostgreSQL', 'Adopt Kafka']
+        first = records[0]
+        assert first['display_id'] == 'ADR-001'
+        assert first['created_by'] == sample_user.email
+        assert first['history'][0]['title'] == 'Use MySQL'
+        assert first['history'][0]['changed_by'] == sample_user.email
+        assert first['comments'][0]['body'] == 'Agreed'
+        assert first['comments'][0]['author'] == 'Test User'
+
+    def test_soft_deleted_decisions_excluded(self, app, session, populated_tenant):
+        decision = ArchitectureDecision.query.filter_by(title='Adopt Kafka').one()
+        decision.deleted_at = datetime.now(timezone.utc)
+        session.commit()
+
+        titles = [r['title'] for r in iter_export_records('example.com')]
+        assert titles == ['Use PostgreSQL']
+
+    def test_madr_tar(self, app, session, populated_tenant):
+        payload = b''.join(iter_export_madr_tar('example.com', batch_size=1))
+        with tarfile.open(fileobj=io.BytesIO(payload)) as archive:
+            names = archive.getnames()
+            assert names == ['decisions/0001-use-postgresql.md', 'decisions/0002-adopt-kafka.md']
+            text = archive.extractfile(names[0]).read().decode('utf-8')
+
+        assert text.startswith('---\nstatus: accepted\n')
+        assert '# Use PostgreSQL' in text
+        assert '## History' in text
+        assert 'Agreed' in text
+
+
+class TestMadrParsing:
+    """MADR Markdown round-trips through render and parse."""
+
+    def test_round_trip(self):
+        record = {
+            'title': 'Cache with Redis', 'status': 'accepted', 'context': 'Slow pages',
+            'decision': 'Use Redis', 'consequences': 'One more service',
+            'owner_email': 'owner@example.com', 'created_at': '2024-05-01T10:00:00',
+            'history': [], 'comments': [{'author': 'Ann', 'created_at': None, 'body': 'ok'}],
+        }
+        parsed = parse_madr(render_madr(record))
+
+        assert parsed['title'] == 'Cache with Redis'
+        assert parsed['status'] == 'accepted'
+        assert parsed['context'] == 'Slow pages'
+        assert parsed['decision'] == 'Use Redis'
+        assert parsed['consequences'] == 'One more service'
+        assert parsed['owner_email'] == 'owner@example.com'
+        assert parsed['created_at'] == '2024-05-01'
+
+    def test_plain_madr_without_front_matter(self):
+        parsed = parse_madr('# Title only\n\n## Context\n\nWhy\n')
+        assert parsed['title'] == 'Title only'
+        assert parsed['context'] == 'Why'
+
+
+class TestImport:
+    """Batched import with progress reporting."""
+
+    def test_numbers_allocated_after_existing(self, app, session, populated_tenant, sample_user):
+        records = iter_ndjson_records(ndjson_source([
+            {'title': 'Imported A', 'status': 'accepted'},
+            {'title': 'Imported B'},
+        ]))
+        events, summary = run_import(records, populated_tenant, sample_user)
+
+        assert summary['done'] is True
+        assert summary['imported'] == 2
+        assert summary['first_decision_number'] == 3
+        assert summary['last_decision_number'] == 4
+        imported = ArchitectureDecision.query.filter(
+            ArchitectureDecision.title.in_(['Imported A', 'Imported B'])
+        ).order_by(ArchitectureDecision.decision_number).all()
+        assert [d.decision_number for d in imported] == [3, 4]
+        assert imported[0].tenant_id == populated_tenant.id
+
+    def test_progress_reported_per_batch(self, app, session, sample_tenant, sample_user):
+        records = iter_ndjson_records(ndjson_source([{'title': f'Bulk {i}'} for i in range(1200)]))
+        events, summary = run_import(records, sample_tenant, sample_user, batch_size=500)
+
+        assert [e['imported'] for e in events] == [500, 1000, 1200]
+        assert [e['done'] for e in events] == [False, False, True]
+        assert ArchitectureDecision.query.filter_by(domain='example.com').count() == 1200
+        numbers = {n for (n,) in db.session.query(ArchitectureDecision.decision_number)}
+        assert numbers == set(range(1, 1201))
+
+    def test_invalid_records_reported(self, app, session, sample_tenant, sample_user):
+        source = io.BytesIO(b'{"title": "Good"}\nnot json\n{"context": "no title"}\n{"title": "X", "status": "bogus"}\n')
+        events, summary = run_import(iter_ndjson_records(source), sample_tenant, sample_user)
+
+        assert summary['imported'] == 1
+        assert summary['failed'] == 3
+        assert [e['record'] for e in summary['errors']] == [2, 3, 4]
+
+    def test_failed_batch_stops_import(self, app, session, sample_tenant, sample_user, monkeypatch):
+        insert_batch = decision_transfer._insert_batch
+        calls = []
+
+        def failing_second_batch(batch, *args):
+            calls.append(len(batch))
+            if len(calls) == 2:
+                db.session.add(ArchitectureDecision(title='Half written', domain='example.com', decision_number=99))
+                db.session.flush()
+                raise OperationalError('INSERT INTO architecture_decisions', {}, Exception('disk full'))
+            return insert_batch(batch, *args)
+
+        monkeypatch.setattr(decision_transfer, '_insert_batch', failing_second_batch)
+        records = iter_ndjson_records(ndjson_source([{'title': f'Bulk {i}'} for i in range(5)]))
+        events, summary = run_import(records, sample_tenant, sample_user, batch_size=2)
+
+        assert [e['done'] for e in events] == [False, True]
+        assert summary['imported'] == 2 and summary['last_decision_number'] == 2
+        assert 'could not be saved' in summary['error']
+        assert ArchitectureDecision.query.filter_by(domain='example.com').count() == 2
+
+    def test_oversized_tar_member_skipped(self, app, session, sample_tenant, sample_user, monkeypatch):
+        monkeypatch.setattr(decision_transfer, 'MAX_MADR_FILE_BYTES', 64)
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w') as archive:
+            for name, text in [('small.md', '# Small'), ('big.md', '# Big\n\n' + 'x' * 100)]:
+                data = text.encode('utf-8')
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+        buffer.seek(0)
+
+        results = list(iter_madr_tar_records(buffer))
+        assert [(name, error) for name, _record, error in results] == [
+            ('small.md', None), ('big.md', 'File is larger than 64 bytes'),
+        ]
+
+    def test_history_comments_and_default_space(self, app, session, sample_tenant, sample_user):
+        space = Space(tenant_id=sample_tenant.id, name='General', is_default=True)
+        session.add(space)
+        session.commit()
+
+        records = iter_ndjson_records(ndjson_source([{
+            'title': 'With extras',
+            'created_at': '2023-01-02T03:04:05+00:00',
+            'history': [{'title': 'Earlier', 'status': 'proposed', 'changed_at': '2022-12-01T00:00:00'}],
+            'comments': [{'author': 'Legacy Bob', 'body': 'Imported comment'}],
+        }]))
+        run_import(records, sample_tenant, sample_user)
+
+        decision = ArchitectureDecision.query.filter_by(title='With extras').one()
+        assert decision.created_at == datetime(2023, 1, 2, 3, 4, 5)
+        assert [h.title for h in decision.history] == ['Earlier']
+        comment = DecisionComment.query.filter_by(decision_id=decision.id).one()
+        assert comment.body == 'Imported comment'
+        assert comment.author_display == 'Legacy Bob'
+        assert DecisionSpace.query.filter_by(decision_id=decision.id, space_id=space.id).count() == 1
+
+    def test_import_madr_tar(self, app, session, populated_tenant, sample_user):
+        payload = b''.join(iter_export_madr_tar('example.com'))
+        target = Tenant(domain='target.com', name='Target', status='active', maturity_state=MaturityState.BOOTSTRAP)
+        session.add(target)
+        session.commit()
+
+        events = list(import_decisions(iter_madr_tar_records(io.BytesIO(payload)), 'target.com', target, sample_user))
+        assert events[-1]['imported'] == 2
+        imported = ArchitectureDecision.query.filter_by(domain='target.com').order_by(ArchitectureDecision.id).all()
+        assert [d.title for d in imported] == ['Use PostgreSQL', 'Adopt Kafka']
+        assert imported[0].status == 'accepted'
+        assert imported[0].context == 'Use PostgreSQL context'
+
+
+class TestTransferEndpoints:
+    """GET /api/decisions/export and POST /api/decisions/import."""
+
+    @pytest.fixture
+    def admin_client(self):
+        app_module, test_app = load_test_app(secret_key='test-secret-key-transfer')
+
+        with test_app.app_context():
+            db.create_all()
+            app_module.init_database()
+
+            tenant = Tenant(domain='transfer.com', name='Transfer Corp', status='active',
+                            maturity_state=MaturityState.BOOTSTRAP)
+            user = User(email='admin@transfer.com', sso_domain='transfer.com',
+                        auth_type='local', email_verified=True)
+            user.set_name(first_name='Transfer', last_name='Admin')
+            user.set_password('transferpassword')
+            db.session.add_all([tenant, user])
+            db.session.commit()
+            db.session.add(TenantMembership(user_id=user.id, tenant_id=tenant.id,
+                                            global_role=GlobalRole.ADMIN))
+            db.session.commit()
+
+            client = test_app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = user.id
+                sess['_csrf_token'] = 'test-csrf-token'
+                sess['_expires_at'] = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+            client.environ_base['HTTP_X_CSRF_TOKEN'] = 'test-csrf-token'
+
+            yield client, tenant
+            db.session.remove()
+            db.drop_all()
+            app_module._db_initialized = False
+
+    def test_import_then_export_ndjson(self, admin_client):
+        client, tenant = admin_client
+        body = '\n'.join(json.dumps({'title': f'HTTP {i}'}) for i in range(3))
+
+        response = client.post('/api/decisions/import', data=body, content_type='application/x-ndjson')
+        assert response.status_code == 201
+        summary = response.get_json()
+        assert summary['imported'] == 3
+        assert 'sample_titles' not in summary
+        assert AuditLog.query.filter_by(action_type=AuditLog.ACTION_DECISIONS_IMPORTED).count() == 1
+
+        response = client.get('/api/decisions/export')
+        assert response.status_code == 200
+        assert response.is_streamed
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [r['title'] for r in records] == ['HTTP 0', 'HTTP 1', 'HTTP 2']
+
+    def test_import_streams_progress(self, admin_client):
+        client, _ = admin_client
+        body = '\n'.join(json.dumps({'title': f'Streamed {i}'}) for i in range(2))
+
+        response = client.post('/api/decisions/import', data=body, content_type='application/x-ndjson',
+                               headers={'Accept': 'application/x-ndjson'})
+        assert response.status_code == 200
+        events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert events[-1]['done'] is True
+        assert events[-1]['imported'] == 2
+
+    def test_import_tar_upload(self, admin_client):
+        client, _ = admin_client
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+            payload = b'# Uploaded decision\n\n## Context and Problem Statement\n\nBecause\n'
+            info = tarfile.TarInfo('0001-uploaded.md')
+            info.size = len(payload)
+            archive.addfile(info, io.BytesIO(payload))
+        buffer.seek(0)
+
+        response = client.post('/api/decisions/import', data={'file': (buffer, 'adrs.tar.gz')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 201
+        assert response.get_json()['imported'] == 1
+
+    def test_export_invalid_format(self, admin_client):
+        client, _ = admin_client
+        response = client.get('/api/decisions/export?format=xml')
+        assert response.status_code == 400
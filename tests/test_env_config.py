@@ -0,0 +1,32 @@
+"""
+Tests for numeric environment settings (env_config.py).
+
+Covers:
+- Values are cast with the given type
+- Unset, empty and invalid values fall back to the default
+"""
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from env_config import env_number
+
+
+class TestEnvNumber:
+    """env_number() reads tuning knobs without failing startup."""
+
+    def test_cast(self, monkeypatch):
+        monkeypatch.setenv('TEST_ENV_NUMBER', '2.5')
+        assert env_number('TEST_ENV_NUMBER', 1.0, float) == 2.5
+        monkeypatch.setenv('TEST_ENV_NUMBER', '7')
+        assert env_number('TEST_ENV_NUMBER', 1) == 7
+
+    @pytest.mark.parametrize('value', [None, '', 'ten', '2.5'])
+    def test_falls_back_to_default(self, monkeypatch, value):
+        if value is None:
+            monkeypatch.delenv('TEST_ENV_NUMBER', raising=False)
+        else:
+            monkeypatch.setenv('TEST_ENV_NUMBER', value)
+        assert env_number('TEST_ENV_NUMBER', 3) == 3
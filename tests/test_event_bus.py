@@ -0,0 +1,293 @@
+"""
+Tests for per-tenant change events and the MCP event stream (event_bus.py).
+
+Covers:
+- Delivery to the tenant's subscribers only
+- Replay after Last-Event-ID, and reset events when the gap cannot be filled
+- Heartbeats, stream lifetime and slow-subscriber disconnects
+- Per-key connection limits, and stream totals, lifetimes and the database pool sized to the gunicorn worker
+- Events published from committed decision and comment changes only, including bulk updates
+- The SSE response: notifications with ids, 429 over the limit
+"""
+import json
+import secrets
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import event_bus as event_bus_module
+from event_bus import ConnectionLimiter, LocalEventBus, RESET, format_sse, stream_capacity, stream_seconds_limit
+from models import db, AIApiKey, ArchitectureDecision, DecisionComment, TenantMembership
+from rate_limits import hash_api_key
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    local = LocalEventBus(replay_size=3)
+    monkeypatch.setattr(event_bus_module, 'event_bus', local)
+    return local
+
+
+def _drain(subscription):
+    """Events available without waiting."""
+    return list(subscription.stream(heartbeat=0.01, max_seconds=0.01))
+
+
+class TestLocalBus:
+    """Publishing, subscribing and replay."""
+
+    def test_delivers_to_tenant_only(self, bus):
+        mine = bus.subscribe(1)
+        other = bus.subscribe(2)
+        published = bus.publish(1, 'decision.created', {'decision_id': 5})
+        events = [e for e in _drain(mine) if e is not None]
+        assert events == [published]
+        assert [e for e in _drain(other) if e is not None] == []
+
+    def test_replay_after_last_event_id(self, bus):
+        first = bus.publish(1, 'decision.created', {'decision_id': 1})
+        second = bus.publish(1, 'decision.updated', {'decision_id': 1})
+        subscription = bus.subscribe(1, last_event_id=first.id)
+        assert [e for e in _drain(subscription) if e is not None] == [second]
+
+    def test_up_to_date_client_gets_nothing(self, bus):
+        latest = bus.publish(1, 'decision.created', {'decision_id': 1})
+        subscription = bus.subscribe(1, last_event_id=latest.id)
+        assert [e for e in _drain(subscription) if e is not None] == []
+
+    def test_reset_when_evicted(self, bus):
+        first = bus.publish(1, 'decision.created', {'decision_id': 1})
+        for number in range(2, 6):
+            bus.publish(1, 'decision.created', {'decision_id': number})
+        events = [e for e in _drain(bus.subscribe(1, last_event_id=first.id)) if e is not None]
+        assert [e.type for e in events] == [RESET]
+
+    def test_reset_for_other_generation(self, bus):
+        bus.publish(1, 'decision.created', {'decision_id': 1})
+        events = [e for e in _drain(bus.subscribe(1, last_event_id='0-1')) if e is not None]
+        assert [e.type for e in events] == [RESET]
+        events = [e for e in _drain(bus.subscribe(1, last_event_id='garbage')) if e is not None]
+        assert [e.type for e in events] == [RESET]
+
+    def test_closed_streams_unsubscribe(self, bus):
+        subscription = bus.subscribe(1)
+        assert bus.subscriber_count(1) == 1
+        _drain(subscription)
+        assert bus.subscriber_count() == 0
+
+
+class TestStream:
+    """Heartbeats, lifetime and back-pressure."""
+
+    def test_heartbeat_then_event(self, bus):
+        subscription = bus.subscribe(1)
+        stream = subscription.stream(heartbeat=0.01, max_seconds=5)
+        assert next(stream) is None
+        published = bus.publish(1, 'comment.created', {'decision_id': 1, 'comment_id': 2})
+        assert next(stream) == published
+        stream.close()
+        assert subscription.closed
+
+    def test_live_event_from_other_thread(self, bus):
+        subscription = bus.subscribe(1)
+        timer = threading.Timer(0.05, bus.publish, args=(1, 'decision.created', {'decision_id': 1}))
+        timer.start()
+        events = subscription.stream(heartbeat=5, max_seconds=5)
+        assert next(events).type == 'decision.created'
+        events.close()
+
+    def test_ends_after_max_seconds(self, bus, clock):
+        subscription = bus.subscribe(1)
+        clock.advance(10)
+        assert list(subscription.stream(heartbeat=1, max_seconds=0, clock=clock)) == []
+
+    def test_slow_subscriber_disconnected(self, bus, monkeypatch):
+        monkeypatch.setattr(event_bus_module, 'SUBSCRIBER_QUEUE_SIZE', 2)
+        subscription = bus.subscribe(1)
+        for number in range(3):
+            bus.publish(1, 'decision.created', {'decision_id': number})
+        assert subscription.overflowed
+        assert list(subscription.stream(heartbeat=1, max_seconds=5)) == []
+
+
+class TestConnectionLimiter:
+    """Open streams are capped per key and per process."""
+
+    def test_per_key(self):
+        limits = ConnectionLimiter(per_key=2, total=10)
+        assert limits.acquire('a') and limits.acquire('a')
+        assert not limits.acquire('a')
+        assert limits.acquire('b')
+        limits.release('a')
+        assert limits.acquire('a')
+
+    def test_total(self):
+        limits = ConnectionLimiter(per_key=5, total=2)
+        assert limits.acquire('a') and limits.acquire('b')
+        assert not limits.acquire('c')
+        limits.release('b')
+        assert limits.open_count() == 1
+        assert limits.open_count('b') == 0
+
+    def test_sized_to_worker(self):
+        assert stream_capacity(32) == 24
+        assert stream_capacity(4) == 1
+        assert stream_seconds_limit(300, 360) == 300
+        assert stream_seconds_limit(300, 120) == 90
+
+
+def _decision(tenant, user, **kwargs):
+    values = dict(title='Use Postgres', context='c', decision='d', consequences='q', status='proposed',
+                  domain='example.com', tenant_id=tenant.id, created_by_id=user.id, decision_number=1)
+    values.update(kwargs)
+    return ArchitectureDecision(**values)
+
+
+class TestOrmFeed:
+    """Committed decision and comment changes are published."""
+
+    def test_create_update_delete(self, session, bus, sample_tenant, sample_user):
+        tenant, user = sample_tenant, sample_user
+        subscription = bus.subscribe(tenant.id)
+        decision = _decision(tenant, user)
+        session.add(decision)
+        session.commit()
+        decision.status = 'accepted'
+        session.commit()
+        decision.deleted_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        session.commit()
+
+        events = [e for e in _drain(subscription) if e is not None]
+        assert [e.type for e in events] == ['decision.created', 'decision.updated', 'decision.deleted']
+        assert events[0].data == {'decision_id': decision.id, 'decision_number': 1, 'title': 'Use Postgres',
+                                  'status': 'proposed'}
+        assert events[1].data['status'] == 'accepted'
+
+    def test_comment(self, session, bus, sample_tenant, sample_user):
+        tenant, user = sample_tenant, sample_user
+        decision = _decision(tenant, user)
+        session.add(decision)
+        session.commit()
+        subscription = bus.subscribe(tenant.id)
+        comment = DecisionComment(decision_id=decision.id, tenant_id=tenant.id, user_id=user.id, body='Agreed')
+        session.add(comment)
+        session.commit()
+        events = [e for e in _drain(subscription) if e is not None]
+        assert [(e.type, e.data) for e in events] == [
+            ('comment.created', {'decision_id': decision.id, 'comment_id': comment.id}),
+        ]
+
+    def test_bulk_update(self, session, bus, sample_tenant, sample_user):
+        from decision_bulk import apply_bulk_patch
+
+        first = _decision(sample_tenant, sample_user)
+        second = _decision(sample_tenant, sample_user, decision_number=2, title='Use Redis', status='accepted')
+        session.add_all([first, second])
+        session.commit()
+        subscription = bus.subscribe(sample_tenant.id)
+
+        apply_bulk_patch([first.id, second.id], {'status': 'accepted'}, 'example.com', sample_user)
+        session.commit()
+        events = [e for e in _drain(subscription) if e is not None]
+        assert [(e.type, e.data) for e in events] == [
+            ('decision.updated', {'decision_id': first.id, 'decision_number': 1, 'title': 'Use Postgres',
+                                  'status': 'accepted'}),
+        ]
+
+    def test_rollback_publishes_nothing(self, session, bus, sample_tenant, sample_user):
+        tenant, user = sample_tenant, sample_user
+        subscription = bus.subscribe(tenant.id)
+        session.add(_decision(tenant, user))
+        session.flush()
+        session.rollback()
+        assert [e for e in _drain(subscription) if e is not None] == []
+
+
+class TestDatabasePool:
+    """Threaded workers get a connection per thread."""
+
+    def test_sized_to_worker_threads(self, tmp_path):
+        from tests.app_test_utils import load_test_app
+
+        app_module, test_app = load_test_app(secret_key='test-secret-key-event-bus-0123456789',
+                                             database_url=f'sqlite:///{tmp_path}/pool.db')
+        try:
+            background = app_module.slack_queue.workers + app_module.mcp_batch.workers + app_module.ai_jobs.workers
+            assert test_app.config['SQLALCHEMY_ENGINE_OPTIONS'] == {
+                'pool_size': event_bus_module.WORKER_THREADS, 'max_overflow': background + 1,
+            }
+            with test_app.app_context():
+                assert db.engine.pool.size() == event_bus_module.WORKER_THREADS
+        finally:
+            load_test_app(secret_key='test-secret-key-event-bus-0123456789')
+
+
+class TestFormat:
+    """SSE framing."""
+
+    def test_format_sse(self):
+        assert format_sse('a-1', {'x': 1}) == 'id: a-1\ndata: {"x":1}\n\n'
+
+
+class TestSseResponse:
+    """GET /api/mcp streams notifications."""
+
+    @pytest.fixture
+    def app_module(self):
+        from tests.app_test_utils import load_test_app
+
+        app_module, test_app = load_test_app(secret_key='test-secret-key-event-bus-0123456789')
+        # Close streams right after the replay so the tests can read them to the end
+        test_app.config['MCP_SSE_MAX_SECONDS'] = 0
+        with test_app.app_context():
+            db.create_all()
+            yield app_module
+            db.session.remove()
+            db.drop_all()
+            app_module._db_initialized = False
+
+    @pytest.fixture
+    def app(self, app_module):
+        return app_module.app
+
+    @pytest.fixture
+    def api_key(self, session, ai_tenant, sample_user):
+        """A read-scoped key for a member of an AI-enabled tenant, as (tenant, raw key)."""
+        session.add(TenantMembership(user_id=sample_user.id, tenant_id=ai_tenant.id))
+        raw = f'adr_{secrets.token_urlsafe(24)}'
+        session.add(AIApiKey(user_id=sample_user.id, tenant_id=ai_tenant.id, key_hash=hash_api_key(raw),
+                             key_prefix=raw[:8], name='Agent', scopes=['read']))
+        session.commit()
+        return ai_tenant, raw
+
+    def test_replay_as_notifications(self, app_module, api_key, bus, monkeypatch):
+        tenant, raw = api_key
+        first = bus.publish(tenant.id, 'decision.created', {'decision_id': 1})
+        second = bus.publish(tenant.id, 'decision.updated', {'decision_id': 1, 'status': 'accepted'})
+        monkeypatch.setattr(app_module, 'event_bus', bus)
+        with app_module.app.test_request_context('/api/mcp', headers={'Last-Event-ID': first.id}):
+            response = app_module._mcp_sse_response(raw)
+            body = ''.join(response.response)
+
+        assert response.mimetype == 'text/event-stream'
+        assert ': decision-records MCP stream ready' in body
+        assert f'id: {second.id}\n' in body
+        data = json.loads(body.split('data: ', 1)[1].split('\n', 1)[0])
+        assert data == {'jsonrpc': '2.0', 'method': 'notifications/decisions/changed',
+                        'params': {'type': 'decision.updated', 'decision_id': 1, 'status': 'accepted'}}
+        assert app_module.stream_limits.open_count() == 0
+
+    def test_connection_limit(self, app_module, api_key, monkeypatch):
+        raw = api_key[1]
+        monkeypatch.setattr(app_module, 'stream_limits', ConnectionLimiter(per_key=1, total=10))
+        with app_module.app.test_request_context('/api/mcp'):
+            open_response = app_module._mcp_sse_response(raw)
+            _payload, status = app_module._mcp_sse_response(raw)
+            assert status == 429
+            ''.join(open_response.response)
+            assert app_module._mcp_sse_response(raw).status_code == 200
@@ -1324,13 +1324,44 @@ class TestGDPREndpointsHTTP:
         assert 'error' in data
 
     def test_execute_gdpr_tasks_via_master(self, master_client):
-        """Master account can execute GDPR tasks."""
+        """Master account can queue GDPR tasks and read back the run results."""
+        from gdpr_jobs import wait_for_run
+
         response = master_client.post('/api/admin/execute-gdpr-tasks')
-        assert response.status_code == 200
+        assert response.status_code == 202
         data = response.get_json()
-        assert 'results' in data
-        assert 'anonymized_users' in data['results']
-        assert 'cleaned_login_history' in data['results']
+        assert data['run_id']
+        assert wait_for_run(data['run_id'], timeout=30)
+
+        response = master_client.get(f"/api/admin/gdpr-jobs?run_id={data['run_id']}")
+        assert response.status_code == 200
+        run = response.get_json()
+        assert 'anonymized_users' in run['results']
+        assert 'cleaned_login_history' in run['results']
+        assert {job['status'] for job in run['jobs']} == {'completed'}
+        assert all(job['trigger'] == 'master' for job in run['jobs'])
+
+    def test_execute_gdpr_tasks_via_cron_secret(self, api_client, monkeypatch):
+        """A valid X-Cron-Secret queues a cron-triggered run."""
+        from gdpr_jobs import wait_for_run
+
+        monkeypatch.setenv('GDPR_CRON_SECRET', 'cron-secret-abc')
+        response = api_client.post('/api/admin/execute-gdpr-tasks',
+                                   headers={'X-Cron-Secret': 'cron-secret-abc'})
+        assert response.status_code == 202
+        run_id = response.get_json()['run_id']
+        assert wait_for_run(run_id, timeout=30)
+
+        response = api_client.get('/api/admin/gdpr-jobs',
+                                  headers={'X-Cron-Secret': 'cron-secret-abc'})
+        assert response.status_code == 200
+        jobs = response.get_json()['jobs']
+        assert jobs and all(job['trigger'] == 'cron' for job in jobs)
+
+    def test_gdpr_job_history_unauthenticated(self, api_client):
+        """Job history requires master account or cron secret."""
+        response = api_client.get('/api/admin/gdpr-jobs')
+        assert response.status_code == 403
 
 
 # ==================== Edge Cases ====================
@@ -0,0 +1,193 @@
+"""
+Tests for the streaming personal data export (gdpr_export.py).
+
+Covers:
+- Streamed JSON parses to the documented sections
+- No row caps on audit trail and login history
+- Comments and AI interactions are included
+- gzip and zip variants decompress to the same document
+- Streaming endpoint over HTTP
+"""
+import gzip
+import io
+import json
+import zipfile
+import pytest
+from datetime import datetime, timedelta, timezone
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import (
+    db, User, Tenant, TenantMembership, ArchitectureDecision, AuditLog, LoginHistory,
+    DecisionComment, AIInteractionLog, AIChannel, AIAction, GlobalRole, MaturityState,
+)
+from gdpr_export import iter_export, iter_export_json, export_section_names
+from tests.app_test_utils import load_test_app
+
+
+def _collect(chunks):
+    parts = list(chunks)
+    if parts and isinstance(parts[0], bytes):
+        return b''.join(parts)
+    return ''.join(parts)
+
+
+@pytest.fixture
+def export_user(session, sample_user, sample_tenant):
+    """A user with a membership, a decision, a comment and an AI interaction."""
+    session.add(TenantMembership(user_id=sample_user.id, tenant_id=sample_tenant.id,
+                                 global_role=GlobalRole.ADMIN))
+    decision = ArchitectureDecision(
+        title='Exported Decision', context='c', decision='d', status='accepted',
+        consequences='q', domain=sample_tenant.domain, tenant_id=sample_tenant.id,
+        decision_number=1, created_by_id=sample_user.id,
+    )
+    session.add(decision)
+    session.commit()
+    session.add(DecisionComment(decision_id=decision.id, tenant_id=sample_tenant.id,
+                                user_id=sample_user.id, body='Looks good'))
+    session.add(AIInteractionLog(user_id=sample_user.id, tenant_id=sample_tenant.id,
+                                 channel=AIChannel.MCP, action=AIAction.SEARCH,
+                                 query_text='caching'))
+    session.commit()
+    return sample_user
+
+
+class TestStreamedJSON:
+    """The streamed document is valid JSON with every section."""
+
+    def test_sections_and_content(self, app, session, export_user):
+        export = json.loads(_collect(iter_export_json(export_user)))
+
+        assert list(export.keys()) == export_section_names()
+        assert export['data_subject']['email'] == export_user.email
+        assert export['decisions_authored'][0]['title'] == 'Exported Decision'
+        assert export['memberships'][0]['tenant_domain'] == 'example.com'
+        assert export['memberships'][0]['role'] == 'admin'
+        assert export['comments'][0]['body'] == 'Looks good'
+        assert export['ai_interactions'][0]['channel'] == 'mcp'
+        assert export['ai_interactions'][0]['query'] == 'caching'
+
+    def test_empty_sections(self, app, session, sample_user):
+        export = json.loads(_collect(iter_export_json(sample_user)))
+
+        for name in ('decisions_authored', 'memberships', 'audit_trail',
+                     'login_history', 'comments', 'ai_interactions'):
+            assert export[name] == []
+
+    def test_excludes_password_hash(self, app, session, sample_user):
+        sample_user.set_password('secretpassword')
+        session.commit()
+
+        body = _collect(iter_export_json(sample_user))
+        assert 'password_hash' not in body
+        assert sample_user.password_hash not in body
+
+    def test_history_is_not_capped(self, app, session, sample_user, sample_tenant):
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        session.add_all([
+            LoginHistory(user_id=sample_user.id, email=sample_user.email, login_method='local',
+                         success=True, created_at=now - timedelta(minutes=i))
+            for i in range(620)
+        ])
+        session.add_all([
+            AuditLog(tenant_id=sample_tenant.id, actor_user_id=sample_user.id,
+                     action_type=AuditLog.ACTION_USER_JOINED, target_entity='user')
+            for _ in range(510)
+        ])
+        session.commit()
+
+        # Small batches exercise the multi-batch path
+        export = json.loads(_collect(iter_export_json(sample_user, batch_size=50)))
+        assert len(export['login_history']) == 620
+        assert len(export['audit_trail']) == 510
+        # Newest first
+        assert export['login_history'][0]['created_at'] > export['login_history'][-1]['created_at']
+
+
+class TestCompressedFormats:
+    """gzip and zip wrap the same JSON document."""
+
+    def test_gzip(self, app, session, export_user):
+        payload = _collect(iter_export(export_user, 'gzip', batch_size=2))
+        export = json.loads(gzip.decompress(payload))
+        assert export['decisions_authored'][0]['title'] == 'Exported Decision'
+
+    def test_zip(self, app, session, export_user):
+        payload = _collect(iter_export(export_user, 'zip', batch_size=2))
+        with zipfile.ZipFile(io.BytesIO(payload)) as archive:
+            assert archive.namelist() == ['data-export.json']
+            export = json.loads(archive.read('data-export.json'))
+        assert export['comments'][0]['body'] == 'Looks good'
+
+
+class TestExportEndpoint:
+    """POST /api/user/export-data streams the export."""
+
+    @pytest.fixture
+    def client_and_user(self):
+        app_module, test_app = load_test_app(secret_key='test-secret-key-gdpr-export')
+
+        with test_app.app_context():
+            db.create_all()
+            app_module.init_database()
+
+            tenant = Tenant(domain='export.com', name='Export Corp', status='active',
+                            maturity_state=MaturityState.BOOTSTRAP)
+            user = User(email='streamer@export.com', sso_domain='export.com',
+                        auth_type='local', email_verified=True)
+            user.set_name(first_name='Stream', last_name='User')
+            user.set_password('streampassword')
+            db.session.add_all([tenant, user])
+            db.session.commit()
+            db.session.add(TenantMembership(user_id=user.id, tenant_id=tenant.id,
+                                            global_role=GlobalRole.USER))
+            db.session.commit()
+
+            client = test_app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = user.id
+                sess['_csrf_token'] = 'test-csrf-token'
+                sess['_expires_at'] = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+            client.environ_base['HTTP_X_CSRF_TOKEN'] = 'test-csrf-token'
+
+            yield client, user
+            db.session.remove()
+            db.drop_all()
+            app_module._db_initialized = False
+
+    def test_invalid_format_rejected(self, client_and_user):
+        client, _ = client_and_user
+        response = client.post('/api/user/export-data?format=rar')
+        assert response.status_code == 400
+
+    def test_streams_json(self, client_and_user):
+        client, user = client_and_user
+        response = client.post('/api/user/export-data')
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.headers['Content-Disposition'].endswith('.json"')
+        export = json.loads(response.get_data())
+        assert export['data_subject']['email'] == 'streamer@export.com'
+        assert export['memberships'][0]['tenant_domain'] == 'export.com'
+
+    def test_streams_gzip(self, client_and_user):
+        client, _ = client_and_user
+        response = client.post('/api/user/export-data?format=gzip')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/gzip'
+        assert response.headers['Content-Disposition'].endswith('.json.gz"')
+        export = json.loads(gzip.decompress(response.get_data()))
+        assert 'login_history' in export
+
+    def test_unauthenticated(self):
+        app_module, test_app = load_test_app(secret_key='test-secret-key-gdpr-export')
+        with test_app.app_context():
+            db.create_all()
+            response = test_app.test_client().post('/api/user/export-data?format=zip')
+            assert response.status_code == 401
+            db.session.remove()
+            db.drop_all()
+            app_module._db_initialized = False
@@ -0,0 +1,231 @@
+"""
+Tests for the chunked GDPR maintenance job runner (gdpr_jobs.py).
+
+Covers:
+- Each task processes rows in chunks and records per-run stats
+- Set-based purge of soft-deleted decisions and tenants, including children
+- Time budget stops a task as 'partial' and the next run resumes from its checkpoint
+- Failures are recorded on the job row without aborting the remaining tasks
+- Cron-safe enqueue reuses an in-flight run
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import (
+    db, User, Tenant, TenantMembership, TenantSettings, Space, DecisionSpace,
+    ArchitectureDecision, DecisionHistory, DecisionComment, LoginHistory,
+    GDPRJobRun, MaturityState, GlobalRole,
+)
+import gdpr_jobs
+from gdpr_jobs import run_gdpr_tasks, get_active_run, enqueue_gdpr_tasks, summarize_run
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def create_user(session, email, scheduled_days_ago=None):
+    user = User(email=email, sso_domain='example.com', auth_type='local', email_verified=True)
+    user.set_name(first_name='Job', last_name='User')
+    if scheduled_days_ago is not None:
+        user.deletion_requested_at = _now() - timedelta(days=scheduled_days_ago + 7)
+        user.deletion_scheduled_at = _now() - timedelta(days=scheduled_days_ago)
+    session.add(user)
+    session.commit()
+    return user
+
+
+def create_tenant(session, domain, expired=False):
+    tenant = Tenant(domain=domain, name=domain, status='active', maturity_state=MaturityState.BOOTSTRAP)
+    if expired:
+        tenant.deleted_at = _now() - timedelta(days=40)
+        tenant.deletion_expires_at = _now() - timedelta(days=10)
+    session.add(tenant)
+    session.commit()
+    return tenant
+
+
+def create_expired_decision(session, tenant, user, number):
+    decision = ArchitectureDecision(
+        title=f'Expired {number}', context='c', decision='d', status='proposed',
+        consequences='q', domain=tenant.domain, tenant_id=tenant.id,
+        decision_number=number, created_by_id=user.id,
+        deleted_at=_now() - timedelta(days=35),
+        deletion_expires_at=_now() - timedelta(days=5),
+    )
+    session.add(decision)
+    session.commit()
+    return decision
+
+
+def create_login_history(session, user, days_ago):
+    entry = LoginHistory(
+        user_id=user.id, email=user.email, login_method='local', success=True,
+        created_at=(_now() - timedelta(days=days_ago)).replace(tzinfo=None),
+    )
+    session.add(entry)
+    session.commit()
+    return entry
+
+
+class TestChunkedTasks:
+    """Each task runs in chunks and records its stats."""
+
+    def test_run_records_one_job_per_task(self, app, session):
+        run_id, results = run_gdpr_tasks(chunk_size=10)
+
+        jobs = GDPRJobRun.query.filter_by(run_id=run_id).order_by(GDPRJobRun.id).all()
+        assert [job.task for job in jobs] == list(gdpr_jobs.TASKS.keys())
+        assert all(job.status == GDPRJobRun.STATUS_COMPLETED for job in jobs)
+        assert all(job.trigger == GDPRJobRun.TRIGGER_CLI for job in jobs)
+        assert all(job.finished_at is not None for job in jobs)
+        assert results == {'anonymized_users': 0, 'purged_decisions': 0,
+                           'purged_tenants': 0, 'cleaned_login_history': 0}
+
+    def test_anonymize_users_in_chunks(self, app, session):
+        user_ids = [create_user(session, f'due{i}@example.com', scheduled_days_ago=1).id for i in range(5)]
+        keep = create_user(session, 'later@example.com', scheduled_days_ago=-3)
+
+        run_id, results = run_gdpr_tasks(tasks=['anonymize_users'], chunk_size=2)
+
+        assert results['anonymized_users'] == 5
+        job = GDPRJobRun.query.filter_by(run_id=run_id).one()
+        assert job.chunks_processed == 3
+        assert job.checkpoint == max(user_ids)
+        for user_id in user_ids:
+            assert db.session.get(User, user_id).is_anonymized is True
+        assert db.session.get(User, keep.id).is_anonymized is False
+
+    def test_purge_decisions_removes_children(self, app, session):
+        tenant = create_tenant(session, 'purge.com')
+        user = create_user(session, 'author@purge.com')
+        space = Space(tenant_id=tenant.id, name='General', is_default=True)
+        session.add(space)
+        session.commit()
+
+        decision_ids = []
+        for number in range(1, 4):
+            decision = create_expired_decision(session, tenant, user, number)
+            session.add(DecisionHistory(decision_id=decision.id, title='old', context='c',
+                                        decision_text='d', status='proposed', consequences='q'))
+            session.add(DecisionSpace(decision_id=decision.id, space_id=space.id))
+            session.add(DecisionComment(decision_id=decision.id, tenant_id=tenant.id,
+                                        user_id=user.id, body='bye'))
+            session.commit()
+            decision_ids.append(decision.id)
+
+        run_id, results = run_gdpr_tasks(tasks=['purge_decisions'], chunk_size=2)
+
+        assert results['purged_decisions'] == 3
+        assert ArchitectureDecision.query.filter(ArchitectureDecision.id.in_(decision_ids)).count() == 0
+        assert DecisionHistory.query.count() == 0
+        assert DecisionSpace.query.count() == 0
+        assert DecisionComment.query.count() == 0
+
+    def test_purge_tenants_removes_dependents(self, app, session):
+        expired = create_tenant(session, 'gone.com', expired=True)
+        live = create_tenant(session, 'live.com')
+        user = create_user(session, 'member@gone.com')
+        session.add(TenantMembership(user_id=user.id, tenant_id=expired.id, global_role=GlobalRole.USER))
+        session.add(TenantSettings(tenant_id=expired.id))
+        session.add(Space(tenant_id=expired.id, name='General', is_default=True))
+        session.commit()
+        expired_id = expired.id
+
+        run_id, results = run_gdpr_tasks(tasks=['purge_tenants'])
+
+        assert results['purged_tenants'] == 1
+        assert db.session.get(Tenant, expired_id) is None
+        assert db.session.get(Tenant, live.id) is not None
+        assert TenantMembership.query.filter_by(tenant_id=expired_id).count() == 0
+        assert TenantSettings.query.filter_by(tenant_id=expired_id).count() == 0
+        assert Space.query.filter_by(tenant_id=expired_id).count() == 0
+
+    def test_clean_login_history(self, app, session):
+        user = create_user(session, 'history@example.com')
+        old_ids = [create_login_history(session, user, days_ago=100 + i).id for i in range(3)]
+        recent = create_login_history(session, user, days_ago=5)
+
+        run_id, results = run_gdpr_tasks(tasks=['clean_login_history'], chunk_size=2)
+
+        assert results['cleaned_login_history'] == 3
+        assert LoginHistory.query.filter(LoginHistory.id.in_(old_ids)).count() == 0
+        assert db.session.get(LoginHistory, recent.id) is not None
+
+    def test_unknown_task_rejected(self, app, session):
+        with pytest.raises(ValueError):
+            run_gdpr_tasks(tasks=['drop_everything'])
+
+
+class TestResumeAndFailure:
+    """Time budget, checkpoint resume and failure recording."""
+
+    def test_time_budget_marks_partial_and_next_run_resumes(self, app, session):
+        user = create_user(session, 'resume@example.com')
+        for i in range(4):
+            create_login_history(session, user, days_ago=100 + i)
+
+        # Budget is already spent, so only the first chunk runs
+        first_run, first = run_gdpr_tasks(tasks=['clean_login_history'], chunk_size=2, max_seconds=-1)
+        job = GDPRJobRun.query.filter_by(run_id=first_run).one()
+        assert job.status == GDPRJobRun.STATUS_PARTIAL
+        assert first['cleaned_login_history'] == 2
+        assert job.checkpoint is not None
+
+        assert gdpr_jobs._resume_checkpoint('clean_login_history') == job.checkpoint
+
+        second_run, second = run_gdpr_tasks(tasks=['clean_login_history'], chunk_size=2)
+        job = GDPRJobRun.query.filter_by(run_id=second_run).one()
+        assert job.status == GDPRJobRun.STATUS_COMPLETED
+        assert second['cleaned_login_history'] == 2
+        assert LoginHistory.query.count() == 0
+
+    def test_failed_task_recorded_and_others_continue(self, app, session, monkeypatch):
+        def boom(now, after_id, limit):
+            raise RuntimeError('database went away')
+
+        tasks = dict(gdpr_jobs.TASKS)
+        tasks['purge_decisions'] = (boom, 'purged_decisions')
+        monkeypatch.setattr(gdpr_jobs, 'TASKS', tasks)
+
+        run_id, results = run_gdpr_tasks()
+
+        jobs = {job.task: job for job in GDPRJobRun.query.filter_by(run_id=run_id).all()}
+        assert jobs['purge_decisions'].status == GDPRJobRun.STATUS_FAILED
+        assert 'database went away' in jobs['purge_decisions'].error_message
+        assert jobs['clean_login_history'].status == GDPRJobRun.STATUS_COMPLETED
+
+
+class TestEnqueue:
+    """Cron-safe queuing."""
+
+    def test_active_run_is_reused(self, app, session):
+        session.add(GDPRJobRun(run_id='existing-run', task='anonymize_users',
+                               trigger=GDPRJobRun.TRIGGER_CRON, status=GDPRJobRun.STATUS_RUNNING))
+        session.commit()
+
+        assert get_active_run() == 'existing-run'
+        run_id, created = enqueue_gdpr_tasks(app, GDPRJobRun.TRIGGER_CRON)
+        assert run_id == 'existing-run'
+        assert created is False
+
+    def test_stale_active_run_is_ignored(self, app, session):
+        session.add(GDPRJobRun(run_id='stale-run', task='anonymize_users',
+                               trigger=GDPRJobRun.TRIGGER_CRON, status=GDPRJobRun.STATUS_RUNNING,
+                               created_at=(_now() - timedelta(hours=3)).replace(tzinfo=None)))
+        session.commit()
+
+        assert get_active_run() is None
+
+    def test_summarize_run(self, app, session):
+        session.add(GDPRJobRun(run_id='r1', task='purge_tenants', trigger=GDPRJobRun.TRIGGER_CLI,
+                               status=GDPRJobRun.STATUS_COMPLETED, rows_processed=4))
+        session.commit()
+
+        summary = summarize_run('r1')
+        assert summary['purged_tenants'] == 4
+        assert summary['anonymized_users'] == 0
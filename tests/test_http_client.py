@@ -0,0 +1,150 @@
+"""
+Tests for the shared outbound HTTP client (http_client.py).
+
+Covers:
+- Connections to a host are pooled and reused across calls
+- Idempotent requests are retried on 5xx, POSTs are not
+- Per-host latency and error metrics, including attached sessions
+- version.check_for_updates going through the shared client
+"""
+import pytest
+import requests
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import version
+from http_client import OutboundHTTPClient, RequestException, http_client
+from tests.stub_idp import StubIdP
+
+
+@pytest.fixture
+def idp():
+    with StubIdP() as stub:
+        yield stub
+
+
+@pytest.fixture
+def client():
+    outbound = OutboundHTTPClient(retries=2)
+    yield outbound
+    outbound.close()
+
+
+def _host(idp):
+    return idp.issuer.split('://', 1)[1]
+
+
+class TestPooling:
+    """Connection reuse and pool configuration."""
+
+    def test_connections_reused(self, idp, client):
+        for _ in range(10):
+            assert client.get(idp.discovery_url).status_code == 200
+        assert idp.hit_count() == 10
+        assert len(idp.connections) == 1
+
+    def test_one_adapter_per_host(self, client):
+        first = client.adapter_for('https://login.example.com/token')
+        assert client.adapter_for('https://LOGIN.example.com/userinfo') is first
+        assert client.adapter_for('https://api.github.com/repos') is not first
+
+    def test_pool_size_override(self, client, monkeypatch):
+        monkeypatch.setenv('HTTP_CLIENT_POOL_MAXSIZE_API_GITHUB_COM', '3')
+        assert client.adapter_for('https://api.github.com/')._pool_maxsize == 3
+        assert client.adapter_for('https://login.example.com/')._pool_maxsize == client.pool_maxsize
+
+    def test_cookies_not_stored(self, idp, client):
+        idp.extra_headers = {'Set-Cookie': 'sid=tenant-a; Path=/'}
+        client.get(idp.discovery_url)
+        assert len(client.session.cookies) == 0
+
+
+class TestRetries:
+    """Retries only where replaying the request is safe."""
+
+    def test_get_retried_on_503(self, idp, client):
+        idp.fail = True
+        response = client.get(idp.discovery_url)
+        assert response.status_code == 503
+        assert idp.hit_count() == 3
+
+    def test_post_not_retried(self, idp, client):
+        idp.fail = True
+        client.post(idp.discovery_url, data={'code': 'single-use'})
+        assert idp.hit_count() == 1
+
+    def test_connection_error_raises(self, client):
+        with pytest.raises(RequestException):
+            client.get('http://127.0.0.1:9/unreachable', timeout=0.5)
+        assert client.metrics()['127.0.0.1:9']['errors'] == 1
+
+
+class TestMetrics:
+    """Per-host latency and error counters."""
+
+    def test_requests_and_errors_counted(self, idp, client):
+        client.get(idp.discovery_url)
+        idp.fail = True
+        client.post(idp.discovery_url)
+
+        metrics = client.metrics()[_host(idp)]
+        assert metrics['requests'] == 2
+        assert metrics['errors'] == 1
+        assert metrics['last_error'] == 'HTTP 503'
+        assert metrics['max_ms'] >= metrics['avg_ms'] > 0
+
+    def test_attached_session(self, idp, client):
+        session = client.attach(requests.Session())
+        session.get(idp.jwks_uri, timeout=5)
+        session.get(idp.jwks_uri, timeout=5)
+
+        assert client.metrics()[_host(idp)]['requests'] == 2
+        assert len(idp.connections) == 1
+
+
+class TestVersionCheck:
+    """check_for_updates uses the shared client."""
+
+    class FakeResponse:
+        def __init__(self, status_code, payload=None):
+            self.status_code = status_code
+            self.ok = status_code < 400
+            self._payload = payload
+
+        def json(self):
+            if self._payload is None:
+                raise ValueError('No JSON')
+            return self._payload
+
+    def test_update_available(self, monkeypatch):
+        calls = []
+
+        def fake_get(url, **kwargs):
+            calls.append(url)
+            return self.FakeResponse(200, {'tag_name': 'v99.0.0', 'html_url': 'https://example.com/r', 'body': None})
+
+        monkeypatch.setattr(http_client, 'get', fake_get)
+        result = version.check_for_updates()
+
+        assert calls == ['https://api.github.com/repos/DecisionRecordsORG/DecisionRecords/releases/latest']
+        assert result['update_available'] is True
+        assert result['latest_version'] == '99.0.0'
+        assert result['error'] is None
+
+    @pytest.mark.parametrize('response, error', [
+        (FakeResponse(404), 'No releases found'),
+        (FakeResponse(500), 'GitHub API error: 500'),
+        (FakeResponse(200), 'Invalid response from GitHub'),
+    ])
+    def test_errors(self, monkeypatch, response, error):
+        monkeypatch.setattr(http_client, 'get', lambda url, **kwargs: response)
+        assert version.check_for_updates()['error'] == error
+
+    def test_network_error(self, monkeypatch):
+        def fail(url, **kwargs):
+            raise requests.ConnectionError('refused')
+
+        monkeypatch.setattr(http_client, 'get', fail)
+        assert version.check_for_updates()['error'] == 'Network error: refused'
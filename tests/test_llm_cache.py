@@ -0,0 +1,189 @@
+"""
+Tests for the LLM response cache (llm_cache.py).
+
+Covers:
+- Query normalization and keys (template, decision-set version)
+- Hits skip the provider and count tokens saved per tenant
+- TTL expiry and LRU eviction
+- Invalidation when a referenced decision changes or is commented on (not on rollback)
+- Metrics persisted on AIInteractionLog
+"""
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import AIAction, AIChannel, AIInteractionLog, ArchitectureDecision, DecisionComment
+from llm_cache import (
+    LLMResponseCache, LocalResponseStore, cache_key, normalize_query, decision_set_version, llm_cache,
+    record_cache_result, tenant_cache_stats,
+)
+
+TEMPLATE = 'Answer {query} using {decisions}'
+
+
+class Provider:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return f'answer {self.calls}', 100, 20
+
+
+@pytest.fixture
+def cache():
+    previous = llm_cache._store
+    llm_cache.store = LocalResponseStore()
+    llm_cache._stats.clear()
+    yield llm_cache
+    llm_cache.store = previous
+
+
+def _decisions(session, tenant, count=2):
+    decisions = [
+        ArchitectureDecision(title=f'Decision {n}', context='c', decision='d', consequences='q', status='accepted',
+                             domain=tenant.domain, tenant_id=tenant.id, decision_number=n)
+        for n in range(1, count + 1)
+    ]
+    session.add_all(decisions)
+    session.commit()
+    return decisions
+
+
+class TestKeys:
+    """What makes two prompts the same."""
+
+    def test_normalize_query(self):
+        assert normalize_query('  Why did <@U123>\n pick   Postgres?  ') == 'why did <@u123> pick postgres?'
+        assert normalize_query(None) == ''
+
+    def test_equivalent_queries_share_key(self):
+        assert cache_key(1, TEMPLATE, 'Why  Postgres?', 'v') == cache_key(1, TEMPLATE, ' why postgres?', 'v')
+        assert cache_key(1, TEMPLATE, 'why postgres', 'v') != cache_key(2, TEMPLATE, 'why postgres', 'v')
+        assert cache_key(1, TEMPLATE, 'why postgres', 'v') != cache_key(1, TEMPLATE + '!', 'why postgres', 'v')
+
+    def test_only_case_and_whitespace_folded(self):
+        # Different people, links or punctuation can change the answer
+        assert cache_key(1, TEMPLATE, 'ask <@U1>', 'v') != cache_key(1, TEMPLATE, 'ask <@U2>', 'v')
+        assert cache_key(1, TEMPLATE, 'mail a@x.io', 'v') != cache_key(1, TEMPLATE, 'mail b@x.io', 'v')
+        assert cache_key(1, TEMPLATE, 'why postgres?', 'v') != cache_key(1, TEMPLATE, 'why postgres', 'v')
+
+    def test_decision_set_version(self, session, sample_tenant):
+        first, second = _decisions(session, sample_tenant)
+        version, ids = decision_set_version([second, first])
+        assert ids == [first.id, second.id]
+        assert version == decision_set_version([first, second])[0]
+        first.title = 'Changed'
+        session.commit()
+        assert decision_set_version([first, second])[0] != version
+
+
+class TestCache:
+    """Repeats are answered without the provider."""
+
+    def test_hit_saves_tokens(self, session, cache, sample_tenant):
+        decisions = _decisions(session, sample_tenant)
+        provider = Provider()
+
+        miss = cache.cached(sample_tenant.id, TEMPLATE, 'Why Postgres?', decisions, provider)
+        hit = cache.cached(sample_tenant.id, TEMPLATE, 'why  postgres?', decisions, provider)
+        assert provider.calls == 1
+        assert (miss.hit, miss.tokens_input, miss.tokens_saved) == (False, 100, 0)
+        assert (hit.value, hit.hit, hit.tokens_saved) == ('answer 1', True, 120)
+        assert cache.stats(sample_tenant.id) == {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'tokens_saved': 120}
+
+    def test_failures_not_cached(self, session, cache, sample_tenant):
+        def failing():
+            raise RuntimeError('provider down')
+
+        with pytest.raises(RuntimeError):
+            cache.cached(sample_tenant.id, TEMPLATE, 'q', [], failing)
+        assert cache.cached(sample_tenant.id, TEMPLATE, 'q', [], Provider()).hit is False
+
+    def test_disabled(self, session):
+        provider = Provider()
+        disabled = LLMResponseCache(store=LocalResponseStore(), enabled=False)
+        disabled.cached(1, TEMPLATE, 'q', [], provider)
+        assert disabled.cached(1, TEMPLATE, 'q', [], provider).hit is False
+        assert provider.calls == 2
+
+
+class TestLocalStore:
+    """TTL and LRU."""
+
+    def test_ttl(self, clock):
+        store = LocalResponseStore(ttl=10, clock=clock)
+        store.set('k', 1, [5], {'value': 'a'})
+        clock.advance(9)
+        assert store.get('k') == {'value': 'a'}
+        clock.advance(1)
+        assert store.get('k') is None
+        assert store.delete_decisions(1, [5]) == 0
+
+    def test_lru_eviction(self):
+        store = LocalResponseStore(max_entries=2)
+        store.set('a', 1, [], {'value': 'a'})
+        store.set('b', 1, [], {'value': 'b'})
+        store.get('a')
+        store.set('c', 1, [], {'value': 'c'})
+        assert store.get('b') is None
+        assert store.get('a') is not None and store.get('c') is not None
+        assert len(store) == 2
+
+    def test_delete_tenants(self):
+        store = LocalResponseStore()
+        store.set('a', 1, [5], {'value': 'a'})
+        store.set('b', 2, [5], {'value': 'b'})
+        assert store.delete_tenants({1}) == 1
+        assert store.get('b') is not None
+
+
+class TestInvalidation:
+    """Committed changes to referenced decisions drop entries."""
+
+    def _cached(self, session, cache, tenant):
+        first, second = _decisions(session, tenant)
+        cache.cached(tenant.id, TEMPLATE, 'q', [first], Provider())
+        cache.cached(tenant.id, TEMPLATE, 'q', [second], Provider())
+        assert len(cache.store) == 2
+        return first, second
+
+    def test_decision_update(self, session, cache, sample_tenant):
+        first, _second = self._cached(session, cache, sample_tenant)
+        first.status = 'superseded'
+        session.commit()
+        assert len(cache.store) == 1
+
+    def test_comment(self, session, cache, sample_tenant):
+        _first, second = self._cached(session, cache, sample_tenant)
+        session.add(DecisionComment(decision_id=second.id, tenant_id=sample_tenant.id, body='Why not MySQL?'))
+        session.commit()
+        assert len(cache.store) == 1
+
+    def test_rollback_keeps_entries(self, session, cache, sample_tenant):
+        first, _second = self._cached(session, cache, sample_tenant)
+        first.status = 'superseded'
+        session.flush()
+        session.rollback()
+        assert len(cache.store) == 2
+
+
+class TestMetrics:
+    """Hits and tokens saved are persisted per interaction."""
+
+    def test_tenant_cache_stats(self, session, cache, sample_tenant):
+        decisions = _decisions(session, sample_tenant)
+        for _ in range(3):
+            result = cache.cached(sample_tenant.id, TEMPLATE, 'q', decisions, Provider())
+            log = AIInteractionLog(tenant_id=sample_tenant.id, channel=AIChannel.SLACK, action=AIAction.SEARCH,
+                                   tokens_input=result.tokens_input, tokens_output=result.tokens_output)
+            record_cache_result(log, result)
+            session.add(log)
+        session.commit()
+
+        assert tenant_cache_stats(sample_tenant.id) == {
+            'requests': 3, 'cache_hits': 2, 'hit_rate': 0.6667, 'tokens_saved': 240,
+        }
+        assert tenant_cache_stats(sample_tenant.id + 1)['requests'] == 0
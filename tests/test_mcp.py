@@ -878,6 +878,8 @@ class TestMCPAPIEndpoint:
         flask_app.app.config['TESTING'] = True
         flask_app.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
         flask_app.app.config['WTF_CSRF_ENABLED'] = False
+        # Close event streams right after the replay so responses can be read to the end
+        flask_app.app.config['MCP_SSE_MAX_SECONDS'] = 0
 
         with flask_app.app.app_context():
             db.create_all()
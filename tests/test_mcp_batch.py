@@ -0,0 +1,163 @@
+"""
+Tests for concurrent MCP JSON-RPC batches (mcp_batch.py).
+
+Covers:
+- Read-only messages run concurrently and results keep request order
+- Writes act as barriers between groups of reads
+- Failures and the batch time budget produce per-message results
+- The app runs pooled messages in their own request context and session
+"""
+import threading
+import time
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp_batch import BatchRunner
+
+
+def _read_only(item):
+    return item['kind'] == 'read'
+
+
+def _run(runner, items, handle, timeout=None):
+    return runner.run(
+        items, handle,
+        can_run_concurrently=_read_only,
+        timed_out=lambda item: ('timed out', item['id']),
+        failed=lambda item, exc: ('failed', item['id'], str(exc)),
+        timeout=timeout,
+    )
+
+
+class TestBatchRunner:
+    """Ordering, grouping and budgets."""
+
+    def test_reads_run_concurrently_in_order(self):
+        runner = BatchRunner(workers=4)
+        items = [{'id': i, 'kind': 'read', 'delay': 0.2 - i * 0.04} for i in range(4)]
+
+        def handle(item):
+            time.sleep(item['delay'])
+            return item['id']
+
+        started = time.perf_counter()
+        assert _run(runner, items, handle) == [0, 1, 2, 3]
+        # Sequentially this would take 0.56s
+        assert time.perf_counter() - started < 0.4
+
+    def test_writes_are_barriers(self):
+        runner = BatchRunner(workers=4)
+        log = []
+        lock = threading.Lock()
+        items = [
+            {'id': 0, 'kind': 'read'}, {'id': 1, 'kind': 'read'},
+            {'id': 2, 'kind': 'write'},
+            {'id': 3, 'kind': 'read'}, {'id': 4, 'kind': 'read'},
+        ]
+
+        def handle(item):
+            time.sleep(0.02)
+            with lock:
+                log.append(item['id'])
+            return item['id']
+
+        assert _run(runner, items, handle) == [0, 1, 2, 3, 4]
+        assert sorted(log[:2]) == [0, 1]
+        assert log[2] == 2
+        assert sorted(log[3:]) == [3, 4]
+
+    def test_writes_run_in_calling_thread(self):
+        runner = BatchRunner(workers=2)
+        items = [{'id': 0, 'kind': 'write'}, {'id': 1, 'kind': 'read'}]
+        threads = _run(runner, items, lambda item: threading.current_thread().name)
+        assert threads == [threading.current_thread().name, threading.current_thread().name]
+
+    def test_failures_are_per_message(self):
+        runner = BatchRunner(workers=2)
+        items = [{'id': i, 'kind': 'read'} for i in range(3)]
+
+        def handle(item):
+            if item['id'] == 1:
+                raise RuntimeError('tool crashed')
+            return item['id']
+
+        assert _run(runner, items, handle) == [0, ('failed', 1, 'tool crashed'), 2]
+
+    def test_time_budget(self):
+        runner = BatchRunner(workers=2)
+        release = threading.Event()
+        items = [
+            {'id': 0, 'kind': 'read'}, {'id': 1, 'kind': 'read'},
+            {'id': 2, 'kind': 'write'},
+        ]
+
+        def handle(item):
+            if item['id'] == 1:
+                release.wait(2)
+            return item['id']
+
+        started = time.perf_counter()
+        results = _run(runner, items, handle, timeout=0.1)
+        release.set()
+        assert results == [0, ('timed out', 1), ('timed out', 2)]
+        assert time.perf_counter() - started < 0.5
+
+
+@pytest.fixture
+def app_module():
+    from tests.app_test_utils import load_test_app
+    from models import db
+
+    app_module, test_app = load_test_app(secret_key='test-secret-key-mcp-batch-0123456789')
+    with test_app.app_context():
+        db.create_all()
+        yield app_module
+        db.session.remove()
+        db.drop_all()
+        app_module._db_initialized = False
+
+
+class TestAppBatch:
+    """The MCP endpoint's batch wiring."""
+
+    def test_read_only_classification(self, app_module):
+        with app_module.app.test_request_context('/api/mcp', method='POST'):
+            assert app_module._mcp_read_only({'method': 'tools/list'})
+            assert app_module._mcp_read_only({'method': 'tools/call', 'params': {'name': 'get_decision'}})
+            assert not app_module._mcp_read_only({'method': 'tools/call', 'params': {'name': 'create_decision'}})
+            assert not app_module._mcp_read_only({'method': 'initialize'})
+
+        with app_module.app.test_request_context('/api/mcp', method='POST', headers={'Mcp-Name': 'search_decisions'}):
+            assert app_module._mcp_read_only({'method': 'tools/call'})
+
+    def test_pooled_messages_get_own_session(self, app_module, monkeypatch):
+        from flask import request
+        from models import db
+
+        seen = []
+        lock = threading.Lock()
+
+        def handle(message, api_key):
+            time.sleep(0.05)
+            with lock:
+                seen.append((message['id'], id(db.session()), request.headers.get('Authorization')))
+            payload = {'jsonrpc': '2.0', 'id': message['id'], 'result': {}}
+            return payload, 200, None, None
+
+        monkeypatch.setattr(app_module, '_handle_mcp_post_message', handle)
+        batch = [
+            {'jsonrpc': '2.0', 'id': i, 'method': 'tools/call', 'params': {'name': 'get_decision'}}
+            for i in range(3)
+        ]
+        headers = {'Authorization': 'Bearer adr_test_key'}
+        with app_module.app.test_request_context('/api/mcp', method='POST', json=batch, headers=headers):
+            request_session = id(db.session())
+            results = app_module._run_mcp_batch(batch, 'adr_test_key')
+
+        assert [payload['id'] for payload, _status, _sid, _pv in results] == [0, 1, 2]
+        assert {auth for _id, _session, auth in seen} == {'Bearer adr_test_key'}
+        assert request_session not in {session_id for _id, session_id, _auth in seen}
@@ -0,0 +1,272 @@
+"""
+Tests for notification digests (notification_digest.py).
+
+Covers:
+- Digest subscribers get events buffered instead of one email per edit
+- One digest per recipient, collapsing repeated edits of a decision
+- Hourly/daily due logic and last_digest_at bookkeeping
+- Failed sends stay queued
+- Subscription delivery_mode API and the cron endpoint
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import notifications
+from models import (
+    db, User, Tenant, TenantMembership, Subscription, NotificationEvent, ArchitectureDecision,
+    EmailConfig, GlobalRole, MaturityState,
+)
+from notification_digest import build_digest_entries, send_due_digests
+from tests.app_test_utils import load_test_app
+
+
+class RecordingSMTP:
+    """Collects (to, message) pairs; one instance per connection."""
+
+    connections = []
+    refuse = set()
+
+    def __init__(self, server, port):
+        self.messages = []
+        RecordingSMTP.connections.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def sendmail(self, from_addr, to_addr, message):
+        if to_addr in RecordingSMTP.refuse:
+            import smtplib
+            raise smtplib.SMTPRecipientsRefused({to_addr: (550, b'No such user')})
+        self.messages.append((to_addr, message))
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    RecordingSMTP.connections = []
+    RecordingSMTP.refuse = set()
+    monkeypatch.setattr(notifications.smtplib, 'SMTP', RecordingSMTP)
+    return RecordingSMTP
+
+
+@pytest.fixture
+def email_config(session):
+    config = EmailConfig(domain='example.com', smtp_server='smtp.example.com', smtp_port=587,
+                         smtp_username='mailer', smtp_password='plain-password',
+                         from_email='noreply@example.com', from_name='ADR', use_tls=True, enabled=True)
+    session.add(config)
+    session.commit()
+    return config
+
+
+@pytest.fixture
+def subscribers(session):
+    """One immediate and one hourly-digest update subscriber."""
+    immediate = User(email='now@example.com', sso_domain='example.com', auth_type='local')
+    hourly = User(email='later@example.com', sso_domain='example.com', auth_type='local')
+    session.add_all([immediate, hourly])
+    session.commit()
+    session.add_all([
+        Subscription(user_id=immediate.id, notify_on_update=True),
+        Subscription(user_id=hourly.id, notify_on_update=True, delivery_mode=Subscription.DELIVERY_HOURLY),
+    ])
+    session.commit()
+    return immediate, hourly
+
+
+def _sent_to(smtp):
+    return [to for connection in smtp.connections for to, _ in connection.messages]
+
+
+def _decision(session, tenant, user, title='Use Kafka'):
+    decision = ArchitectureDecision(title=title, context='c', decision='d', status='proposed',
+                                    consequences='q', domain='example.com', tenant_id=tenant.id,
+                                    created_by_id=user.id, updated_by_id=user.id)
+    session.add(decision)
+    session.commit()
+    return decision
+
+
+class TestBuffering:
+    """Digest subscribers are buffered, immediate subscribers are emailed."""
+
+    def test_burst_of_edits(self, app, session, sample_user, sample_tenant, subscribers, email_config, smtp):
+        immediate, hourly = subscribers
+        decision = _decision(session, sample_tenant, sample_user)
+
+        for _ in range(40):
+            notifications.notify_subscribers_decision_updated(db, decision, email_config, 'Review')
+
+        assert _sent_to(smtp) == [immediate.email] * 40
+        assert NotificationEvent.query.filter_by(user_id=hourly.id).count() == 40
+        assert NotificationEvent.query.filter_by(user_id=immediate.id).count() == 0
+
+
+class TestDigestEntries:
+    """build_digest_entries collapses events per decision."""
+
+    def test_collapse_and_order(self):
+        events = [
+            SimpleNamespace(id=1, decision_id=10, event_type='created', title='A', status='proposed',
+                            actor_name='Ann', change_reason=None),
+            SimpleNamespace(id=2, decision_id=11, event_type='updated', title='B', status='proposed',
+                            actor_name='Bob', change_reason='Typo'),
+            SimpleNamespace(id=3, decision_id=10, event_type='updated', title='A2', status='accepted',
+                            actor_name='Bob', change_reason=None),
+            SimpleNamespace(id=4, decision_id=10, event_type='updated', title='A3', status='accepted',
+                            actor_name='Ann', change_reason='Review'),
+            SimpleNamespace(id=5, decision_id=None, event_type='imported', title='3 decisions imported',
+                            status=None, actor_name='Cy', change_reason=None),
+        ]
+        entries = build_digest_entries(events)
+
+        assert [e['title'] for e in entries] == ['3 decisions imported', 'A3', 'B']
+        assert entries[1]['summary'] == 'Created, Updated 2 times'
+        assert entries[1]['status'] == 'accepted'
+        assert entries[1]['actors'] == ['Ann', 'Bob']
+        assert entries[1]['change_reasons'] == ['Review']
+
+
+class TestSendDueDigests:
+    """The scheduled job sends one digest per recipient."""
+
+    def test_one_digest_per_recipient(self, app, session, sample_user, sample_tenant, subscribers,
+                                      email_config, smtp):
+        _, hourly = subscribers
+        first = _decision(session, sample_tenant, sample_user, 'Use Kafka')
+        second = _decision(session, sample_tenant, sample_user, 'Use <Redis>')
+        for decision in [first] * 5 + [second] * 3:
+            notifications.notify_subscribers_decision_updated(db, decision, email_config)
+        smtp.connections = []
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(minutes=1)
+        stats = send_due_digests(now=now)
+
+        assert stats['emails_sent'] == 1
+        assert stats['events_delivered'] == 8
+        assert len(smtp.connections) == 1
+        to, message = smtp.connections[0].messages[0]
+        assert to == hourly.email
+        assert 'Subject: [ADR] Digest: 2 decisions changed' in message
+        assert NotificationEvent.query.count() == 0
+        assert Subscription.query.filter_by(user_id=hourly.id).first().last_digest_at == now
+
+        # Nothing left to send
+        smtp.connections = []
+        assert send_due_digests(now=now)['emails_sent'] == 0
+        assert smtp.connections == []
+
+    def test_due_intervals(self, app, session, sample_user, sample_tenant, subscribers, email_config, smtp):
+        _, hourly = subscribers
+        daily = User(email='daily@example.com', sso_domain='example.com', auth_type='local')
+        session.add(daily)
+        session.commit()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        session.add(Subscription(user_id=daily.id, notify_on_update=True,
+                                 delivery_mode=Subscription.DELIVERY_DAILY, last_digest_at=now - timedelta(hours=2)))
+        Subscription.query.filter_by(user_id=hourly.id).first().last_digest_at = now - timedelta(minutes=58)
+        session.commit()
+
+        decision = _decision(session, sample_tenant, sample_user)
+        notifications.notify_subscribers_decision_updated(db, decision, email_config)
+        smtp.connections = []
+
+        # Hourly is within the grace period, daily is not due yet
+        send_due_digests(now=now)
+        assert _sent_to(smtp) == [hourly.email]
+        assert NotificationEvent.query.filter_by(user_id=daily.id).count() == 1
+
+        smtp.connections = []
+        send_due_digests(now=now + timedelta(hours=23))
+        assert _sent_to(smtp) == [daily.email]
+
+    def test_failed_send_stays_queued(self, app, session, sample_user, sample_tenant, subscribers,
+                                      email_config, smtp):
+        _, hourly = subscribers
+        decision = _decision(session, sample_tenant, sample_user)
+        notifications.notify_subscribers_decision_updated(db, decision, email_config)
+        smtp.refuse = {hourly.email}
+
+        stats = send_due_digests()
+        assert stats['failed'] == 1
+        assert NotificationEvent.query.filter_by(user_id=hourly.id).count() == 1
+        assert Subscription.query.filter_by(user_id=hourly.id).first().last_digest_at is None
+
+    def test_switched_back_to_immediate_flushes(self, app, session, sample_user, sample_tenant,
+                                                subscribers, email_config, smtp):
+        _, hourly = subscribers
+        decision = _decision(session, sample_tenant, sample_user)
+        notifications.notify_subscribers_decision_updated(db, decision, email_config)
+        subscription = Subscription.query.filter_by(user_id=hourly.id).first()
+        subscription.delivery_mode = Subscription.DELIVERY_IMMEDIATE
+        subscription.last_digest_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        session.commit()
+        smtp.connections = []
+
+        send_due_digests()
+        assert _sent_to(smtp) == [hourly.email]
+        assert NotificationEvent.query.count() == 0
+
+
+class TestEndpoints:
+    """Subscription delivery_mode and the cron endpoint."""
+
+    @pytest.fixture
+    def client_and_user(self):
+        app_module, test_app = load_test_app(secret_key='test-secret-key-digest')
+
+        with test_app.app_context():
+            db.create_all()
+            app_module.init_database()
+
+            tenant = Tenant(domain='digest.com', name='Digest Corp', status='active',
+                            maturity_state=MaturityState.BOOTSTRAP)
+            user = User(email='reader@digest.com', sso_domain='digest.com', auth_type='local', email_verified=True)
+            user.set_password('digestpassword')
+            db.session.add_all([tenant, user])
+            db.session.commit()
+            db.session.add(TenantMembership(user_id=user.id, tenant_id=tenant.id, global_role=GlobalRole.USER))
+            db.session.commit()
+
+            client = test_app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = user.id
+                sess['_csrf_token'] = 'test-csrf-token'
+                sess['_expires_at'] = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+            client.environ_base['HTTP_X_CSRF_TOKEN'] = 'test-csrf-token'
+
+            yield test_app, client
+            db.session.remove()
+            db.drop_all()
+            app_module._db_initialized = False
+
+    def test_delivery_mode(self, client_and_user):
+        _, client = client_and_user
+        assert client.get('/api/user/subscription').get_json()['delivery_mode'] == 'immediate'
+
+        response = client.put('/api/user/subscription', json={'notify_on_update': True, 'delivery_mode': 'daily'})
+        assert response.status_code == 200
+        assert response.get_json()['delivery_mode'] == 'daily'
+
+        assert client.put('/api/user/subscription', json={'delivery_mode': 'weekly'}).status_code == 400
+
+    def test_cron_endpoint(self, client_and_user, monkeypatch):
+        test_app, _ = client_and_user
+        monkeypatch.setenv('NOTIFICATION_CRON_SECRET', 'digest-secret')
+        anonymous = test_app.test_client()
+
+        assert anonymous.post('/api/admin/send-notification-digests').status_code == 403
+        response = anonymous.post('/api/admin/send-notification-digests',
+                                  headers={'X-Cron-Secret': 'digest-secret'})
+        assert response.status_code == 200
+        assert response.get_json()['emails_sent'] == 0
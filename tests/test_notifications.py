@@ -0,0 +1,147 @@
+"""
+Tests for subscriber notification emails (notifications.py, notification_templates.py).
+
+Covers:
+- Templates render once per event and escape HTML
+- Creator/updater are excluded from the recipient list
+- send_email_batch reuses one SMTP connection and only changes the To header
+"""
+import pytest
+from types import SimpleNamespace
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import notifications
+import notification_templates
+from notification_templates import render_notification
+from models import db, User, Subscription, ArchitectureDecision
+
+
+class FakeSMTP:
+    """Records connections and messages instead of talking to a server."""
+
+    instances = []
+
+    def __init__(self, server, port):
+        self.messages = []
+        self.quit_called = False
+        FakeSMTP.instances.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def sendmail(self, from_addr, to_addr, message):
+        self.messages.append((to_addr, message))
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture
+def email_config():
+    return SimpleNamespace(
+        enabled=True, smtp_username='mailer', smtp_password='plain-password',
+        smtp_server='smtp.example.com', smtp_port=587, use_tls=True,
+        from_name='Decision Records', from_email='noreply@example.com',
+    )
+
+
+@pytest.fixture
+def fake_smtp(monkeypatch):
+    FakeSMTP.instances = []
+    monkeypatch.setattr(notifications.smtplib, 'SMTP', FakeSMTP)
+    return FakeSMTP
+
+
+def _decision(**overrides):
+    fields = dict(id=7, title='Use <b>Kafka</b>', status='proposed', context='Line one\nLine two',
+                  decision='We will & must', consequences='More ops', domain='example.com')
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+class TestTemplates:
+    """render_notification output."""
+
+    def test_html_is_escaped_text_is_not(self):
+        html, text = render_notification(
+            'new_decision', decision=_decision(), actor_name='Ann <admin>',
+            subscription_reason='new decision notifications',
+        )
+        assert 'Use &lt;b&gt;Kafka&lt;/b&gt;' in html
+        assert 'We will &amp; must' in html
+        assert 'Ann &lt;admin&gt;' in html
+        assert 'ADR-7: Use <b>Kafka</b>' in text
+        assert 'Status: Proposed' in text
+        assert 'subscribed to new decision notifications' in text
+
+    def test_optional_change_reason(self):
+        _, text = render_notification('decision_updated', decision=_decision(), actor_name='Ann',
+                                      change_reason=None, subscription_reason='updates')
+        assert 'Change reason' not in text
+        _, text = render_notification('decision_updated', decision=_decision(), actor_name='Ann',
+                                      change_reason='Scale', subscription_reason='updates')
+        assert 'Change reason: Scale' in text
+
+    def test_unknown_template(self):
+        with pytest.raises(ValueError):
+            render_notification('missing')
+
+
+class TestBatchSending:
+    """send_email_batch sends one message over one connection."""
+
+    def test_one_connection_many_recipients(self, email_config, fake_smtp):
+        recipients = [f'user{i}@example.com' for i in range(5)] + ['user0@example.com']
+        sent = notifications.send_email_batch(email_config, recipients, 'Subject', '<p>Hi</p>', 'Hi')
+
+        assert sent == 5
+        assert len(fake_smtp.instances) == 1
+        server = fake_smtp.instances[0]
+        assert server.quit_called
+        assert [to for to, _ in server.messages] == recipients[:5]
+        assert 'To: user3@example.com' in server.messages[3][1]
+        assert server.messages[3][1].count('To: ') == 1
+
+    def test_disabled_config(self, email_config, fake_smtp):
+        email_config.enabled = False
+        assert notifications.send_email_batch(email_config, ['a@example.com'], 'S', 'h') == 0
+        assert fake_smtp.instances == []
+
+
+class TestFanOut:
+    """Subscriber fan-out renders once per event."""
+
+    def test_thousand_recipients_single_render(self, app, session, sample_user, sample_tenant,
+                                               email_config, fake_smtp, monkeypatch):
+        subscribers = [User(email=f'sub{i}@example.com', sso_domain='example.com', auth_type='local')
+                       for i in range(1000)]
+        session.add_all(subscribers)
+        session.commit()
+        session.add_all([Subscription(user_id=user.id, notify_on_create=True) for user in subscribers])
+        session.add(Subscription(user_id=sample_user.id, notify_on_create=True))
+        decision = ArchitectureDecision(
+            title='Adopt gRPC', context='c', decision='d', status='accepted', consequences='q',
+            domain='example.com', tenant_id=sample_tenant.id, created_by_id=sample_user.id,
+        )
+        session.add(decision)
+        session.commit()
+
+        renders = []
+        original = notification_templates.render_notification
+        monkeypatch.setattr(notifications, 'render_notification',
+                            lambda name, **context: renders.append(name) or original(name, **context))
+
+        notifications.notify_subscribers_new_decision(db, decision, email_config)
+
+        assert renders == ['new_decision']
+        assert len(fake_smtp.instances) == 1
+        messages = fake_smtp.instances[0].messages
+        assert len(messages) == 1000
+        # The creator is not notified
+        assert sample_user.email not in {to for to, _ in messages}
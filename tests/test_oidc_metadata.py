@@ -0,0 +1,182 @@
+"""
+Tests for the OIDC metadata cache (oidc_metadata.py).
+
+Covers:
+- TTL derivation from Cache-Control / Age / Expires
+- Cache hits, expiry and refresh-ahead in the background
+- Serving stale metadata while the provider is down, with retry backoff
+- Concurrent callers coalescing onto one fetch
+- JWKS lookup and auth.get_oidc_config sharing the process-wide cache
+"""
+import threading
+import time
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import oidc_metadata
+from oidc_metadata import MetadataCache, parse_cache_ttl, FAILURE_BACKOFF, MIN_TTL, MAX_TTL, DEFAULT_TTL
+from http_client import http_client
+from tests.stub_idp import StubIdP
+
+
+@pytest.fixture
+def idp():
+    with StubIdP() as stub:
+        yield stub
+
+
+@pytest.fixture
+def shared_cache():
+    oidc_metadata.metadata_cache.invalidate()
+    yield oidc_metadata.metadata_cache
+    oidc_metadata.metadata_cache.invalidate()
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestParseCacheTtl:
+    """Freshness lifetime from response headers."""
+
+    def test_max_age(self):
+        assert parse_cache_ttl({'Cache-Control': 'public, max-age=600'}) == 600
+
+    def test_age_is_subtracted(self):
+        assert parse_cache_ttl({'Cache-Control': 'max-age=600', 'Age': '100'}) == 500
+
+    def test_no_store_uses_minimum(self):
+        assert parse_cache_ttl({'Cache-Control': 'no-store'}) == MIN_TTL
+        assert parse_cache_ttl({'Cache-Control': 'no-cache'}) == MIN_TTL
+
+    def test_clamped(self):
+        assert parse_cache_ttl({'Cache-Control': 'max-age=5'}) == MIN_TTL
+        assert parse_cache_ttl({'Cache-Control': 'max-age=31536000'}) == MAX_TTL
+
+    def test_expires(self):
+        headers = {'Date': 'Wed, 21 Oct 2026 07:00:00 GMT', 'Expires': 'Wed, 21 Oct 2026 07:30:00 GMT'}
+        assert parse_cache_ttl(headers) == 1800
+        assert parse_cache_ttl({'Expires': '0'}) == MIN_TTL
+
+    def test_default(self):
+        assert parse_cache_ttl({}) == DEFAULT_TTL
+        assert parse_cache_ttl({'Cache-Control': 'max-age=soon'}) == DEFAULT_TTL
+
+
+class TestMetadataCache:
+    """Fetching, expiry and failure handling against the stub IdP."""
+
+    def test_cache_hit(self, idp, clock):
+        cache = MetadataCache(clock=clock)
+
+        for _ in range(20):
+            document = cache.get(idp.discovery_url)
+
+        assert document['issuer'] == idp.issuer
+        assert idp.hit_count() == 1
+
+    def test_refetch_after_max_age(self, idp, clock):
+        idp.cache_control = 'max-age=300'
+        cache = MetadataCache(clock=clock)
+        cache.get(idp.discovery_url)
+
+        clock.advance(301)
+        cache.get(idp.discovery_url)
+        assert idp.hit_count() == 2
+
+    def test_background_refresh_before_expiry(self, idp, clock):
+        idp.cache_control = 'max-age=1000'
+        cache = MetadataCache(clock=clock)
+        cache.get(idp.discovery_url)
+
+        # Within the refresh-ahead window the cached copy is returned immediately
+        clock.advance(900)
+        idp.delay = 0.2
+        started = time.monotonic()
+        assert cache.get(idp.discovery_url) is not None
+        assert time.monotonic() - started < 0.2
+
+        assert _wait_for(lambda: idp.hit_count() == 2)
+        # The refreshed entry is good for another max-age from now
+        clock.advance(500)
+        cache.get(idp.discovery_url)
+        assert _wait_for(lambda: not cache._entry(idp.discovery_url).refreshing)
+        assert idp.hit_count() == 2
+
+    def test_serves_stale_when_idp_down(self, idp, clock):
+        idp.cache_control = 'max-age=300'
+        cache = MetadataCache(clock=clock)
+        original = cache.get(idp.discovery_url)
+
+        # The shared HTTP client retries the failed GET before giving up
+        failed_fetch_hits = 1 + http_client.retries
+        idp.fail = True
+        clock.advance(400)
+        assert cache.get(idp.discovery_url) == original
+        assert idp.hit_count() == 1 + failed_fetch_hits
+
+        # Failures back off instead of hitting the provider on every login
+        clock.advance(FAILURE_BACKOFF / 2)
+        assert cache.get(idp.discovery_url) == original
+        assert idp.hit_count() == 1 + failed_fetch_hits
+
+        idp.fail = False
+        clock.advance(FAILURE_BACKOFF)
+        assert cache.get(idp.discovery_url) == original
+        assert idp.hit_count() == 2 + failed_fetch_hits
+
+    def test_unavailable_without_cached_copy(self, idp, clock):
+        idp.fail = True
+        cache = MetadataCache(clock=clock)
+        assert cache.get(idp.discovery_url) is None
+
+    def test_concurrent_callers_share_one_fetch(self, idp):
+        idp.delay = 0.2
+        cache = MetadataCache()
+        results = []
+
+        def login():
+            results.append(cache.get(idp.discovery_url))
+
+        threads = [threading.Thread(target=login) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(results) == 10 and all(r is not None for r in results)
+        assert idp.hit_count() == 1
+
+    def test_invalidate(self, idp, clock):
+        cache = MetadataCache(clock=clock)
+        cache.get(idp.discovery_url)
+        cache.invalidate(idp.discovery_url)
+        cache.get(idp.discovery_url)
+        assert idp.hit_count() == 2
+
+
+class TestSharedCache:
+    """Module-level helpers used by the SSO flows."""
+
+    def test_get_jwks(self, idp, shared_cache):
+        jwks = oidc_metadata.get_jwks(idp.discovery_url)
+        assert jwks['keys'][0]['kid'] == idp.kid
+        oidc_metadata.get_jwks(idp.discovery_url)
+        assert idp.hit_count() == 1
+        assert idp.hit_count('/jwks') == 1
+
+    def test_get_oidc_config_uses_shared_cache(self, idp, shared_cache):
+        from auth import get_oidc_config
+
+        assert get_oidc_config(idp.discovery_url)['token_endpoint'] == f'{idp.issuer}/token'
+        assert oidc_metadata.get_discovery_document(idp.discovery_url)['issuer'] == idp.issuer
+        assert idp.hit_count() == 1
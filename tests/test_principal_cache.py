@@ -0,0 +1,203 @@
+"""
+Tests for the server-side principal cache (principal_cache.py).
+
+Covers:
+- Principal records and the per-process store's TTL
+- Invalidation on credential, role and anonymization commits (not on rollback)
+- login_required authorizing cached principals without SQL
+- Lazy loading of g.current_user and the credential setup gate
+- A cached principal whose user row is gone is rejected like a signed-out session
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask import g, jsonify
+from sqlalchemy import event
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, User, TenantMembership, WebAuthnCredential, GlobalRole
+from principal_cache import LocalPrincipalStore, Principal, principal_cache, principal_for
+
+
+@pytest.fixture
+def local_store():
+    previous = principal_cache._store
+    principal_cache.store = LocalPrincipalStore()
+    yield principal_cache.store
+    principal_cache.store = previous
+
+
+def _member(session, tenant, email='member@example.com', role=GlobalRole.USER, password=True):
+    user = User(email=email, sso_domain='example.com', auth_type='local', email_verified=True)
+    if password:
+        user.set_password('principal-password-123')
+    session.add(user)
+    session.flush()
+    session.add(TenantMembership(user_id=user.id, tenant_id=tenant.id, global_role=role))
+    session.commit()
+    return user
+
+
+class TestPrincipal:
+    """Principal records and the local store."""
+
+    def test_principal_for(self, session, sample_tenant):
+        user = _member(session, sample_tenant, role=GlobalRole.STEWARD)
+        assert principal_for(user) == Principal(
+            user_id=user.id, domain='example.com', auth_type='local', has_credentials=True,
+            tenant_id=sample_tenant.id, role='steward',
+        )
+
+    def test_local_store_ttl(self, clock):
+        store = LocalPrincipalStore(ttl=10, clock=clock)
+        principal = Principal(1, 'example.com', 'local', True, 1, 'user')
+        store.set(principal)
+        assert store.get(1) == principal
+        clock.now += 11
+        assert store.get(1) is None
+
+
+class TestInvalidation:
+    """Commits touching users, credentials or memberships drop cached principals."""
+
+    def test_role_change(self, session, local_store, sample_tenant):
+        user = _member(session, sample_tenant)
+        principal_cache.remember(user)
+        membership = TenantMembership.query.filter_by(user_id=user.id).first()
+        membership.global_role = GlobalRole.ADMIN
+        session.commit()
+        assert principal_cache.get(user.id) is None
+        assert principal_cache.remember(user).role == 'admin'
+
+    def test_credential_added(self, session, local_store, sample_tenant):
+        user = _member(session, sample_tenant, password=False)
+        assert principal_cache.remember(user).has_credentials is False
+        session.add(WebAuthnCredential(user_id=user.id, credential_id=b'cred', public_key=b'key'))
+        session.commit()
+        assert principal_cache.get(user.id) is None
+
+    def test_anonymization(self, session, local_store, sample_tenant):
+        from gdpr_jobs import anonymize_user
+
+        user = _member(session, sample_tenant)
+        principal_cache.remember(user)
+        assert anonymize_user(user.id)
+        assert principal_cache.get(user.id) is None
+
+    def test_rollback_keeps_entry(self, session, local_store, sample_tenant):
+        user = _member(session, sample_tenant)
+        principal_cache.remember(user)
+        user.auth_type = 'sso'
+        session.flush()
+        session.rollback()
+        assert principal_cache.get(user.id) is not None
+
+
+def _login(test_app, user):
+    client = test_app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+        sess['_csrf_token'] = 'test-csrf-token'
+        sess['_expires_at'] = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    return client
+
+
+@pytest.fixture
+def statements():
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+class TestLoginRequired:
+    """login_required authorizes from the cached principal."""
+
+    @pytest.fixture
+    def app(self, local_store):
+        from tests.app_test_utils import load_test_app
+
+        app_module, test_app = load_test_app(secret_key='test-secret-key-principal-cache-012345')
+
+        @test_app.route('/api/test/principal')
+        @app_module.login_required
+        def principal_view():
+            return jsonify({'user_id': g.principal.user_id, 'role': g.principal.role})
+
+        @test_app.route('/api/test/user')
+        @app_module.login_required
+        def user_view():
+            return jsonify({'email': g.current_user.email})
+
+        with test_app.app_context():
+            db.create_all()
+            app_module.init_database()
+            yield test_app
+            db.session.remove()
+            db.drop_all()
+            app_module._db_initialized = False
+
+    def test_cached_principal_needs_no_sql(self, app, session, sample_tenant, statements):
+        user = _member(session, sample_tenant)
+        client = _login(app, user)
+
+        assert client.get('/api/test/principal').get_json() == {'user_id': user.id, 'role': 'user'}
+        db.session.remove()
+        statements.clear()
+
+        assert client.get('/api/test/principal').status_code == 200
+        assert statements == []
+
+    def test_current_user_loaded_on_use(self, app, session, sample_tenant, statements):
+        user = _member(session, sample_tenant)
+        client = _login(app, user)
+        client.get('/api/test/principal')
+        db.session.remove()
+        statements.clear()
+
+        assert client.get('/api/test/user').get_json() == {'email': 'member@example.com'}
+        assert len(statements) == 1
+
+    def test_credential_setup_gate(self, app, session, sample_tenant):
+        user = _member(session, sample_tenant, password=False)
+        client = _login(app, user)
+        response = client.get('/api/test/principal')
+        assert response.status_code == 403
+        assert response.get_json()['setup_required'] is True
+
+        user.set_password('principal-password-123')
+        session.commit()
+        assert client.get('/api/test/principal').status_code == 200
+
+    def test_anonymized_user_rejected(self, app, session, sample_tenant):
+        from gdpr_jobs import anonymize_user
+
+        user = _member(session, sample_tenant)
+        client = _login(app, user)
+        assert client.get('/api/test/principal').status_code == 200
+        anonymize_user(user.id)
+        assert client.get('/api/test/principal').status_code == 401
+
+    def test_deleted_user_is_a_cache_miss(self, app, session, sample_tenant):
+        user = _member(session, sample_tenant)
+        client = _login(app, user)
+        assert client.get('/api/test/principal').status_code == 200
+
+        # Bulk deletes bypass the invalidation hooks, so the principal is still cached
+        TenantMembership.query.filter_by(user_id=user.id).delete()
+        User.query.filter_by(id=user.id).delete()
+        session.commit()
+        assert principal_cache.get(user.id) is not None
+
+        response = client.get('/api/test/user')
+        assert response.status_code == 401
+        assert response.get_json() == {'error': 'Authentication required'}
+        assert principal_cache.get(user.id) is None
+        assert client.get('/api/test/principal').status_code == 401
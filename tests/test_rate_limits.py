@@ -0,0 +1,246 @@
+"""
+Tests for shared sliding-window rate limiting (rate_limits.py).
+
+Covers:
+- Sliding-window counting, decay of the previous window and Retry-After
+- Falling back to in-process counters when Redis is unreachable
+- Per-API-key and per-tenant AI quotas
+- The decision deletion throttle counts in a shared store, or on the membership row without one
+- /api/ai and /api/mcp requests over quota get 429 with Retry-After
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rate_limits
+import redis_support
+from rate_limits import MemoryStore, SlidingWindowLimiter, check_ai_quota, hash_api_key, limiter_storage_uri
+
+
+@pytest.fixture
+def clock(clock):
+    clock.now = 1_000_020.0  # 0s into a 60s window
+    return clock
+
+
+class TestMemoryStore:
+    """Sliding-window counters held in-process."""
+
+    def test_limit_within_window(self, clock):
+        store = MemoryStore(clock)
+        results = [store.hit('k', 3, 60) for _ in range(4)]
+        assert [r.allowed for r in results] == [True, True, True, False]
+        assert [r.remaining for r in results[:3]] == [2, 1, 0]
+        assert results[3].retry_after > 0
+
+    def test_denied_hits_are_not_counted(self, clock):
+        store = MemoryStore(clock)
+        for _ in range(10):
+            store.hit('k', 2, 60)
+        clock.now += 120
+        assert store.hit('k', 2, 60).allowed
+
+    def test_previous_window_decays(self, clock):
+        store = MemoryStore(clock)
+        assert all(store.hit('k', 4, 60).allowed for _ in range(4))
+
+        # Halfway through the next window half of the previous count still applies
+        clock.now += 90
+        results = [store.hit('k', 4, 60) for _ in range(3)]
+        assert [r.allowed for r in results] == [True, True, False]
+        assert results[2].retry_after == 15
+
+    def test_keys_are_independent(self, clock):
+        store = MemoryStore(clock)
+        assert store.hit('a', 1, 60).allowed
+        assert store.hit('b', 1, 60).allowed
+        assert not store.hit('a', 1, 60).allowed
+
+    def test_cost(self, clock):
+        store = MemoryStore(clock)
+        assert store.hit('k', 5, 60, cost=4).allowed
+        assert not store.hit('k', 5, 60, cost=2).allowed
+        assert store.hit('k', 5, 60).allowed
+
+    def test_sweep_drops_expired_keys(self, monkeypatch, clock):
+        monkeypatch.setattr(rate_limits, 'MEMORY_SWEEP_THRESHOLD', 2)
+        store = MemoryStore(clock)
+        store.hit('a', 1, 60)
+        store.hit('b', 1, 60)
+        clock.now += 300
+        store.hit('c', 1, 60)
+        assert set(store._counters) == {'c'}
+
+
+class TestRedisStore:
+    """Redis counters fall back to in-process ones while Redis is down."""
+
+    def test_falls_back_when_unreachable(self, clock):
+        redis = pytest.importorskip('redis')
+
+        class DownClient:
+            def register_script(self, script):
+                def run(keys, args):
+                    raise redis.ConnectionError('connection refused')
+                return run
+
+        store = rate_limits.RedisStore(DownClient(), clock=clock)
+        assert [store.hit('k', 1, 60).allowed for _ in range(2)] == [True, False]
+        assert store.shared_hit('k', 1, 60) is None
+
+    def test_memory_store_is_not_shared(self, clock):
+        assert MemoryStore(clock).shared_hit('k', 1, 60) is None
+
+    def test_storage_uri_without_redis(self, monkeypatch):
+        monkeypatch.setattr(redis_support, 'REDIS_AVAILABLE', False)
+        assert limiter_storage_uri('redis://localhost:6379/0') == 'memory://'
+        assert limiter_storage_uri('') == 'memory://'
+        assert isinstance(rate_limits.create_store('redis://localhost:6379/0'), MemoryStore)
+
+
+class TestAIQuota:
+    """Per-API-key and per-tenant quotas."""
+
+    def test_key_quota(self, monkeypatch, clock):
+        monkeypatch.setenv('AI_RATE_LIMIT_PER_KEY', '2')
+        limiter = SlidingWindowLimiter(MemoryStore(clock))
+        assert check_ai_quota('hash-a', 1, limiter=limiter) is None
+        assert check_ai_quota('hash-a', 1, limiter=limiter) is None
+        exceeded = check_ai_quota('hash-a', 1, limiter=limiter)
+        assert exceeded.limit == 2 and exceeded.retry_after > 0
+        assert check_ai_quota('hash-b', 1, limiter=limiter) is None
+
+    def test_tenant_quota_spans_keys(self, monkeypatch, clock):
+        monkeypatch.setenv('AI_RATE_LIMIT_PER_TENANT', '3')
+        limiter = SlidingWindowLimiter(MemoryStore(clock))
+        assert all(check_ai_quota(f'hash-{i}', 7, limiter=limiter) is None for i in range(3))
+        assert check_ai_quota('hash-3', 7, limiter=limiter).limit == 3
+        assert check_ai_quota('hash-4', 8, limiter=limiter) is None
+
+    def test_zero_disables(self, monkeypatch, clock):
+        monkeypatch.setenv('AI_RATE_LIMIT_PER_KEY', '0')
+        monkeypatch.setenv('AI_RATE_LIMIT_PER_TENANT', '0')
+        limiter = SlidingWindowLimiter(MemoryStore(clock))
+        assert all(check_ai_quota('hash', 1, limiter=limiter) is None for _ in range(500))
+
+    def test_hash_matches_stored_key_hash(self):
+        assert len(hash_api_key('dr_example')) == 64
+
+
+@pytest.fixture
+def app():
+    from tests.app_test_utils import load_test_app
+    from models import db
+
+    app_module, test_app = load_test_app(secret_key='test-secret-key-rate-limits-0123456789')
+    rate_limits.rate_limiter.store = MemoryStore()
+    with test_app.app_context():
+        db.create_all()
+        app_module.init_database()
+        yield test_app
+        db.session.remove()
+        db.drop_all()
+        app_module._db_initialized = False
+    rate_limits.rate_limiter.store = None
+
+
+@pytest.fixture
+def app_client(app, session, sample_tenant, sample_user):
+    from models import TenantMembership, GlobalRole
+
+    sample_user.set_password('rate-limit-password-123')
+    membership = TenantMembership(user_id=sample_user.id, tenant_id=sample_tenant.id, global_role=GlobalRole.ADMIN)
+    session.add(membership)
+    session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = sample_user.id
+        sess['_csrf_token'] = 'test-csrf-token'
+        sess['_expires_at'] = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    client.environ_base['HTTP_X_CSRF_TOKEN'] = 'test-csrf-token'
+    return app, client, sample_tenant, sample_user, membership
+
+
+class SharedMemoryStore(MemoryStore):
+    """A MemoryStore standing in for a reachable Redis."""
+
+    def shared_hit(self, key, limit, window, cost=1):
+        return self.hit(key, limit, window, cost)
+
+
+class TestDeletionThrottle:
+    """More than three deletions in five minutes locks deletion for an hour."""
+
+    def _delete_four(self, app_client):
+        from models import db, ArchitectureDecision
+
+        _app, client, tenant, user, membership = app_client
+        decisions = [
+            ArchitectureDecision(title=f'Decision {i}', context='c', decision='d', consequences='c',
+                                 status='proposed', domain=tenant.domain, tenant_id=tenant.id,
+                                 created_by_id=user.id, decision_number=i + 1)
+            for i in range(4)
+        ]
+        db.session.add_all(decisions)
+        db.session.commit()
+
+        statuses = [client.delete(f'/api/decisions/{d.id}').status_code for d in decisions]
+        assert statuses == [200, 200, 200, 429]
+
+        db.session.refresh(membership)
+        assert membership.deletion_rate_limited_at is not None
+        assert db.session.get(ArchitectureDecision, decisions[3].id).deleted_at is None
+        return membership
+
+    def test_fourth_deletion_locks_out(self, app_client):
+        # No shared store: the count is kept on the membership, which every worker sees
+        membership = self._delete_four(app_client)
+        assert membership.deletion_count == 3
+        assert membership.deletion_count_window_start is not None
+
+    def test_counted_in_shared_store(self, app_client):
+        rate_limits.rate_limiter.store = SharedMemoryStore()
+        membership = self._delete_four(app_client)
+        assert membership.deletion_count in (None, 0)
+
+    def test_missing_decision_not_counted(self, app_client):
+        _app, client, _tenant, _user, _membership = app_client
+        assert all(client.delete('/api/decisions/99999').status_code == 404 for _ in range(5))
+
+
+class TestAIQuotaEndpoints:
+    """Requests over quota are rejected before reaching the AI handlers."""
+
+    def test_api_ai_over_quota(self, app_client, monkeypatch):
+        monkeypatch.setenv('AI_RATE_LIMIT_PER_KEY', '2')
+        test_app, client, _tenant, _user, _membership = app_client
+        test_app.config['RATELIMIT_ENABLED'] = True
+        headers = {'Authorization': 'Bearer dr_test_key'}
+
+        assert all(client.get('/api/ai/search', headers=headers).status_code != 429 for _ in range(2))
+        response = client.get('/api/ai/search', headers=headers)
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) > 0
+        assert response.get_json()['error'] == 'Rate limit exceeded'
+
+    def test_mcp_batch_counts_each_message(self, app_client, monkeypatch):
+        monkeypatch.setenv('AI_RATE_LIMIT_PER_KEY', '3')
+        test_app, client, _tenant, _user, _membership = app_client
+        test_app.config['RATELIMIT_ENABLED'] = True
+        batch = [{'jsonrpc': '2.0', 'id': i, 'method': 'tools/list'} for i in range(4)]
+
+        response = client.post('/api/mcp', json=batch, headers={'Authorization': 'Bearer dr_test_key'})
+        assert response.status_code == 429
+        assert response.get_json()['error']['code'] == -32000
+
+    def test_disabled_with_rate_limiting(self, app_client, monkeypatch):
+        monkeypatch.setenv('AI_RATE_LIMIT_PER_KEY', '1')
+        test_app, client, _tenant, _user, _membership = app_client
+        test_app.config['RATELIMIT_ENABLED'] = False
+        headers = {'Authorization': 'Bearer dr_test_key'}
+        assert all(client.get('/api/ai/search', headers=headers).status_code != 429 for _ in range(3))
@@ -0,0 +1,38 @@
+"""
+Tests for optional Redis configuration (redis_support.py).
+
+Covers:
+- Feature URLs fall back to REDIS_URL
+- Non-Redis URLs, and Redis URLs without the redis package, keep state in-process
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import redis_support
+from redis_support import configured_url, redis_url
+
+
+class TestRedisUrl:
+    """Which URL a feature connects to, if any."""
+
+    def test_feature_url_then_redis_url(self, monkeypatch):
+        monkeypatch.setenv('REDIS_URL', 'redis://shared:6379/0')
+        monkeypatch.delenv('TEST_FEATURE_URL', raising=False)
+        assert configured_url('TEST_FEATURE_URL') == 'redis://shared:6379/0'
+        monkeypatch.setenv('TEST_FEATURE_URL', 'rediss://feature:6380/1')
+        assert configured_url('TEST_FEATURE_URL') == 'rediss://feature:6380/1'
+        monkeypatch.delenv('REDIS_URL')
+        assert configured_url() is None
+
+    def test_only_redis_schemes(self, monkeypatch):
+        monkeypatch.setattr(redis_support, 'REDIS_AVAILABLE', True)
+        assert redis_url('redis://localhost:6379/0') == 'redis://localhost:6379/0'
+        assert redis_url('unix:///run/redis.sock') == 'unix:///run/redis.sock'
+        assert redis_url('memcached://localhost:11211') is None
+        assert redis_url('') is None
+
+    def test_without_package(self, monkeypatch, caplog):
+        monkeypatch.setattr(redis_support, 'REDIS_AVAILABLE', False)
+        assert redis_url('redis://localhost:6379/0', description='Test cache') is None
+        assert 'Test cache URL is Redis but the redis package is not installed' in caplog.text
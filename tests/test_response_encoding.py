@@ -0,0 +1,134 @@
+"""
+Tests for the JSON provider and response compression (response_encoding.py).
+
+Covers:
+- JSON output with and without orjson, including datetime handling
+- gzip negotiation, size threshold and Vary header
+- Streamed (SSE) responses and non-text mimetypes are not compressed
+- Strong ETags are weakened when the body is compressed
+"""
+import gzip
+import json
+import pytest
+from datetime import datetime, date
+from decimal import Decimal
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, Response, jsonify
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+import response_encoding
+from response_encoding import FastJSONProvider, choose_encoding, init_response_encoding
+
+
+@pytest.fixture
+def encoded_app():
+    app = Flask(__name__)
+    init_response_encoding(app)
+    app.config['RESPONSE_COMPRESSION_MIN_SIZE'] = 100
+
+    @app.route('/big')
+    def big():
+        return jsonify([{'title': 'Use PostgreSQL', 'status': 'accepted'}] * 50)
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/tagged')
+    def tagged():
+        response = jsonify([{'title': 'Use PostgreSQL'}] * 50)
+        response.set_etag('abc123')
+        return response
+
+    @app.route('/sse')
+    def sse():
+        return Response((f'data: {i}\n\n' * 100 for i in range(3)), mimetype='text/event-stream')
+
+    @app.route('/binary')
+    def binary():
+        return Response(b'\x00' * 5000, mimetype='application/octet-stream')
+
+    return app
+
+
+class TestJSONProvider:
+    """FastJSONProvider output."""
+
+    def test_datetimes_are_iso(self, encoded_app):
+        with encoded_app.app_context():
+            body = encoded_app.json.dumps({'at': datetime(2026, 1, 2, 3, 4, 5), 'on': date(2026, 1, 2)})
+        assert json.loads(body) == {'at': '2026-01-02T03:04:05', 'on': '2026-01-02'}
+
+    def test_sorted_keys_and_fallback_types(self, encoded_app):
+        with encoded_app.app_context():
+            body = encoded_app.json.dumps({'b': Decimal('1.5'), 'a': 2 ** 70})
+        assert body.index('"a"') < body.index('"b"')
+        assert json.loads(body) == {'a': 2 ** 70, 'b': '1.5'}
+
+    def test_stdlib_fallback(self, encoded_app, monkeypatch):
+        monkeypatch.setattr(response_encoding, 'ORJSON_AVAILABLE', False)
+        with encoded_app.test_request_context():
+            response = encoded_app.json.response({'at': datetime(2026, 1, 2)})
+        assert json.loads(response.get_data()) == {'at': '2026-01-02T00:00:00'}
+
+    def test_loads(self, encoded_app):
+        with encoded_app.app_context():
+            assert encoded_app.json.loads(b'{"a": [1, 2]}') == {'a': [1, 2]}
+            with pytest.raises(ValueError):
+                encoded_app.json.loads('{not json')
+
+    def test_is_installed(self, encoded_app):
+        assert isinstance(encoded_app.json, FastJSONProvider)
+
+
+class TestCompression:
+    """Negotiated compression of buffered responses."""
+
+    def test_gzip_large_json(self, encoded_app):
+        response = encoded_app.test_client().get('/big', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert int(response.headers['Content-Length']) == len(response.get_data())
+        assert json.loads(gzip.decompress(response.get_data()))[0]['title'] == 'Use PostgreSQL'
+
+    def test_no_accept_encoding(self, encoded_app):
+        response = encoded_app.test_client().get('/big')
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_json()[0]['status'] == 'accepted'
+
+    def test_below_threshold(self, encoded_app):
+        response = encoded_app.test_client().get('/small', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+
+    def test_sse_and_binary_skipped(self, encoded_app):
+        client = encoded_app.test_client()
+        sse = client.get('/sse', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in sse.headers
+        assert sse.get_data(as_text=True).startswith('data: 0')
+        binary = client.get('/binary', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in binary.headers
+
+    def test_disabled(self, encoded_app):
+        encoded_app.config['RESPONSE_COMPRESSION_ENABLED'] = False
+        response = encoded_app.test_client().get('/big', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+
+    def test_etag_weakened(self, encoded_app):
+        response = encoded_app.test_client().get('/tagged', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['ETag'] == 'W/"abc123"'
+
+    @pytest.mark.parametrize('header, brotli_available, expected', [
+        ('gzip, deflate, br', False, 'gzip'),
+        ('gzip, deflate, br', True, 'br'),
+        ('gzip;q=1.0, br;q=0.5', True, 'gzip'),
+        ('identity', True, None),
+        ('', False, None),
+    ])
+    def test_choose_encoding(self, monkeypatch, header, brotli_available, expected):
+        monkeypatch.setattr(response_encoding, 'BROTLI_AVAILABLE', brotli_available)
+        assert choose_encoding(parse_accept_header(header, Accept)) == expected
@@ -0,0 +1,153 @@
+"""
+Tests for declarative route classes (route_classes.py).
+
+Covers:
+- Path classification from @route_class declarations and static endpoints
+- Probe and static requests never decode or write the session cookie
+- Rate limiting exempts probes
+- The real app classifies its health routes as probes
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask import Flask, jsonify, session
+from flask.sessions import SecureCookieSessionInterface
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from route_classes import (
+    ROUTE_APP, ROUTE_PROBE, ROUTE_STATIC, FRONTEND_ASSET_EXTENSIONS,
+    route_class, init_route_classes, register_route_classes, is_lightweight_request,
+)
+
+
+def _make_app(limiter=False, asset_extensions=()):
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static'))
+    app.config['SECRET_KEY'] = 'test-secret-key-route-classes'
+
+    rate_limiter = None
+    if limiter:
+        from flask_limiter import Limiter
+        from flask_limiter.util import get_remote_address
+        rate_limiter = Limiter(key_func=get_remote_address, app=app, default_limits=['2 per minute'],
+                               storage_uri='memory://')
+
+    init_route_classes(app, limiter=rate_limiter, asset_extensions=asset_extensions)
+
+    @app.route('/ping')
+    @route_class(ROUTE_PROBE)
+    def ping():
+        return jsonify({'lightweight': is_lightweight_request(), 'user_id': session.get('user_id')})
+
+    @app.route('/api/me')
+    def me():
+        session['seen'] = True
+        return jsonify({'lightweight': is_lightweight_request(), 'user_id': session.get('user_id')})
+
+    register_route_classes(app)
+    return app
+
+
+@pytest.fixture
+def opened_sessions(monkeypatch):
+    calls = []
+    original = SecureCookieSessionInterface.open_session
+
+    def counting(self, app, request):
+        calls.append(request.path)
+        return original(self, app, request)
+
+    monkeypatch.setattr(SecureCookieSessionInterface, 'open_session', counting)
+    return calls
+
+
+class TestClassification:
+    """Paths map to the declared classes."""
+
+    def test_declared_and_static_routes(self):
+        classifier = _make_app().extensions['route_classes']
+        assert classifier.classify('/ping') == ROUTE_PROBE
+        assert classifier.classify('/static/css/app.css') == ROUTE_STATIC
+        assert classifier.classify('/api/me') == ROUTE_APP
+        assert classifier.classify('/') == ROUTE_APP
+
+    def test_frontend_assets(self):
+        classifier = _make_app(asset_extensions=FRONTEND_ASSET_EXTENSIONS).extensions['route_classes']
+        assert classifier.classify('/main-5XK2.js') == ROUTE_STATIC
+        assert classifier.classify('/assets/logo.SVG') == ROUTE_STATIC
+        assert classifier.classify('/api/decisions/export.js') == ROUTE_APP
+        assert classifier.classify('/example.com/decisions') == ROUTE_APP
+
+    def test_unknown_class_rejected(self):
+        with pytest.raises(ValueError):
+            route_class('cached')
+
+    def test_disabled(self):
+        classifier = _make_app().extensions['route_classes']
+        classifier.enabled = False
+        assert classifier.classify('/ping') == ROUTE_APP
+
+
+class TestSessionBypass:
+    """Lightweight requests do not touch the session cookie."""
+
+    def test_probe_skips_session(self, opened_sessions):
+        client = _make_app().test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = 7
+        opened_sessions.clear()
+
+        response = client.get('/ping')
+        assert response.get_json() == {'lightweight': True, 'user_id': None}
+        assert 'Set-Cookie' not in response.headers
+        assert opened_sessions == []
+
+        response = client.get('/api/me')
+        assert response.get_json() == {'lightweight': False, 'user_id': 7}
+        assert opened_sessions == ['/api/me']
+
+    def test_static_skips_session(self, opened_sessions):
+        client = _make_app().test_client()
+        response = client.get('/static/CUBE_2D_LIGHT.svg')
+        assert response.status_code == 200
+        assert 'Set-Cookie' not in response.headers
+        assert opened_sessions == []
+
+
+class TestRateLimiting:
+    """Probes are exempt from the limiter."""
+
+    def test_probe_exempt(self):
+        client = _make_app(limiter=True).test_client()
+        assert all(client.get('/ping').status_code == 200 for _ in range(5))
+        assert [client.get('/api/me').status_code for _ in range(3)] == [200, 200, 429]
+
+
+class TestAppRoutes:
+    """The real app's health endpoints are probes."""
+
+    def test_health_routes_are_probes(self):
+        from tests.app_test_utils import load_test_app
+        from models import db
+
+        app_module, test_app = load_test_app(secret_key='test-secret-key-route-classes')
+        classifier = test_app.extensions['route_classes']
+        for path in ('/health', '/ping', '/api/health'):
+            assert classifier.classify(path) == ROUTE_PROBE
+        assert classifier.classify('/api/decisions') == ROUTE_APP
+
+        with test_app.app_context():
+            db.create_all()
+            client = test_app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = 1
+                sess['_expires_at'] = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+
+            # An expired session is left alone by probes and cleared by app requests
+            assert 'Set-Cookie' not in client.get('/ping').headers
+            assert 'Set-Cookie' in client.get('/api/version').headers
+            db.session.remove()
+            db.drop_all()
+            app_module._db_initialized = False
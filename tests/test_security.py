@@ -373,6 +373,81 @@ class TestSecurityHeaders:
             assert response.headers['X-Content-Type-Options'] == 'nosniff'
 
 
+class TestAttackPathMatcher:
+    """Test the precompiled scanner path matcher."""
+
+    def _legacy_match(self, path):
+        from security import ATTACK_PATH_PATTERNS
+        return any(pattern in path.lower() for pattern in ATTACK_PATH_PATTERNS)
+
+    @pytest.mark.parametrize('path', [
+        '/wp-login.php', '/xmlrpc.php', '/.env', '/ADMIN/.env', '/.git/config', '/cgi-bin/luci',
+        '/vendor/phpunit/phpunit/src/Util/PHP/eval-stdin.php', '/phpMyAdmin/', '/debug/vars',
+        '/.well-known/security.txt', '/api/decisions', '/api/decisions/42/history', '/static/js/main.js',
+        '/api/user/subscription', '/', '/api/mcp', '/superadmin/settings',
+    ])
+    def test_matches_like_substring_loop(self, path):
+        """The compiled matcher blocks exactly what the substring loop blocked."""
+        from security import AttackPathMatcher, ATTACK_PATH_PATTERNS
+
+        matcher = AttackPathMatcher(ATTACK_PATH_PATTERNS)
+        assert (matcher.match(path) is not None) == self._legacy_match(path)
+        # Second lookup goes through the cache and must agree
+        assert (matcher.match(path) is not None) == self._legacy_match(path)
+
+    def test_longest_overlapping_pattern_reported(self):
+        """A pattern is credited rather than its prefix."""
+        from security import AttackPathMatcher
+
+        matcher = AttackPathMatcher(['admin', 'adminer', 'php'])
+        assert matcher.match('/Adminer.php') == 'adminer'
+        assert matcher.match('/admin/login') == 'admin'
+
+    def test_hit_counters(self):
+        """Blocked paths are counted per pattern."""
+        from security import AttackPathMatcher, ATTACK_PATH_PATTERNS
+
+        matcher = AttackPathMatcher(ATTACK_PATH_PATTERNS)
+        for path in ['/wp-login.php', '/wp-admin/', '/.env', '/api/decisions']:
+            matcher.match(path)
+
+        stats = matcher.stats()
+        assert stats['hits'] == {'wp-': 2, '.env': 1}
+        assert stats['total_hits'] == 3
+
+    def test_extend_at_runtime(self):
+        """Extra patterns from config take effect, including for cached paths."""
+        from security import AttackPathMatcher, ATTACK_PATH_PATTERNS
+
+        matcher = AttackPathMatcher(ATTACK_PATH_PATTERNS)
+        assert matcher.match('/actuator/health') is None
+
+        matcher.extend(' /Actuator/ , .bak,')
+        assert matcher.match('/actuator/health') == '/actuator/'
+        assert matcher.match('/backup/site.bak') == '.bak'
+        assert len(matcher.patterns) == len(ATTACK_PATH_PATTERNS) + 2
+
+    def test_cache_is_bounded(self):
+        """Clean paths are cached up to the configured size."""
+        from security import AttackPathMatcher, ATTACK_PATH_CACHE_MAX_LENGTH
+
+        matcher = AttackPathMatcher(['.php'], cache_size=10)
+        for i in range(25):
+            matcher.match(f'/api/decisions/{i}')
+        matcher.match('/api/' + 'x' * ATTACK_PATH_CACHE_MAX_LENGTH)
+        assert len(matcher._state[2]) <= 10
+
+    def test_blocked_in_app(self):
+        """The before_request hook returns an empty 404 for scanner paths."""
+        from tests.app_test_utils import load_test_app
+
+        _, test_app = load_test_app(secret_key='test-secret-key-attack-paths')
+        client = test_app.test_client()
+        response = client.get('/wp-login.php')
+        assert response.status_code == 404
+        assert response.data == b''
+
+
 class TestInputValidationEdgeCases:
     """Test edge cases for input validation."""
 
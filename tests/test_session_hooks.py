@@ -0,0 +1,75 @@
+"""
+Tests for changes handled after a commit (session_hooks.py).
+
+Covers:
+- Items collected at flush time are applied once, after the commit
+- Rolled back transactions discard their items; rolled back savepoints do not
+- Items queued with add() outside a flush
+"""
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Tenant, MaturityState
+from session_hooks import PendingChanges
+
+applied = []
+
+
+def _hook_domains(session):
+    return [obj.domain for obj in session.new if isinstance(obj, Tenant) and obj.domain.endswith('.hooks')]
+
+
+pending_domains = PendingChanges('test_session_hooks', _hook_domains,
+                                 lambda session, domains: applied.append(domains))
+
+
+@pytest.fixture(autouse=True)
+def clear_applied():
+    applied.clear()
+    yield
+    applied.clear()
+
+
+def _tenant(domain):
+    return Tenant(domain=domain, name=domain, status='active', maturity_state=MaturityState.BOOTSTRAP)
+
+
+class TestPendingChanges:
+    """Flushed changes reach apply() only when they commit."""
+
+    def test_applied_after_commit(self, session):
+        session.add(_tenant('a.hooks'))
+        session.flush()
+        session.add(_tenant('b.hooks'))
+        session.flush()
+        assert applied == []
+        session.commit()
+        assert applied == [['a.hooks', 'b.hooks']]
+        session.commit()
+        assert applied == [['a.hooks', 'b.hooks']]
+
+    def test_rollback_discards(self, session):
+        session.add(_tenant('a.hooks'))
+        session.flush()
+        session.rollback()
+        session.commit()
+        assert applied == []
+
+    def test_savepoint_rollback_keeps_outer_changes(self, session):
+        session.add(_tenant('a.hooks'))
+        session.flush()
+        savepoint = session.begin_nested()
+        session.add(_tenant('b.hooks'))
+        session.flush()
+        savepoint.rollback()
+        session.commit()
+        # Items of the savepoint itself are kept too: an extra invalidation is harmless
+        assert applied == [['a.hooks', 'b.hooks']]
+
+    def test_add_outside_flush(self, session):
+        pending_domains.add(session, ['bulk.hooks', 'bulk.hooks', 'other.hooks'])
+        session.commit()
+        assert applied == [['bulk.hooks', 'other.hooks']]
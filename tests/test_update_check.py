@@ -0,0 +1,145 @@
+"""
+Tests for the cached update check (update_check.py).
+
+Covers:
+- First request returns a pending result and triggers one background check
+- Cached results are served without calling GitHub until they expire
+- Concurrent requests coalesce into a single fetch
+- Results are shared between workers through SystemConfig
+- Failed checks keep the last known release and retry sooner
+"""
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import update_check
+from models import SystemConfig
+from update_check import UpdateChecker, FAILURE_RETRY, _serialize, _deserialize
+
+
+class FakeGitHub:
+    def __init__(self, latest='99.0.0', error=None):
+        self.latest = latest
+        self.error = error
+        self.calls = 0
+        self.gate = None
+
+    def __call__(self):
+        self.calls += 1
+        if self.gate:
+            self.gate.wait(2)
+        if self.error:
+            return {'latest_version': None, 'release_url': None, 'release_notes': None, 'error': self.error}
+        return {'latest_version': self.latest, 'release_url': 'https://example.com/release',
+                'release_notes': 'Notes', 'error': None}
+
+
+@pytest.fixture
+def github():
+    return FakeGitHub()
+
+
+@pytest.fixture
+def clock(clock):
+    clock.now = datetime(2026, 10, 1, 12, 0, 0)
+    return clock
+
+
+@pytest.fixture
+def checker(app, session, github, clock):
+    return UpdateChecker(fetch=github, clock=clock, interval=timedelta(hours=6))
+
+
+def _wait_idle(checker):
+    for _ in range(200):
+        if not checker._refreshing:
+            return
+        threading.Event().wait(0.01)
+
+
+class TestUpdateChecker:
+    """Serving from cache and refreshing in the background."""
+
+    def test_first_request_is_pending(self, app, checker, github):
+        result = checker.status(app)
+        assert result['pending'] is True
+        assert result['latest_version'] is None
+
+        _wait_idle(checker)
+        assert github.calls == 1
+        result = checker.status(app)
+        assert result['pending'] is False
+        assert result['latest_version'] == '99.0.0'
+        assert result['update_available'] is True
+
+    def test_served_from_cache_until_interval(self, app, checker, github, clock):
+        checker.refresh()
+        for _ in range(50):
+            checker.status(app)
+        assert github.calls == 1
+
+        clock.now += timedelta(hours=6)
+        checker.status(app)
+        _wait_idle(checker)
+        assert github.calls == 2
+
+    def test_concurrent_requests_coalesce(self, app, checker, github):
+        github.gate = threading.Event()
+        threads = [threading.Thread(target=checker.status, args=(app,)) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        github.gate.set()
+        _wait_idle(checker)
+        assert github.calls == 1
+
+    def test_shared_through_system_config(self, app, checker, github, clock):
+        checker.refresh()
+        assert _deserialize(SystemConfig.get(SystemConfig.KEY_UPDATE_CHECK_RESULT))['latest_version'] == '99.0.0'
+
+        # Another worker starts with an empty memory cache
+        other = UpdateChecker(fetch=github, clock=clock, interval=timedelta(hours=6))
+        assert other.status(app)['latest_version'] == '99.0.0'
+        assert other.refresh()['latest_version'] == '99.0.0'
+        assert github.calls == 1
+
+    def test_failure_keeps_last_release(self, app, checker, github, clock):
+        checker.refresh()
+        clock.now += timedelta(hours=7)
+        github.error = 'Network error: timed out'
+        checker.refresh()
+
+        result = checker.status(app)
+        assert result['latest_version'] == '99.0.0'
+        assert result['error'] == 'Network error: timed out'
+
+        # Retried after FAILURE_RETRY rather than the full interval
+        clock.now += FAILURE_RETRY
+        github.error = None
+        checker.status(app)
+        _wait_idle(checker)
+        assert github.calls == 3
+        assert checker.status(app)['error'] is None
+
+
+class TestSerialization:
+    """Stored results fit the SystemConfig value column."""
+
+    def test_long_release_notes_trimmed(self):
+        record = {'latest_version': '3.0.0', 'release_url': 'https://example.com/r', 'release_notes': 'x' * 500,
+                  'error': None, 'checked_at': datetime(2026, 10, 1)}
+        value = _serialize(record)
+        assert len(value) <= update_check.STORED_VALUE_LIMIT
+        restored = _deserialize(value)
+        assert restored['latest_version'] == '3.0.0'
+        assert restored['checked_at'] == datetime(2026, 10, 1)
+
+    def test_invalid_stored_value(self):
+        assert _deserialize(None) is None
+        assert _deserialize('not json') is None
@@ -0,0 +1,182 @@
+"""
+Tests for acknowledge-then-process webhook handling (webhook_queue.py).
+
+Covers:
+- Delivery deduplication and key expiry
+- Worker pool jobs run in an app context, failures are counted, a full queue runs inline
+- Slack retry storms are acknowledged immediately and processed once
+- Replies are posted to Slack's response_url
+"""
+import json
+import threading
+import time
+
+import pytest
+from flask import Flask, current_app, request
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import webhook_queue
+from webhook_queue import Deduplicator, WorkQueue, INLINE, SUBMITTED, deliver_response_url
+from tests.stub_idp import StubIdP
+
+
+@pytest.fixture
+def flask_app():
+    app = Flask(__name__)
+    with app.app_context():
+        yield app
+
+
+class TestDeduplicator:
+    """Each delivery key is accepted once per TTL."""
+
+    def test_first_seen_once(self):
+        dedupe = Deduplicator('test')
+        assert dedupe.first_seen('event:Ev1')
+        assert not dedupe.first_seen('event:Ev1')
+        assert dedupe.first_seen('event:Ev2')
+        assert dedupe.duplicates == 1
+
+    def test_keys_expire(self, clock):
+        dedupe = Deduplicator('test', ttl=60, clock=clock)
+        assert dedupe.first_seen('k')
+        clock.now += 61
+        assert dedupe.first_seen('k')
+
+    def test_missing_key_never_deduplicated(self):
+        dedupe = Deduplicator('test')
+        assert dedupe.first_seen(None) and dedupe.first_seen(None)
+
+    def test_redis_failure_falls_back(self):
+        redis = pytest.importorskip('redis')
+
+        class DownClient:
+            def set(self, *args, **kwargs):
+                raise redis.ConnectionError('connection refused')
+
+        dedupe = Deduplicator('test', client=DownClient())
+        assert dedupe.first_seen('k')
+        assert not dedupe.first_seen('k')
+
+
+class TestWorkQueue:
+    """Jobs run on the pool inside an app context."""
+
+    def test_runs_in_app_context(self, flask_app):
+        work = WorkQueue('test', workers=2)
+        seen = []
+        assert work.submit(lambda: seen.append(current_app.name)) == SUBMITTED
+        work.join()
+        assert seen == [flask_app.name]
+        assert work.stats()['completed'] == 1
+
+    def test_failures_are_counted(self, flask_app):
+        def broken():
+            raise RuntimeError('boom')
+
+        work = WorkQueue('test', workers=1)
+        work.submit(broken)
+        work.join()
+        assert work.stats()['failed'] == 1
+
+    def test_full_queue_runs_inline(self, flask_app):
+        release = threading.Event()
+        work = WorkQueue('test', workers=1, maxsize=1)
+        work.submit(release.wait)  # Occupies the only worker
+        time.sleep(0.05)
+        work.submit(release.wait)  # Fills the queue
+        ran = []
+        assert work.submit(ran.append, 'inline') == INLINE
+        assert ran == ['inline']
+        release.set()
+        work.join()
+        assert work.stats()['inline'] == 1
+
+
+def _events_app(work, dedupe, processed, job_seconds):
+    """A Slack events endpoint wired like app.slack_events."""
+    app = Flask(__name__)
+
+    def process(event):
+        time.sleep(job_seconds)
+        processed.append(event['event_ts'])
+
+    @app.route('/events', methods=['POST'])
+    def events():
+        data = request.get_json()
+        if not dedupe.first_seen(f"event:{data['event_id']}"):
+            return '', 200
+        work.submit(process, data['event'])
+        return '', 200
+
+    return app
+
+
+class TestRetryStorm:
+    """Slack retries of a slow event are acknowledged at once and processed once."""
+
+    def test_concurrent_retries(self):
+        work = WorkQueue('test', workers=2)
+        processed = []
+        app = _events_app(work, Deduplicator('test'), processed, job_seconds=0.5)
+        payload = {'type': 'event_callback', 'event_id': 'Ev123', 'event': {'type': 'app_home_opened', 'event_ts': '1'}}
+
+        latencies, statuses = [], []
+        lock = threading.Lock()
+
+        def deliver(retry_num):
+            headers = {'X-Slack-Retry-Num': str(retry_num), 'X-Slack-Retry-Reason': 'http_timeout'} if retry_num else {}
+            started = time.perf_counter()
+            response = app.test_client().post('/events', json=payload, headers=headers)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                statuses.append(response.status_code)
+
+        threads = [threading.Thread(target=deliver, args=(i % 4,)) for i in range(40)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        work.join()
+
+        assert statuses == [200] * 40
+        assert processed == ['1']
+        # Every delivery was acknowledged well before the job finished
+        assert max(latencies) < 0.4
+
+    def test_distinct_events_all_processed(self):
+        work = WorkQueue('test', workers=4)
+        processed = []
+        app = _events_app(work, Deduplicator('test'), processed, job_seconds=0)
+        client = app.test_client()
+        for i in range(20):
+            for retry in range(3):
+                payload = {'event_id': f'Ev{i}', 'event': {'event_ts': str(i)}}
+                client.post('/events', json=payload, headers={'X-Slack-Retry-Num': str(retry)} if retry else {})
+        work.join()
+        assert sorted(processed, key=int) == [str(i) for i in range(20)]
+
+
+class TestResponseUrl:
+    """Results are posted back to Slack."""
+
+    def test_posts_payload(self, monkeypatch):
+        with StubIdP() as hooks:
+            hooks.documents = lambda: {'/commands/T1/123': {'ok': True}}
+            monkeypatch.setattr(webhook_queue, 'SLACK_RESPONSE_URL_PREFIX', hooks.issuer + '/')
+            message = {'response_type': 'ephemeral', 'text': 'Decision created'}
+            assert deliver_response_url(f'{hooks.issuer}/commands/T1/123', message)
+            assert [(path, json.loads(body)) for path, body in hooks.bodies] == [('/commands/T1/123', message)]
+
+    def test_rejects_other_hosts(self):
+        assert not deliver_response_url('https://example.com/hook', {'text': 'x'})
+        assert not deliver_response_url('', {'text': 'x'})
+
+    def test_reports_failure(self, monkeypatch):
+        with StubIdP() as hooks:
+            hooks.fail = True
+            monkeypatch.setattr(webhook_queue, 'SLACK_RESPONSE_URL_PREFIX', hooks.issuer + '/')
+            assert not deliver_response_url(f'{hooks.issuer}/commands/T1/123', {'text': 'x'})
@@ -0,0 +1,175 @@
+"""
+Tests for chat workspace lookups and activity tracking (workspace_cache.py).
+
+Covers:
+- Cached resolution of active workspaces, including unknown ids
+- Invalidation when a workspace is claimed or disconnected (not on rollback)
+- Coalesced last_activity_at writes in one batched UPDATE per interval
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, SlackWorkspace, TeamsWorkspace
+from workspace_cache import ActivityTracker, WorkspaceRef, WorkspaceResolver, slack_workspaces, teams_workspaces
+
+
+@pytest.fixture(autouse=True)
+def empty_resolvers():
+    slack_workspaces.invalidate()
+    teams_workspaces.invalidate()
+    yield
+    slack_workspaces.invalidate()
+    teams_workspaces.invalidate()
+
+
+@pytest.fixture
+def statements(session):
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def _slack_workspace(session, team_id='T123', tenant=None, is_active=True):
+    workspace = SlackWorkspace(
+        workspace_id=team_id, bot_token_encrypted='encrypted',
+        tenant_id=tenant.id if tenant else None, is_active=is_active,
+    )
+    session.add(workspace)
+    session.commit()
+    return workspace
+
+
+class TestWorkspaceResolver:
+    """Active workspaces are looked up once per TTL."""
+
+    def test_cached_lookup(self, session, statements):
+        workspace_id = _slack_workspace(session).id
+        resolver = WorkspaceResolver(SlackWorkspace, 'workspace_id')
+        statements.clear()
+
+        assert resolver.resolve('T123') == WorkspaceRef(workspace_id, None)
+        assert resolver.resolve('T123') == WorkspaceRef(workspace_id, None)
+        assert len(statements) == 1
+        assert (resolver.hits, resolver.misses) == (1, 1)
+
+    def test_unknown_and_inactive(self, session, clock):
+        _slack_workspace(session, team_id='TOFF', is_active=False)
+        resolver = WorkspaceResolver(SlackWorkspace, 'workspace_id', negative_ttl=30, clock=clock)
+        assert resolver.resolve('TOFF') is None
+        assert resolver.resolve('TNONE') is None
+        assert resolver.resolve(None) is None
+
+        _slack_workspace(session, team_id='TNONE')
+        assert resolver.resolve('TNONE') is None  # Until the negative entry expires
+        clock.now += 31
+        assert resolver.resolve('TNONE') is not None
+
+    def test_entries_expire(self, session, clock):
+        _slack_workspace(session)
+        resolver = WorkspaceResolver(SlackWorkspace, 'workspace_id', ttl=60, clock=clock)
+        resolver.resolve('T123')
+        clock.now += 61
+        resolver.resolve('T123')
+        assert resolver.misses == 2
+
+
+class TestInvalidation:
+    """Commits that change a workspace clear the module resolvers."""
+
+    def test_claim(self, session, sample_tenant):
+        workspace = _slack_workspace(session)
+        assert slack_workspaces.resolve('T123').tenant_id is None
+
+        workspace.tenant_id = sample_tenant.id
+        workspace.status = SlackWorkspace.STATUS_ACTIVE
+        session.commit()
+        assert slack_workspaces.resolve('T123') == WorkspaceRef(workspace.id, sample_tenant.id)
+
+    def test_disconnect(self, session):
+        workspace = _slack_workspace(session)
+        assert slack_workspaces.resolve('T123') is not None
+        workspace.is_active = False
+        session.commit()
+        assert slack_workspaces.resolve('T123') is None
+
+    def test_connect(self, session):
+        assert slack_workspaces.resolve('TNEW') is None
+        _slack_workspace(session, team_id='TNEW')
+        assert slack_workspaces.resolve('TNEW') is not None
+
+    def test_rollback_keeps_entries(self, session, statements):
+        workspace = _slack_workspace(session)
+        slack_workspaces.resolve('T123')
+        workspace.is_active = False
+        session.flush()
+        session.rollback()
+        statements.clear()
+        assert slack_workspaces.resolve('T123') is not None
+        assert statements == []
+
+
+class TestActivityTracker:
+    """last_activity_at is written in batches."""
+
+    @pytest.fixture
+    def tracker(self, clock):
+        times = iter(datetime(2026, 1, 1, 12, 0) + timedelta(seconds=i) for i in range(1000))
+        return ActivityTracker(SlackWorkspace, interval=60, clock=clock, now=lambda: next(times))
+
+    def test_touches_coalesce(self, session, statements, tracker, clock):
+        first = _slack_workspace(session, team_id='T1').id
+        second = _slack_workspace(session, team_id='T2').id
+        statements.clear()
+
+        for _ in range(50):
+            tracker.touch(first)
+            tracker.touch(second)
+        assert statements == []
+        assert len(tracker.pending()) == 2
+
+        clock.now += 60
+        tracker.touch(first)
+        assert [s for s in statements if s.startswith('UPDATE')] == statements
+        assert len(statements) == 1
+        assert tracker.pending() == {}
+
+        session.expire_all()
+        assert session.get(SlackWorkspace, first).last_activity_at == datetime(2026, 1, 1, 12, 1, 40)
+        assert session.get(SlackWorkspace, second).last_activity_at == datetime(2026, 1, 1, 12, 1, 39)
+
+    def test_flush_without_activity(self, session, statements, tracker):
+        assert tracker.flush() == 0
+        assert statements == []
+
+    def test_failed_flush_keeps_pending(self, session, monkeypatch, tracker):
+        workspace = _slack_workspace(session)
+        tracker.touch(workspace.id)
+
+        def broken(*args, **kwargs):
+            raise RuntimeError('database unavailable')
+
+        monkeypatch.setattr(db.engine, 'begin', broken)
+        assert tracker.flush() == 0
+        assert list(tracker.pending()) == [workspace.id]
+        monkeypatch.undo()
+        assert tracker.flush() == 1
+
+    def test_teams_workspaces(self, session):
+        workspace = TeamsWorkspace(ms_tenant_id='00000000-0000-0000-0000-000000000001')
+        session.add(workspace)
+        session.commit()
+        tracker = ActivityTracker(TeamsWorkspace, interval=0)
+        tracker.touch(workspace.id)
+        session.expire_all()
+        assert session.get(TeamsWorkspace, workspace.id).last_activity_at is not None
@@ -0,0 +1,173 @@
+"""
+Cached check for newer releases.
+
+GET /api/version/check used to call GitHub on every request. The latest result
+is now kept in memory and in SystemConfig (so all workers share it) and is
+refreshed on a background thread once it is older than UPDATE_CHECK_INTERVAL_HOURS
+(default 6). Requests never wait for GitHub: they get the last known result,
+or a pending result before the first check has completed.
+
+Only one refresh runs per process at a time, and a refresh first re-reads the
+stored result so workers do not repeat a check another worker just made.
+Failed checks are retried after FAILURE_RETRY instead of the full interval.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from models import SystemConfig
+from version import __version__, check_for_updates, compare_versions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL_HOURS = 6
+FAILURE_RETRY = timedelta(minutes=15)
+STORED_VALUE_LIMIT = 500  # SystemConfig.value column length
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _interval():
+    try:
+        hours = float(os.environ.get('UPDATE_CHECK_INTERVAL_HOURS', DEFAULT_INTERVAL_HOURS))
+    except ValueError:
+        hours = DEFAULT_INTERVAL_HOURS
+    return timedelta(hours=hours)
+
+
+def _serialize(record):
+    """JSON for SystemConfig, trimming release notes to fit the column."""
+    record = dict(record, checked_at=record['checked_at'].isoformat())
+    value = json.dumps(record, separators=(',', ':'))
+    while len(value) > STORED_VALUE_LIMIT and record.get('release_notes'):
+        overflow = len(value) - STORED_VALUE_LIMIT
+        record['release_notes'] = record['release_notes'][:max(0, len(record['release_notes']) - overflow - 1)]
+        value = json.dumps(record, separators=(',', ':'))
+    return value
+
+
+def _deserialize(value):
+    try:
+        record = json.loads(value)
+        record['checked_at'] = datetime.fromisoformat(record['checked_at'])
+        return record
+    except (TypeError, ValueError, KeyError):
+        return None
+
+
+class UpdateChecker:
+    """Serves the last update check result and refreshes it in the background."""
+
+    def __init__(self, fetch=None, clock=_utcnow, interval=None):
+        self._fetch = fetch or check_for_updates
+        self._clock = clock
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._record = None
+        self._loaded = False
+        self._refreshing = False
+
+    @property
+    def interval(self):
+        return self._interval or _interval()
+
+    def _is_fresh(self, record, now):
+        if record is None:
+            return False
+        max_age = FAILURE_RETRY if record.get('error') else self.interval
+        return now - record['checked_at'] < max_age
+
+    def _load_stored(self):
+        try:
+            return _deserialize(SystemConfig.get(SystemConfig.KEY_UPDATE_CHECK_RESULT))
+        except Exception as e:
+            logger.warning(f"Could not load stored update check: {e}")
+            return None
+
+    def _store(self, record):
+        try:
+            SystemConfig.set(SystemConfig.KEY_UPDATE_CHECK_RESULT, _serialize(record),
+                             description='Latest release check (managed automatically)')
+        except Exception as e:
+            logger.warning(f"Could not store update check: {e}")
+
+    def refresh(self):
+        """Check GitHub now unless a fresh result is already stored. Needs an app context."""
+        stored = self._load_stored()
+        if self._is_fresh(stored, self._clock()):
+            self._record = stored
+            return stored
+
+        result = self._fetch()
+        record = {
+            'latest_version': result.get('latest_version'),
+            'release_url': result.get('release_url'),
+            'release_notes': result.get('release_notes'),
+            'error': result.get('error'),
+            'checked_at': self._clock(),
+        }
+        if record['error'] and stored and stored.get('latest_version'):
+            # Keep the last known release; only note that the check failed
+            record.update({k: stored.get(k) for k in ('latest_version', 'release_url', 'release_notes')})
+        self._record = record
+        self._store(record)
+        return record
+
+    def _refresh_in_background(self, app):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def worker():
+            from models import db
+            with app.app_context():
+                try:
+                    self.refresh()
+                except Exception:
+                    logger.exception("Update check failed")
+                finally:
+                    db.session.remove()
+                    self._refreshing = False
+
+        threading.Thread(target=worker, name='update-check', daemon=True).start()
+
+    def status(self, app):
+        """The cached result in check_for_updates() shape, scheduling a refresh if due."""
+        if not self._loaded:
+            self._loaded = True
+            self._record = self._record or self._load_stored()
+
+        record = self._record
+        if not self._is_fresh(record, self._clock()):
+            self._refresh_in_background(app)
+
+        result = {
+            'current_version': __version__,
+            'latest_version': None,
+            'update_available': False,
+            'release_url': None,
+            'release_notes': None,
+            'error': None,
+            'checked_at': None,
+            'pending': record is None,
+        }
+        if record:
+            result.update({k: record.get(k) for k in ('latest_version', 'release_url', 'release_notes', 'error')})
+            result['checked_at'] = record['checked_at'].isoformat()
+            if record.get('latest_version'):
+                result['update_available'] = compare_versions(__version__, record['latest_version']) < 0
+        return result
+
+    def reset(self):
+        """Forget the in-memory result (tests)."""
+        with self._lock:
+            self._record = None
+            self._loaded = False
+
+
+update_checker = UpdateChecker()
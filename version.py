@@ -10,7 +10,6 @@ The version is automatically updated via git hooks on commit.
 """
 
 import os
-import json
 from datetime import datetime
 
 # Application version - automatically updated by git pre-commit hook
@@ -98,8 +97,7 @@ def check_for_updates(timeout=5):
     Check GitHub releases for newer version.
     Returns dict with update information.
     """
-    import urllib.request
-    import ssl
+    from http_client import http_client, RequestException
 
     result = {
         'current_version': __version__,
@@ -114,37 +112,36 @@ def check_for_updates(timeout=5):
         # GitHub API endpoint for latest release
         url = 'https://api.github.com/repos/DecisionRecordsORG/DecisionRecords/releases/latest'
 
-        req = urllib.request.Request(
+        response = http_client.get(
             url,
             headers={
                 'Accept': 'application/vnd.github.v3+json',
                 'User-Agent': f'DecisionRecords/{__version__}'
-            }
+            },
+            timeout=timeout
         )
 
-        # Create SSL context
-        context = ssl.create_default_context()
+        if response.status_code == 404:
+            result['error'] = 'No releases found'
+            return result
+        if not response.ok:
+            result['error'] = f'GitHub API error: {response.status_code}'
+            return result
 
-        with urllib.request.urlopen(req, timeout=timeout, context=context) as response:
-            data = json.loads(response.read().decode('utf-8'))
+        data = response.json()
 
-            latest_version = data.get('tag_name', '').lstrip('v')
-            result['latest_version'] = latest_version
-            result['release_url'] = data.get('html_url')
-            result['release_notes'] = data.get('body', '')[:500]  # First 500 chars
+        latest_version = data.get('tag_name', '').lstrip('v')
+        result['latest_version'] = latest_version
+        result['release_url'] = data.get('html_url')
+        result['release_notes'] = (data.get('body') or '')[:500]  # First 500 chars
 
-            comparison = compare_versions(__version__, latest_version)
-            result['update_available'] = comparison < 0
+        comparison = compare_versions(__version__, latest_version)
+        result['update_available'] = comparison < 0
 
-    except urllib.error.HTTPError as e:
-        if e.code == 404:
-            result['error'] = 'No releases found'
-        else:
-            result['error'] = f'GitHub API error: {e.code}'
-    except urllib.error.URLError as e:
-        result['error'] = f'Network error: {str(e.reason)}'
-    except json.JSONDecodeError:
+    except ValueError:
         result['error'] = 'Invalid response from GitHub'
+    except RequestException as e:
+        result['error'] = f'Network error: {str(e)}'
     except Exception as e:
         result['error'] = f'Check failed: {str(e)}'
 
@@ -0,0 +1,187 @@
+"""
+Acknowledge-then-process support for inbound webhooks.
+
+Slack expects an HTTP 200 within 3 seconds and retries (with X-Slack-Retry-Num)
+when it does not get one, so a slow database or LLM call turns into duplicate
+deliveries. Webhook views instead:
+
+1. verify the request and drop anything already seen (Deduplicator),
+2. hand the work to a bounded pool of worker threads (WorkQueue),
+3. return 200 straight away; the job posts its result to Slack's response_url
+   (deliver_response_url) or calls the Web API itself.
+
+    if not slack_deduplicator.first_seen(f"event:{event_id}"):
+        return '', 200
+    slack_queue.submit(_process_slack_event, workspace.id, event)
+    return '', 200
+
+Deduplication keys are shared through Redis when REDIS_URL is set, so a retry
+that lands on another worker is still recognised; otherwise they are kept
+per process. Jobs run in an app context on daemon threads. When the queue is
+full the job runs inline, which is slower to acknowledge but loses nothing.
+Queued jobs do not survive a process restart.
+"""
+import logging
+import queue
+import threading
+import time
+
+from flask import current_app
+
+from env_config import env_number
+from http_client import http_client, RequestException
+from redis_support import RedisError, connect, redis_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 200
+DEFAULT_DEDUPE_TTL = 900  # Slack retries for about five minutes
+DEDUPE_KEY_PREFIX = 'dr:webhook:'
+LOCAL_DEDUPE_MAX_KEYS = 50000
+RESPONSE_URL_TIMEOUT = (3, 10)
+SLACK_RESPONSE_URL_PREFIX = 'https://hooks.slack.com/'
+
+SUBMITTED = 'queued'
+INLINE = 'inline'
+
+
+class Deduplicator:
+    """Remembers delivery keys for ttl seconds; first_seen() is True only once per key."""
+
+    def __init__(self, namespace, ttl=DEFAULT_DEDUPE_TTL, client=None, clock=time.monotonic):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.client = client
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._seen = {}  # key -> expires at
+        self.duplicates = 0
+
+    @classmethod
+    def from_env(cls, namespace, ttl=DEFAULT_DEDUPE_TTL):
+        url = redis_url(description='Webhook dedupe store', fallback='retries are deduplicated per process')
+        return cls(namespace, ttl=ttl, client=connect(url) if url else None)
+
+    def first_seen(self, key):
+        if not key:
+            return True
+        if self.client is not None:
+            try:
+                new = bool(self.client.set(f'{DEDUPE_KEY_PREFIX}{self.namespace}:{key}', 1, nx=True, ex=self.ttl))
+            except RedisError as e:
+                logger.warning(f"Webhook dedupe store unavailable, using in-process keys: {e}")
+                new = self._first_seen_locally(key)
+        else:
+            new = self._first_seen_locally(key)
+        if not new:
+            self.duplicates += 1
+        return new
+
+    def _first_seen_locally(self, key):
+        now = self._clock()
+        with self._lock:
+            expires_at = self._seen.get(key)
+            if expires_at is not None and expires_at > now:
+                return False
+            if len(self._seen) >= LOCAL_DEDUPE_MAX_KEYS:
+                self._seen = {k: v for k, v in self._seen.items() if v > now}
+            self._seen[key] = now + self.ttl
+            return True
+
+
+class WorkQueue:
+    """A bounded queue served by a fixed pool of daemon threads, each job in an app context."""
+
+    def __init__(self, name, workers=DEFAULT_WORKERS, maxsize=DEFAULT_QUEUE_SIZE):
+        self.name = name
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._counts = {'submitted': 0, 'inline': 0, 'completed': 0, 'failed': 0}
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs); runs it inline when the queue is full. Returns SUBMITTED or INLINE."""
+        app = current_app._get_current_object()
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((app, fn, args, kwargs))
+        except queue.Full:
+            logger.warning(f"{self.name} work queue full ({self._queue.maxsize}), running {fn.__name__} inline")
+            self._count('inline')
+            self._run(app, fn, args, kwargs)
+            return INLINE
+        self._count('submitted')
+        return SUBMITTED
+
+    def join(self):
+        """Block until every queued job has finished."""
+        self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counts,
+                'queued': self._queue.qsize(),
+                'max_queued': self._queue.maxsize,
+                'workers': len(self._threads),
+            }
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _ensure_started(self):
+        if len(self._threads) >= self.workers:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._work, name=f'{self.name}-worker-{len(self._threads)}', daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            app, fn, args, kwargs = self._queue.get()
+            try:
+                self._run(app, fn, args, kwargs)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, app, fn, args, kwargs):
+        with app.app_context():
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                # The app context teardown rolls back and removes the job's DB session
+                self._count('failed')
+                logger.exception(f"{self.name} job {fn.__name__} failed")
+            else:
+                self._count('completed')
+
+
+def deliver_response_url(response_url, payload):
+    """POST a message to a Slack response_url. Returns True when Slack accepted it."""
+    if not response_url or not response_url.startswith(SLACK_RESPONSE_URL_PREFIX):
+        logger.warning("Dropping Slack response with a missing or unexpected response_url")
+        return False
+    try:
+        response = http_client.post(response_url, json=payload, timeout=RESPONSE_URL_TIMEOUT)
+    except RequestException as e:
+        logger.warning(f"Slack response_url delivery failed: {e}")
+        return False
+    if response.status_code != 200:
+        logger.warning(f"Slack response_url delivery returned HTTP {response.status_code}")
+        return False
+    return True
+
+
+slack_queue = WorkQueue(
+    'slack',
+    workers=env_number('SLACK_WORKER_THREADS', DEFAULT_WORKERS),
+    maxsize=env_number('SLACK_QUEUE_SIZE', DEFAULT_QUEUE_SIZE),
+)
+slack_deduplicator = Deduplicator.from_env('slack')
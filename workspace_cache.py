@@ -0,0 +1,183 @@
+"""
+Workspace lookups and activity timestamps for chat webhooks.
+
+Every Slack command, interaction and event, and every Teams activity, starts
+by finding the workspace it belongs to, and Slack deliveries used to commit a
+last_activity_at update each time. In busy channels that made every message a
+write transaction.
+
+- WorkspaceResolver maps an external id (Slack team_id, Microsoft tenant id) to
+  the active workspace's (id, tenant_id), cached per process. Unknown ids are
+  cached for a shorter time. Any committed ORM change to a workspace (connect,
+  disconnect, claim, settings) clears the resolver for that model in this
+  process; other processes pick the change up within the TTL. Views that act on
+  a workspace still load it by primary key and check is_active.
+
+- ActivityTracker records last_activity_at in memory and writes the pending
+  timestamps of all workspaces in one batched UPDATE at most once per interval
+  (default a minute), on its own connection so it never commits the caller's
+  session.
+
+    ref = slack_workspaces.resolve(team_id)
+    if ref:
+        slack_activity.touch(ref.id)
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import case, update
+
+from models import db, SlackWorkspace, TeamsWorkspace
+from session_hooks import PendingChanges
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300
+DEFAULT_NEGATIVE_TTL = 30
+DEFAULT_ACTIVITY_INTERVAL = 60
+MAX_ENTRIES = 10000
+
+WorkspaceRef = namedtuple('WorkspaceRef', 'id tenant_id')
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class WorkspaceResolver:
+    """Cached external id -> WorkspaceRef lookups for active workspaces of one model."""
+
+    def __init__(self, model, key_attr, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL, clock=time.monotonic):
+        self.model = model
+        self.key_attr = key_attr
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (expires at, WorkspaceRef or None)
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, key):
+        """The active workspace for key, or None."""
+        if not key:
+            return None
+        now = self._clock()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        model = self.model
+        row = (
+            db.session.query(model.id, model.tenant_id)
+            .filter(getattr(model, self.key_attr) == key, model.is_active == True)  # noqa: E712
+            .first()
+        )
+        ref = WorkspaceRef(row[0], row[1]) if row else None
+        with self._lock:
+            if len(self._entries) >= MAX_ENTRIES:
+                self._entries.clear()
+            self._entries[key] = (now + (self.ttl if ref else self.negative_ttl), ref)
+        return ref
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+class ActivityTracker:
+    """Coalesces last_activity_at (or another timestamp column) updates into one batched UPDATE per interval."""
+
+    def __init__(self, model, interval=DEFAULT_ACTIVITY_INTERVAL, column='last_activity_at', clock=time.monotonic, now=_utcnow):
+        self.model = model
+        self.interval = interval
+        self.column = column
+        self._clock = clock
+        self._now = now
+        self._lock = threading.Lock()
+        self._pending = {}  # workspace id -> latest activity
+        self._last_flush = clock()
+        self._app = None
+        self.flushes = 0
+
+    def touch(self, workspace_id):
+        """Record activity now; writes pending timestamps if the interval has passed."""
+        with self._lock:
+            self._pending[workspace_id] = self._now()
+            due = self._clock() - self._last_flush >= self.interval
+            if self._app is None:
+                self._app = current_app._get_current_object()
+        if due:
+            self.flush()
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self):
+        """Write all pending timestamps in one UPDATE. Returns the number of workspaces written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = self._clock()
+        if not pending:
+            return 0
+
+        model = self.model
+        statement = (
+            update(model)
+            .where(model.id.in_(list(pending)))
+            .values({self.column: case(pending, value=model.id)})
+        )
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(statement)
+        except Exception as e:
+            logger.warning(f"Could not record {model.__tablename__} activity: {e}")
+            with self._lock:
+                for workspace_id, seen_at in pending.items():
+                    if self._pending.get(workspace_id, seen_at) <= seen_at:
+                        self._pending[workspace_id] = seen_at
+            return 0
+        self.flushes += 1
+        return len(pending)
+
+    def flush_at_exit(self):
+        if self._app is None or not self._pending:
+            return
+        with self._app.app_context():
+            self.flush()
+
+
+slack_workspaces = WorkspaceResolver(SlackWorkspace, 'workspace_id')
+teams_workspaces = WorkspaceResolver(TeamsWorkspace, 'ms_tenant_id')
+slack_activity = ActivityTracker(SlackWorkspace)
+teams_activity = ActivityTracker(TeamsWorkspace)
+
+_RESOLVERS = {SlackWorkspace: slack_workspaces, TeamsWorkspace: teams_workspaces}
+_PENDING_KEY = 'workspace_cache_invalidations'
+
+atexit.register(slack_activity.flush_at_exit)
+atexit.register(teams_activity.flush_at_exit)
+
+
+def _changed_resolvers(session):
+    objects = list(session.new) + list(session.dirty) + list(session.deleted)
+    return [_RESOLVERS[type(obj)] for obj in objects if type(obj) in _RESOLVERS]
+
+
+def _invalidate(session, resolvers):
+    for resolver in resolvers:
+        resolver.invalidate()
+
+
+pending_invalidations = PendingChanges(_PENDING_KEY, _changed_resolvers, _invalidate)